@@ -0,0 +1,137 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time filling the FeatureAtLocationBuffer of an LM over long episodes.
+
+Each step appends one observation and records stats of the size the
+`EvidenceGraphLM` logs. Compares the `GrowableArray` storage and `copy_stat` with
+copying all previous rows into a new nan padded array and deep copying the stats
+at every step, as done before. With growable storage the time per step should
+stay constant as the episode gets longer.
+
+Usage:
+    python benchmarks/micro/buffer.py --num_steps 1000 2000 4000 8000
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import make_observations
+from tbp.monty.frameworks.models.buffer import FeatureAtLocationBuffer
+
+
+class PaddingFeatureAtLocationBuffer(FeatureAtLocationBuffer):
+    """Buffer copying all rows and deep copying stats at each step, as before."""
+
+    def _set_current_row(self, rows, arrays, key, value):
+        value = np.ravel(value)
+        existing_vals = arrays.get(key, np.empty((0, 0)))
+        new_vals = np.empty((len(self) + 1, len(value))) * np.nan
+        new_vals[: existing_vals.shape[0], : existing_vals.shape[1]] = existing_vals
+        new_vals[-1] = value
+        arrays[key] = new_vals
+
+    def update_stats(self, stats, update_time=True, append=True, init_list=True):
+        for stat in stats.keys():
+            if stat in self.stats.keys() and append:
+                self.stats[stat].append(copy.deepcopy(stats[stat]))
+            else:
+                self.stats[stat] = [copy.deepcopy(stats[stat])]
+        if update_time:
+            self.stats["time"].append(time.time() - self.start_time)
+
+
+def fill_buffer(buffer, observations, stats):
+    """Append all observations and stats to the buffer.
+
+    Returns:
+        The duration in seconds.
+    """
+    start_time = time.perf_counter()
+    for observation in observations:
+        buffer.append([observation])
+        buffer.update_stats(stats)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_steps", type=int, nargs="+", default=[1000, 2000, 4000, 8000]
+    )
+    parser.add_argument("--num_objects", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    observations = make_observations(rng, max(args.num_steps))
+    for observation in observations:
+        observation.set_displacement(rng.normal(0, 0.004, 3))
+    # Stats of one step of an LM with the MLH and a few evidence values per object.
+    stats = {
+        "current_mlh": {
+            "graph_id": "object0",
+            "location": np.zeros(3),
+            "rotation": np.eye(3),
+            "evidence": np.float64(1.0),
+        },
+        "possible_matches": [f"object{i}" for i in range(args.num_objects)],
+        "max_evidence": {f"object{i}": rng.random(4) for i in range(args.num_objects)},
+        "lm_processed_steps": True,
+    }
+
+    print(
+        f"{'steps':>6} {'padding ms':>10} {'us/step':>8} "
+        f"{'growable ms':>11} {'us/step':>8}"
+    )
+    identical = True
+    for num_steps in args.num_steps:
+        buffers = {}
+        durations = {}
+        for name, buffer_class in [
+            ("padding", PaddingFeatureAtLocationBuffer),
+            ("growable", FeatureAtLocationBuffer),
+        ]:
+            buffers[name] = buffer_class()
+            durations[name] = fill_buffer(
+                buffers[name], observations[:num_steps], stats
+            )
+        identical &= all(
+            np.array_equal(
+                buffers["padding"].features["patch"][feature],
+                buffers["growable"].features["patch"][feature],
+                equal_nan=True,
+            )
+            for feature in buffers["padding"].features["patch"]
+        ) and np.array_equal(
+            buffers["padding"].locations["patch"],
+            buffers["growable"].locations["patch"],
+        )
+        print(
+            f"{num_steps:>6} {1000 * durations['padding']:>10.1f} "
+            f"{1e6 * durations['padding'] / num_steps:>8.1f} "
+            f"{1000 * durations['growable']:>11.1f} "
+            f"{1e6 * durations['growable'] / num_steps:>8.1f}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time writing and reading detailed logs of the JSON handler vs. the episode log.
+
+Logs synthetic detailed stats of an `EvidenceGraphLM` (possible locations and
+evidences of every object at every step) with `DetailedJSONHandler` and
+`DetailedEpisodeLogHandler`, and reports the time to write the episodes, the size
+of the log files and the time to load the evidences of a single object at a single
+step of the last episode.
+
+Usage:
+    python benchmarks/micro/episode_log.py --num_objects 10 --num_hypotheses 5000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.loggers.monty_handlers import (
+    DetailedEpisodeLogHandler,
+    DetailedJSONHandler,
+)
+from tbp.monty.frameworks.utils.episode_log import EPISODE_LOG_FILE_NAME, EpisodeLog
+from tbp.monty.frameworks.utils.logging_utils import deserialize_json_chunks
+
+
+def time_call(function, num_repeats):
+    """Return the minimum duration of calling function in seconds and its result."""
+    durations = []
+    for _ in range(num_repeats):
+        start_time = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations), result
+
+
+def make_detailed_stats(rng, num_objects, num_hypotheses, num_steps):
+    objects = [f"object_{i}" for i in range(num_objects)]
+    possible_locations = {
+        obj: rng.random((num_hypotheses, 3)).astype(np.float32) for obj in objects
+    }
+    return {
+        "LM_0": {
+            "possible_locations": [possible_locations for _ in range(num_steps)],
+            "evidences": [
+                {obj: rng.random(num_hypotheses) for obj in objects}
+                for _ in range(num_steps)
+            ],
+            "possible_matches": [objects for _ in range(num_steps)],
+            "time": list(np.arange(num_steps) * 0.01),
+            "mode": "eval",
+        }
+    }
+
+
+def report_episodes(handler_class, data, output_dir, num_episodes):
+    handler = handler_class()
+    for episode in range(num_episodes):
+        handler.report_episode(
+            data,
+            output_dir,
+            episode,
+            mode="eval",
+            eval_episodes_to_total={i: i for i in range(num_episodes)},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=10)
+    parser.add_argument("--num_hypotheses", type=int, default=5000)
+    parser.add_argument("--num_steps", type=int, default=20)
+    parser.add_argument("--num_episodes", type=int, default=3)
+    parser.add_argument("--num_repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = {"BASIC": {"eval_stats": {}}, "DETAILED": {}}
+    for episode in range(args.num_episodes):
+        data["BASIC"]["eval_stats"][episode] = {"LM_0": {"num_steps": args.num_steps}}
+        data["DETAILED"][episode] = make_detailed_stats(
+            rng, args.num_objects, args.num_hypotheses, args.num_steps
+        )
+    episode, step, obj = args.num_episodes - 1, args.num_steps // 2, "object_0"
+
+    output_dir = tempfile.mkdtemp()
+    json_file = os.path.join(output_dir, "detailed_run_stats.json")
+    log_file = os.path.join(output_dir, EPISODE_LOG_FILE_NAME)
+    loaders = {
+        DetailedJSONHandler: (
+            json_file,
+            lambda: deserialize_json_chunks(json_file, episodes=[episode])[
+                str(episode)
+            ]["LM_0"]["evidences"][step][obj],
+        ),
+        DetailedEpisodeLogHandler: (
+            log_file,
+            lambda: np.array(
+                EpisodeLog(log_file).get(episode, "LM_0", "evidences", step, obj)
+            ),
+        ),
+    }
+    print(f"{'handler':>26} {'write ms':>9} {'size MiB':>9} {'load step ms':>12}")
+    results = []
+    try:
+        for handler_class, (file_name, load_step) in loaders.items():
+            write_durations = []
+            for _ in range(args.num_repeats):
+                if os.path.exists(file_name):
+                    os.remove(file_name)
+                write_duration, _ = time_call(
+                    lambda handler_class=handler_class: report_episodes(
+                        handler_class, data, output_dir, args.num_episodes
+                    ),
+                    1,
+                )
+                write_durations.append(write_duration)
+            size = Path(file_name).stat().st_size
+            load_duration, result = time_call(load_step, args.num_repeats)
+            results.append(np.asarray(result))
+            print(
+                f"{handler_class.__name__:>26} {1000 * min(write_durations):>9.1f} "
+                f"{size / 2**20:>9.1f} {1000 * load_duration:>12.2f}"
+            )
+    finally:
+        shutil.rmtree(output_dir)
+    identical = np.array_equal(results[0], results[1]) and np.array_equal(
+        results[1], data["DETAILED"][episode]["LM_0"]["evidences"][step][obj]
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
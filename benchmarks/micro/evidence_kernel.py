@@ -0,0 +1,104 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Compare the default and fused evidence kernels of the EvidenceGraphLM.
+
+Usage:
+    python benchmarks/micro/evidence_kernel.py --num_objects 77
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import (
+    make_evidence_lm,
+    run_matching_episode,
+)
+
+
+def time_evidence_calculation(lm):
+    """Accumulate the time spent in `_calculate_evidence_for_new_locations`.
+
+    Returns:
+        List to which the duration of each call is appended.
+    """
+    durations = []
+    calculate_evidence = lm._calculate_evidence_for_new_locations
+
+    def timed_calculate_evidence(*args, **kwargs):
+        start_time = time.perf_counter()
+        location_evidence = calculate_evidence(*args, **kwargs)
+        durations.append(time.perf_counter() - start_time)
+        return location_evidence
+
+    lm._calculate_evidence_for_new_locations = timed_calculate_evidence
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_steps", type=int, default=20)
+    parser.add_argument("--use_multithreading", action="store_true")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects,
+        num_points=args.num_points,
+        use_multithreading=args.use_multithreading,
+    )
+    print(
+        f"Learned {args.num_objects} objects in {time.perf_counter() - start_time:.1f}s"
+    )
+    target_observations = observations["new_object0"]
+    evidence_durations = time_evidence_calculation(lm)
+
+    evidence = {}
+    for evidence_kernel in ["default", "fused"]:
+        lm.evidence_kernel = evidence_kernel
+        # Warm up (allocates the buffers of the fused kernel).
+        run_matching_episode(lm, target_observations, num_steps=3)
+        evidence_durations.clear()
+        step_times = run_matching_episode(
+            lm, target_observations, num_steps=args.num_steps
+        )
+        evidence[evidence_kernel] = {
+            graph_id: graph_evidence.copy()
+            for graph_id, graph_evidence in lm.evidence.items()
+        }
+        num_hypotheses = sum(len(e) for e in lm.evidence.values())
+        print(
+            f"{evidence_kernel:>8}: {1000 * np.mean(step_times[1:]):.1f}ms per step "
+            f"(first step {1000 * step_times[0]:.1f}ms), "
+            f"{1000 * np.sum(evidence_durations) / len(step_times):.1f}ms per step in "
+            f"the evidence kernel, {num_hypotheses} hypotheses"
+        )
+
+    identical = all(
+        np.array_equal(evidence["default"][graph_id], evidence["fused"][graph_id])
+        for graph_id in evidence["default"]
+    )
+    print(f"Evidence identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Compare the evidence update executors of the EvidenceGraphLM.
+
+Usage:
+    python benchmarks/micro/evidence_update_executors.py --num_objects 77
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import (
+    make_evidence_lm,
+    run_matching_episode,
+)
+from tbp.monty.frameworks.models.evidence_update_executors import (
+    EVIDENCE_UPDATE_EXECUTORS,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_steps", type=int, default=20)
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        nargs="+",
+        default=[os.cpu_count()],
+        help="Number of workers to test for the thread and process pools.",
+    )
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects, num_points=args.num_points
+    )
+    print(
+        f"Learned {args.num_objects} objects in {time.perf_counter() - start_time:.1f}s"
+    )
+    target_observations = observations["new_object0"]
+
+    configurations = [("serial", None), ("threads", None)] + [
+        (executor_name, num_workers)
+        for executor_name in ["thread_pool", "process_pool"]
+        for num_workers in args.num_workers
+    ]
+    evidence = {}
+    for executor_name, num_workers in configurations:
+        assert executor_name in EVIDENCE_UPDATE_EXECUTORS
+        lm.evidence_update_executor.close()
+        lm.evidence_update_executor = lm._create_evidence_update_executor(
+            executor_name, num_workers
+        )
+        # Warm up (starts the pools and allocates the shared memory).
+        run_matching_episode(lm, target_observations, num_steps=3)
+        step_times = run_matching_episode(
+            lm, target_observations, num_steps=args.num_steps
+        )
+        evidence[(executor_name, num_workers)] = {
+            graph_id: graph_evidence.copy()
+            for graph_id, graph_evidence in lm.evidence.items()
+        }
+        name = (
+            executor_name if num_workers is None else f"{executor_name}({num_workers})"
+        )
+        print(
+            f"{name:>16}: {1000 * np.mean(step_times[1:]):.1f}ms per step "
+            f"(first step {1000 * step_times[0]:.1f}ms)"
+        )
+    lm.evidence_update_executor.close()
+
+    reference = evidence[("serial", None)]
+    max_difference = max(
+        np.max(np.abs(executor_evidence[graph_id] - reference[graph_id]))
+        for executor_evidence in evidence.values()
+        for graph_id in reference
+    )
+    print(f"Max. evidence difference to serial updates: {max_difference}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time calculating the node feature evidence of all objects for one observation.
+
+Compares building the tolerance, weight and circular mask vectors at every call
+(the loop previously used by `EvidenceGraphLM`), a `FeatureMatcher` per object,
+and one stacked `FeatureMatcher` for all objects.
+
+Usage:
+    python benchmarks/micro/feature_matcher.py --num_objects 77
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import INPUT_CHANNEL, make_evidence_lm
+from tbp.monty.frameworks.utils.evidence_matching import FeatureMatcher
+
+
+def loop_feature_evidence(lm, query_features, graph_id):
+    """Build all vectors in a loop over the features, as done before FeatureMatcher.
+
+    Returns:
+        The feature evidence for all nodes of the graph.
+    """
+    feature_array = lm.graph_memory.get_feature_array(graph_id)[INPUT_CHANNEL]
+    feature_order = lm.graph_memory.get_feature_order(graph_id)[INPUT_CHANNEL]
+    shape_to_use = feature_array.shape[1]
+    tolerance_list = np.zeros(shape_to_use) * np.nan
+    feature_weight_list = np.zeros(shape_to_use) * np.nan
+    feature_list = np.zeros(shape_to_use) * np.nan
+    circular_var = np.zeros(shape_to_use, dtype=bool)
+    start_idx = 0
+    query_features = query_features[INPUT_CHANNEL]
+    for feature in feature_order:
+        if feature in ["pose_vectors", "pose_fully_defined"]:
+            continue
+        if hasattr(query_features[feature], "__len__"):
+            feature_length = len(query_features[feature])
+        else:
+            feature_length = 1
+        end_idx = start_idx + feature_length
+        feature_list[start_idx:end_idx] = query_features[feature]
+        tolerance_list[start_idx:end_idx] = lm.tolerances[INPUT_CHANNEL][feature]
+        feature_weight_list[start_idx:end_idx] = lm.feature_weights[INPUT_CHANNEL][
+            feature
+        ]
+        circular_var[start_idx:end_idx] = (
+            [True, False, False] if feature == "hsv" else False
+        )
+        start_idx = end_idx
+    feature_differences = np.zeros_like(feature_array)
+    feature_differences[:, ~circular_var] = np.abs(
+        feature_array[:, ~circular_var] - feature_list[~circular_var]
+    )
+    cnode_fs = feature_array[:, circular_var]
+    cquery_fs = feature_list[circular_var]
+    feature_differences[:, circular_var] = np.min(
+        [
+            np.abs(1 + cnode_fs - cquery_fs),
+            np.abs(cnode_fs - cquery_fs),
+            np.abs(cnode_fs - (cquery_fs + 1)),
+        ],
+        axis=0,
+    )
+    feature_evidence = np.clip(tolerance_list - feature_differences, 0, np.inf)
+    feature_evidence = feature_evidence / tolerance_list
+    return np.average(feature_evidence, weights=feature_weight_list, axis=1)
+
+
+def time_call(function, num_repeats):
+    """Return the mean duration of calling function in seconds and its result."""
+    start_time = time.perf_counter()
+    for _ in range(num_repeats):
+        result = function()
+    return (time.perf_counter() - start_time) / num_repeats, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_repeats", type=int, default=100)
+    args = parser.parse_args()
+
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects, num_points=args.num_points
+    )
+    lm.pre_episode({"object": "unknown", "quat_rotation": [1, 0, 0, 0]})
+    query_features = lm._select_features_to_use([observations["new_object0"][0]])
+    graph_ids = lm.get_all_known_object_ids()
+    matchers = [lm._get_feature_matcher(g, INPUT_CHANNEL) for g in graph_ids]
+    stacked = FeatureMatcher.stack(matchers)
+
+    durations, results = {}, {}
+    durations["loop"], results["loop"] = time_call(
+        lambda: [loop_feature_evidence(lm, query_features, g) for g in graph_ids],
+        args.num_repeats,
+    )
+    durations["per graph"], results["per graph"] = time_call(
+        lambda: [
+            m.node_feature_evidence(query_features[INPUT_CHANNEL]) for m in matchers
+        ],
+        args.num_repeats,
+    )
+    durations["stacked"], results["stacked"] = time_call(
+        lambda: stacked.split(
+            stacked.node_feature_evidence(query_features[INPUT_CHANNEL])
+        ),
+        args.num_repeats,
+    )
+    num_nodes = sum(len(m.node_features) for m in matchers)
+    print(f"{len(graph_ids)} objects, {num_nodes} nodes")
+    for name, duration in durations.items():
+        print(f"{name:>9}: {1000 * duration:.2f}ms")
+    identical = all(
+        np.array_equal(a, b, equal_nan=True)
+        for name in ["per graph", "stacked"]
+        for a, b in zip(results["loop"], results[name])
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time the matching steps of an EvidenceGraphLM with and without pruning.
+
+Runs a noisy inference episode on one of the learned objects, once keeping all
+hypotheses and once with `hypotheses_pruning_margin` set, and prints the duration
+and the number of hypotheses (over all objects) at each step, as well as whether
+both episodes end with the same most likely hypothesis.
+
+Usage:
+    python benchmarks/micro/hypotheses_pruning.py --num_objects 77 --margin 2
+"""
+
+import argparse
+import copy
+import os
+import sys
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import make_evidence_lm, run_matching_episode
+
+
+class HypothesesCounter:
+    """Wraps matching_step of an LM to record the number of hypotheses."""
+
+    def __init__(self, lm):
+        self.lm = lm
+        self.matching_step = lm.matching_step
+        self.num_hypotheses = []
+        lm.matching_step = self
+
+    def __call__(self, observations):
+        self.matching_step(observations)
+        self.num_hypotheses.append(sum(len(e) for e in self.lm.evidence.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_steps", type=int, default=30)
+    parser.add_argument("--margin", type=float, default=2)
+    parser.add_argument("--pruning_steps", type=int, default=3)
+    args = parser.parse_args()
+
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects, num_points=args.num_points
+    )
+    results = {}
+    for margin in [None, args.margin]:
+        pruning_lm = copy.deepcopy(lm)
+        pruning_lm.hypotheses_pruning_margin = margin
+        pruning_lm.hypotheses_pruning_steps = args.pruning_steps
+        counter = HypothesesCounter(pruning_lm)
+        step_times = run_matching_episode(
+            pruning_lm, observations["new_object0"], args.num_steps
+        )
+        mlh = pruning_lm.get_current_mlh()
+        results[margin] = (step_times, counter.num_hypotheses, mlh)
+        print(
+            f"margin {margin}: total {1000 * np.sum(step_times):.0f}ms, "
+            f"MLH {mlh['graph_id']} with evidence {mlh['evidence']:.2f}"
+        )
+
+    print(f"{'step':>4} {'all ms':>8} {'pruned ms':>9} {'hypotheses kept':>16}")
+    for step, (all_time, pruned_time, num_all, num_pruned) in enumerate(
+        zip(
+            results[None][0],
+            results[args.margin][0],
+            results[None][1],
+            results[args.margin][1],
+        )
+    ):
+        print(
+            f"{step:>4} {1000 * all_time:>8.1f} {1000 * pruned_time:>9.1f} "
+            f"{num_pruned:>7}/{num_all}"
+        )
+    all_mlh, pruned_mlh = results[None][2], results[args.margin][2]
+    same_mlh = all_mlh["graph_id"] == pruned_mlh["graph_id"] and np.allclose(
+        all_mlh["location"], pruned_mlh["location"]
+    )
+    print(f"Same MLH: {same_mlh}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time the first matching step of an EvidenceGraphLM against the library size.
+
+At the first step of an episode the LM initializes the hypotheses of all known
+objects. This compares the latency of that step when the hypotheses are built with
+the per-direction `np.vstack` and per-node loops previously used by
+`EvidenceGraphLM` and with the current vectorized initialization, for observations
+with a fully defined pose (2 sensed directions) and without (8 sensed directions),
+and for uniformly sampled initial poses.
+
+Usage:
+    python benchmarks/micro/initial_hypotheses.py --num_objects 10 20 40 77
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import make_evidence_lm
+from tbp.monty.frameworks.utils.graph_matching_utils import get_initial_possible_poses
+from tbp.monty.frameworks.utils.spatial_arithmetics import (
+    align_multiple_orthonormal_vectors,
+    get_more_directions_in_plane,
+)
+
+
+def loop_informed_possible_poses(lm, graph_id, sensed_features, input_channel):
+    """Stack the poses of each sensed direction in a loop, as done before.
+
+    Returns:
+        The possible locations and rotations.
+    """
+    all_possible_locations = np.zeros((1, 3))
+    all_possible_rotations = np.zeros((1, 3, 3))
+    node_directions = lm.graph_memory.get_rotation_features_at_all_nodes(
+        graph_id, input_channel
+    )
+    sensed_directions = sensed_features[input_channel]["pose_vectors"]
+    if sensed_features[input_channel].get("pose_fully_defined", True):
+        possible_s_d = [sensed_directions.copy(), sensed_directions.copy()]
+        possible_s_d[1][1:] = possible_s_d[1][1:] * -1
+    else:
+        possible_s_d = get_more_directions_in_plane(sensed_directions, 8)
+    for s_d in possible_s_d:
+        r = align_multiple_orthonormal_vectors(node_directions, s_d, as_scipy=False)
+        all_possible_locations = np.vstack(
+            [
+                all_possible_locations,
+                np.array(
+                    lm.graph_memory.get_locations_in_graph(graph_id, input_channel)
+                ),
+            ]
+        )
+        all_possible_rotations = np.vstack([all_possible_rotations, r])
+    return all_possible_locations[1:], all_possible_rotations[1:]
+
+
+def loop_initial_hypothesis_space(lm, features, graph_id, input_channel):
+    """Build the initial hypotheses with per-node loops, as done before.
+
+    Returns:
+        The initial locations, rotations and evidence.
+    """
+    if lm.initial_possible_poses is None:
+        locations, rotations = loop_informed_possible_poses(
+            lm, graph_id, features, input_channel
+        )
+    else:
+        locations, rotations = [], []
+        all_channel_locations = lm.graph_memory.get_locations_in_graph(
+            graph_id, input_channel
+        )
+        for rotation in lm.initial_possible_poses:
+            for node_id in range(len(all_channel_locations)):
+                locations.append(all_channel_locations[node_id])
+                rotations.append(rotation.as_matrix())
+        rotations = np.array(rotations)
+    if lm.use_features_for_matching[input_channel]:
+        node_feature_evidence = lm._calculate_feature_evidence_for_all_nodes(
+            features, input_channel, graph_id
+        )
+        nwmf_stacked = []
+        for _ in range(len(rotations) // len(node_feature_evidence)):
+            nwmf_stacked.extend(node_feature_evidence)
+        evidence = np.array(nwmf_stacked) * lm.feature_evidence_increment
+    else:
+        evidence = np.zeros(rotations.shape[0])
+    return locations, rotations, evidence
+
+
+def time_first_step(lm, observation, num_repeats):
+    """Return the median duration of the first matching step and the evidence.
+
+    Returns:
+        The median duration in seconds and the evidence of all objects.
+    """
+    durations = []
+    for _ in range(num_repeats):
+        lm.pre_episode({"object": "unknown", "quat_rotation": [1, 0, 0, 0]})
+        lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+        start_time = time.perf_counter()
+        lm.matching_step([copy.deepcopy(observation)])
+        durations.append(time.perf_counter() - start_time)
+    return np.median(durations), dict(lm.evidence)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, nargs="+", default=[10, 20, 40, 77])
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'objects':>7} {'poses':>16} {'hypotheses':>10} {'loop ms':>8} {'ms':>8}")
+    identical = True
+    for num_objects in args.num_objects:
+        lm, observations = make_evidence_lm(
+            num_objects=num_objects, num_points=args.num_points
+        )
+        lm.mode = "eval"
+        observation = observations["new_object0"][0]
+        for poses in ["fully defined", "not defined", "uniform"]:
+            first_observation = copy.deepcopy(observation)
+            first_observation.morphological_features["pose_fully_defined"] = (
+                poses != "not defined"
+            )
+            lm.initial_possible_poses = get_initial_possible_poses(
+                "uniform" if poses == "uniform" else "informed"
+            )
+            loop_lm = copy.deepcopy(lm)
+            loop_lm._get_initial_hypothesis_space = (
+                lambda features, graph_id, input_channel, loop_lm=loop_lm: (
+                    loop_initial_hypothesis_space(
+                        loop_lm, features, graph_id, input_channel
+                    )
+                )
+            )
+            loop_duration, loop_evidence = time_first_step(
+                loop_lm, first_observation, args.num_repeats
+            )
+            duration, evidence = time_first_step(
+                lm, first_observation, args.num_repeats
+            )
+            identical &= all(
+                np.array_equal(loop_evidence[g], evidence[g]) for g in evidence
+            )
+            num_hypotheses = sum(len(e) for e in evidence.values())
+            print(
+                f"{num_objects:>7} {poses:>16} {num_hypotheses:>10} "
+                f"{1000 * loop_duration:>8.1f} {1000 * duration:>8.1f}"
+            )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time stepping and voting of several EvidenceGraphLMs with each LM scheduler.
+
+Copies one trained LM num_lms times and runs an inference episode in which each
+copy gets differently noised observations of the same object. Each step, all LMs
+take a matching step and then vote with each other (all-to-all voting), using the
+"serial" or "thread_pool" scheduler of the Monty model. The LMs share one random
+number generator, like in an experiment.
+
+Usage:
+    python benchmarks/micro/lm_schedulers.py --num_objects 77 --num_lms 5
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import make_evidence_lm
+from tbp.monty.frameworks.models.evidence_matching import (
+    MontyForEvidenceGraphMatching,
+)
+
+
+def make_monty(learning_modules, lm_scheduler, num_workers):
+    """Create a Monty model in which all learning_modules vote with each other.
+
+    Returns:
+        The Monty model.
+    """
+    num_lms = len(learning_modules)
+    return MontyForEvidenceGraphMatching(
+        sensor_modules=[],
+        learning_modules=learning_modules,
+        motor_system=None,
+        sm_to_agent_dict={},
+        sm_to_lm_matrix=[[] for _ in range(num_lms)],
+        lm_to_lm_matrix=None,
+        lm_to_lm_vote_matrix=[
+            [j for j in range(num_lms) if j != i] for i in range(num_lms)
+        ],
+        min_eval_steps=1,
+        min_train_steps=1,
+        num_exploratory_steps=1,
+        max_total_steps=1,
+        lm_scheduler=lm_scheduler,
+        num_lm_scheduler_workers=num_workers,
+    )
+
+
+def run_episode(lm, observations_per_lm, lm_scheduler, num_workers):
+    """Run an inference episode with copies of lm using the given scheduler.
+
+    Returns:
+        Average duration of stepping and voting in seconds and the evidence of each
+        LM at the end of the episode.
+    """
+    rng = np.random.RandomState(0)
+    learning_modules = []
+    for lm_id in range(len(observations_per_lm)):
+        lm_copy = copy.deepcopy(lm)
+        lm_copy.learning_module_id = f"LM_{lm_id}"
+        lm_copy.rng = rng
+        lm_copy.mode = "eval"
+        lm_copy.pre_episode({"object": "unknown", "quat_rotation": [1, 0, 0, 0]})
+        learning_modules.append(lm_copy)
+    monty = make_monty(learning_modules, lm_scheduler, num_workers)
+
+    durations = {"step": 0, "vote": 0}
+    num_steps = len(observations_per_lm[0])
+    for step in range(num_steps):
+        for lm in learning_modules:
+            lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+        start_time = time.perf_counter()
+        monty.lm_scheduler.map(
+            lambda lm, sensory_inputs: lm.matching_step(sensory_inputs),
+            learning_modules,
+            [[observations[step]] for observations in observations_per_lm],
+        )
+        durations["step"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        monty._vote()
+        durations["vote"] += time.perf_counter() - start_time
+    monty.lm_scheduler.close()
+    durations = {phase: d / num_steps for phase, d in durations.items()}
+    return durations, [copy.deepcopy(lm.evidence) for lm in learning_modules]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_lms", type=int, default=5)
+    parser.add_argument("--num_steps", type=int, default=10)
+    parser.add_argument("--num_workers", type=int, default=None)
+    parser.add_argument("--noise", type=float, default=0.001)
+    args = parser.parse_args()
+
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects, num_points=args.num_points
+    )
+    observations_per_lm = []
+    for lm_id in range(args.num_lms):
+        rng = np.random.default_rng(lm_id)
+        lm_observations = copy.deepcopy(observations["new_object0"][: args.num_steps])
+        for observation in lm_observations:
+            observation.location = observation.location + rng.normal(0, args.noise, 3)
+        observations_per_lm.append(lm_observations)
+
+    evidences = {}
+    for lm_scheduler in ["serial", "thread_pool"]:
+        durations, evidences[lm_scheduler] = run_episode(
+            lm, observations_per_lm, lm_scheduler, args.num_workers
+        )
+        print(
+            f"{lm_scheduler:>11}: "
+            + ", ".join(f"{k} {1000 * v:.1f}ms" for k, v in durations.items())
+        )
+    identical = all(
+        np.array_equal(serial[graph_id], thread_pool[graph_id])
+        for serial, thread_pool in zip(evidences["serial"], evidences["thread_pool"])
+        for graph_id in serial
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time rendering the patch and view finder of a MeshSim by CPU ray casting.
+
+Renders the 64x64 patch (zoom 10) and view finder (zoom 1) images of the same
+mount as `PatchAndViewFinderMountConfig` looking at icospheres with an increasing
+number of faces, intersecting all rays with all faces (brute force) vs. traversing
+the BVH of the mesh as done by `MeshSim`. Also reports the time to build the BVH,
+which `MeshSim` does once per object and scale.
+
+Usage:
+    python benchmarks/micro/mesh_ray_casting.py --subdivisions 1 2 3 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.simulators.mesh import (
+    BVH,
+    MeshAgent,
+    MeshSim,
+    intersect_triangles,
+    make_primitive,
+)
+
+
+class BruteForceBVH:
+    """Drop-in for `BVH` intersecting every ray with every face."""
+
+    def __init__(self, vertices, faces, chunk_size=2_000_000):
+        triangles = vertices[faces]
+        self.v0 = triangles[:, 0]
+        self.edges1 = triangles[:, 1] - triangles[:, 0]
+        self.edges2 = triangles[:, 2] - triangles[:, 0]
+        self.chunk_size = chunk_size
+
+    def intersect(self, origins, directions, t_max=None):
+        num_rays, num_faces = len(directions), len(self.v0)
+        origins = np.broadcast_to(origins, directions.shape)
+        t_hit = np.full(num_rays, np.inf) if t_max is None else np.array(t_max)
+        faces = np.full(num_rays, -1)
+        u_hit, v_hit = np.zeros(num_rays), np.zeros(num_rays)
+        rays_per_chunk = max(1, self.chunk_size // num_faces)
+        for start in range(0, num_rays, rays_per_chunk):
+            rays = np.arange(start, min(start + rays_per_chunk, num_rays))
+            pair_rays = np.repeat(rays, num_faces)
+            pair_faces = np.tile(np.arange(num_faces), len(rays))
+            t, u, v = intersect_triangles(
+                origins[pair_rays],
+                directions[pair_rays],
+                self.v0[pair_faces],
+                self.edges1[pair_faces],
+                self.edges2[pair_faces],
+            )
+            t = t.reshape(len(rays), num_faces)
+            closest = np.argmin(t, axis=1)
+            t_closest = t[np.arange(len(rays)), closest]
+            hit = t_closest < t_hit[rays]
+            t_hit[rays[hit]] = t_closest[hit]
+            faces[rays[hit]] = closest[hit]
+            index = np.arange(len(rays))[hit] * num_faces + closest[hit]
+            u_hit[rays[hit]], v_hit[rays[hit]] = u[index], v[index]
+        t_hit[faces < 0] = np.inf
+        return t_hit, faces, u_hit, v_hit
+
+
+def time_call(function, num_repeats):
+    """Return the minimum duration of calling function in seconds and its result."""
+    durations = []
+    for _ in range(num_repeats):
+        start_time = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subdivisions", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--num_repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    agent = MeshAgent(
+        agent_id="agent_id_0",
+        sensor_ids=("patch", "view_finder"),
+        resolutions=((64, 64), (64, 64)),
+        positions=((0.0, 0.0, 0.0), (0.0, 0.0, 0.0)),
+        rotations=((1.0, 0.0, 0.0, 0.0), (1.0, 0.0, 0.0, 0.0)),
+        zooms=(10.0, 1.0),
+        semantics=(False, False),
+    )
+    sim = MeshSim(agents=[agent])
+    print(
+        f"{'faces':>6} {'build ms':>8} {'brute force ms':>14} {'bvh ms':>7} "
+        f"{'bvh ms/sensor':>13}"
+    )
+    identical = True
+    for subdivisions in args.subdivisions:
+        name = f"icosphereSolid_subdivs_{subdivisions}"
+        mesh = make_primitive(name)
+        sim.remove_all_objects()
+        obj = sim.add_object(name, position=(0.0, 1.5, -0.15))
+        build_duration, obj.bvh = time_call(
+            lambda mesh=mesh: BVH(mesh.vertices, mesh.faces), args.num_repeats
+        )
+        durations, results = {}, {}
+        for method, bvh in [
+            ("brute force", BruteForceBVH(mesh.vertices, mesh.faces)),
+            ("bvh", obj.bvh),
+        ]:
+            obj.bvh = bvh
+            durations[method], results[method] = time_call(
+                sim.get_observations, args.num_repeats
+            )
+        identical &= all(
+            np.array_equal(results["brute force"]["agent_id_0"][sensor][key], value)
+            for sensor, sensor_obs in results["bvh"]["agent_id_0"].items()
+            for key, value in sensor_obs.items()
+        )
+        print(
+            f"{len(mesh.faces):>6} {1000 * build_duration:>8.1f} "
+            f"{1000 * durations['brute force']:>14.1f} "
+            f"{1000 * durations['bvh']:>7.1f} "
+            f"{1000 * durations['bvh'] / len(agent.sensors):>13.1f}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
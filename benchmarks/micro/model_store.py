@@ -0,0 +1,145 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Compare loading a model.pt file and a memory mapped model store.
+
+Saves the state dict of a learning module with synthetic objects both ways and times
+loading it and adding the loaded graphs to the memory of a new learning module (as
+done by each worker of a parallel evaluation). Then loads the model in several worker
+processes at once and reports their total proportional set size (PSS, Linux only),
+which counts pages shared between the workers only once.
+
+Usage:
+    python benchmarks/micro/model_store.py --num_objects 77
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Barrier, Process, Queue
+from pathlib import Path
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+import torch
+
+from benchmarks.micro.synthetic import (
+    DEFAULT_LM_ARGS,
+    INPUT_CHANNEL,
+    make_evidence_lm,
+)
+from tbp.monty.frameworks.models.evidence_matching import EvidenceGraphLM
+from tbp.monty.frameworks.utils.model_store import (
+    convert_model_to_store,
+    load_model_state_dict,
+)
+
+
+def time_loading(model_path, num_repeats):
+    """Return the mean time to load a model and the loaded learning module."""
+    start_time = time.perf_counter()
+    for _ in range(num_repeats):
+        lm = EvidenceGraphLM(**DEFAULT_LM_ARGS)
+        lm.load_state_dict(load_model_state_dict(model_path)["lm_dict"][0])
+    return (time.perf_counter() - start_time) / num_repeats, lm
+
+
+def get_proportional_set_size():
+    """Return the proportional set size of this process in MiB."""
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 2**10
+
+
+def load_in_worker(model_path, barrier, results):
+    """Load a model and report the PSS once all workers have loaded it."""
+    lm = EvidenceGraphLM(**DEFAULT_LM_ARGS)
+    lm.load_state_dict(load_model_state_dict(model_path)["lm_dict"][0])
+    # Measure once all workers are alive so shared pages are split between them
+    barrier.wait()
+    results.put(get_proportional_set_size())
+    # Keep the learning module alive until all workers have measured
+    barrier.wait()
+    del lm
+
+
+def measure_worker_memory(model_path, num_workers):
+    """Return the total PSS of num_workers processes that loaded the model."""
+    barrier = Barrier(num_workers)
+    results = Queue()
+    workers = [
+        Process(target=load_in_worker, args=(model_path, barrier, results))
+        for _ in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    total_pss = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return total_pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_repeats", type=int, default=10)
+    parser.add_argument("--num_workers", type=int, default=4)
+    args = parser.parse_args()
+
+    lm, _ = make_evidence_lm(num_objects=args.num_objects, num_points=args.num_points)
+    output_dir = tempfile.mkdtemp()
+    try:
+        model_path = os.path.join(output_dir, "model.pt")
+        torch.save({"lm_dict": {0: lm.state_dict()}}, model_path)
+        start_time = time.perf_counter()
+        store_path = convert_model_to_store(model_path)
+        print(
+            f"Converted model.pt in {1000 * (time.perf_counter() - start_time):.1f}ms"
+        )
+
+        lms = {}
+        for name, path in [("model.pt", model_path), ("model store", store_path)]:
+            duration, lms[name] = time_loading(path, args.num_repeats)
+            print(
+                f"{name:>12}: load {1000 * duration:.1f}ms, "
+                f"file size {Path(path).stat().st_size / 2**20:.1f}MiB"
+            )
+        if Path("/proc/self/smaps_rollup").exists():
+            for name, path in [("model.pt", model_path), ("model store", store_path)]:
+                total_pss = measure_worker_memory(path, args.num_workers)
+                print(
+                    f"{name:>12}: {args.num_workers} workers use {total_pss:.0f}MiB "
+                    "in total (PSS)"
+                )
+    finally:
+        shutil.rmtree(output_dir)
+
+    identical = all(
+        np.array_equal(
+            lms["model.pt"].get_graph(graph_id, INPUT_CHANNEL).x,
+            lms["model store"].get_graph(graph_id, INPUT_CHANNEL).x,
+        )
+        for graph_id in lm.get_all_known_object_ids()
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time an episode of a slow environment with and without prefetching.
+
+The environment sleeps to emulate moving a robot and capturing images, and each
+step sleeps to emulate Monty processing the observation. Without prefetching a step
+takes the sum of both, with `EnvironmentDataLoader(prefetch=True)` and a policy
+that does not depend on observations it takes about the longer of the two.
+
+Usage:
+    python benchmarks/micro/prefetching_data_loader.py --step_ms 20 --process_ms 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.actions.action_samplers import UniformlyDistributedSampler
+from tbp.monty.frameworks.actions.actions import LookUp, TurnLeft
+from tbp.monty.frameworks.environments.embodied_data import (
+    EnvironmentDataLoader,
+    EnvironmentDataset,
+)
+from tbp.monty.frameworks.environments.embodied_environment import (
+    EmbodiedEnvironment,
+)
+from tbp.monty.frameworks.models.motor_policies import BasePolicy
+from tbp.monty.frameworks.models.motor_system import MotorSystem
+
+
+class SleepingEnvironment(EmbodiedEnvironment):
+    """Environment that takes `step_ms` to apply an action and observe."""
+
+    def __init__(self, step_ms):
+        self.step_seconds = step_ms / 1000
+        self.num_steps = 0
+
+    @property
+    def action_space(self):
+        return None
+
+    def add_object(self, *args, **kwargs):
+        return None
+
+    def step(self, action):
+        time.sleep(self.step_seconds)
+        self.num_steps += 1
+        return {"agent_id_0": {"patch": {"step": self.num_steps}}}
+
+    def get_state(self):
+        return None
+
+    def remove_all_objects(self):
+        pass
+
+    def reset(self):
+        self.num_steps = 0
+        return {"agent_id_0": {"patch": {"step": self.num_steps}}}
+
+    def close(self):
+        pass
+
+
+def run_episode(step_ms, process_ms, num_steps, prefetch):
+    """Iterate over one episode, sleeping `process_ms` after each observation.
+
+    Returns:
+        The duration in seconds and the step numbers of the observations.
+    """
+    rng = np.random.RandomState(0)
+    dataset = EnvironmentDataset(
+        env_init_func=SleepingEnvironment, env_init_args={"step_ms": step_ms}, rng=rng
+    )
+    policy = BasePolicy(
+        rng=rng,
+        action_sampler_args=dict(actions=[LookUp, TurnLeft]),
+        action_sampler_class=UniformlyDistributedSampler,
+        agent_id="agent_id_0",
+        switch_frequency=1.0,
+    )
+    dataloader = EnvironmentDataLoader(
+        dataset, MotorSystem(policy), rng, prefetch=prefetch
+    )
+    dataloader.pre_episode()
+    steps = []
+    start_time = time.perf_counter()
+    for observation in dataloader:
+        steps.append(observation["agent_id_0"]["patch"]["step"])
+        time.sleep(process_ms / 1000)
+        if len(steps) == num_steps:
+            break
+    duration = time.perf_counter() - start_time
+    dataloader.post_episode()
+    dataloader.finish()
+    return duration, steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--step_ms", type=float, nargs="+", default=[5, 20, 40])
+    parser.add_argument("--process_ms", type=float, default=20)
+    parser.add_argument("--num_steps", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'step ms':>7} {'process ms':>10} {'serial ms/step':>14} "
+        f"{'prefetch ms/step':>16}"
+    )
+    identical = True
+    for step_ms in args.step_ms:
+        durations, steps = {}, {}
+        for prefetch in [False, True]:
+            durations[prefetch], steps[prefetch] = run_episode(
+                step_ms, args.process_ms, args.num_steps, prefetch
+            )
+        identical &= steps[False] == steps[True]
+        print(
+            f"{step_ms:>7.1f} {args.process_ms:>10.1f} "
+            f"{1000 * durations[False] / args.num_steps:>14.1f} "
+            f"{1000 * durations[True] / args.num_steps:>16.1f}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time switching scenes of a SaccadeOnImageEnvironment with and without a store.
+
+Switches to every version of every scene of a worldimages dataset, once loading the
+images and unprojecting the depth image as before and once memory mapping them from
+a scene store built by `build_scene_store`, and reports the time per scene switch.
+Defaults to the test images of the unit tests.
+
+Usage:
+    python benchmarks/micro/scene_store.py --data_path path/to/labeled_scenes/
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.environments.two_d_data import (
+    SCENE_STORE_FILE_NAME,
+    SaccadeOnImageEnvironment,
+    build_scene_store,
+)
+
+DEFAULT_DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+    "tests/unit/resources/dataloader_test_images/",
+)
+SCENE_ARRAYS = [
+    "current_depth_image",
+    "current_rgb_image",
+    "current_scene_point_cloud",
+    "current_sf_scene_point_cloud",
+    "world_camera",
+]
+
+
+def time_call(function, num_repeats):
+    """Return the minimum duration of calling function in seconds and its result."""
+    durations = []
+    for _ in range(num_repeats):
+        start_time = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations), result
+
+
+def switch_to_all_scenes(env, scene_versions):
+    """Switch to every scene version."""
+    for scene_id, version in scene_versions:
+        env.switch_to_object(scene_id, version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data_path", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--num_repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    data_path = os.path.join(os.path.expanduser(args.data_path), "")
+    output_dir = tempfile.mkdtemp()
+    store_path = os.path.join(output_dir, SCENE_STORE_FILE_NAME)
+    try:
+        build_duration, _ = time_call(
+            lambda: build_scene_store(data_path, store_path), 1
+        )
+        store_env = SaccadeOnImageEnvironment(
+            data_path=data_path, scene_store_path=store_path
+        )
+        scene_versions = [
+            (store_env.scene_names.index(scene_name), version)
+            for scene_name, versions in store_env.scene_store.items()
+            for version in versions
+        ]
+        image_env = SaccadeOnImageEnvironment(data_path=data_path)
+        image_env.scene_store = {}
+        durations, results = {}, {}
+        for method, env in [("image files", image_env), ("scene store", store_env)]:
+            durations[method], _ = time_call(
+                lambda env=env: switch_to_all_scenes(env, scene_versions),
+                args.num_repeats,
+            )
+            results[method] = [np.array(getattr(env, name)) for name in SCENE_ARRAYS]
+        store_size = Path(store_path).stat().st_size
+    finally:
+        shutil.rmtree(output_dir)
+
+    print(
+        f"{len(scene_versions)} scene versions, store size {store_size / 2**20:.1f}MiB"
+    )
+    print(f"build scene store: {1000 * build_duration:.1f}ms")
+    print(f"{'method':>12} {'ms/switch':>10}")
+    for method, duration in durations.items():
+        print(f"{method:>12} {1000 * duration / len(scene_versions):>10.3f}")
+    identical = all(
+        np.array_equal(image_array, store_array)
+        for image_array, store_array in zip(
+            results["image files"], results["scene store"]
+        )
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time the object ID SDR overlaps of a hierarchical EvidenceSDRGraphLM.
+
+Compares the overlaps of the SDRs stored at all nodes of all graphs with one
+query SDR, computed as before with a float matmul of the dense (n, sdr_length)
+feature arrays vs. popcounts of the packed (n, sdr_length / 64) uint64 arrays,
+and the memory of both arrays. Also compares binarizing the dense representations
+of `EncoderSDR` with `np.argsort` (as before) and `np.argpartition`.
+
+Usage:
+    python benchmarks/micro/sdr_overlaps.py --num_nodes 1000 10000 77000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.models.evidence_sdr_matching import (
+    EncoderSDR,
+    pack_sdrs,
+    packed_overlaps,
+)
+
+
+def argsort_binarize(emb, sdr_on_bits):
+    """Previous top-k binarization with a full sort of each row.
+
+    Returns:
+        The SDRs.
+    """
+    topk_indices = np.argsort(emb, axis=1)[:, -sdr_on_bits:]
+    mask = np.zeros_like(emb)
+    np.put_along_axis(mask, topk_indices, 1, axis=1)
+    return mask
+
+
+def time_call(function, num_repeats):
+    """Return the minimum duration of calling function in seconds and its result."""
+    durations = []
+    for _ in range(num_repeats):
+        start_time = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_nodes", type=int, nargs="+", default=[1000, 10000, 77000]
+    )
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--sdr_length", type=int, default=2048)
+    parser.add_argument("--sdr_on_bits", type=int, default=41)
+    parser.add_argument("--num_repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    np.random.seed(0)
+    encoder = EncoderSDR(sdr_length=args.sdr_length, sdr_on_bits=args.sdr_on_bits)
+    encoder.add_objects(args.num_objects)
+    identical = True
+
+    argsort_duration, argsort_sdrs = time_call(
+        lambda: argsort_binarize(encoder.obj_sdrs, args.sdr_on_bits),
+        args.num_repeats,
+    )
+    argpartition_duration, sdrs = time_call(
+        lambda: encoder.binarize(encoder.obj_sdrs), args.num_repeats
+    )
+    identical &= np.array_equal(argsort_sdrs, sdrs)
+    print(
+        f"binarize {args.num_objects} objects: argsort "
+        f"{1000 * argsort_duration:.2f} ms, argpartition "
+        f"{1000 * argpartition_duration:.2f} ms\n"
+    )
+
+    print(
+        f"{'nodes':>6} {'dense MB':>8} {'packed MB':>9} {'matmul ms':>9} "
+        f"{'popcount ms':>11}"
+    )
+    rng = np.random.default_rng(0)
+    for num_nodes in args.num_nodes:
+        node_sdrs = sdrs[rng.integers(args.num_objects, size=num_nodes)]
+        packed_node_sdrs = pack_sdrs(node_sdrs)
+        query_sdr = sdrs[0]
+        packed_query = pack_sdrs(query_sdr)
+        matmul_duration, dense_overlaps = time_call(
+            lambda node_sdrs=node_sdrs, query_sdr=query_sdr: node_sdrs @ query_sdr,
+            args.num_repeats,
+        )
+        popcount_duration, overlaps = time_call(
+            lambda packed_node_sdrs=packed_node_sdrs, packed_query=packed_query: (
+                packed_overlaps(packed_node_sdrs, packed_query)
+            ),
+            args.num_repeats,
+        )
+        identical &= np.array_equal(dense_overlaps, overlaps)
+        print(
+            f"{num_nodes:>6} {node_sdrs.nbytes / 1e6:>8.1f} "
+            f"{packed_node_sdrs.nbytes / 1e6:>9.2f} "
+            f"{1000 * matmul_duration:>9.2f} {1000 * popcount_duration:>11.2f}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
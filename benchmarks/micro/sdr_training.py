@@ -0,0 +1,117 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time the post-episode training of the object ID SDRs of an EvidenceSDRGraphLM.
+
+Compares `EncoderSDR.train_sdrs` with the previous double loop over the pairs of
+objects in `optimize` vs. the vectorized optimizer for all objects, and the time of
+an episode in which the target overlaps of one object changed, training all
+objects for `n_epochs` vs. only that object with early stopping (as with the
+`sdr_incremental` and `sdr_early_stopping_patience` sdr_args).
+
+Usage:
+    python benchmarks/micro/sdr_training.py --num_objects 10 30 77
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.models.evidence_sdr_matching import EncoderSDR
+
+
+class PairwiseEncoderSDR(EncoderSDR):
+    """Previous optimizer computing the gradient one pair of objects at a time."""
+
+    def optimize(self, overlap_error, mask, train_ids=None):
+        grad = np.zeros_like(self.obj_sdrs)
+        for i in range(self.n_objects):
+            for j in range(self.n_objects):
+                if mask[i, j]:
+                    diff = self.obj_sdrs[i] - self.obj_sdrs[j]
+                    if np.sum(np.abs(diff)) > 0:
+                        grad[i] += overlap_error[i, j] * 2 * diff
+                        grad[j] -= overlap_error[i, j] * 2 * diff
+        self.obj_sdrs -= self.lr * grad
+
+
+def make_target_overlaps(rng, num_objects, sdr_on_bits):
+    """Return random target overlaps of the upper triangle of object pairs.
+
+    Returns:
+        The target overlaps. shape = (num_objects, num_objects)
+    """
+    target_overlaps = np.full((num_objects, num_objects), np.nan)
+    rows, columns = np.triu_indices(num_objects, 1)
+    target_overlaps[rows, columns] = rng.integers(0, sdr_on_bits, len(rows))
+    return target_overlaps
+
+
+def train(encoder_class, target_overlaps, n_epochs, train_ids=None, **kwargs):
+    """Train the SDRs of a new encoder with the same initial representations.
+
+    Returns:
+        The duration in seconds, the SDRs and the number of epochs trained.
+    """
+    np.random.seed(0)
+    encoder = encoder_class(n_epochs=n_epochs, lr=1e-3, **kwargs)
+    encoder.add_objects(len(target_overlaps))
+    start_time = time.perf_counter()
+    stats = encoder.train_sdrs(target_overlaps, train_ids=train_ids)
+    duration = time.perf_counter() - start_time
+    return duration, encoder.sdrs, stats["n_epochs_trained"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, nargs="+", default=[10, 30, 77])
+    parser.add_argument("--n_epochs", type=int, default=100)
+    parser.add_argument("--patience", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'objects':>7} {'pairwise s':>10} {'vectorized s':>12} "
+        f"{'incremental s':>13} {'epochs':>6}"
+    )
+    identical = True
+    for num_objects in args.num_objects:
+        target_overlaps = make_target_overlaps(rng, num_objects, 41)
+        pairwise_duration, pairwise_sdrs, _ = train(
+            PairwiseEncoderSDR, target_overlaps, args.n_epochs
+        )
+        vectorized_duration, sdrs, _ = train(EncoderSDR, target_overlaps, args.n_epochs)
+        identical &= np.array_equal(pairwise_sdrs, sdrs)
+        incremental_duration, _, n_epochs_trained = train(
+            EncoderSDR,
+            target_overlaps,
+            args.n_epochs,
+            train_ids=[num_objects - 1],
+            early_stopping_patience=args.patience,
+        )
+        print(
+            f"{num_objects:>7} {pairwise_duration:>10.2f} "
+            f"{vectorized_duration:>12.2f} {incremental_duration:>13.3f} "
+            f"{n_epochs_trained:>6}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
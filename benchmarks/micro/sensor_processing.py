@@ -0,0 +1,141 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time extracting point normals and principal curvatures of several patches.
+
+Compares calling `get_point_normal_total_least_squares` and
+`get_principal_curvatures` on one patch after another, as each
+`HabitatDistantPatchSM` does on its own, with processing all patches of a step in
+one call of the batched versions, as done in `HabitatDistantPatchSM.prepare_step`.
+
+Usage:
+    python benchmarks/micro/sensor_processing.py --num_patches 1 2 5 10 --patch_size 64
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.utils.sensor_processing import (
+    get_point_normal_total_least_squares,
+    get_point_normals_total_least_squares_batch,
+    get_principal_curvatures,
+    get_principal_curvatures_batch,
+)
+
+
+def make_patches(rng, num_patches, patch_size):
+    """Return point clouds of ellipsoids seen from random directions.
+
+    Returns:
+        The point clouds of shape (num_patches, patch_size**2, 4) and the view
+        direction of each patch.
+    """
+    coords = (np.arange(patch_size) - patch_size // 2) / patch_size * 0.04
+    x, y = np.meshgrid(coords, coords)
+    patches, view_dirs = [], []
+    for _ in range(num_patches):
+        radii = rng.uniform(0.01, 0.1, 2)
+        height = 1 - (x / radii[0]) ** 2 - (y / radii[1]) ** 2
+        on_object = height > 0
+        z = np.sqrt(np.clip(height, 0, None)) * rng.uniform(0.01, 0.1)
+        points = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+        points += rng.normal(0, 1e-4, points.shape)
+        rotation = np.linalg.qr(rng.normal(size=(3, 3)))[0]
+        patches.append(np.hstack([points @ rotation.T, on_object.reshape(-1, 1)]))
+        view_dirs.append(rotation @ [0, 0, -1])
+    return np.stack(patches), np.stack(view_dirs)
+
+
+def per_patch(patches, center_id, view_dirs):
+    """Extract the surface geometry of one patch after another.
+
+    Returns:
+        The point normals, curvatures and principal directions of all patches.
+    """
+    results = []
+    for patch, view_dir in zip(patches, view_dirs):
+        point_normal, _ = get_point_normal_total_least_squares(
+            patch, center_id, view_dir
+        )
+        k1, k2, dir1, dir2, _ = get_principal_curvatures(patch, center_id, point_normal)
+        results.append([point_normal, k1, k2, dir1, dir2])
+    return [np.stack(values) for values in zip(*results)]
+
+
+def batched(patches, center_id, view_dirs):
+    """Extract the surface geometry of all patches in one batch.
+
+    Returns:
+        The point normals, curvatures and principal directions of all patches.
+    """
+    center_ids = [center_id] * len(patches)
+    point_normals, _ = get_point_normals_total_least_squares_batch(
+        patches, center_ids, view_dirs
+    )
+    k1, k2, dir1, dir2, _ = get_principal_curvatures_batch(
+        patches, center_ids, point_normals
+    )
+    return [point_normals, k1, k2, dir1, dir2]
+
+
+def time_call(function, num_repeats):
+    """Return the minimum duration of calling function in seconds and its result."""
+    durations = []
+    for _ in range(num_repeats):
+        start_time = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_patches", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--patch_size", type=int, default=64)
+    parser.add_argument("--num_repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    center_id = args.patch_size // 2 + args.patch_size * (args.patch_size // 2)
+    print(f"{'patches':>7} {'per patch ms':>12} {'batched ms':>10}")
+    identical = True
+    for num_patches in args.num_patches:
+        patches, view_dirs = make_patches(rng, num_patches, args.patch_size)
+        durations, results = {}, {}
+        for name, function in [("per patch", per_patch), ("batched", batched)]:
+            durations[name], results[name] = time_call(
+                lambda function=function, patches=patches, view_dirs=view_dirs: (
+                    function(patches, center_id, view_dirs)
+                ),
+                args.num_repeats,
+            )
+        identical &= all(
+            np.allclose(a, b, rtol=1e-9, atol=1e-12)
+            for a, b in zip(results["per patch"], results["batched"])
+        )
+        print(
+            f"{num_patches:>7} {1000 * durations['per patch']:>12.2f} "
+            f"{1000 * durations['batched']:>10.2f}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Compare per-graph and stacked hypotheses of the EvidenceGraphLM.
+
+Times the operations that look at the hypotheses of all objects after each evidence
+update (thresholding the possible matches, finding the most likely hypothesis and
+selecting the hypotheses to vote on).
+
+Usage:
+    python benchmarks/micro/stacked_hypotheses.py --num_objects 77
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import (
+    make_evidence_lm,
+    run_matching_episode,
+)
+from tbp.monty.frameworks.utils.evidence_matching import StackedHypotheses
+
+
+def time_call(function, num_repeats):
+    """Return the mean duration of calling function in seconds."""
+    start_time = time.perf_counter()
+    for _ in range(num_repeats):
+        function()
+    return (time.perf_counter() - start_time) / num_repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_steps", type=int, default=10)
+    parser.add_argument("--num_repeats", type=int, default=100)
+    parser.add_argument("--vote_evidence_threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects,
+        num_points=args.num_points,
+        vote_evidence_threshold=args.vote_evidence_threshold,
+    )
+    print(
+        f"Learned {args.num_objects} objects in {time.perf_counter() - start_time:.1f}s"
+    )
+    target_observations = observations["new_object0"]
+
+    results = {}
+    for stack_hypotheses in [False, True]:
+        lm.hypotheses_stack = None
+        if stack_hypotheses:
+            lm.hypotheses_stack = StackedHypotheses(
+                ["possible_locations", "possible_poses", "evidence"]
+            )
+        step_times = run_matching_episode(
+            lm, target_observations, num_steps=args.num_steps
+        )
+        durations = {
+            "threshold": time_call(lm._threshold_possible_matches, args.num_repeats),
+            "mlh": time_call(lm._calculate_most_likely_hypothesis, args.num_repeats),
+            "vote": time_call(lm.send_out_vote, args.num_repeats),
+        }
+        num_hypotheses = sum(len(e) for e in lm.evidence.values())
+        name = "stacked" if stack_hypotheses else "default"
+        print(
+            f"{name:>8}: {1000 * np.mean(step_times[1:]):.1f}ms per step, "
+            + ", ".join(f"{k} {1000 * v:.2f}ms" for k, v in durations.items())
+            + f", {num_hypotheses} hypotheses"
+        )
+        vote = lm.send_out_vote()["possible_states"]
+        results[name] = (
+            lm._threshold_possible_matches(),
+            lm._calculate_most_likely_hypothesis()["graph_id"],
+            {graph_id: len(states) for graph_id, states in vote.items()},
+            {graph_id: evidence.copy() for graph_id, evidence in lm.evidence.items()},
+        )
+
+    default, stacked = results["default"], results["stacked"]
+    identical = default[:3] == stacked[:3] and all(
+        np.array_equal(evidence, stacked[3][graph_id])
+        for graph_id, evidence in default[3].items()
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
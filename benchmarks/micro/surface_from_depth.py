@@ -0,0 +1,168 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time finding the on-surface pixels of depth patches in DepthTo3DLocations.
+
+Compares the previous `get_surface_from_depth`, which took the depth range with
+Python's `min` and `max` and called `np.histogram` per patch, with the current
+vectorized version on one patch at a time and on all patches of a step at once
+(as done by `DepthTo3DLocations` for sensors with the same patch size).
+
+Usage:
+    python benchmarks/micro/surface_from_depth.py --patch_sizes 64 180
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from tbp.monty.frameworks.environment_utils.transforms import DepthTo3DLocations
+
+
+class HistogramDepthTo3DLocations(DepthTo3DLocations):
+    """Previous per-patch implementation of the surface estimation."""
+
+    def get_on_surface_th(
+        self, depth_patch, semantic_patch, min_depth_range, default_on_surface_th
+    ):
+        center_loc = (depth_patch.shape[0] // 2, depth_patch.shape[1] // 2)
+        depth_center = depth_patch[center_loc[0], center_loc[1]]
+        semantic_center = semantic_patch[center_loc[0], center_loc[1]]
+
+        depths = np.asarray(depth_patch).flatten()
+        flip_sign = False
+        th = default_on_surface_th
+        if (max(depths) - min(depths)) > min_depth_range:
+            height, bins = np.histogram(
+                np.array(depth_patch).flatten(), bins=8, density=False
+            )
+            gap = np.where(height == 0)[0]
+            if len(gap) > 0:
+                gap_center = len(gap) // 2
+                th_id = gap[gap_center]
+                th = bins[th_id]
+                if depth_center > th and semantic_center > 0:
+                    flip_sign = True
+        return th, flip_sign
+
+    def get_surface_from_depth(
+        self, depth_patch, semantic_patch, default_on_surface_th
+    ):
+        depth_patch = np.array(depth_patch)
+        depth_patch[depth_patch > self.void_value] = self.void_value
+        if np.all(depth_patch >= self.void_value):
+            return np.zeros_like(depth_patch, dtype=bool)
+        th, flip_sign = self.get_on_surface_th(
+            depth_patch,
+            semantic_patch,
+            min_depth_range=0.01,
+            default_on_surface_th=default_on_surface_th,
+        )
+        if flip_sign is False:
+            surface_patch = depth_patch < th
+        else:
+            surface_patch = depth_patch > th
+        return surface_patch * semantic_patch
+
+
+def make_patches(rng, num_patches, patch_size):
+    """Return depth and semantic patches of two surfaces in front of a background.
+
+    Returns:
+        The depth patches and semantic patches. shape = (B, H, W)
+    """
+    depth_patches = rng.uniform(0.2, 0.22, (num_patches, patch_size, patch_size))
+    for depth_patch in depth_patches:
+        depth_patch[:, : rng.integers(patch_size // 2)] += 0.3
+        depth_patch[: rng.integers(patch_size // 4)] = 1.0
+    semantic_patches = (depth_patches < 1.0).astype(int)
+    return depth_patches.astype(np.float32), semantic_patches
+
+
+def time_call(function, num_repeats):
+    """Return the minimum duration of calling function in seconds and its result."""
+    durations = []
+    for _ in range(num_repeats):
+        start_time = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start_time)
+    return min(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patch_sizes", type=int, nargs="+", default=[64, 180])
+    parser.add_argument("--num_patches", type=int, default=5)
+    parser.add_argument("--num_repeats", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    kwargs = dict(agent_id="agent_id_0", sensor_ids=[], resolutions=[])
+    histogram_transform = HistogramDepthTo3DLocations(**kwargs)
+    transform = DepthTo3DLocations(**kwargs)
+    print(
+        f"{'size':>4} {'patches':>7} {'histogram ms':>12} {'per patch ms':>12} "
+        f"{'batched ms':>10}"
+    )
+    identical = True
+    for patch_size in args.patch_sizes:
+        depth_patches, semantic_patches = make_patches(
+            rng, args.num_patches, patch_size
+        )
+        durations, results = {}, {}
+        for name, function in [
+            (
+                "histogram",
+                lambda depth_patches=depth_patches, semantic_patches=semantic_patches: [
+                    histogram_transform.get_surface_from_depth(d, s, 1000.0)
+                    for d, s in zip(depth_patches, semantic_patches)
+                ],
+            ),
+            (
+                "per patch",
+                lambda depth_patches=depth_patches, semantic_patches=semantic_patches: [
+                    transform.get_surface_from_depth(d, s, 1000.0)
+                    for d, s in zip(depth_patches, semantic_patches)
+                ],
+            ),
+            (
+                "batched",
+                lambda depth_patches=depth_patches, semantic_patches=semantic_patches: (
+                    transform.get_surfaces_from_depth(
+                        depth_patches, semantic_patches, 1000.0
+                    )
+                ),
+            ),
+        ]:
+            durations[name], results[name] = time_call(function, args.num_repeats)
+        identical &= all(
+            np.array_equal(results["histogram"], results[name])
+            for name in ["per patch", "batched"]
+        )
+        print(
+            f"{patch_size:>4} {args.num_patches:>7} "
+            f"{1000 * durations['histogram']:>12.2f} "
+            f"{1000 * durations['per patch']:>12.2f} "
+            f"{1000 * durations['batched']:>10.2f}"
+        )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Synthetic object memories for micro-benchmarks.
+
+The benchmark experiments in `benchmarks/configs` need habitat and the pretrained
+YCB models. The micro-benchmarks instead train learning modules on random
+observations with the same structure as the ones sent by a `HabitatDistantPatchSM`.
+This is enough to time individual components at the scale of the 77 object YCB
+benchmark without any external dependencies.
+"""
+
+import contextlib
+import copy
+import io
+import time
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from tbp.monty.frameworks.models.evidence_matching import EvidenceGraphLM
+from tbp.monty.frameworks.models.states import State
+
+INPUT_CHANNEL = "patch"
+
+DEFAULT_LM_ARGS = dict(
+    max_match_distance=0.01,
+    tolerances={
+        INPUT_CHANNEL: {
+            "hsv": np.array([0.1, 0.2, 0.2]),
+            "principal_curvatures_log": np.ones(2),
+        }
+    },
+    feature_weights={
+        INPUT_CHANNEL: {
+            "hsv": np.array([1, 0.5, 0.5]),
+        }
+    },
+    max_graph_size=0.3,
+    num_model_voxels_per_dim=100,
+    max_nodes_per_graph=2000,
+)
+
+
+def make_observations(rng, num_points, step_size=0.004, input_channel=INPUT_CHANNEL):
+    """Sample a random walk of observations over a synthetic object.
+
+    Args:
+        rng: Numpy random generator.
+        num_points: Number of observations.
+        step_size: Standard deviation of the displacement between observations.
+        input_channel: Sender id of the observations.
+
+    Returns:
+        List of State observations.
+    """
+    observations = []
+    location = np.zeros(3)
+    for _ in range(num_points):
+        location = location + rng.normal(0, step_size, 3)
+        observations.append(
+            State(
+                location=location.copy(),
+                morphological_features={
+                    "pose_vectors": Rotation.random(
+                        random_state=rng.integers(1e9)
+                    ).as_matrix(),
+                    "pose_fully_defined": bool(rng.random() > 0.3),
+                    "on_object": 1,
+                },
+                non_morphological_features={
+                    "principal_curvatures_log": rng.normal(0, 1, 2),
+                    "hsv": rng.random(3),
+                },
+                confidence=1.0,
+                use_state=True,
+                sender_id=input_channel,
+                sender_type="SM",
+            )
+        )
+    return observations
+
+
+def make_evidence_lm(num_objects=77, num_points=200, seed=0, **lm_args):
+    """Train an EvidenceGraphLM on num_objects synthetic objects.
+
+    Args:
+        num_objects: Number of objects to learn.
+        num_points: Number of observations per object.
+        seed: Random seed.
+        **lm_args: Arguments overwriting DEFAULT_LM_ARGS.
+
+    Returns:
+        The trained LM and a dictionary of the observations used to learn each
+        object.
+    """
+    rng = np.random.default_rng(seed)
+    lm = EvidenceGraphLM(**{**DEFAULT_LM_ARGS, **lm_args})
+    lm.mode = "train"
+    observations = {}
+    for object_id in range(num_objects):
+        object_observations = make_observations(rng, num_points)
+        observations[f"new_object{object_id}"] = object_observations
+        lm.pre_episode({"object": f"object{object_id}", "quat_rotation": [1, 0, 0, 0]})
+        for observation in object_observations:
+            lm.exploratory_step([observation])
+        lm.detected_object = f"new_object{object_id}"
+        lm.detected_rotation_r = None
+        lm.buffer.stats["detected_location_rel_body"] = lm.buffer.get_current_location(
+            input_channel="first"
+        )
+        # Silence the prints from building the object models.
+        with contextlib.redirect_stdout(io.StringIO()):
+            lm.post_episode()
+    return lm, observations
+
+
+def run_matching_episode(lm, observations, num_steps=20, noise=0.001, seed=1):
+    """Run an inference episode on noisy versions of the given observations.
+
+    Args:
+        lm: A trained LM.
+        observations: Observations of one of the learned objects.
+        num_steps: Number of matching steps.
+        noise: Standard deviation of the location noise.
+        seed: Random seed for the noise.
+
+    Returns:
+        Duration of each matching step in seconds.
+    """
+    rng = np.random.default_rng(seed)
+    lm.mode = "eval"
+    lm.pre_episode({"object": "unknown", "quat_rotation": [1, 0, 0, 0]})
+    step_times = []
+    for observation in copy.deepcopy(observations[:num_steps]):
+        observation.location = observation.location + rng.normal(0, noise, 3)
+        lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+        start_time = time.perf_counter()
+        lm.matching_step([observation])
+        step_times.append(time.perf_counter() - start_time)
+    return step_times
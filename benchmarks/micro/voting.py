@@ -0,0 +1,162 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Time voting between several EvidenceGraphLMs.
+
+Copies one trained LM num_lms times, runs a noisy inference episode with each copy,
+and times sending out the votes of all LMs, combining them with
+`MontyForEvidenceGraphMatching._combine_votes` (all-to-all voting), and receiving
+them. Votes are sent either as `PoseVotes` arrays or converted to one `State` per
+hypothesis (the format used before `PoseVotes`).
+
+Usage:
+    python benchmarks/micro/voting.py --num_objects 77 --num_lms 5
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.expanduser(os.path.realpath(__file__))))
+    ),
+)
+
+import numpy as np
+
+from benchmarks.micro.synthetic import make_evidence_lm, run_matching_episode
+from tbp.monty.frameworks.models.evidence_matching import (
+    MontyForEvidenceGraphMatching,
+)
+
+
+def make_monty(learning_modules):
+    """Create a Monty model that lets all learning_modules vote with each other.
+
+    Returns:
+        The Monty model.
+    """
+    num_lms = len(learning_modules)
+    return MontyForEvidenceGraphMatching(
+        sensor_modules=[],
+        learning_modules=learning_modules,
+        motor_system=None,
+        sm_to_agent_dict={},
+        sm_to_lm_matrix=[[] for _ in range(num_lms)],
+        lm_to_lm_matrix=None,
+        lm_to_lm_vote_matrix=[
+            [j for j in range(num_lms) if j != i] for i in range(num_lms)
+        ],
+        min_eval_steps=1,
+        min_train_steps=1,
+        num_exploratory_steps=1,
+        max_total_steps=1,
+    )
+
+
+def send_out_votes(learning_modules, vote_format):
+    """Send out the votes of all LMs in the given format.
+
+    Returns:
+        The votes of each LM.
+    """
+    votes_per_lm = [lm.send_out_vote() for lm in learning_modules]
+    if vote_format == "states":
+        for lm, votes in zip(learning_modules, votes_per_lm):
+            votes["possible_states"] = {
+                graph_id: graph_votes.to_states(lm.learning_module_id)
+                for graph_id, graph_votes in votes["possible_states"].items()
+            }
+    return votes_per_lm
+
+
+def time_voting(monty, vote_format, num_repeats):
+    """Time sending, combining, and receiving votes on copies of the LMs.
+
+    Returns:
+        Duration of each voting phase in seconds, the combined votes and the
+        evidence of each LM after receiving the votes.
+    """
+    durations = {"send": 0, "combine": 0, "receive": 0}
+    for _ in range(num_repeats):
+        learning_modules = copy.deepcopy(monty.learning_modules)
+        start_time = time.perf_counter()
+        votes_per_lm = send_out_votes(learning_modules, vote_format)
+        durations["send"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        combined_votes = monty._combine_votes(votes_per_lm)
+        durations["combine"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for lm, votes in zip(learning_modules, combined_votes):
+            lm.receive_votes(votes)
+        durations["receive"] += time.perf_counter() - start_time
+    evidences = [copy.deepcopy(lm.evidence) for lm in learning_modules]
+    durations = {phase: d / num_repeats for phase, d in durations.items()}
+    return durations, combined_votes, evidences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_objects", type=int, default=77)
+    parser.add_argument("--num_points", type=int, default=200)
+    parser.add_argument("--num_lms", type=int, default=5)
+    parser.add_argument("--num_steps", type=int, default=5)
+    parser.add_argument("--num_repeats", type=int, default=3)
+    parser.add_argument("--vote_evidence_threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    lm, observations = make_evidence_lm(
+        num_objects=args.num_objects,
+        num_points=args.num_points,
+        vote_evidence_threshold=args.vote_evidence_threshold,
+    )
+    learning_modules = []
+    for lm_id in range(args.num_lms):
+        lm_copy = copy.deepcopy(lm)
+        lm_copy.learning_module_id = f"LM_{lm_id}"
+        run_matching_episode(
+            lm_copy, observations["new_object0"], args.num_steps, seed=lm_id
+        )
+        learning_modules.append(lm_copy)
+    monty = make_monty(learning_modules)
+
+    results = {}
+    for vote_format in ["states", "arrays"]:
+        durations, combined_votes, evidences = time_voting(
+            monty, vote_format, args.num_repeats
+        )
+        num_votes = sum(len(v) for votes in combined_votes for v in votes.values())
+        print(
+            f"{vote_format:>7}: "
+            + ", ".join(f"{k} {1000 * v:.1f}ms" for k, v in durations.items())
+            + f", {num_votes} received votes"
+        )
+        results[vote_format] = (combined_votes, evidences)
+
+    states, arrays = results["states"], results["arrays"]
+    identical = all(
+        np.allclose(s[graph_id].locations, a[graph_id].locations)
+        and np.allclose(s[graph_id].pose_vectors, a[graph_id].pose_vectors)
+        and np.array_equal(s[graph_id].confidences, a[graph_id].confidences)
+        for s, a in zip(states[0], arrays[0])
+        for graph_id in a
+    ) and all(
+        np.allclose(s[graph_id], a[graph_id])
+        for s, a in zip(states[1], arrays[1])
+        for graph_id in a
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Compare the voxel stores of the GridObjectModel.
+
+Times building a model from a set of observations and updating it with a few more,
+and measures how much the peak memory of the process grows during these operations
+(each store is run in a new process).
+
+Usage:
+    python benchmarks/micro/voxel_store.py --num_voxels_per_dim 100
+"""
+
+import argparse
+import resource
+import time
+from multiprocessing import get_context
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+from tbp.monty.frameworks.models.object_model import GridObjectModel
+from tbp.monty.frameworks.models.voxel_stores import VOXEL_STORES
+
+MAX_SIZE = 0.3
+
+
+def make_observations(rng, num_observations, max_size):
+    """Return random locations on a sphere and features for each of them."""
+    locations = rng.normal(size=(num_observations, 3))
+    locations *= max_size / 3 / np.linalg.norm(locations, axis=1, keepdims=True)
+    features = {
+        "pose_vectors": np.tile(np.eye(3).flatten(), (num_observations, 1)),
+        "pose_fully_defined": np.ones(num_observations, dtype=bool),
+        "hsv": rng.random((num_observations, 3)),
+        "curvature": rng.normal(size=num_observations),
+    }
+    return locations, features
+
+
+def run_store(name, observations, updates, args):
+    """Build and update a model with the given voxel store.
+
+    Returns:
+        Build time, mean update time, peak memory increase in KiB, number of
+        occupied voxels and the node locations and features of the model.
+    """
+    memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    model = GridObjectModel(
+        "benchmark_object",
+        max_nodes=args.max_nodes,
+        max_size=MAX_SIZE,
+        num_voxels_per_dim=args.num_voxels_per_dim,
+        voxel_store=name,
+    )
+    start_time = time.perf_counter()
+    model.build_model(*observations)
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for locations, features in updates:
+        model.update_model(
+            locations,
+            features,
+            location_rel_model=np.zeros(3),
+            object_location_rel_body=np.zeros(3),
+            object_rotation=Rotation.identity(),
+        )
+    update_time = (time.perf_counter() - start_time) / len(updates)
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory_before
+    return (
+        build_time,
+        update_time,
+        peak_memory,
+        len(model._voxel_store),
+        (model.pos, model.x),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_voxels_per_dim", type=int, default=100)
+    parser.add_argument("--num_observations", type=int, default=5000)
+    parser.add_argument("--num_updates", type=int, default=10)
+    parser.add_argument("--max_nodes", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    observations = make_observations(rng, args.num_observations, MAX_SIZE)
+    # The grid is centered on the first observed location
+    observations[0][0] = 0
+    updates = [make_observations(rng, 100, MAX_SIZE) for _ in range(args.num_updates)]
+
+    with get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        results = {
+            name: pool.apply(run_store, (name, observations, updates, args))
+            for name in VOXEL_STORES
+        }
+    for name, (build_time, update_time, peak_memory, num_voxels, _) in results.items():
+        print(
+            f"{name:>14}: build {1000 * build_time:.1f}ms, "
+            f"update {1000 * update_time:.1f}ms, "
+            f"peak memory +{peak_memory / 2**10:.1f}MiB, {num_voxels} occupied voxels"
+        )
+
+    identical = all(
+        np.array_equal(value, expected_value)
+        for result in results.values()
+        for value, expected_value in zip(result[-1], results["arrays"][-1])
+    )
+    print(f"Results identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
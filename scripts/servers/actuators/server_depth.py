@@ -2,6 +2,7 @@ import ArducamDepthCamera as ac
 import cv2
 import numpy as np
 import Pyro5.api
+from array_transport import encode_array
 from pyro_utils import Pyro5Mixin
 
 MAX_DISTANCE = 2000
@@ -61,8 +62,7 @@ class DepthPatchCamera:
 
         return patch.tolist()
 
-    @Pyro5.api.expose
-    def depth(self, size: int = 64):
+    def _depth_patch(self, size: int):
         frame = self.cam.requestFrame(MAX_DISTANCE)
 
         depth_image = frame.depth_data
@@ -83,9 +83,16 @@ class DepthPatchCamera:
         side = size // 2
         x1, x2 = x_center - side, x_center + side
         y1, y2 = y_center - side, y_center + side
-        patch = depth_image[y1:y2, x1:x2]
+        return depth_image[y1:y2, x1:x2]
 
-        return patch.tolist()
+    @Pyro5.api.expose
+    def depth(self, size: int = 64):
+        return self._depth_patch(size).tolist()
+
+    @Pyro5.api.expose
+    def depth_bytes(self, size: int = 64, compress: bool = False):
+        # Same as depth, but much faster to send and decode
+        return encode_array(self._depth_patch(size), compress)
 
     def stop(self):
         self.cam.stop()
@@ -4,6 +4,7 @@ import Pyro5.api
 import numpy as np
 from picamera2 import Picamera2
 
+from array_transport import encode_array
 from pyro_utils import Pyro5Mixin
 
 
@@ -18,8 +19,7 @@ class PatchCamera:
         self.height = 600
         print("[PatchCamera] Picamera2 started.")
 
-    @Pyro5.api.expose
-    def rgb(self, size: int = 64):
+    def _rgb_patch(self, size: int):
         # Capture a new frame for every request
         image = self.picam2.capture_array()
         if image is None:
@@ -31,10 +31,23 @@ class PatchCamera:
         side = size//2
         x1, x2 = x_center-side, x_center+side
         y1, y2 = y_center-side, y_center+side
-        patch = image[y1:y2, x1:x2]
+        return image[y1:y2, x1:x2]
 
+    @Pyro5.api.expose
+    def rgb(self, size: int = 64):
+        patch = self._rgb_patch(size)
+        if patch is None:
+            return None
         return patch.tolist()
 
+    @Pyro5.api.expose
+    def rgb_bytes(self, size: int = 64, compress: bool = False):
+        # Same as rgb, but much faster to send and decode
+        patch = self._rgb_patch(size)
+        if patch is None:
+            return None
+        return encode_array(patch, compress)
+
     def stop(self):
         self.picam2.stop()
         print("[PatchCamera] Camera stopped.")
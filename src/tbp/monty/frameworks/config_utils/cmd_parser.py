@@ -135,5 +135,17 @@ def create_cmd_parser_parallel(experiments: list[str]):
         action="store_true",
         help="Don't run an experiment; just print out the config for visual inspection",
     )
+    parser.add_argument(
+        "-s",
+        "--share_pretrained_model",
+        action="store_true",
+        help="Let all evaluation workers memory map one copy of the pretrained model",
+    )
+    parser.add_argument(
+        "-w",
+        "--persistent_workers",
+        action="store_true",
+        help="Let each evaluation worker reuse its experiment for many episodes",
+    )
 
     return parser
@@ -528,12 +528,18 @@ class MontyArgs:
         max_total_steps: Maximum total episode steps before timeout, regardless of
             whether LMs receive sensory information and perform a true matching step.
             Defaults to 2500.
+        lm_scheduler: How to run the steps and voting of the learning modules,
+            "serial" or "thread_pool". See `lm_schedulers.py`. Defaults to "serial".
+        num_lm_scheduler_workers: Number of threads used by the "thread_pool"
+            lm_scheduler. If None, use one thread per CPU. Defaults to None.
     """
 
     num_exploratory_steps: int = 1_000
     min_eval_steps: int = 3
     min_train_steps: int = 3
     max_total_steps: int = 2_500
+    lm_scheduler: str = "serial"
+    num_lm_scheduler_workers: Optional[int] = None
 
 
 @dataclass
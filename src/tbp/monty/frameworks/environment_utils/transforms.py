@@ -275,6 +275,7 @@ class DepthTo3DLocations:
         self.needs_rng = False
 
         self.inv_k = []
+        self.unprojection_rays = []
         self.h, self.w = [], []
 
         if isinstance(zooms, (int, float)):
@@ -308,6 +309,16 @@ class DepthTo3DLocations:
             # Inverse K
             self.inv_k.append(np.linalg.inv(k))
 
+            # Unproject the pixel grid once. The 3D location of a pixel relative to
+            # the sensor is its ray scaled by the pixel's depth.
+            x, y = np.meshgrid(
+                np.linspace(-1, 1, self.w[i]), np.linspace(1, -1, self.h[i])
+            )
+            xyz = np.stack([x.ravel(), y.ravel(), -np.ones(x.size)])
+            rays = np.ascontiguousarray(np.matmul(self.inv_k[i][:3, :3], xyz).T)
+            rays.flags.writeable = False
+            self.unprojection_rays.append(rays)
+
         self.agent_id = agent_id
         self.sensor_ids = sensor_ids
         self.world_coord = world_coord
@@ -389,7 +400,9 @@ class DepthTo3DLocations:
                     sensor. Has the same structure as "semantic_3d". Included only
                     when `self.get_all_points` is `True`.
         """
-        for i, sensor_id in enumerate(self.sensor_ids):
+        surface_patches = {}
+        surface_groups = {}
+        for sensor_id in self.sensor_ids:
             sensor_obs = observations[self.agent_id][sensor_id]
             depth_patch = sensor_obs["depth"]
 
@@ -427,27 +440,45 @@ class DepthTo3DLocations:
                 # self.use_semantic_sensor is not commonly used at present, if ever.
                 # self.depth_clip_sensors implies a surface agent, and
                 # self.use_semantic_sensor implies multi-object experiments.
-                surface_patch = sensor_obs["semantic"]
+                surface_patches[sensor_id] = sensor_obs["semantic"]
             else:
-                surface_patch = self.get_surface_from_depth(
-                    depth_patch,
-                    semantic_patch,
-                    default_on_surface_th,
+                # Patches of the same size and threshold are segmented together.
+                key = (depth_patch.shape, depth_patch.dtype, default_on_surface_th)
+                surface_groups.setdefault(key, []).append(
+                    (sensor_id, depth_patch, semantic_patch)
                 )
 
-            # Approximate true world coordinates
-            x, y = np.meshgrid(
-                np.linspace(-1, 1, self.w[i]), np.linspace(1, -1, self.h[i])
+        for (_, _, default_on_surface_th), group in surface_groups.items():
+            sensor_ids, depth_patches, semantic_patches = zip(*group)
+            surfaces = self.get_surfaces_from_depth(
+                np.stack(depth_patches),
+                np.stack(semantic_patches),
+                default_on_surface_th,
             )
-            x = x.reshape(1, self.h[i], self.w[i])
-            y = y.reshape(1, self.h[i], self.w[i])
+            surface_patches.update(zip(sensor_ids, surfaces))
 
-            # Unproject 2D camera coordinates into 3D coordinates relative to the agent
-            depth = depth_patch.reshape(1, self.h[i], self.w[i])
-            xyz = np.vstack((x * depth, y * depth, -depth, np.ones(depth.shape)))
-            xyz = xyz.reshape(4, -1)
-            xyz = np.matmul(self.inv_k[i], xyz)
-            sensor_frame_data = xyz.T.copy()
+        for i, sensor_id in enumerate(self.sensor_ids):
+            depth_patch = observations[self.agent_id][sensor_id]["depth"]
+            surface_patch = surface_patches[sensor_id]
+
+            # Off-surface pixels are only unprojected if all points are returned
+            semantic = surface_patch.reshape(-1)
+            if self.get_all_points:
+                pixel_ids = slice(None)
+            else:
+                pixel_ids = np.flatnonzero(semantic)
+            depth = depth_patch.reshape(-1, 1)[pixel_ids]
+            semantic_ids = semantic[pixel_ids]
+
+            # Unproject 2D camera coordinates into homogeneous 3D coordinates relative
+            # to the agent
+            sensor_frame_data = np.empty((len(depth), 4))
+            np.multiply(
+                self.unprojection_rays[i][pixel_ids],
+                depth,
+                out=sensor_frame_data[:, :3],
+            )
+            sensor_frame_data[:, 3] = 1.0
 
             if self.world_coord and state is not None:
                 # Get agent and sensor states from state dictionary
@@ -472,29 +503,23 @@ class DepthTo3DLocations:
                 world_camera = np.eye(4)
                 world_camera[0:3, 0:3] = rotation_matrix
                 world_camera[0:3, 3] = sensor_translation_rel_world
-                xyz = np.matmul(world_camera, xyz)
+                semantic_3d = np.matmul(sensor_frame_data, world_camera.T)
 
                 # Add sensor-to-world coordinate frame transform, used for point-normal
                 # extraction. View direction is the third column of the matrix.
                 observations[self.agent_id][sensor_id]["world_camera"] = world_camera
+            else:
+                semantic_3d = sensor_frame_data.copy()
+            # Last column contains the semantic ID
+            semantic_3d[:, 3] = semantic_ids
 
-            # Extract 3D coordinates of detected objects (semantic_id != 0)
-            semantic = surface_patch.reshape(1, -1)
             if self.get_all_points:
-                semantic_3d = xyz.transpose(1, 0)
-                semantic_3d[:, 3] = semantic[0]
-                sensor_frame_data[:, 3] = semantic[0]
-
+                sensor_frame_data[:, 3] = semantic_ids
                 # Add point-cloud data expressed in sensor coordinate frame. Used for
                 # point-normal extraction
                 observations[self.agent_id][sensor_id]["sensor_frame_data"] = (
                     sensor_frame_data
                 )
-            else:
-                detected = semantic.any(axis=0)
-                xyz = xyz.transpose(1, 0)
-                semantic_3d = xyz[detected]
-                semantic_3d[:, 3] = semantic[0, detected]
 
             # Add transformed observation to existing dict. We don't need to create
             # a deepcopy because we are appending a new observation
@@ -552,30 +577,94 @@ class DepthTo3DLocations:
         Returns:
             threshold and whether we want to use values above or below threshold
         """
-        center_loc = (depth_patch.shape[0] // 2, depth_patch.shape[1] // 2)
-        depth_center = depth_patch[center_loc[0], center_loc[1]]
-        semantic_center = semantic_patch[center_loc[0], center_loc[1]]
-
-        depths = np.asarray(depth_patch).flatten()
-        flip_sign = False
-        th = default_on_surface_th
-        if (max(depths) - min(depths)) > min_depth_range:
-            # only check for bimodal distribution if we have a large enough
-            # range in depth values
-            height, bins = np.histogram(
-                np.array(depth_patch).flatten(), bins=8, density=False
-            )
-            gap = np.where(height == 0)[0]
-            if len(gap) > 0:
-                # There is a bimodal distribution
-                gap_center = len(gap) // 2
-                th_id = gap[gap_center]
-                th = bins[th_id]
-                if depth_center > th and semantic_center > 0:
-                    # if the FOV's center is on the further away surface and the FOV's
-                    # center is on-object, then we want to use the further-away surface.
-                    flip_sign = True
+        th, flip_sign = self.get_on_surface_ths(
+            depth_patch[np.newaxis],
+            semantic_patch[np.newaxis],
+            min_depth_range,
+            default_on_surface_th,
+        )
+        return th[0], bool(flip_sign[0])
 
+    def get_on_surface_ths(
+        self,
+        depth_patches: np.ndarray,
+        semantic_patches: np.ndarray,
+        min_depth_range: Number,
+        default_on_surface_th: Number,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the depth thresholds of several patches of the same size.
+
+        Batched version of `get_on_surface_th`. The histograms of all patches are
+        computed at once with the same bin edges and bin assignment as
+        `np.histogram` with 8 bins.
+
+        Args:
+            depth_patches: sensor patch observations of depth. shape = (B, H, W)
+            semantic_patches: binary masks indicating on-object locations.
+                shape = (B, H, W)
+            min_depth_range: minimum range of depth values to even be considered
+            default_on_surface_th: default threshold to use if no bimodal distribution
+                is found
+
+        Returns:
+            thresholds and whether we want to use values above or below them.
+            shape = (B,)
+        """
+        num_patches, height, width = depth_patches.shape
+        depth_center = depth_patches[:, height // 2, width // 2]
+        semantic_center = semantic_patches[:, height // 2, width // 2]
+
+        depths = depth_patches.reshape(num_patches, -1)
+        min_depths = depths.min(axis=1)
+        max_depths = depths.max(axis=1)
+        th = np.full(num_patches, default_on_surface_th, dtype=float)
+        flip_sign = np.zeros(num_patches, dtype=bool)
+        # only check for bimodal distribution if we have a large enough
+        # range in depth values
+        check = (max_depths - min_depths) > min_depth_range
+        if not np.any(check):
+            return th, flip_sign
+
+        depths = depths[check]
+        first_edges = min_depths[check, np.newaxis]
+        last_edges = max_depths[check, np.newaxis]
+        n_bins = 8
+        # Like np.histogram, compute the edges in double precision and then cast
+        # them to the type of the depths
+        bins = np.linspace(
+            first_edges[:, 0].astype(float),
+            last_edges[:, 0].astype(float),
+            n_bins + 1,
+            axis=1,
+            dtype=np.result_type(first_edges, last_edges, depths),
+        )
+        depths = depths.astype(bins.dtype, copy=False)
+        # Assign depths to bins the same way as np.histogram, correcting the
+        # rounding errors of the scaled depths with the bin edges
+        indices = ((depths - first_edges) / (last_edges - first_edges) * n_bins).astype(
+            np.intp
+        )
+        indices[indices == n_bins] -= 1
+        indices -= depths < np.take_along_axis(bins, indices, axis=1)
+        indices += (depths >= np.take_along_axis(bins, indices + 1, axis=1)) & (
+            indices != n_bins - 1
+        )
+        indices += np.arange(len(depths))[:, np.newaxis] * n_bins
+        counts = np.bincount(indices.ravel(), minlength=len(depths) * n_bins)
+        gap = counts.reshape(-1, n_bins) == 0
+
+        # There is a bimodal distribution if there are empty bins. The threshold
+        # is at the center of the gap.
+        bimodal = np.any(gap, axis=1)
+        gap_center = np.count_nonzero(gap, axis=1) // 2
+        th_id = np.argmax(gap & (np.cumsum(gap, axis=1) == gap_center[:, None] + 1), 1)
+        bimodal_th = bins[np.arange(len(bins)), th_id]
+        # if the FOV's center is on the further away surface and the FOV's
+        # center is on-object, then we want to use the further-away surface.
+        flip_sign[check] = (
+            bimodal & (depth_center[check] > bimodal_th) & (semantic_center[check] > 0)
+        )
+        th[check] = np.where(bimodal, bimodal_th, th[check])
         return th, flip_sign
 
     def get_surface_from_depth(
@@ -623,25 +712,51 @@ class DepthTo3DLocations:
         Returns:
             sensor patch shaped info about whether each pixel is on surface of not
         """
-        depth_patch = np.array(depth_patch)
-        depth_patch[depth_patch > self.void_value] = self.void_value
+        return self.get_surfaces_from_depth(
+            depth_patch[np.newaxis], semantic_patch[np.newaxis], default_on_surface_th
+        )[0]
 
-        # If all depth values are at maximum self.void_value, then we are
-        # automatically off-object.
-        if np.all(depth_patch >= self.void_value):
-            return np.zeros_like(depth_patch, dtype=bool)
+    def get_surfaces_from_depth(
+        self,
+        depth_patches: np.ndarray,
+        semantic_patches: np.ndarray,
+        default_on_surface_th: Number,
+    ) -> np.ndarray:
+        """Return surface patch information of several patches of the same size.
+
+        Batched version of `get_surface_from_depth`.
+
+        Args:
+            depth_patches: sensor patch observations of depth. shape = (B, H, W)
+            semantic_patches: binary masks indicating on-object locations.
+                shape = (B, H, W)
+            default_on_surface_th: default threshold to use if no bimodal distribution
+                is found
+
+        Returns:
+            sensor patch shaped info about whether each pixel is on surface of not.
+            shape = (B, H, W)
+        """
+        depth_patches = np.minimum(depth_patches, self.void_value)
+        semantic_patches = np.asarray(semantic_patches)
 
         # Compute the on-suface depth threshold (and whether we need to flip the
         # sign), and apply it to the depth to get the semantic patch.
-        th, flip_sign = self.get_on_surface_th(
-            depth_patch,
-            semantic_patch,
+        th, flip_sign = self.get_on_surface_ths(
+            depth_patches,
+            semantic_patches,
             min_depth_range=0.01,
             default_on_surface_th=default_on_surface_th,
         )
-        if flip_sign is False:
-            surface_patch = depth_patch < th
-        else:
-            surface_patch = depth_patch > th
-
-        return surface_patch * semantic_patch
+        th = th[:, np.newaxis, np.newaxis]
+        surface_patches = np.where(
+            flip_sign[:, np.newaxis, np.newaxis],
+            depth_patches > th,
+            depth_patches < th,
+        )
+        # If all depth values are at maximum self.void_value, then we are
+        # automatically off-object.
+        surface_patches &= np.any(depth_patches < self.void_value, axis=(1, 2))[
+            :, np.newaxis, np.newaxis
+        ]
+        return surface_patches * semantic_patches
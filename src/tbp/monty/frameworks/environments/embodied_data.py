@@ -8,9 +8,11 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+import contextlib
 import copy
 import logging
 import math
+from concurrent.futures import Future, ThreadPoolExecutor
 from pprint import pformat
 
 import numpy as np
@@ -128,9 +130,29 @@ class EnvironmentDataLoader:
     environment's initial state, subsequent observations are returned after the action
     returned by `motor_system` is applied.
 
+    With `prefetch`, and if the motor policy does not depend on observations (see
+    :attr:`MotorPolicy.depends_on_observations`), the next action is selected as
+    soon as an observation is returned and applied to the environment in a
+    background thread. Moving the agent and capturing the next observation then
+    overlaps with processing the current observation. Note that the policy is called
+    one step earlier than without prefetching, e.g. `last_action` is the action
+    leading to the next observation while the current one is processed. The
+    environment has to support being stepped from another thread.
+
+    No step is prefetched after `max_steps`. If an episode ends earlier (e.g. because
+    an object was recognized), the prefetched step has already been applied to the
+    environment. It is discarded and its action is not added to the action sequence
+    of the policy. Prefetching should therefore only be used where an extra step is
+    harmless, i.e. in simulation. It is not supported with physical hardware (e.g.
+    `EverythingIsAwesomeDataLoader`), where the step after a terminal condition
+    would already have moved the robot.
+
     Attributes:
         dataset: :class:`EnvironmentDataset`
         motor_system: :class:`MotorSystem`
+        prefetch: Whether to prefetch the next observation when the policy allows it.
+        max_steps: Last step of the current episode, set by the experiment. No step
+            is prefetched after it. None if the episode has no step limit.
 
     Note:
         If the amount variable returned by motor_system is None, the amount used by
@@ -141,13 +163,20 @@ class EnvironmentDataLoader:
         This one on its own won't work.
     """
 
-    def __init__(self, dataset: EnvironmentDataset, motor_system: MotorSystem, rng):
+    def __init__(
+        self,
+        dataset: EnvironmentDataset,
+        motor_system: MotorSystem,
+        rng,
+        prefetch: bool = False,
+    ):
         assert isinstance(dataset, EnvironmentDataset)
         if not isinstance(motor_system, MotorSystem):
             f"motor_system must be an instance of MotorSystem, got {motor_system}"
         self.dataset = dataset
         self.motor_system = motor_system
         self.rng = rng
+        self._init_prefetching(prefetch)
         self._observation, proprioceptive_state = self.dataset.reset()
         self.motor_system._state = (
             MotorSystemState(proprioceptive_state) if proprioceptive_state else None
@@ -156,6 +185,7 @@ class EnvironmentDataLoader:
         self._counter = 0
 
     def __iter__(self):
+        self._discard_prefetched_step()
         # Reset the environment before iterating
         self._observation, proprioceptive_state = self.dataset.reset()
         self.motor_system._state = (
@@ -170,21 +200,101 @@ class EnvironmentDataLoader:
         if self._counter == 0:
             # Return first observation after 'reset' before any action is applied
             self._counter += 1
+            self._prefetch_step()
             return self._observation
         else:
-            action = self.motor_system()
-            self._action = action
-            self._observation, proprioceptive_state = self.dataset[action]
-            self.motor_system._state = (
-                MotorSystemState(proprioceptive_state) if proprioceptive_state else None
-            )
+            if self._prefetched_step is not None:
+                self._apply_prefetched_step()
+            else:
+                action = self.motor_system()
+                self._action = action
+                self._observation, proprioceptive_state = self.dataset[action]
+                self.motor_system._state = (
+                    MotorSystemState(proprioceptive_state)
+                    if proprioceptive_state
+                    else None
+                )
             self._counter += 1
+            self._prefetch_step()
             return self._observation
 
+    def _init_prefetching(self, prefetch: bool):
+        """Set the attributes used for prefetching.
+
+        Args:
+            prefetch: Whether to prefetch the next observation when the policy
+                allows it.
+        """
+        self.prefetch = prefetch
+        self.max_steps = None
+        self._executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        # (action, action sequence entry, future of the dataset item) of the step
+        # applied in the background
+        self._prefetched_step = None
+
+    def _prefetch_step(self):
+        """Start applying the next action in the background if enabled.
+
+        The action is selected right away so that the policy is only ever called
+        from this thread. If the policy signals the end of the iteration, the
+        StopIteration is raised by the following call of `__next__`.
+        """
+        if self._executor is None or self.motor_system.depends_on_observations:
+            return
+        if self.max_steps is not None and self._counter > self.max_steps:
+            return
+        try:
+            action = self.motor_system()
+        except StopIteration as stop:
+            future = Future()
+            future.set_exception(stop)
+            self._prefetched_step = (None, None, future)
+        else:
+            # The action is only added to the action sequence once it is returned
+            action_sequence = getattr(self.motor_system._policy, "action_sequence", [])
+            logged_action = action_sequence.pop() if action_sequence else None
+            future = self._executor.submit(self.dataset.__getitem__, action)
+            self._prefetched_step = (action, logged_action, future)
+
+    def _apply_prefetched_step(self, log_action=True):
+        """Wait for the prefetched step and make it the current one.
+
+        Re-raises the StopIteration of the policy if it ended the iteration when
+        prefetching.
+
+        Args:
+            log_action: Whether to add the action to the action sequence of the
+                policy.
+        """
+        action, logged_action, future = self._prefetched_step
+        self._prefetched_step = None
+        observation, proprioceptive_state = future.result()
+        if log_action and logged_action is not None:
+            self.motor_system._policy.action_sequence.append(logged_action)
+        self._action = action
+        self._observation = observation
+        self.motor_system._state = (
+            MotorSystemState(proprioceptive_state) if proprioceptive_state else None
+        )
+
+    def _discard_prefetched_step(self):
+        """Wait for a prefetched step that will not be returned.
+
+        The environment has still been stepped, so the loader and motor system state
+        are updated to match it. Its action is not added to the action sequence of
+        the policy, which only contains the actions of returned observations.
+        """
+        if self._prefetched_step is None:
+            return
+        with contextlib.suppress(StopIteration):
+            self._apply_prefetched_step(log_action=False)
+
     def pre_episode(self):
+        self._discard_prefetched_step()
         self.motor_system.pre_episode()
 
     def post_episode(self):
+        self._discard_prefetched_step()
         self.motor_system.post_episode()
 
     def pre_epoch(self):
@@ -193,7 +303,18 @@ class EnvironmentDataLoader:
     def post_epoch(self):
         pass
 
+    def shutdown(self):
+        """Stop prefetching, without closing the dataset.
+
+        Used when the dataset is shared with a data loader replacing this one.
+        """
+        self._discard_prefetched_step()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def finish(self):
+        self.shutdown()
         self.dataset.close()
 
 
@@ -859,6 +980,7 @@ class OmniglotDataLoader(EnvironmentDataLoaderPerObject):
         )
         self._action = None
         self._counter = 0
+        self._init_prefetching(prefetch=False)
 
         self.alphabets = alphabets
         self.characters = characters
@@ -950,6 +1072,7 @@ class SaccadeOnImageDataLoader(EnvironmentDataLoaderPerObject):
         )
         self._action = None
         self._counter = 0
+        self._init_prefetching(prefetch=False)
 
         self.scenes = scenes
         self.versions = versions
@@ -1045,6 +1168,7 @@ class SaccadeOnImageFromStreamDataLoader(SaccadeOnImageDataLoader):
         )
         self._action = None
         self._counter = 0
+        self._init_prefetching(prefetch=False)
         self.current_scene = 0
         self.episodes = 0
         self.epochs = 0
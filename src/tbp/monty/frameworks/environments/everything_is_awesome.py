@@ -10,6 +10,7 @@ from __future__ import annotations
 
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from typing import Protocol, TypedDict, Union, cast
@@ -36,6 +37,7 @@ from tbp.monty.frameworks.models.motor_system_state import (
     ProprioceptiveState,
     SensorState,
 )
+from tbp.monty.frameworks.utils.array_transport import decode_array
 
 
 class EverythingIsAwesomeSensorObservation(TypedDict):
@@ -75,6 +77,9 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
         depth_server_uri: str,
         pitch_diameter_rr: float,
         rgb_server_uri: str,
+        binary_observations: bool = True,
+        compress_observations: bool = False,
+        concurrent_observations: bool = True,
     ) -> None:
         """Initialize the Everything Is Awesome environment.
 
@@ -85,6 +90,15 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
                 robot_radius is the distance between the sensor and the center of the
                 platform that the robot can rotate around.
             rgb_server_uri: The URI of the rgb server.
+            binary_observations: Whether to request the RGB and depth images as raw
+                bytes (see `utils/array_transport.py`) instead of as nested lists.
+                Falls back to lists for servers that don't support it. Defaults to
+                True.
+            compress_observations: Whether the servers should compress the bytes of
+                the images. Only used with binary_observations. Defaults to False.
+            concurrent_observations: Whether to request the depth image in a
+                background thread while the RGB image is requested, so that the
+                latencies of the two servers overlap. Defaults to True.
         """
         self._actuator_server = cast(
             Union[ActuatorProtocol, ProprioceptionProtocol],
@@ -100,6 +114,21 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
         )
         self._depth_server = cast(DepthProtocol, Pyro5.api.Proxy(depth_server_uri))
         self._rgb_server = cast(RgbProtocol, Pyro5.api.Proxy(rgb_server_uri))
+        # Whether to request each image as bytes
+        self._binary_observations = {
+            "rgb": binary_observations,
+            "depth": binary_observations,
+        }
+        self._compress_observations = compress_observations
+        if binary_observations:
+            # marshal sends bytes as they are, while the default serpent serializer
+            # base64 encodes them.
+            self._rgb_server._pyroSerializer = "marshal"
+            self._depth_server._pyroSerializer = "marshal"
+
+        self._depth_executor = (
+            ThreadPoolExecutor(max_workers=1) if concurrent_observations else None
+        )
 
         self._orbit_motor = MotorState(id=Motor.ORBIT)
         self._translate_motor = MotorState(id=Motor.TRANSLATE)
@@ -115,7 +144,22 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
         raise NotImplementedError
 
     def close(self):
-        pass
+        if self._depth_executor is not None:
+            self._depth_executor.shutdown()
+        self._claim_proxies()
+        for server in (self._actuator_server, self._rgb_server, self._depth_server):
+            server._pyroRelease()
+
+    def _claim_proxies(self) -> None:
+        """Lets the calling thread use the server proxies.
+
+        Pyro proxies may only be used by the thread owning them. The environment can
+        be stepped from another thread than it was created in, e.g. by a prefetching
+        `EnvironmentDataLoader`, and the depth image may be requested in a
+        background thread.
+        """
+        for server in (self._actuator_server, self._rgb_server, self._depth_server):
+            server._pyroClaimOwnership()
 
     def _extract_patch(self, img, side=70, resize_to=None, start_pos=(0, 0)):
         """Extracts a patch from the given image.
@@ -153,6 +197,10 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
           EverythingIsAwesomeObservations: An object containing RGB and depth
             observations, as well as other relevant information.
         """
+        self._claim_proxies()
+        if self._depth_executor is not None:
+            depth_future = self._depth_executor.submit(self._depth)
+
         # Get RGB image and extract the patch
         rgb = self._rgb()
         rgb_patch = self._extract_patch(rgb, start_pos=(0, 0))
@@ -163,7 +211,10 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
 
         # Get Depth image and extract the patch
         # Linear transformation coefficients are specific to depth sensor.
-        depth = self._depth()
+        if self._depth_executor is not None:
+            depth = depth_future.result()
+        else:
+            depth = self._depth()
         depth_patch = self._extract_patch(
             depth, resize_to=(1000, 1000), start_pos=(550, 350)
         )
@@ -179,12 +230,48 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
         )
 
     def _rgb(self) -> np.ndarray:
-        rgb = np.array(self._rgb_server.rgb(size=100), dtype=np.uint8)
-        return rgb
+        return self._request_image(self._rgb_server, "rgb", size=100, dtype=np.uint8)
 
     def _depth(self) -> np.ndarray:
-        depth = np.array(self._depth_server.depth(size=180), dtype=np.float64)
-        return depth
+        self._depth_server._pyroClaimOwnership()
+        return self._request_image(
+            self._depth_server, "depth", size=180, dtype=np.float64
+        )
+
+    def _request_image(
+        self, server, name: str, size: int, dtype: np.dtype
+    ) -> np.ndarray:
+        """Requests an image from a sensor server.
+
+        Uses the `<name>_bytes` method of the server if binary observations are
+        enabled, and the `<name>` method, which returns nested lists, otherwise or if
+        the server doesn't have a `<name>_bytes` method.
+
+        Args:
+            server: The proxy of the sensor server.
+            name: The name of the image, "rgb" or "depth".
+            size: The side length of the requested image patch.
+            dtype: The dtype of the returned image.
+
+        Returns:
+            The image. Read only when received as bytes in the requested dtype.
+        """
+        if self._binary_observations[name]:
+            try:
+                message = getattr(server, f"{name}_bytes")(
+                    size=size, compress=self._compress_observations
+                )
+            except AttributeError:
+                # Note: Set at top of module once importlib.reload(logging) is removed
+                logger = logging.getLogger(__name__)
+                logger.warning(
+                    f"{name} server does not support binary observations, "
+                    "falling back to lists"
+                )
+                self._binary_observations[name] = False
+            else:
+                return decode_array(message).astype(dtype, copy=False)
+        return np.array(getattr(server, name)(size=size), dtype=dtype)
 
     def _update_orbit_motor_state(self) -> None:
         """Updates the orbit motor state from the proprioception server.
@@ -212,6 +299,7 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
 
     @measure_time(__name__)
     def step(self, action: Action) -> EverythingIsAwesomeObservations:
+        self._claim_proxies()
         action.act(self._actuator)
         return self._observations()
 
@@ -234,6 +322,7 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
         Returns:
             ProprioceptiveState: The Monty proprioceptive state.
         """
+        self._claim_proxies()
         self._update_orbit_motor_state()
         self._update_translate_motor_state()
 
@@ -295,6 +384,7 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
         raise NotImplementedError
 
     def reset(self) -> EverythingIsAwesomeObservations:
+        self._claim_proxies()
         # slowly move the translate motor to the bottom
         curr_pos = self._proprioception_server.position(Motor.TRANSLATE)
         prev_pos = curr_pos + 1  # just make them different
@@ -326,7 +416,11 @@ class EverythingIsAwesomeEnvironment(EmbodiedEnvironment):
 
 
 class EverythingIsAwesomeDataLoader(EnvironmentDataLoader):
-    """DataLoader for the Everything Is Awesome hackathon environment."""
+    """DataLoader for the Everything Is Awesome hackathon environment.
+
+    Prefetching is not supported, since the robot would already be moved by the
+    prefetched step when an episode ends before `max_steps`.
+    """
 
     def __init__(self, object_name: str, *args, **kwargs) -> None:
         """Initialize the data loader.
@@ -335,7 +429,15 @@ class EverythingIsAwesomeDataLoader(EnvironmentDataLoader):
             object_name: The ground truth name of the object presented to the robot.
             *args: Additional arguments to pass to the parent class.
             **kwargs: Additional keyword arguments to pass to the parent class.
+
+        Raises:
+            ValueError: If prefetching is requested.
         """
+        if kwargs.get("prefetch", False):
+            raise ValueError(
+                "Prefetching is not supported with the robot, since the prefetched "
+                "step moves it even if the episode ends before the step is used."
+            )
         super().__init__(*args, **kwargs)
         self._object_name = object_name
         self.primary_target = {
@@ -634,10 +736,12 @@ class ActuatorProtocol(Protocol):
 
 class RgbProtocol(Protocol):
     def rgb(self, size: int = 64) -> list[list[list[int]]]: ...
+    def rgb_bytes(self, size: int = 64, compress: bool = False) -> dict: ...
 
 
 class DepthProtocol(Protocol):
     def depth(self, size: int = 64) -> list[list[list[int]]]: ...
+    def depth_bytes(self, size: int = 64, compress: bool = False) -> dict: ...
 
 
 class ProprioceptionProtocol(Protocol):
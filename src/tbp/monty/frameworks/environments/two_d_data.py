@@ -8,8 +8,10 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+import argparse
 import logging
 import os
+import re
 import time
 
 import matplotlib.pyplot as plt
@@ -24,13 +26,23 @@ from tbp.monty.frameworks.environments.embodied_environment import (
     ActionSpace,
     EmbodiedEnvironment,
 )
+from tbp.monty.frameworks.utils.model_store import (
+    get_changed_sources,
+    load_model_store,
+    save_model_store,
+)
 
 __all__ = [
+    "SCENE_STORE_FILE_NAME",
     "OmniglotEnvironment",
     "SaccadeOnImageEnvironment",
     "SaccadeOnImageFromStreamEnvironment",
+    "build_scene_store",
+    "load_scene_store",
 ]
 
+SCENE_STORE_FILE_NAME = "scene_store.bin"
+
 # Listing Numenta objects here since they were used in the iPad demo which uses the
 # SaccadeOnImageEnvironment (or SaccadeOnImageFromStreamEnvironment). However, these
 # objects can also be tested in simulation in habitat since we created 3D meshes of
@@ -260,15 +272,23 @@ class SaccadeOnImageEnvironment(EmbodiedEnvironment):
     """Environment for moving over a 2D image with depth channel.
 
     Images should be stored in .png format for rgb and .data format for depth.
+
+    If the dataset was preprocessed with :func:`build_scene_store`, the images and
+    3D point clouds of each scene version are memory mapped from the scene store
+    instead of being decoded and unprojected on every scene switch. Scene stores are
+    ignored if any of the image files they were built from changed since.
     """
 
-    def __init__(self, patch_size=64, data_path=None):
+    def __init__(self, patch_size=64, data_path=None, scene_store_path=None):
         """Initialize environment.
 
         Args:
             patch_size: height and width of patch in pixels, defaults to 64
             data_path: path to the image dataset. If None its set to
                 ~/tbp/data/worldimages/labeled_scenes/
+            scene_store_path: Optional scene store built by
+                :func:`build_scene_store`. If None, the `SCENE_STORE_FILE_NAME`
+                file in `data_path` is used if it exists.
         """
         self.patch_size = patch_size
         # Images are always presented upright so patch and agent rotation is always
@@ -280,22 +300,32 @@ class SaccadeOnImageEnvironment(EmbodiedEnvironment):
             self.data_path = os.path.join(
                 os.environ["MONTY_DATA"], "worldimages/labeled_scenes/"
             )
-        self.scene_names = [a for a in os.listdir(self.data_path) if a[0] != "."]
+        self.scene_names = [
+            a
+            for a in os.listdir(self.data_path)
+            if a[0] != "." and not a.startswith(SCENE_STORE_FILE_NAME)
+        ]
         self.current_scene = self.scene_names[0]
         self.scene_version = 0
 
-        (
-            self.current_depth_image,
-            self.current_rgb_image,
-            self.current_loc,
-        ) = self.load_new_scene_data()
-        self.move_area = self.get_move_area()
+        if scene_store_path is None:
+            scene_store_path = os.path.join(self.data_path, SCENE_STORE_FILE_NAME)
+            if not os.path.exists(scene_store_path):
+                scene_store_path = None
+        self.scene_store = {}
+        if scene_store_path is not None:
+            changed_sources = get_changed_sources(scene_store_path)
+            if changed_sources:
+                logging.warning(
+                    f"Ignoring scene store {scene_store_path}, since "
+                    f"{changed_sources} changed after it was built. Build the scene "
+                    "store again to use it."
+                )
+            else:
+                self.scene_store = load_scene_store(scene_store_path)
 
-        # Get 3D scene point cloud array from depth image
-        (
-            self.current_scene_point_cloud,
-            self.current_sf_scene_point_cloud,
-        ) = self.get_3d_scene_point_cloud()
+        self.load_scene()
+        self.move_area = self.get_move_area()
 
         # Just for compatibility. TODO: find cleaner way to do this.
         self._agents = [
@@ -410,17 +440,38 @@ class SaccadeOnImageEnvironment(EmbodiedEnvironment):
         """Load new image to be used as environment."""
         self.current_scene = self.scene_names[scene_id]
         self.scene_version = scene_version_id
-        (
-            self.current_depth_image,
-            self.current_rgb_image,
-            self.current_loc,
-        ) = self.load_new_scene_data()
+        self.load_scene()
 
-        # Get 3D scene point cloud array from depth image
-        (
-            self.current_scene_point_cloud,
-            self.current_sf_scene_point_cloud,
-        ) = self.get_3d_scene_point_cloud()
+    def load_scene(self):
+        """Load the images and 3D point clouds of the current scene version.
+
+        They are views of the scene store if it contains the scene version.
+        Otherwise the images are loaded from the dataset and the depth image is
+        unprojected.
+        """
+        scene = self.scene_store.get(self.current_scene, {}).get(self.scene_version)
+        if scene is None:
+            (
+                self.current_depth_image,
+                self.current_rgb_image,
+                self.current_loc,
+            ) = self.load_new_scene_data()
+
+            # Get 3D scene point cloud array from depth image
+            (
+                self.current_scene_point_cloud,
+                self.current_sf_scene_point_cloud,
+            ) = self.get_3d_scene_point_cloud()
+            return
+
+        self.current_depth_image = scene["depth_image"]
+        self.current_rgb_image = scene["rgb_image"]
+        self.current_scene_point_cloud = scene["scene_point_cloud"]
+        self.current_sf_scene_point_cloud = scene["sf_scene_point_cloud"]
+        self.world_camera = scene["world_camera"]
+        # set start location to center of image, same as load_new_scene_data
+        obs_shape = self.current_depth_image.shape
+        self.current_loc = [obs_shape[0] // 2, obs_shape[1] // 2]
 
     def remove_all_objects(self):
         # TODO The NotImplementedError highlights an issue with the EmbodiedEnvironment
@@ -793,6 +844,85 @@ class SaccadeOnImageFromStreamEnvironment(SaccadeOnImageEnvironment):
         return current_depth_image, current_rgb_image, start_location
 
 
+def build_scene_store(data_path, store_path=None):
+    """Preprocess a worldimages dataset into a memory mappable scene store.
+
+    Loads every version of every scene of the dataset as
+    :class:`SaccadeOnImageEnvironment` does, including the unprojection of the
+    depth image into world and sensor frame point clouds, and saves the resulting
+    arrays as a model store (see :mod:`tbp.monty.frameworks.utils.model_store`).
+    Environments memory map the store, so scene switches no longer decode PNG and
+    .data files or unproject the depth image, and parallel workers share the
+    mapped pages. The size and modification time of the image files are saved in
+    the store, so environments ignore it once they change.
+
+    Args:
+        data_path: Path to the image dataset, e.g. worldimages/labeled_scenes/.
+        store_path: Path of the scene store to write. Defaults to
+            `SCENE_STORE_FILE_NAME` in `data_path`, where environments find it
+            automatically.
+
+    Returns:
+        Path of the written scene store.
+    """
+    if store_path is None:
+        store_path = os.path.join(data_path, SCENE_STORE_FILE_NAME)
+    env = SaccadeOnImageEnvironment(data_path=data_path)
+    # Always load the scenes from the image files, even if a store exists
+    env.scene_store = {}
+    scenes = {}
+    source_files = []
+    for scene_id, scene_name in enumerate(env.scene_names):
+        versions = sorted(
+            int(match.group(1))
+            for file_name in os.listdir(os.path.join(env.data_path, scene_name))
+            if (match := re.fullmatch(r"rgb_(\d+)\.png", file_name))
+        )
+        scenes[scene_name] = {}
+        for version in versions:
+            env.switch_to_object(scene_id, version)
+            source_files += [
+                os.path.join(env.data_path, scene_name, f"rgb_{version}.png"),
+                os.path.join(env.data_path, scene_name, f"depth_{version}.data"),
+            ]
+            scenes[scene_name][version] = {
+                "depth_image": env.current_depth_image,
+                "rgb_image": env.current_rgb_image,
+                "scene_point_cloud": env.current_scene_point_cloud,
+                "sf_scene_point_cloud": env.current_sf_scene_point_cloud,
+                "world_camera": env.world_camera,
+            }
+    save_model_store({"scene_store": scenes}, store_path, source_files)
+    return store_path
+
+
+def load_scene_store(store_path):
+    """Memory map a scene store written by :func:`build_scene_store`.
+
+    Args:
+        store_path: Path of the scene store file.
+
+    Returns:
+        Dictionary mapping each scene name and version to a dictionary with the
+        "depth_image", "rgb_image", "scene_point_cloud", "sf_scene_point_cloud"
+        and "world_camera" arrays. The arrays are copy-on-write views of the file.
+
+    Raises:
+        ValueError: If the file is not a scene store.
+    """
+    state = load_model_store(store_path)
+    if not isinstance(state, dict) or "scene_store" not in state:
+        raise ValueError(f"{store_path} is not a scene store")
+    logging.info(f"memory mapping scene store {store_path}")
+    return {
+        scene_name: {
+            version: {key: np.asarray(array) for key, array in arrays.items()}
+            for version, arrays in versions.items()
+        }
+        for scene_name, versions in state["scene_store"].items()
+    }
+
+
 # Functions from omniglot/python.demo.py
 # TODO: integrate better and maybe rewrite
 def load_img(fn):
@@ -822,3 +952,24 @@ def load_motor(fn):
 def space_motor_to_img(pt):
     pt[:, 1] = -pt[:, 1]
     return pt
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Preprocess a worldimages dataset into a memory mappable scene "
+        "store."
+    )
+    parser.add_argument(
+        "data_path", help="Image dataset, e.g. worldimages/labeled_scenes/"
+    )
+    parser.add_argument(
+        "--store_path",
+        default=None,
+        help=f"Output file. Defaults to {SCENE_STORE_FILE_NAME} in data_path",
+    )
+    args = parser.parse_args()
+    print(build_scene_store(args.data_path, args.store_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,7 @@ from tbp.monty.frameworks.utils.dataclass_utils import (
     config_to_dict,
     get_subset_of_args,
 )
+from tbp.monty.frameworks.utils.model_store import load_model_state_dict
 
 __all__ = {"MontyExperiment"}
 
@@ -103,6 +104,8 @@ class MontyExperiment:
             monty_config: configuration for the Monty class.
             model_path: Optional model checkpoint. Can be full file name or just the
                 directory containing the "model.pt" file saved from a previous run.
+                If the directory also contains a model store (see
+                `utils.model_store`), the model store is memory mapped instead.
 
         Returns:
             Monty class instance
@@ -188,9 +191,7 @@ class MontyExperiment:
 
         # Load from checkpoint
         if model_path:
-            if "model.pt" not in model_path:
-                model_path = os.path.join(model_path, "model.pt")
-            state_dict = torch.load(model_path)
+            state_dict = load_model_state_dict(model_path)
             model.load_state_dict(state_dict)
 
         return model
@@ -451,6 +452,7 @@ class MontyExperiment:
     def run_episode(self):
         """Run one episode until model.is_done."""
         self.pre_episode()
+        self.dataloader.max_steps = self.max_steps
         for step, observation in enumerate(self.dataloader):
             self.pre_step(step, observation)
             self.model.step(observation)
@@ -609,10 +611,57 @@ class MontyExperiment:
         for k in state_dict_keys:
             setattr(self, k, exp_state_dict[k])
 
+    def reset_experiment(self, config):
+        """Set up the experiment for another config, keeping environment and model.
+
+        Creating the environment (e.g. starting a simulator) and loading the model can
+        take much longer than a short episode. Persistent parallel workers (see
+        `run_parallel.py`) therefore run the configs of many episodes with the same
+        experiment. The new config may only differ from the one the experiment was
+        set up with in its experiment args (e.g. the seed), its logging config and the
+        objects and poses of its dataloaders.
+
+        Args:
+            config: config specifying variables of the experiment.
+        """
+        self.close_loggers()
+        config = copy.deepcopy(config)
+        config = config_to_dict(config)
+        self.config = config
+        # The model and environment keep the random state they were set up with. It
+        # is reseeded instead of replaced.
+        rng = self.rng
+        self.unpack_experiment_args(config["experiment_args"])
+        rng.seed(config["experiment_args"]["seed"])
+        self.rng = rng
+
+        self.init_loggers(self.config["logging_config"])
+        # The new data loaders use the same dataset, so it is not closed
+        for dataloader in [self.train_dataloader, self.eval_dataloader]:
+            if isinstance(dataloader, EnvironmentDataLoader):
+                dataloader.shutdown()
+        self.train_dataloader = None
+        if config["experiment_args"]["do_train"]:
+            self.train_dataloader = self.create_data_loader(
+                config["train_dataloader_class"], config["train_dataloader_args"]
+            )
+        self.eval_dataloader = None
+        if config["experiment_args"]["do_eval"]:
+            self.eval_dataloader = self.create_data_loader(
+                config["eval_dataloader_class"], config["eval_dataloader_args"]
+            )
+        self.init_monty_data_loggers(self.config["logging_config"])
+        self.init_counters()
+
     def close(self):
         if isinstance(self.dataset, EnvironmentDataset):
             self.dataset.close()
+        if getattr(self, "model", None) is not None:
+            self.model.close()
+        self.close_loggers()
 
+    def close_loggers(self):
+        """Close monty and python logging."""
         # Close monty logging
         self.logger_handler.close(self.logger_args)
 
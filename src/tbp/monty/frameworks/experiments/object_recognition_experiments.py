@@ -9,13 +9,12 @@
 # https://opensource.org/licenses/MIT.
 
 import logging
-import os
 
 import matplotlib.pyplot as plt
 import numpy as np
-import torch
 
 from tbp.monty.frameworks.environments.embodied_data import SaccadeOnImageDataLoader
+from tbp.monty.frameworks.utils.model_store import load_model_state_dict
 from tbp.monty.frameworks.utils.plot_utils import add_patch_outline_to_view_finder
 
 from .monty_experiment import MontyExperiment
@@ -79,6 +78,7 @@ class MontyObjectRecognitionExperiment(MontyExperiment):
         Returns:
             The number of total steps taken in the episode.
         """
+        self.dataloader.max_steps = self.max_total_steps
         for loader_step, observation in enumerate(self.dataloader):
             if self.show_sensor_output:
                 self.show_observations(observation, loader_step)
@@ -230,10 +230,8 @@ class MontyGeneralizationExperiment(MontyObjectRecognitionExperiment):
 
     def pre_episode(self):
         """Pre episode where we pass target object to the model for logging."""
-        if "model.pt" not in self.model_path:
-            model_path = os.path.join(self.model_path, "model.pt")
-        state_dict = torch.load(model_path)
-        print(f"loading models again from {model_path}")
+        state_dict = load_model_state_dict(self.model_path)
+        print(f"loading models again from {self.model_path}")
         self.model.load_state_dict(state_dict)
         super().pre_episode()
         target_object = self.dataloader.primary_target["object"]
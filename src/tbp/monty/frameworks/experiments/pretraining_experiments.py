@@ -78,6 +78,7 @@ class MontySupervisedObjectPretrainingExperiment(MontyExperiment):
             lm.buffer.stats["detected_scale"] = target["scale"]
         # Collect data about the object (exploratory steps)
         num_steps = 0
+        self.dataloader.max_steps = self.max_total_steps - 1
         for observation in self.dataloader:
             num_steps += 1
             self.model.step(observation)
@@ -86,6 +86,19 @@ class ProfileExperimentMixin:
         filepath = os.path.join(self.profile_dir, filename)
         df.to_csv(filepath)
 
+    def reset_experiment(self, config):
+        # Reported as setup of the new config's experiment
+        filename = "profile-setup_experiment.csv"
+        pr = cProfile.Profile()
+        pr.enable()
+        super().reset_experiment(config)
+        pr.disable()
+
+        self.make_profile_dir()
+        df = make_stats_df(pr)
+        filepath = os.path.join(self.profile_dir, filename)
+        df.to_csv(filepath)
+
     def run_episode(self):
         mode, epoch, episode = self.get_epoch_state()
         filename = f"profile-{mode}_epoch_{epoch}_episode_{episode}.csv"
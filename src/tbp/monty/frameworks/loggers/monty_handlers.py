@@ -9,7 +9,6 @@
 # https://opensource.org/licenses/MIT.
 
 import abc
-import copy
 import json
 import logging
 import os
@@ -17,6 +16,10 @@ from pprint import pformat
 
 from tbp.monty.frameworks.actions.actions import ActionJSONEncoder
 from tbp.monty.frameworks.models.buffer import BufferEncoder
+from tbp.monty.frameworks.utils.episode_log import (
+    EPISODE_LOG_FILE_NAME,
+    EpisodeLogWriter,
+)
 from tbp.monty.frameworks.utils.logging_utils import (
     lm_stats_to_dataframe,
     maybe_rename_existing_file,
@@ -45,6 +48,26 @@ class MontyHandler(metaclass=abc.ABCMeta):
         pass
 
 
+def get_detailed_episode_stats(data, episode, mode="train", **kwargs):
+    """Merge the basic and detailed stats of an episode.
+
+    Returns:
+        The total episode number and the stats of the episode. The stats are a
+        shallow copy, since they are only read while writing them.
+    """
+    if mode == "train":
+        total = kwargs["train_episodes_to_total"][episode]
+        stats = data["BASIC"]["train_stats"][episode]
+
+    elif mode == "eval":
+        total = kwargs["eval_episodes_to_total"][episode]
+        stats = data["BASIC"]["eval_stats"][episode]
+
+    episode_stats = dict(stats)
+    episode_stats.update(data["DETAILED"][total])
+    return total, episode_stats
+
+
 ###
 # Handler classes
 ###
@@ -66,23 +89,13 @@ class DetailedJSONHandler(MontyHandler):
         Changed name to report episode since we are currently running with
         reporting and flushing exactly once per episode.
         """
-        output_data = {}
-        if mode == "train":
-            total = kwargs["train_episodes_to_total"][episode]
-            stats = data["BASIC"]["train_stats"][episode]
-
-        elif mode == "eval":
-            total = kwargs["eval_episodes_to_total"][episode]
-            stats = data["BASIC"]["eval_stats"][episode]
-
-        output_data[total] = copy.deepcopy(stats)
-        output_data[total].update(data["DETAILED"][total])
+        total, episode_stats = get_detailed_episode_stats(data, episode, mode, **kwargs)
 
         save_stats_path = os.path.join(output_dir, "detailed_run_stats.json")
         maybe_rename_existing_file(save_stats_path, ".json", self.report_count)
 
         with open(save_stats_path, "a") as f:
-            json.dump({total: output_data[total]}, f, cls=BufferEncoder)
+            json.dump({total: episode_stats}, f, cls=BufferEncoder)
             f.write(os.linesep)
 
         print("Stats appended to " + save_stats_path)
@@ -92,6 +105,38 @@ class DetailedJSONHandler(MontyHandler):
         pass
 
 
+class DetailedEpisodeLogHandler(MontyHandler):
+    """Grab any logs at the DETAILED level and append to a binary episode log.
+
+    Stores the same stats as :class:`DetailedJSONHandler`, but numeric arrays are
+    written as raw data and each step, object and field can be loaded lazily with
+    :class:`tbp.monty.frameworks.utils.episode_log.EpisodeLog`.
+    """
+
+    def __init__(self):
+        self.report_count = 0
+
+    @classmethod
+    def log_level(cls):
+        return "DETAILED"
+
+    def report_episode(self, data, output_dir, episode, mode="train", **kwargs):
+        """Report episode data by streaming it into the episode log."""
+        total, episode_stats = get_detailed_episode_stats(data, episode, mode, **kwargs)
+
+        save_stats_path = os.path.join(output_dir, EPISODE_LOG_FILE_NAME)
+        maybe_rename_existing_file(save_stats_path, ".bin", self.report_count)
+
+        with EpisodeLogWriter(save_stats_path) as writer:
+            writer.write_episode(total, episode_stats)
+
+        print("Stats appended to " + save_stats_path)
+        self.report_count += 1
+
+    def close(self):
+        pass
+
+
 class BasicCSVStatsHandler(MontyHandler):
     """Grab any logs at the BASIC level and append to train or eval CSV files."""
 
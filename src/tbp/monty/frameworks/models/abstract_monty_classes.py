@@ -123,6 +123,10 @@ class Monty(metaclass=abc.ABCMeta):
         """Recursively call post_episode on child classes."""
         pass
 
+    def close(self):  # noqa: B027
+        """Recursively release resources of child classes, e.g. worker pools."""
+        pass
+
     @abc.abstractmethod
     def set_experiment_mode(self, mode):
         """Set the experiment mode.
@@ -157,6 +161,10 @@ class LearningModule(metaclass=abc.ABCMeta):
         """Do things like update object models with stored data after an episode."""
         pass
 
+    def close(self):  # noqa: B027
+        """Release resources of this LM, e.g. worker threads or processes."""
+        pass
+
     @abc.abstractmethod
     def set_experiment_mode(self, mode):
         """Set the experiment mode.
@@ -308,6 +316,20 @@ class SensorModule(abc.ABC, Callable):
     def update_state(self, state):
         pass
 
+    @classmethod
+    def prepare_step(cls, sensor_modules, data):
+        """Called before step is called on all sensor modules of this class.
+
+        Can be overridden to process the observations of several sensor modules
+        that are stepped at the same time together, e.g. in one vectorized call.
+        Does nothing by default.
+
+        Args:
+            sensor_modules: Sensor modules of this class that are stepped next.
+            data: Sensor observations of each of the sensor modules.
+        """
+        pass
+
     @abc.abstractmethod
     def pre_episode(self):
         """This method is called before each episode."""
@@ -41,6 +41,64 @@ class BaseBuffer:
         pass
 
 
+class GrowableArray:
+    """2D array of rows that grows with amortized doubling of its capacity.
+
+    Appending a row to a numpy array copies all previous rows. Instead, rows are
+    written into preallocated storage whose capacity is doubled when it is full, so
+    that writing n rows only costs O(n) copies. Rows that were never written are
+    nan. The rows written so far can be read through `array`, which is a view into
+    the storage.
+    """
+
+    def __init__(self, num_columns, capacity=16):
+        self._data = np.full((capacity, num_columns), np.nan)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def array(self):
+        """View of the rows written so far. shape=(len, num_columns)."""
+        return self._data[: self._len]
+
+    def set_row(self, idx, value):
+        """Write a row, padding all rows since the last written one with nans.
+
+        Args:
+            idx: Index of the row. Rows before idx that were not written yet are
+                nan. If idx is smaller than the current length, the row is
+                overwritten and all rows after it are dropped.
+            value: Values of the row. If it has more values than the array has
+                columns, the columns of all previous rows are padded with nans.
+        """
+        value = np.ravel(value)
+        self._reserve(idx + 1, len(value))
+        if idx + 1 < self._len:
+            # Reset dropped rows to nan so that padding does not expose them again.
+            self._data[idx + 1 : self._len] = np.nan
+        self._data[idx, : len(value)] = value
+        self._len = idx + 1
+
+    def pad(self, length, fill_value):
+        """Pad the array with rows of fill_value up to the given length."""
+        if length > self._len:
+            self._reserve(length, self._data.shape[1])
+            self._data[self._len : length] = fill_value
+            self._len = length
+
+    def _reserve(self, num_rows, num_columns):
+        capacity, current_columns = self._data.shape
+        if num_rows <= capacity and num_columns <= current_columns:
+            return
+        new_data = np.full(
+            (max(num_rows, 2 * capacity), max(num_columns, current_columns)), np.nan
+        )
+        new_data[: self._len, :current_columns] = self._data[: self._len]
+        self._data = new_data
+
+
 class FeatureAtLocationBuffer(BaseBuffer):
     """Buffer which stores features at locations coming into one LM. Also stores stats.
 
@@ -49,9 +107,16 @@ class FeatureAtLocationBuffer(BaseBuffer):
     """
 
     def __init__(self):
-        """Initialize buffer dicts for locations, features, displacements and stats."""
+        """Initialize buffer dicts for locations, features, displacements and stats.
+
+        The arrays in locations, features and displacements are views of the
+        GrowableArrays that store them, and are updated with each append.
+        """
         self.locations = {}
         self.features = {}
+        self._location_rows = {}
+        self._feature_rows = {}
+        self._displacement_rows = {}
         self.on_object = []
         self.input_states = []
 
@@ -122,6 +187,7 @@ class FeatureAtLocationBuffer(BaseBuffer):
             self._add_loc_to_location_buffer(input_channel, state.location)
             if input_channel not in self.features.keys():
                 self.features[input_channel] = {}
+                self._feature_rows[input_channel] = {}
             for attr in state.morphological_features.keys():
                 attr_val = state.morphological_features[attr]
                 self._add_attr_to_feature_buffer(input_channel, attr, attr_val)
@@ -147,12 +213,12 @@ class FeatureAtLocationBuffer(BaseBuffer):
         """Update statistics for this step in the episode."""
         for stat in stats.keys():
             if stat in self.stats.keys() and append:
-                self.stats[stat].append(copy.deepcopy(stats[stat]))
+                self.stats[stat].append(copy_stat(stats[stat]))
             else:
                 if init_list:
-                    self.stats[stat] = [copy.deepcopy(stats[stat])]
+                    self.stats[stat] = [copy_stat(stats[stat])]
                 else:
-                    self.stats[stat] = copy.deepcopy(stats[stat])
+                    self.stats[stat] = copy_stat(stats[stat])
         if update_time:
             self.stats["time"].append(time.time() - self.start_time)
 
@@ -164,7 +230,7 @@ class FeatureAtLocationBuffer(BaseBuffer):
         """Use this to overwrite last entry (for example after voting)."""
         for stat in stats.keys():
             if stat in self.stats.keys():
-                self.stats[stat][-1] = copy.deepcopy(stats[stat])
+                self.stats[stat][-1] = copy_stat(stats[stat])
 
     def reset(self):
         """Reset the buffer."""
@@ -367,13 +433,9 @@ class FeatureAtLocationBuffer(BaseBuffer):
                 # Pad end of array with 0s if last steps of episode were off object
                 # for this channel
                 if self.features[input_channel][feature].shape[0] < len(self):
-                    self.features[input_channel][feature].resize(
-                        (
-                            len(self),
-                            self.features[input_channel][feature].shape[1],
-                        ),
-                        refcheck=False,
-                    )
+                    feature_rows = self._feature_rows[input_channel][feature]
+                    feature_rows.pad(len(self), 0)
+                    self.features[input_channel][feature] = feature_rows.array
                 logging.debug(
                     f"{input_channel} observations for feature {feature} have "
                     f"shape {np.array(self.features[input_channel][feature]).shape}"
@@ -486,37 +548,25 @@ class FeatureAtLocationBuffer(BaseBuffer):
     def _add_attr_to_feature_buffer(self, input_channel, attr_name, attr_value):
         """Add attribute to feature buffer.
 
+        If the feature is not stored in buffer yet (i.e. when an LM sends an
+        object ID to a higher level LM for the first time) the array for this
+        feature is filled with nans up to this time step before adding the sensed
+        feature. This makes sure the same index in different feature arrays
+        corresponds to the same time step and location.
+
         Args:
             input_channel: Input channel from which the feature was received.
             attr_name: Name of the feature.
             attr_value: Value of the feature.
         """
-        if isinstance(attr_value, (int, float, bool)):
-            attr_shape = 1
-        else:
-            if isinstance(attr_value, np.ndarray):
-                # Store all features as flat list so we can easily concatenate them and
-                # perform matrix operations on them.
-                attr_value = attr_value.flatten()
-            attr_shape = len(attr_value)
-
-        if attr_name not in self.features[input_channel].keys():
-            # If the feature is not stored in buffer yet (i.e. when
-            # an LM sends an object ID to a higher level LM for the first
-            # time) we fill the array for this feature with nans up to
-            # this time step and then add the sensed feature. This makes
-            # sure the same index in different feature array corresponds to
-            # the same time step and location.
-            self.features[input_channel][attr_name] = (
-                np.empty((len(self.locations), attr_shape)) * np.nan
-            )
-        else:
-            padded_feat = self._fill_old_values_with_nans(
-                existing_vals=self.features[input_channel][attr_name],
-                new_val_len=attr_shape,
-            )
-            self.features[input_channel][attr_name] = padded_feat
-        self.features[input_channel][attr_name][-1] = attr_value
+        # Features are stored as flat rows so we can easily concatenate them and
+        # perform matrix operations on them.
+        self._set_current_row(
+            self._feature_rows[input_channel],
+            self.features[input_channel],
+            attr_name,
+            attr_value,
+        )
 
     def _add_loc_to_location_buffer(self, input_channel, location):
         """Add location to location buffer.
@@ -525,15 +575,9 @@ class FeatureAtLocationBuffer(BaseBuffer):
             input_channel: Input channel from which the location was received.
             location: Location to add to buffer.
         """
-        if input_channel not in self.locations.keys():
-            self.locations[input_channel] = np.empty((0, 0))
-
-        padded_locs = self._fill_old_values_with_nans(
-            existing_vals=self.locations[input_channel],
-            new_val_len=location.shape[0],
+        self._set_current_row(
+            self._location_rows, self.locations, input_channel, location
         )
-        self.locations[input_channel] = padded_locs
-        self.locations[input_channel][-1] = location
 
     def _add_disp_to_displacement_buffer(self, input_channel, disp_name, disp_val):
         """Add displacement to displacement buffer.
@@ -545,41 +589,51 @@ class FeatureAtLocationBuffer(BaseBuffer):
         """
         if input_channel not in self.displacements.keys():
             self.displacements[input_channel] = {}
-        if disp_name not in self.displacements[input_channel].keys():
-            self.displacements[input_channel][disp_name] = (
-                np.empty((len(self.locations), len(disp_val))) * np.nan
-            )
-
-        padded_vals = self._fill_old_values_with_nans(
-            existing_vals=self.displacements[input_channel][disp_name],
-            new_val_len=disp_val.shape[0],
+            self._displacement_rows[input_channel] = {}
+        self._set_current_row(
+            self._displacement_rows[input_channel],
+            self.displacements[input_channel],
+            disp_name,
+            disp_val,
         )
-        self.displacements[input_channel][disp_name] = padded_vals
-        self.displacements[input_channel][disp_name][-1] = disp_val
 
-    def _fill_old_values_with_nans(self, existing_vals, new_val_len):
-        """Pad existing values with nans to make sure indices align.
+    def _set_current_row(self, rows, arrays, key, value):
+        """Write the value of the current step and update the view of the array.
 
-        If len(existing_vals)== len(buffer) this operation has no effect (besides adding
-        a nan at the end which will be filled with the feature value in the next line
-        making it equivalent to calling append).
-
-        TODO O investigate whether pre-allocating large arrays (rather than
-        repeatedly creating new ones) might be faster, despite a cost in memory
+        Rows of previous steps in which no value was received for key are nan, so
+        that indices align with the steps of the episode.
 
         Args:
-            existing_vals: Values already stored in buffer.
-            new_val_len: Shape (along first dim) of new values to be added.
-
-        Returns:
-            The padded values.
+            rows: Dictionary of the GrowableArrays storing the values.
+            arrays: Dictionary of the array views to update.
+            key: Key of the value in rows and arrays.
+            value: Value to add at the current step.
         """
-        # create new np array filled with nans of size (current_step, new_val_len)
-        new_vals = np.empty((len(self) + 1, new_val_len)) * np.nan
-        # Replace nans with stored values for this feature.
-        # existing_feat has shape (last_stored_step, attr_shape)
-        new_vals[: existing_vals.shape[0], : existing_vals.shape[1]] = existing_vals
-        return new_vals
+        if key not in rows:
+            rows[key] = GrowableArray(num_columns=np.size(value))
+        rows[key].set_row(len(self), value)
+        arrays[key] = rows[key].array
+
+
+def copy_stat(value):
+    """Copy a stat so later changes to the value don't change the stored stat.
+
+    Equivalent to copy.deepcopy for the containers and arrays in our stats, but
+    without the overhead of deepcopy's memo and without copying immutable values
+    like numbers, strings and numpy scalars.
+
+    Returns:
+        The copied stat.
+    """
+    if value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        return value
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return value.copy()
+    if type(value) is dict:
+        return {key: copy_stat(val) for key, val in value.items()}
+    if type(value) is list:
+        return [copy_stat(val) for val in value]
+    return copy.deepcopy(value)
 
 
 class BufferEncoder(json.JSONEncoder):
@@ -10,9 +10,7 @@
 
 from __future__ import annotations
 
-import copy
 import logging
-import threading
 import time
 from typing import Tuple
 
@@ -20,6 +18,10 @@ import numpy as np
 from scipy.spatial import KDTree
 from scipy.spatial.transform import Rotation
 
+from tbp.monty.frameworks.models.evidence_update_executors import (
+    EVIDENCE_UPDATE_EXECUTORS,
+    ProcessPoolEvidenceUpdateExecutor,
+)
 from tbp.monty.frameworks.models.goal_state_generation import EvidenceGoalStateGenerator
 from tbp.monty.frameworks.models.graph_matching import (
     GraphLM,
@@ -31,14 +33,20 @@ from tbp.monty.frameworks.models.object_model import (
     GridObjectModel,
     GridTooSmallError,
 )
-from tbp.monty.frameworks.models.states import State
-from tbp.monty.frameworks.utils.evidence_matching import ChannelMapper
+from tbp.monty.frameworks.models.states import PoseVotes, State
+from tbp.monty.frameworks.utils.evidence_matching import (
+    ChannelMapper,
+    FeatureMatcher,
+    FusedEvidenceKernel,
+    StackedHypotheses,
+)
 from tbp.monty.frameworks.utils.graph_matching_utils import (
     add_pose_features_to_tolerances,
     get_custom_distances,
     get_initial_possible_poses,
     get_relevant_curvature,
     get_scaled_evidences,
+    scale_evidences,
 )
 from tbp.monty.frameworks.utils.spatial_arithmetics import (
     align_multiple_orthonormal_vectors,
@@ -84,9 +92,24 @@ class MontyForEvidenceGraphMatching(MontyForGraphMatching):
     def _combine_votes(self, votes_per_lm):
         """Combine evidence from different lms.
 
+        The votes on each object are `PoseVotes` (votes sent as a list of States are
+        converted), so the votes of a sending LM can be transformed into the
+        reference frame of a receiving LM all at once.
+
         Returns:
             The combined votes.
         """
+        pose_votes_per_lm = [
+            None
+            if votes is None
+            else {
+                obj: obj_votes
+                if isinstance(obj_votes, PoseVotes)
+                else PoseVotes.from_states(obj_votes)
+                for obj, obj_votes in votes["possible_states"].items()
+            }
+            for votes in votes_per_lm
+        ]
         combined_votes = []
         for i in range(len(self.learning_modules)):
             lm_state_votes = {}
@@ -108,41 +131,32 @@ class MontyForEvidenceGraphMatching(MontyForGraphMatching):
                             f"rotation: "
                             f"{sensor_rotation_disp}"
                         )
-                        for obj in votes_per_lm[j]["possible_states"].keys():
+                        for obj, lm_votes_for_object in pose_votes_per_lm[j].items():
                             # Get the displacement between the sending and receiving
                             # sensor and take this into account when transmitting
                             # possible locations on the object.
                             # "If I am here, you should be there."
-                            lm_states_for_object = votes_per_lm[j]["possible_states"][
-                                obj
-                            ]
                             # Take the location votes and transform them so they would
                             # apply to the receiving LMs sensor. Basically saying, if my
                             # sensor is here and in this pose then your sensor should be
                             # there in that pose.
                             # NOTE: rotation votes are not being used right now.
-                            transformed_lm_states_for_object = []
-                            for s in lm_states_for_object:
-                                # need to make a copy because the same vote state may be
-                                # transformed in different ways depending on the
-                                # receiving LMs' pose
-                                new_s = copy.deepcopy(s)
-                                rotated_displacement = new_s.get_pose_vectors().dot(
-                                    sensor_disp
-                                )
-                                new_s.transform_morphological_features(
-                                    translation=rotated_displacement,
+                            # The transformed votes are new arrays, so the same votes
+                            # can be transformed differently for each receiving LM.
+                            rotated_displacements = (
+                                lm_votes_for_object.pose_vectors.dot(sensor_disp)
+                            )
+                            lm_state_votes.setdefault(obj, []).append(
+                                lm_votes_for_object.transformed(
+                                    translation=rotated_displacements,
                                     rotation=sensor_rotation_disp,
                                 )
-                                transformed_lm_states_for_object.append(new_s)
-                            if obj in lm_state_votes.keys():
-                                lm_state_votes[obj].extend(
-                                    transformed_lm_states_for_object
-                                )
-                            else:
-                                lm_state_votes[obj] = transformed_lm_states_for_object
+                            )
             logging.debug(f"VOTE from LMs {self.lm_to_lm_vote_matrix[i]} to LM {i}")
-            vote = lm_state_votes
+            vote = {
+                obj: PoseVotes.concatenate(obj_votes)
+                for obj, obj_votes in lm_state_votes.items()
+            }
             combined_votes.append(vote)
         return combined_votes
 
@@ -188,6 +202,28 @@ class EvidenceGraphLM(GraphLM):
         vote_evidence_threshold: Only send votes that have a scaled evidence above
             this threshold. Vote evidences are in the range of [-1, 1] so the threshold
             should not be outside this range.
+        evidence_kernel: How to calculate the evidence for the hypothesized locations.
+            "default" chains the individual helper functions, "fused" uses a
+            `FusedEvidenceKernel` which computes the same values but reuses
+            preallocated buffers instead of allocating new arrays at every step. In
+            ["default", "fused"].
+        stack_hypotheses: Whether to additionally store the hypotheses of all
+            objects in contiguous arrays (see `StackedHypotheses`). Thresholding the
+            possible matches, finding the most likely hypothesis and selecting the
+            hypotheses to vote on are then done with single vectorized calls over
+            all objects instead of looping over them, which is faster when many
+            objects are in memory. The results are identical. Can't be combined with
+            the "process_pool" evidence_update_executor.
+        hypotheses_pruning_margin: If not None, hypotheses whose evidence stayed
+            more than this margin below the evidence of the most likely hypothesis
+            (over all objects) for hypotheses_pruning_steps consecutive steps are
+            removed for the rest of the episode. This makes the evidence updates
+            cheaper as an episode converges. Hypotheses within the
+            x_percent_threshold of the most likely hypothesis and the two best
+            hypotheses of each object and input channel are never removed. If None,
+            all hypotheses are kept.
+        hypotheses_pruning_steps: Number of consecutive steps a hypothesis needs to
+            be below the hypotheses_pruning_margin to be removed.
         past_weight: How much should the evidence accumulated so far be weighted
             when combined with the evidence from the most recent observation.
         present_weight: How much should the current evidence be weighted when added
@@ -246,8 +282,13 @@ class EvidenceGraphLM(GraphLM):
             This constraints the spatial resolution that the model can represent.
             max_graph_size/num_model_voxels_per_dim = how much space is lumped into one
             voxel. All locations that fall into the same voxel will be averaged and
-            represented as one value. num_model_voxels_per_dim should not be too large
-            since the memory requirements grow cubically with this number.
+            represented as one value. With the "sparse_tensor" model_voxel_store,
+            num_model_voxels_per_dim should not be too large since the memory
+            requirements grow cubically with this number.
+        model_voxel_store: How the models store the content of their grid voxels.
+            "arrays" only stores voxels with observations, "sparse_tensor" uses 4d
+            torch sparse tensors (legacy). Both give the same models. See
+            `VOXEL_STORES`.
         gsg_class: The type of goal-state-generator to associate with the LM.
         gsg_args: Dictionary of configuration parameters for the GSG.
 
@@ -257,6 +298,16 @@ class EvidenceGraphLM(GraphLM):
             updates to different objects are completely independent of each other. In
             general it is recommended to use this but it can be useful to turn it off
             for debugging purposes.
+        evidence_update_executor: How to distribute the evidence updates (and vote
+            updates) of the different objects. "threads" starts one thread per object
+            at every step, "serial" updates one object after the other, "thread_pool"
+            and "process_pool" shard the objects across a persistent pool of
+            num_evidence_update_workers threads or forked processes. The process pool
+            keeps the hypotheses of each object in shared memory. If None, use
+            "threads" if use_multithreading is True and "serial" otherwise. In
+            [None, "serial", "threads", "thread_pool", "process_pool"].
+        num_evidence_update_workers: Number of workers of the "thread_pool" and
+            "process_pool" executors. If None, use one worker per CPU.
     """
 
     def __init__(
@@ -269,6 +320,10 @@ class EvidenceGraphLM(GraphLM):
         initial_possible_poses="informed",
         evidence_update_threshold="all",
         vote_evidence_threshold=0.8,
+        evidence_kernel="default",
+        stack_hypotheses=False,
+        hypotheses_pruning_margin=None,
+        hypotheses_pruning_steps=3,
         past_weight=1,
         present_weight=1,
         vote_weight=1,
@@ -281,7 +336,10 @@ class EvidenceGraphLM(GraphLM):
         max_graph_size=0.3,  # 30cm
         max_nodes_per_graph=2000,
         num_model_voxels_per_dim=50,  # -> voxel size = 6mm3 (0.006)
+        model_voxel_store="arrays",
         use_multithreading=True,
+        evidence_update_executor=None,
+        num_evidence_update_workers=None,
         gsg_class=EvidenceGoalStateGenerator,
         gsg_args=None,
         *args,
@@ -295,6 +353,7 @@ class EvidenceGraphLM(GraphLM):
             max_nodes_per_graph=max_nodes_per_graph,
             max_graph_size=max_graph_size,
             num_model_voxels_per_dim=num_model_voxels_per_dim,
+            model_voxel_store=model_voxel_store,
         )
         if gsg_args is None:
             gsg_args = {}
@@ -307,6 +366,30 @@ class EvidenceGraphLM(GraphLM):
         self.max_nneighbors = max_nneighbors
         self.evidence_update_threshold = evidence_update_threshold
         self.vote_evidence_threshold = vote_evidence_threshold
+        if evidence_kernel not in ["default", "fused"]:
+            raise ValueError(f"Unknown evidence kernel: {evidence_kernel}")
+        self.evidence_kernel = evidence_kernel
+        # One kernel per (graph_id, input_channel) such that the scratch buffers are
+        # not shared between threads updating different graphs.
+        self._evidence_kernels = {}
+        # One FeatureMatcher per (graph_id, input_channel), see _get_feature_matcher
+        self._feature_matchers = {}
+        # {input_channel: (matchers, stacked matcher)} to batch all graphs
+        self._stacked_feature_matchers = {}
+        # Node feature evidence of all graphs for the current step, see
+        # _update_possible_matches
+        self._node_feature_evidence = {}
+        self.hypotheses_stack = None
+        if stack_hypotheses:
+            self.hypotheses_stack = StackedHypotheses(
+                ["possible_locations", "possible_poses", "evidence"]
+            )
+        if hypotheses_pruning_steps < 1:
+            raise ValueError("hypotheses_pruning_steps must be at least 1.")
+        self.hypotheses_pruning_margin = hypotheses_pruning_margin
+        self.hypotheses_pruning_steps = hypotheses_pruning_steps
+        # Number of consecutive steps each hypothesis was below the pruning margin.
+        self._steps_below_pruning_margin = {}
         # ------ Weighting Params ------
         self.feature_weights = feature_weights
         self.past_weight = past_weight
@@ -322,6 +405,17 @@ class EvidenceGraphLM(GraphLM):
         self.max_graph_size = max_graph_size
         # --- Debugging Params ---
         self.use_multithreading = use_multithreading
+        if evidence_update_executor is None:
+            evidence_update_executor = "threads" if use_multithreading else "serial"
+        if stack_hypotheses and evidence_update_executor == "process_pool":
+            # The process pool moves the hypotheses into shared memory blocks which
+            # can't at the same time be views into the stacked arrays.
+            raise ValueError(
+                "stack_hypotheses can't be used with the process_pool executor."
+            )
+        self.evidence_update_executor = self._create_evidence_update_executor(
+            evidence_update_executor, num_evidence_update_workers
+        )
 
         # TODO make sure we always extract pose features and remove this
         self.tolerances = add_pose_features_to_tolerances(tolerances)
@@ -366,9 +460,12 @@ class EvidenceGraphLM(GraphLM):
             # TODO H: Differentiate between features from different input channels
             # TODO: could do this in the object model class
             self.graph_memory.initialize_feature_arrays()
+            self._build_feature_matchers()
         self.symmetry_evidence = 0
         self.last_possible_hypotheses = None
+        self._last_possible_hypotheses_graph_id = None
         self.channel_hypothesis_mapping = {}
+        self._steps_below_pruning_margin = {}
 
         self.current_mlh["graph_id"] = "no_observations_yet"
         self.current_mlh["location"] = [0, 0, 0]
@@ -382,40 +479,26 @@ class EvidenceGraphLM(GraphLM):
         Weighted by distance to votes and their evidence.
         TODO: also take into account rotation vote
 
-        vote_data contains:
-            pos_location_votes: shape=(N, 3)
-            pos_rotation_votes: shape=(N, 3, 3)
-            pose_evidences: shape=(N,)
+        vote_data contains the votes on each object as `PoseVotes` (or, for
+        compatibility, as a list of State votes):
+            locations: shape=(N, 3)
+            pose_vectors: shape=(N, 3, 3)
+            confidences: shape=(N,)
 
         """
         if (vote_data is not None) and (
             self.buffer.get_num_observations_on_object() > 0
         ):
-            thread_list = []
-            for graph_id in self.get_all_known_object_ids():
-                if graph_id in vote_data.keys():
-                    if self.use_multithreading:
-                        t = threading.Thread(
-                            target=self._update_evidence_with_vote,
-                            args=(
-                                vote_data[graph_id],
-                                graph_id,
-                            ),
-                        )
-                        thread_list.append(t)
-                    else:  # This can be useful for debugging.
-                        self._update_evidence_with_vote(
-                            vote_data[graph_id],
-                            graph_id,
-                        )
-            if self.use_multithreading:
-                for thread in thread_list:
-                    # start executing _update_evidence in each thread.
-                    thread.start()
-                for thread in thread_list:
-                    # call this to prevent main thread from continuing in code
-                    # before all evidences are updated.
-                    thread.join()
+            graph_ids = [
+                graph_id
+                for graph_id in self.get_all_known_object_ids()
+                if graph_id in vote_data.keys()
+            ]
+            self.evidence_update_executor.map(
+                "_update_evidence_with_vote",
+                graph_ids,
+                graph_args={graph_id: (vote_data[graph_id],) for graph_id in graph_ids},
+            )
             logging.debug("Updating possible matches after vote")
             self.possible_matches = self._threshold_possible_matches()
             self.current_mlh = self._calculate_most_likely_hypothesis()
@@ -426,12 +509,14 @@ class EvidenceGraphLM(GraphLM):
         """Send out hypotheses and the evidence for them.
 
         Votes are a dict and contain the following:
-            pose_hypotheses: locations (V, 3) and rotations (V, 3, 3)
-            pose_evidence: Evidence (V) for each location-rotation pair in the
-                    pose hypotheses. Scaled into range [-1, 1] where 1 is the
-                    hypothesis with the largest evidence in this LM and -1 the
-                    one with the smallest evidence. When thresholded, pose_evidence
-                    will be in range [self.vote_evidence_threshold, 1]
+            possible_states: `PoseVotes` for each object, containing
+                locations (V, 3) and rotations as pose vectors (V, 3, 3) and
+                confidences (V), the evidence for each location-rotation pair in
+                the pose hypotheses. Evidence is scaled into range [-1, 1] where 1
+                is the hypothesis with the largest evidence in this LM and -1 the
+                one with the smallest evidence. When thresholded, it will be in
+                range [self.vote_evidence_threshold, 1]. Use
+                `PoseVotes.to_states` to get one State per hypothesis.
             sensed_pose_rel_body: sensed location and rotation of the input to this
                     LM. Rotation is represented by the pose vectors (point normal and
                     curvature directions) for the SMs. For input from LMs it is also
@@ -446,7 +531,7 @@ class EvidenceGraphLM(GraphLM):
 
         Returns:
             None or dict:
-                possible_states: The possible states.
+                possible_states: The votes on each object.
                 sensed_pose_rel_body: The sensed pose relative to the body.
         """
         if (
@@ -462,32 +547,21 @@ class EvidenceGraphLM(GraphLM):
             # Get pose of first sensor stored in buffer.
             sensed_pose = self.buffer.get_current_pose(input_channel="first")
 
-            possible_states = {}
-            evidences = get_scaled_evidences(self.get_all_evidences())
-            for graph_id in evidences.keys():
-                interesting_hyp = np.where(
-                    evidences[graph_id] > self.vote_evidence_threshold
-                )
-                if len(interesting_hyp[0]) > 0:
-                    possible_states[graph_id] = []
-                    for hyp_id in interesting_hyp[0]:
-                        vote = State(
-                            location=self.possible_locations[graph_id][
-                                hyp_id
-                            ],  # location rel. body
-                            morphological_features={
-                                # Pose vectors are columns of the rotation matrix
-                                "pose_vectors": self.possible_poses[graph_id][hyp_id].T,
-                                "pose_fully_defined": True,
-                            },
-                            # No feature when voting.
-                            non_morphological_features=None,
-                            confidence=evidences[graph_id][hyp_id],
-                            use_state=True,
-                            sender_id=self.learning_module_id,
-                            sender_type="LM",
+            if self._stack_hypotheses():
+                possible_states = self._get_votes_from_stacked_hypotheses()
+            else:
+                possible_states = {}
+                evidences = get_scaled_evidences(self.get_all_evidences())
+                for graph_id in evidences.keys():
+                    interesting_hyp = np.flatnonzero(
+                        evidences[graph_id] > self.vote_evidence_threshold
+                    )
+                    if len(interesting_hyp) > 0:
+                        possible_states[graph_id] = self._hypotheses_to_votes(
+                            self.possible_locations[graph_id][interesting_hyp],
+                            self.possible_poses[graph_id][interesting_hyp],
+                            evidences[graph_id][interesting_hyp],
                         )
-                        possible_states[graph_id].append(vote)
 
             vote = {
                 "possible_states": possible_states,
@@ -626,6 +700,7 @@ class EvidenceGraphLM(GraphLM):
             )
 
             self.last_possible_hypotheses = possible_object_hypotheses_ids
+            self._last_possible_hypotheses_graph_id = object_id
 
             if pose_is_unique or symmetry_detected:
                 r_inv = mlh["rotation"].inv()
@@ -764,6 +839,8 @@ class EvidenceGraphLM(GraphLM):
         graph_ids = self.get_all_known_object_ids()
         if graph_ids[0] not in self.evidence.keys():
             return ["patch_off_object"], [0]
+        if self._stack_hypotheses():
+            return graph_ids, self.hypotheses_stack.max_per_graph("evidence")
         graph_evidences = []
         for graph_id in graph_ids:
             graph_evidences.append(np.max(self.evidence[graph_id]))
@@ -784,13 +861,35 @@ class EvidenceGraphLM(GraphLM):
             "possible_matches": self.get_possible_matches(),
             "current_mlh": self.get_current_mlh(),
         }
+        if self.hypotheses_pruning_margin is not None:
+            stats["num_hypotheses"] = {
+                graph_id: len(evidence) for graph_id, evidence in self.evidence.items()
+            }
         if self.has_detailed_logger:
             stats = self._add_detailed_stats(stats)
         return stats
 
+    def load_state_dict(self, state_dict):
+        """Load state dict and notify the evidence update executor of the new graphs.
+
+        Args:
+            state_dict: State dict to load.
+        """
+        super().load_state_dict(state_dict)
+        self.evidence_update_executor.invalidate()
+
+    def close(self):
+        """Shut down the evidence update executor and release its shared memory."""
+        self.evidence_update_executor.close()
+
     # ======================= Private ==========================
 
     # ------------------- Main Algorithm -----------------------
+    def _update_memory(self):
+        """Update memory and notify the evidence update executor of the change."""
+        super()._update_memory()
+        self.evidence_update_executor.invalidate()
+
     def _get_initial_hypothesis_space(self, features, graph_id, input_channel):
         if self.initial_possible_poses is None:
             # Get initial poses for all locations informed by pose features
@@ -799,21 +898,20 @@ class EvidenceGraphLM(GraphLM):
                 initial_possible_channel_rotations,
             ) = self._get_all_informed_possible_poses(graph_id, features, input_channel)
         else:
-            initial_possible_channel_locations = []
-            initial_possible_channel_rotations = []
-            all_channel_locations = self.graph_memory.get_locations_in_graph(
-                graph_id, input_channel
+            all_channel_locations = np.asarray(
+                self.graph_memory.get_locations_in_graph(graph_id, input_channel)
             )
-            # Initialize fixed possible poses (without using pose features)
-            for rotation in self.initial_possible_poses:
-                for node_id in range(len(all_channel_locations)):
-                    initial_possible_channel_locations.append(
-                        all_channel_locations[node_id]
-                    )
-                    initial_possible_channel_rotations.append(rotation.as_matrix())
-
-            initial_possible_channel_rotations = np.array(
-                initial_possible_channel_rotations
+            num_nodes = all_channel_locations.shape[0]
+            # Initialize fixed possible poses (without using pose features). Every
+            # rotation is tested at every node, ordered by rotation first.
+            rotation_matrices = np.array(
+                [rotation.as_matrix() for rotation in self.initial_possible_poses]
+            )
+            initial_possible_channel_locations = np.tile(
+                all_channel_locations, (len(rotation_matrices), 1)
+            )
+            initial_possible_channel_rotations = np.repeat(
+                rotation_matrices, num_nodes, axis=0
             )
         # There will always be two feature weights (point normal and curvature
         # direction). If there are no more weight we are not using features for
@@ -825,14 +923,15 @@ class EvidenceGraphLM(GraphLM):
             node_feature_evidence = self._calculate_feature_evidence_for_all_nodes(
                 features, input_channel, graph_id
             )
-            # stack node_feature_evidence to match possible poses
-            nwmf_stacked = []
-            for _ in range(
-                len(initial_possible_channel_rotations) // len(node_feature_evidence)
-            ):
-                nwmf_stacked.extend(node_feature_evidence)
+            # Repeat node_feature_evidence for each rotation tested at the nodes
+            num_rotations_per_node = len(initial_possible_channel_rotations) // len(
+                node_feature_evidence
+            )
             # add evidence if features match
-            evidence = np.array(nwmf_stacked) * self.feature_evidence_increment
+            evidence = (
+                np.tile(node_feature_evidence, num_rotations_per_node)
+                * self.feature_evidence_increment
+            )
         else:
             evidence = np.zeros(initial_possible_channel_rotations.shape[0])
         return (
@@ -843,33 +942,87 @@ class EvidenceGraphLM(GraphLM):
 
     def _update_possible_matches(self, query):
         """Update evidence for each hypothesis instead of removing them."""
-        thread_list = []
-        for graph_id in self.get_all_known_object_ids():
-            if self.use_multithreading:
-                # assign separate thread on same CPU to each objects update.
-                # Since the updates of different objects are independent of
-                # each other we can do this.
-                t = threading.Thread(
-                    target=self._update_evidence,
-                    args=(query[0], query[1], graph_id),
-                )
-                thread_list.append(t)
-            else:  # This can be useful for debugging.
-                self._update_evidence(query[0], query[1], graph_id)
-        if self.use_multithreading:
-            # TODO: deal with keyboard interrupt
-            for thread in thread_list:
-                # start executing _update_evidence in each thread.
-                thread.start()
-            for thread in thread_list:
-                # call this to prevent main thread from continuing in code
-                # before all evidences are updated.
-                thread.join()
+        # The feature evidence of the nodes of all objects is calculated at once.
+        self._node_feature_evidence = self._calculate_feature_evidence_for_all_graphs(
+            query[0]
+        )
+        # Since the updates of different objects are independent of each other we can
+        # distribute them over multiple threads or processes.
+        try:
+            self.evidence_update_executor.map(
+                "_update_evidence",
+                self.get_all_known_object_ids(),
+                args=(query[0], query[1]),
+            )
+        finally:
+            self._node_feature_evidence = {}
+        if self.hypotheses_pruning_margin is not None:
+            self._prune_hypotheses()
         # NOTE: would not need to do this if we are still voting
         # Call this update in the step method?
         self.possible_matches = self._threshold_possible_matches()
         self.current_mlh = self._calculate_most_likely_hypothesis()
 
+    def _prune_hypotheses(self):
+        """Remove hypotheses that stayed far below the most likely hypothesis.
+
+        The arrays of each graph are compacted (keeping the order of the
+        hypotheses) and the channel_hypothesis_mapping is shrunk accordingly. See
+        hypotheses_pruning_margin for which hypotheses are removed.
+        """
+        graph_ids = [
+            graph_id
+            for graph_id in self.get_all_known_object_ids()
+            if graph_id in self.evidence
+        ]
+        if len(graph_ids) == 0:
+            return
+        max_evidence = max(np.max(self.evidence[graph_id]) for graph_id in graph_ids)
+        margin = self.hypotheses_pruning_margin
+        if max_evidence > 0:
+            # Never remove hypotheses that are still possible poses of the MLH object
+            margin = max(margin, max_evidence / 100 * self.x_percent_threshold)
+        pruning_threshold = max_evidence - margin
+
+        for graph_id in graph_ids:
+            evidence = self.evidence[graph_id]
+            steps_below = self._steps_below_pruning_margin.get(graph_id)
+            if steps_below is None or steps_below.shape != evidence.shape:
+                # New hypothesis space, e.g. at the first step or for a new channel.
+                steps_below = np.zeros(evidence.shape, dtype=int)
+            steps_below = np.where(evidence < pruning_threshold, steps_below + 1, 0)
+            keep = steps_below < self.hypotheses_pruning_steps
+            if np.all(keep):
+                self._steps_below_pruning_margin[graph_id] = steps_below
+                continue
+
+            mapper = self.channel_hypothesis_mapping[graph_id]
+            for start, end in mapper.channel_ranges().values():
+                if end - start <= 2:
+                    keep[start:end] = True
+                else:
+                    top_two_ids = np.argpartition(evidence[start:end], -2)[-2:]
+                    keep[start + top_two_ids] = True
+            mapper.compact(keep)
+            self.possible_locations[graph_id] = self.possible_locations[graph_id][keep]
+            self.possible_poses[graph_id] = self.possible_poses[graph_id][keep]
+            self.evidence[graph_id] = evidence[keep]
+            self._steps_below_pruning_margin[graph_id] = steps_below[keep]
+
+            if (
+                graph_id == self._last_possible_hypotheses_graph_id
+                and self.last_possible_hypotheses is not None
+            ):
+                # Keep the ids used for the symmetry check pointing to the same
+                # hypotheses.
+                new_ids = np.cumsum(keep) - 1
+                last_ids = self.last_possible_hypotheses
+                self.last_possible_hypotheses = new_ids[last_ids[keep[last_ids]]]
+            logging.debug(
+                f"Kept {len(self.evidence[graph_id])} of {len(keep)} hypotheses for "
+                f"{graph_id}."
+            )
+
     def _update_evidence(
         self,
         features: dict,
@@ -1103,6 +1256,17 @@ class EvidenceGraphLM(GraphLM):
             current_mean_evidence = np.mean(self.evidence[graph_id])
             new_evidence = new_evidence + current_mean_evidence
 
+        if input_channel in mapper.channels and mapper.channel_sizes[
+            input_channel
+        ] == len(new_evidence):
+            # Write into the arrays in place, since they may be views into the
+            # stacked hypotheses
+            start, end = mapper.channel_range(input_channel)
+            self.possible_locations[graph_id][start:end] = new_location_hypotheses
+            self.possible_poses[graph_id][start:end] = new_pose_hypotheses
+            self.evidence[graph_id][start:end] = new_evidence
+            return
+
         # The mapper update function calls below automatically resize the
         # arrays they update. Afterward, we must update the channel indices
         # in the mapper via resize_channel_to to stay in sync with
@@ -1127,15 +1291,17 @@ class EvidenceGraphLM(GraphLM):
 
         mapper.resize_channel_to(input_channel, len(new_evidence))
 
-    def _update_evidence_with_vote(self, state_votes, graph_id):
-        """Use incoming votes to update all hypotheses."""
-        # Extract information from list of State classes into np.arrays for efficient
-        # matrix operations and KDTree search.
-        graph_location_vote = np.zeros((len(state_votes), 3))
-        vote_evidences = np.zeros(len(state_votes))
-        for n, vote in enumerate(state_votes):
-            graph_location_vote[n] = vote.location
-            vote_evidences[n] = vote.confidence
+    def _update_evidence_with_vote(self, votes, graph_id):
+        """Use incoming votes to update all hypotheses.
+
+        Args:
+            votes: `PoseVotes` on the object, or a list of State votes.
+            graph_id: ID of the object.
+        """
+        if not isinstance(votes, PoseVotes):
+            votes = PoseVotes.from_states(votes)
+        graph_location_vote = votes.locations
+        vote_evidences = votes.confidences
 
         vote_location_tree = KDTree(
             graph_location_vote,
@@ -1168,26 +1334,17 @@ class EvidenceGraphLM(GraphLM):
             axis=1,
         )
 
+        # Hypotheses without a vote in the radius keep their evidence. The evidence
+        # is updated in place since it may be a view into the stacked hypotheses.
+        has_vote = ~np.ma.getmaskarray(distance_weighted_vote_evidence)
+        weighted_vote_evidence = distance_weighted_vote_evidence.data * self.vote_weight
+        evidence = self.evidence[graph_id]
+        np.add(evidence, weighted_vote_evidence, out=evidence, where=has_vote)
         if self.past_weight + self.present_weight == 1:
-            # Take the average to keep evidence in range
-            self.evidence[graph_id] = np.ma.average(
-                [
-                    self.evidence[graph_id],
-                    distance_weighted_vote_evidence,
-                ],
-                weights=[1, self.vote_weight],
-                axis=0,
-            )
-        else:
-            # Add to evidence count if the evidence can grow infinitely. Taking the
-            # average would drag down the evidence otherwise.
-            self.evidence[graph_id] = np.ma.sum(
-                [
-                    self.evidence[graph_id],
-                    distance_weighted_vote_evidence * self.vote_weight,
-                ],
-                axis=0,
-            )
+            # Take the (weighted) average to keep evidence in range
+            np.divide(evidence, 1 + self.vote_weight, out=evidence, where=has_vote)
+        # Otherwise, only add to the evidence count if the evidence can grow
+        # infinitely. Taking the average would drag down the evidence otherwise.
 
     def _calculate_evidence_for_new_locations(
         self,
@@ -1215,6 +1372,14 @@ class EvidenceGraphLM(GraphLM):
         logging.debug(
             f"Calculating evidence for {graph_id} using input from {input_channel}"
         )
+        if self.evidence_kernel == "fused":
+            return self._calculate_evidence_with_fused_kernel(
+                graph_id,
+                input_channel,
+                search_locations,
+                channel_possible_poses,
+                features,
+            )
 
         pose_transformed_features = rotate_pose_dependent_features(
             features[input_channel],
@@ -1302,6 +1467,57 @@ class EvidenceGraphLM(GraphLM):
         )
         return location_evidence
 
+    def _calculate_evidence_with_fused_kernel(
+        self,
+        graph_id: str,
+        input_channel: str,
+        search_locations: np.ndarray,
+        channel_possible_poses: np.ndarray,
+        features: dict,
+    ):
+        """Calculate the same evidence as above using a `FusedEvidenceKernel`.
+
+        Returns:
+            The location evidence.
+        """
+        graph = self.get_graph(graph_id, input_channel)
+        nearest_node_ids = graph.find_nearest_neighbors(
+            search_locations,
+            num_neighbors=self.max_nneighbors,
+        )
+        if self.max_nneighbors == 1:
+            nearest_node_ids = np.expand_dims(nearest_node_ids, axis=1)
+
+        node_feature_evidence = None
+        if self.use_features_for_matching[input_channel]:
+            node_feature_evidence = self._calculate_feature_evidence_for_all_nodes(
+                features, input_channel, graph_id
+            )
+        # shape=(N,) view of the pose_fully_defined column in the graph features.
+        node_pose_fully_defined = graph.get_values_for_feature("pose_fully_defined")
+        node_pose_fully_defined = node_pose_fully_defined[:, 0]
+        kernel_key = (graph_id, input_channel)
+        if kernel_key not in self._evidence_kernels:
+            self._evidence_kernels[kernel_key] = FusedEvidenceKernel()
+        location_evidence = self._evidence_kernels[kernel_key].location_evidence(
+            search_locations=search_locations,
+            hypotheses_poses=channel_possible_poses,
+            nearest_node_ids=nearest_node_ids,
+            node_locations=graph.pos,
+            node_pose_vectors=graph.get_values_for_feature("pose_vectors"),
+            node_pose_fully_defined=node_pose_fully_defined,
+            sensed_pose_vectors=features[input_channel]["pose_vectors"],
+            sensed_pose_fully_defined=features[input_channel]["pose_fully_defined"],
+            search_curvature=get_relevant_curvature(features[input_channel]),
+            max_match_distance=self.max_match_distance,
+            pose_vector_weights=self.feature_weights[input_channel]["pose_vectors"],
+            node_feature_evidence=node_feature_evidence,
+            feature_evidence_increment=self.feature_evidence_increment,
+        )
+        # The kernel returns a view into its scratch buffers which is overwritten at
+        # the next step so we need to copy it here.
+        return location_evidence.copy()
+
     def _get_pose_evidence_matrix(
         self,
         query_features,
@@ -1395,62 +1611,90 @@ class EvidenceGraphLM(GraphLM):
         Returns:
             The feature evidence for all nodes.
         """
-        feature_array = self.graph_memory.get_feature_array(graph_id)
-        feature_order = self.graph_memory.get_feature_order(graph_id)
-        # generate the lists of features, tolerances, and whether features are circular
-        shape_to_use = feature_array[input_channel].shape[1]
-        feature_order = feature_order[input_channel]
-        tolerance_list = np.zeros(shape_to_use) * np.nan
-        feature_weight_list = np.zeros(shape_to_use) * np.nan
-        feature_list = np.zeros(shape_to_use) * np.nan
-        circular_var = np.zeros(shape_to_use, dtype=bool)
-        start_idx = 0
-        query_features = query_features[input_channel]
-        for feature in feature_order:
-            if feature in [
-                "pose_vectors",
-                "pose_fully_defined",
-            ]:
+        node_feature_evidence = self._node_feature_evidence.get(
+            (graph_id, input_channel)
+        )
+        if node_feature_evidence is not None:
+            # Already calculated for all graphs at once in this step
+            return node_feature_evidence
+        matcher = self._get_feature_matcher(graph_id, input_channel)
+        return matcher.node_feature_evidence(query_features[input_channel])
+
+    def _calculate_feature_evidence_for_all_graphs(self, query_features):
+        """Calculate the feature evidence for the nodes of all graphs at once.
+
+        For each input channel, the matchers of all graphs that store this channel
+        are stacked and evaluated with a single call. Not done with the process_pool
+        evidence update executor since its workers don't share the result.
+
+        Returns:
+            Dictionary of {(graph_id, input_channel): node feature evidence}.
+        """
+        if isinstance(self.evidence_update_executor, ProcessPoolEvidenceUpdateExecutor):
+            return {}
+        node_feature_evidence = {}
+        for input_channel in query_features.keys():
+            if not self.use_features_for_matching.get(input_channel, False):
                 continue
-            if hasattr(query_features[feature], "__len__"):
-                feature_length = len(query_features[feature])
-            else:
-                feature_length = 1
-            end_idx = start_idx + feature_length
-            feature_list[start_idx:end_idx] = query_features[feature]
-            tolerance_list[start_idx:end_idx] = self.tolerances[input_channel][feature]
-            feature_weight_list[start_idx:end_idx] = self.feature_weights[
-                input_channel
-            ][feature]
-            circular_var[start_idx:end_idx] = (
-                [True, False, False] if feature == "hsv" else False
+            graph_ids = [
+                graph_id
+                for graph_id in self.get_all_known_object_ids()
+                if input_channel in self.get_input_channels_in_graph(graph_id)
+            ]
+            if len(graph_ids) < 2:
+                continue
+            matchers = [
+                self._get_feature_matcher(graph_id, input_channel)
+                for graph_id in graph_ids
+            ]
+            stacked = self._stacked_feature_matchers.get(input_channel)
+            if stacked is None or not (
+                len(stacked[0]) == len(matchers)
+                and all(a is b for a, b in zip(stacked[0], matchers))
+            ):
+                try:
+                    stacked = (matchers, FeatureMatcher.stack(matchers))
+                except ValueError:
+                    # Graphs store different features, calculate them separately.
+                    continue
+                self._stacked_feature_matchers[input_channel] = stacked
+            stacked_matcher = stacked[1]
+            graph_evidences = stacked_matcher.split(
+                stacked_matcher.node_feature_evidence(query_features[input_channel])
             )
-            circ_range = 1
-            start_idx = end_idx
+            for graph_id, evidence in zip(graph_ids, graph_evidences):
+                node_feature_evidence[(graph_id, input_channel)] = evidence
+        return node_feature_evidence
 
-        feature_differences = np.zeros_like(feature_array[input_channel])
-        feature_differences[:, ~circular_var] = np.abs(
-            feature_array[input_channel][:, ~circular_var] - feature_list[~circular_var]
-        )
-        cnode_fs = feature_array[input_channel][:, circular_var]
-        cquery_fs = feature_list[circular_var]
-        feature_differences[:, circular_var] = np.min(
-            [
-                np.abs(circ_range + cnode_fs - cquery_fs),
-                np.abs(cnode_fs - cquery_fs),
-                np.abs(cnode_fs - (cquery_fs + circ_range)),
-            ],
-            axis=0,
-        )
-        # any difference < tolerance should be positive evidence
-        # any difference >= tolerance should be 0 evidence
-        feature_evidence = np.clip(tolerance_list - feature_differences, 0, np.inf)
-        # normalize evidence to be in [0, 1]
-        feature_evidence = feature_evidence / tolerance_list
-        weighted_feature_evidence = np.average(
-            feature_evidence, weights=feature_weight_list, axis=1
-        )
-        return weighted_feature_evidence
+    def _get_feature_matcher(self, graph_id, input_channel):
+        """Return the FeatureMatcher for the node features of a graph.
+
+        The matcher is rebuilt whenever the node feature array of the graph was
+        rebuilt (see `GraphMemory.initialize_feature_arrays`).
+
+        Returns:
+            The FeatureMatcher.
+        """
+        node_features = self.graph_memory.get_feature_array(graph_id)[input_channel]
+        matcher = self._feature_matchers.get((graph_id, input_channel))
+        if matcher is None or matcher.node_features is not node_features:
+            matcher = FeatureMatcher(
+                node_features,
+                self.graph_memory.get_feature_order(graph_id)[input_channel],
+                self.tolerances[input_channel],
+                self.feature_weights[input_channel],
+            )
+            self._feature_matchers[(graph_id, input_channel)] = matcher
+        return matcher
+
+    def _build_feature_matchers(self):
+        """Build the FeatureMatchers for the current node feature arrays."""
+        self._feature_matchers = {}
+        self._stacked_feature_matchers = {}
+        for graph_id in self.get_all_known_object_ids():
+            for input_channel in self.get_input_channels_in_graph(graph_id):
+                if self.use_features_for_matching.get(input_channel, False):
+                    self._get_feature_matcher(graph_id, input_channel)
 
     def _check_for_unique_poses(
         self,
@@ -1598,6 +1842,34 @@ class EvidenceGraphLM(GraphLM):
                 use_features[input_channel] = feature_weights_provided
         return use_features
 
+    def _create_evidence_update_executor(self, executor_name, num_workers):
+        """Create the executor used to update the evidence of all graphs.
+
+        Returns:
+            The EvidenceUpdateExecutor.
+
+        Raises:
+            ValueError: If executor_name is not a known executor.
+        """
+        if executor_name not in EVIDENCE_UPDATE_EXECUTORS:
+            raise ValueError(f"Unknown evidence update executor: {executor_name}")
+        executor_args = {}
+        if executor_name == "process_pool":
+            # Everything that _update_evidence and _update_evidence_with_vote read or
+            # write for a graph (besides the graph memory).
+            executor_args = dict(
+                shared_array_attributes=[
+                    "possible_locations",
+                    "possible_poses",
+                    "evidence",
+                ],
+                synced_graph_attributes=["channel_hypothesis_mapping"],
+                synced_attributes=["current_mlh"],
+            )
+        return EVIDENCE_UPDATE_EXECUTORS[executor_name](
+            self, num_workers, **executor_args
+        )
+
     def _fill_feature_weights_with_default(self, default):
         for input_channel in self.tolerances.keys():
             if input_channel not in self.feature_weights.keys():
@@ -1638,13 +1910,14 @@ class EvidenceGraphLM(GraphLM):
         Returns:
             The possible locations and rotations.
         """
-        all_possible_locations = np.zeros((1, 3))
-        all_possible_rotations = np.zeros((1, 3, 3))
-
         logging.debug(f"Determining possible poses using input from {input_channel}")
         node_directions = self.graph_memory.get_rotation_features_at_all_nodes(
             graph_id, input_channel
         )
+        node_locations = np.asarray(
+            self.graph_memory.get_locations_in_graph(graph_id, input_channel),
+            dtype=float,
+        )
         sensed_directions = sensed_features[input_channel]["pose_vectors"]
         # Check if PCs in patch are similar -> need to sample more directions
         if (
@@ -1657,36 +1930,25 @@ class EvidenceGraphLM(GraphLM):
 
         if not sample_more_directions:
             # 2 possibilities since the curvature directions may be flipped
-            possible_s_d = [
-                sensed_directions.copy(),
-                sensed_directions.copy(),
-            ]
-            possible_s_d[1][1:] = possible_s_d[1][1:] * -1
+            possible_s_d = np.stack([sensed_directions, sensed_directions])
+            possible_s_d[1, 1:] = possible_s_d[1, 1:] * -1
         else:
             # TODO: whats a reasonable number here?
             # Maybe just samle n poses regardless of if pc1==pc2 and increase
             # evidence in the cases where we are more sure?
             # Maybe keep moving until pc1!= pc2 and then start matching?
-            possible_s_d = get_more_directions_in_plane(sensed_directions, 8)
-
-        for s_d in possible_s_d:
-            # Since we have orthonormal vectors and know their correspondence we can
-            # directly calculate the rotation instead of using the Kabsch esimate
-            # used in Rotation.align_vectors
-            r = align_multiple_orthonormal_vectors(node_directions, s_d, as_scipy=False)
-            all_possible_locations = np.vstack(
-                [
-                    all_possible_locations,
-                    np.array(
-                        self.graph_memory.get_locations_in_graph(
-                            graph_id, input_channel
-                        )
-                    ),
-                ]
-            )
-            all_possible_rotations = np.vstack([all_possible_rotations, r])
-
-        return all_possible_locations[1:], all_possible_rotations[1:]
+            possible_s_d = np.array(get_more_directions_in_plane(sensed_directions, 8))
+
+        # Hypotheses are ordered by sensed direction first and then by node.
+        all_possible_locations = np.tile(node_locations, (len(possible_s_d), 1))
+        # Since we have orthonormal vectors and know their correspondence we can
+        # directly calculate the rotation instead of using the Kabsch esimate
+        # used in Rotation.align_vectors. All sensed directions are aligned at once
+        # by broadcasting them over the nodes.
+        all_possible_rotations = align_multiple_orthonormal_vectors(
+            node_directions, possible_s_d[:, np.newaxis], as_scipy=False
+        )
+        return all_possible_locations, all_possible_rotations.reshape(-1, 3, 3)
 
     def _threshold_possible_matches(self, x_percent_scale_factor=1.0):
         """Return possible matches based on evidence threshold.
@@ -1757,6 +2019,68 @@ class EvidenceGraphLM(GraphLM):
         }
         return mlh_dict
 
+    def _stack_hypotheses(self):
+        """Update the stacked hypotheses of all graphs if stack_hypotheses is set.
+
+        Returns:
+            Whether the stacked hypotheses are up to date and can be used.
+        """
+        if self.hypotheses_stack is None:
+            return False
+        graph_ids = self.get_all_known_object_ids()
+        if len(graph_ids) == 0 or any(
+            graph_id not in self.evidence for graph_id in graph_ids
+        ):
+            return False
+        self.hypotheses_stack.update(
+            {
+                "possible_locations": self.possible_locations,
+                "possible_poses": self.possible_poses,
+                "evidence": self.evidence,
+            },
+            graph_ids,
+        )
+        return True
+
+    def _get_votes_from_stacked_hypotheses(self):
+        """Select the hypotheses to vote on from the stacked hypotheses.
+
+        Returns:
+            Dictionary with graph_ids as keys and `PoseVotes` as values.
+        """
+        stack = self.hypotheses_stack
+        evidences = stack.arrays["evidence"]
+        scaled_evidences = scale_evidences(
+            evidences, np.min(evidences), np.max(evidences)
+        )
+        stack_ids = np.flatnonzero(scaled_evidences > self.vote_evidence_threshold)
+        graph_indices, _ = stack.locate(stack_ids)
+        # stack_ids are sorted, so the votes of each graph are consecutive
+        voting_graph_indices, starts = np.unique(graph_indices, return_index=True)
+        possible_states = {}
+        for graph_index, graph_stack_ids in zip(
+            voting_graph_indices, np.split(stack_ids, starts[1:])
+        ):
+            possible_states[stack.graph_ids[graph_index]] = self._hypotheses_to_votes(
+                stack.arrays["possible_locations"][graph_stack_ids],
+                stack.arrays["possible_poses"][graph_stack_ids],
+                scaled_evidences[graph_stack_ids],
+            )
+        return possible_states
+
+    def _hypotheses_to_votes(self, locations, poses, scaled_evidences):
+        """Return the votes for hypotheses of one object.
+
+        Returns:
+            PoseVotes with the hypothesized locations (rel. body) and poses.
+        """
+        return PoseVotes(
+            locations=locations,
+            # Pose vectors are columns of the rotation matrix
+            pose_vectors=poses.transpose(0, 2, 1),
+            confidences=scaled_evidences,
+        )
+
     def _calculate_most_likely_hypothesis(self, graph_id=None):
         """Return pose with highest evidence count.
 
@@ -1771,13 +2095,21 @@ class EvidenceGraphLM(GraphLM):
             mlh_id = np.argmax(self.evidence[graph_id])
             mlh = self._get_mlh_dict_from_id(graph_id, mlh_id)
         else:
-            highest_evidence_so_far = -np.inf
-            for graph_id in self.get_all_known_object_ids():
-                mlh_id = np.argmax(self.evidence[graph_id])
-                evidence = self.evidence[graph_id][mlh_id]
-                if evidence > highest_evidence_so_far:
-                    mlh = self._get_mlh_dict_from_id(graph_id, mlh_id)
-                    highest_evidence_so_far = evidence
+            if self._stack_hypotheses():
+                # The first maximum of the stacked evidence is the first maximum of
+                # the first graph with the highest evidence, same as in the loop.
+                stack = self.hypotheses_stack
+                stack_id = np.argmax(stack.arrays["evidence"])
+                graph_index, mlh_id = stack.locate(stack_id)
+                mlh = self._get_mlh_dict_from_id(stack.graph_ids[graph_index], mlh_id)
+            else:
+                highest_evidence_so_far = -np.inf
+                for graph_id in self.get_all_known_object_ids():
+                    mlh_id = np.argmax(self.evidence[graph_id])
+                    evidence = self.evidence[graph_id][mlh_id]
+                    if evidence > highest_evidence_so_far:
+                        mlh = self._get_mlh_dict_from_id(graph_id, mlh_id)
+                        highest_evidence_so_far = evidence
             if not mlh:  # No objects in memory
                 mlh = self.current_mlh
                 mlh["graph_id"] = "new_object0"
@@ -1839,10 +2171,14 @@ class EvidenceGraphLM(GraphLM):
         pass
 
     def _add_detailed_stats(self, stats):
-        # Save possible poses once since they don't change during episode
+        # Save possible poses once since they don't change during episode (unless
+        # hypotheses are pruned)
         get_rotations = False
         if "possible_rotations" not in self.buffer.stats.keys():
             get_rotations = True
+        if self.hypotheses_pruning_margin is not None:
+            # Removing hypotheses changes the possible poses during the episode
+            get_rotations = True
 
         stats["possible_locations"] = self.possible_locations
         if get_rotations:
@@ -1860,6 +2196,7 @@ class EvidenceGraphMemory(GraphMemory):
         max_nodes_per_graph,
         max_graph_size,
         num_model_voxels_per_dim,
+        model_voxel_store="arrays",
         *args,
         **kwargs,
     ):
@@ -1868,6 +2205,7 @@ class EvidenceGraphMemory(GraphMemory):
         self.max_nodes_per_graph = max_nodes_per_graph
         self.max_graph_size = max_graph_size
         self.num_model_voxels_per_dim = num_model_voxels_per_dim
+        self.model_voxel_store = model_voxel_store
 
     # =============== Public Interface Functions ===============
 
@@ -1934,6 +2272,7 @@ class EvidenceGraphMemory(GraphMemory):
             max_nodes=self.max_nodes_per_graph,
             max_size=self.max_graph_size,
             num_voxels_per_dim=self.num_model_voxels_per_dim,
+            voxel_store=self.model_voxel_store,
         )
         # Keep benchmark results constant by still using original graph for
         # matching when loading pretrained models.
@@ -1959,6 +2298,7 @@ class EvidenceGraphMemory(GraphMemory):
             max_nodes=self.max_nodes_per_graph,
             max_size=self.max_graph_size,
             num_voxels_per_dim=self.num_model_voxels_per_dim,
+            voxel_store=self.model_voxel_store,
         )
         try:
             model.build_model(locations=locations, features=features)
@@ -15,7 +15,122 @@ import shutil
 import numpy as np
 from tqdm import tqdm
 
+from tbp.monty.frameworks.measure import timed_context
 from tbp.monty.frameworks.models.evidence_matching import EvidenceGraphLM
+from tbp.monty.frameworks.models.evidence_update_executors import (
+    ProcessPoolEvidenceUpdateExecutor,
+)
+
+# Masks and multiplier of the SWAR bit count of 64 bit words
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+# Number of 64 bit words of SDR intersections counted at once in `packed_overlaps`.
+# Keeps the temporary arrays small enough to stay in the CPU cache.
+MAX_OVERLAP_CHUNK_WORDS = 2**17
+
+
+def pack_sdrs(sdrs):
+    """Pack SDRs into 64 bit words, one bit per SDR element.
+
+    Bit `i % 64` of word `i // 64` is set if element `i` of the SDR is on (> 0). The
+    last word is padded with zeros if the SDR length is not a multiple of 64.
+
+    Args:
+        sdrs: The SDRs, shape=(..., sdr_length).
+
+    Returns:
+        The packed SDRs, shape=(..., ceil(sdr_length / 64)), dtype=np.uint64.
+    """
+    packed_bytes = np.packbits(np.asarray(sdrs) > 0, axis=-1, bitorder="little")
+    num_pad_bytes = -packed_bytes.shape[-1] % 8
+    if num_pad_bytes:
+        pad_width = [(0, 0)] * (packed_bytes.ndim - 1) + [(0, num_pad_bytes)]
+        packed_bytes = np.pad(packed_bytes, pad_width)
+    return np.ascontiguousarray(packed_bytes).view(np.uint64)
+
+
+def unpack_sdrs(packed_sdrs, sdr_length):
+    """Unpack SDRs packed with `pack_sdrs` into arrays of 0s and 1s.
+
+    Returns:
+        The SDRs, shape=(..., sdr_length).
+    """
+    packed_bytes = np.ascontiguousarray(packed_sdrs).view(np.uint8)
+    bits = np.unpackbits(packed_bytes, axis=-1, count=sdr_length, bitorder="little")
+    return bits.astype(float)
+
+
+def popcount(words):
+    """Count the set bits of each 64 bit word.
+
+    Returns:
+        The number of set bits of each word.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return _popcount_in_place(np.array(words, dtype=np.uint64))
+
+
+def _popcount_in_place(words):
+    """Replace each 64 bit word by its number of set bits (SWAR bit count).
+
+    Returns:
+        The words array holding the bit counts.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    shifted = words >> np.uint64(1)
+    shifted &= _M1
+    words -= shifted
+    np.right_shift(words, np.uint64(2), out=shifted)
+    shifted &= _M2
+    words &= _M2
+    words += shifted
+    np.right_shift(words, np.uint64(4), out=shifted)
+    words += shifted
+    words &= _M4
+    words *= _H01
+    words >>= np.uint64(56)
+    return words
+
+
+def packed_overlaps(packed_sdrs, packed_queries):
+    """Count the overlapping on bits of packed SDRs and packed query SDRs.
+
+    Args:
+        packed_sdrs: Packed SDRs, shape=(n, num_words).
+        packed_queries: One packed query SDR, shape=(num_words,), or several,
+            shape=(q, num_words).
+
+    Returns:
+        The overlaps, shape=(n,) for one query or (n, q) for several.
+    """
+    if packed_queries.ndim == 1:
+        packed_sdrs_view = packed_sdrs
+    else:
+        packed_sdrs_view = packed_sdrs[:, np.newaxis, :]
+    num_rows = packed_sdrs.shape[0]
+    overlaps = np.empty((num_rows, *packed_queries.shape[:-1]), dtype=np.int64)
+    chunk_rows = max(1, MAX_OVERLAP_CHUNK_WORDS // packed_queries.size)
+    for start in range(0, num_rows, chunk_rows):
+        words = packed_sdrs_view[start : start + chunk_rows] & packed_queries
+        overlaps[start : start + chunk_rows] = _popcount_in_place(words).sum(
+            axis=-1, dtype=np.int64
+        )
+    return overlaps
+
+
+def _is_binary(sdrs):
+    """Check whether SDRs only contain 0s and 1s, i.e. can be packed losslessly.
+
+    Returns:
+        Whether all elements of the SDRs are 0 or 1.
+    """
+    sdrs = np.asarray(sdrs)
+    return bool(np.all((sdrs == 0) | (sdrs == 1)))
 
 
 class LoggerSDR:
@@ -95,6 +210,10 @@ class EncoderSDR:
             stability constraint applied and 1.0 is fixed SDRs. Values in between are
             for partial stability.
         log_flag: Flag to activate the logger.
+        early_stopping_patience: Number of epochs without improvement of the overlap
+            error after which training stops early. None trains for all `n_epochs`.
+        early_stopping_min_delta: Minimum decrease of the mean absolute overlap
+            error that counts as an improvement for early stopping.
     """
 
     def __init__(
@@ -105,6 +224,8 @@ class EncoderSDR:
         n_epochs=1000,
         stability=0.0,
         log_flag=False,
+        early_stopping_patience=None,
+        early_stopping_min_delta=0.0,
     ):
         if sdr_on_bits >= sdr_length or sdr_on_bits <= 0:
             logging.warning(
@@ -122,10 +243,15 @@ class EncoderSDR:
                 f"Invalid stability parameter: stability clamped to {self.stability}"
             )
         self.log_flag = log_flag
+        self.early_stopping_patience = early_stopping_patience
+        self.early_stopping_min_delta = early_stopping_min_delta
 
         # Initialize obj SDR array with arbitrary values
         self.obj_sdrs = np.zeros((0, self.sdr_length))
 
+        # Arrays reused across epochs and episodes by the optimizer
+        self._buffers = {}
+
     @property
     def n_objects(self):
         """Return the available number of objects."""
@@ -136,6 +262,11 @@ class EncoderSDR:
         """Return the available SDRs."""
         return self.binarize(self.obj_sdrs)
 
+    @property
+    def packed_sdrs(self):
+        """Return the available SDRs packed into 64 bit words (see `pack_sdrs`)."""
+        return pack_sdrs(self.sdrs)
+
     def get_sdr(self, index):
         """Return the SDR at a specific index.
 
@@ -144,7 +275,7 @@ class EncoderSDR:
         """
         return self.sdrs[index]
 
-    def optimize(self, overlap_error, mask):
+    def optimize(self, overlap_error, mask, train_ids=None):
         """Compute and apply local gradient descent.
 
         Compute based on the overlap error and mask.
@@ -156,77 +287,76 @@ class EncoderSDR:
         The overlap error helps correct the sign and also provides a magnitude for the
         representation updates.
 
+        As we're optimizing the L2 norm of the difference between two SDRs, the
+        gradient of each valid pair (i, j) is 2 * overlap_error[i, j] * (x_i - x_j)
+        for x_i and its negative for x_j. Summing over all pairs gives, with
+        W = overlap_error * mask and S = W + W.T:
+
+            grad[i] = 2 * (S[i].sum() * x_i - S[i] @ x)
+
+        which is computed for all representations with one matrix product instead of
+        a loop over the pairs of objects.
+
         Args:
             overlap_error: The difference between target and predicted overlaps.
             mask: Mask indicating valid entries in the overlap matrix.
+            train_ids: Ids of the representations to update. Only the rows and
+                columns of `overlap_error` of these ids need to be up to date. All
+                representations are updated if None.
 
         Note:
             num_objects = self.n_objects
+        """
+        rows = slice(None) if train_ids is None else train_ids
+        n_rows = self.n_objects if train_ids is None else len(train_ids)
+
+        # Pair weights S[rows], i.e. the masked errors of (i, j) and (j, i)
+        pair_weights = self._get_buffer("pair_weights", (n_rows, self.n_objects))
+        np.multiply(overlap_error[rows], mask[rows], out=pair_weights)
+        pair_weights_t = self._get_buffer("pair_weights_t", (self.n_objects, n_rows))
+        np.multiply(overlap_error[:, rows], mask[:, rows], out=pair_weights_t)
+        pair_weights += pair_weights_t.T
+
+        # grad = 2 * (S.sum(1) * x - S @ x), scaled by the learning rate
+        grad = self._get_buffer("grad", (n_rows, self.sdr_length))
+        weighted_sum = self._get_buffer("weighted_sum", (n_rows, self.sdr_length))
+        np.multiply(
+            self.obj_sdrs[rows], pair_weights.sum(axis=1)[:, np.newaxis], out=grad
+        )
+        np.matmul(pair_weights, self.obj_sdrs, out=weighted_sum)
+        grad -= weighted_sum
+        grad *= 2 * self.lr
 
-        Note:
-            A vectorized version of the algorithm is provided below, although it
-            would need to be modified to avoid repeated creation of arrays in order to
-            be more efficient. Leaving for now as this algorithm is not a bottle-neck
-            (circa 10-20 seconds to learn 60 object SDRs).:
-
-            # Initialize gradients
-            grad = np.zeros_like(self.obj_sdrs)
-
-            # Compute the pairwise differences between SDRs
-            diff_matrix = (
-                self.obj_sdrs[:, np.newaxis, :] - self.obj_sdrs[np.newaxis, :, :]
-            )
-
-            # Compute the absolute differences for each pair
-            abs_diff = np.sum(np.abs(diff_matrix), axis=2)
-
-            # Create a mask for non-zero differences
-            non_zero_mask = abs_diff > 0
-
-            # Apply the mask to the original mask
-            valid_mask = mask & non_zero_mask
+        # Update the SDRs using the gradient
+        self.obj_sdrs[rows] -= grad
 
-            # Calculate the summed distance and gradient contributions where the mask
-            # is valid for logging
-            summed_distance = np.sum(overlap_error * valid_mask * abs_diff)
+    def summed_distance(self, overlap_error, mask):
+        """Sum of the L1 distances between dense representations weighted by error.
 
-            # Calculate the gradients
-            grad_contrib = overlap_error[:, :, np.newaxis] * 2 * diff_matrix
-            grad += np.sum(grad_contrib * valid_mask[:, :, np.newaxis], axis=1)
-            grad -= np.sum(grad_contrib * valid_mask[:, :, np.newaxis], axis=0)
+        This is only computed for logging, i.e. to be able to visualize that it is
+        decreasing during training.
 
-            # Update the SDRs using the gradient
-            self.obj_sdrs -= self.lr * grad
+        Args:
+            overlap_error: The difference between target and predicted overlaps.
+            mask: Mask indicating valid entries in the overlap matrix.
 
         Returns:
             The summed distance for logging.
         """
-        # Initialize the gradient array
-        grad = np.zeros_like(self.obj_sdrs)
-
-        # Track the summed distance for logging, i.e. to be able to visualize that
-        # it is decreasing during each update
-        summed_distance = 0
-
-        # Calculate the gradient for each pair of objects
-        for i in range(self.n_objects):
-            for j in range(self.n_objects):
-                if mask[i, j]:
-                    # As we're optimizing the L2 norm of the difference between
-                    # the two SDRs, the gradient is the difference between the
-                    # two non-binarized (dense) representations.
-                    diff = self.obj_sdrs[i] - self.obj_sdrs[j]
-                    if np.sum(np.abs(diff)) > 0:
-                        summed_distance += overlap_error[i, j] * np.sum(np.abs(diff))
-                        # Multiply the gradient by 2 to exactly match the
-                        # derivative of the L2 norm
-                        grad[i] += overlap_error[i, j] * 2 * diff
-                        grad[j] -= overlap_error[i, j] * 2 * diff
+        i, j = np.nonzero(mask)
+        distances = np.abs(self.obj_sdrs[i] - self.obj_sdrs[j]).sum(axis=1)
+        return np.sum(overlap_error[i, j] * distances)
 
-        # Update the SDRs using the gradient
-        self.obj_sdrs -= self.lr * grad
+    def _get_buffer(self, name, shape):
+        """Return a reusable array of the given shape, allocated on first use.
 
-        return summed_distance
+        Returns:
+            The (uninitialized) buffer.
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape)
+        return buffer
 
     def add_objects(self, n_objects):
         """Adds more objects to the available objects and re-initializes the optimizer.
@@ -252,7 +382,7 @@ class EncoderSDR:
         new_obj_sdrs[: stable_data.shape[0]] = stable_data
         self.obj_sdrs = new_obj_sdrs
 
-    def train_sdrs(self, target_overlaps, log_epoch_every=10):
+    def train_sdrs(self, target_overlaps, log_epoch_every=10, train_ids=None):
         """Main SDR training function.
 
         This function receives a copy of the average target overlap 2D tensor
@@ -287,6 +417,13 @@ class EncoderSDR:
         proportional to the error in overlaps. We move them apart if they have more
         overlap than the target.
 
+        If `train_ids` is given, only these representations are binarized and updated
+        in each epoch, using the overlaps of their rows and columns of the target.
+        The other representations stay fixed. If `self.early_stopping_patience` is
+        set, training stops before `n_epochs` once the mean absolute overlap error of
+        the trained pairs is zero or has not improved by more than
+        `self.early_stopping_min_delta` for `early_stopping_patience` epochs.
+
         Note:
             The `distance_matrix` variable is calculated using the cdist function
             and it denotes the pairwise euclidean distances between *dense*
@@ -298,6 +435,14 @@ class EncoderSDR:
             each pair of objects, and gradients *do not* flow through the sparse
             overlap calculations.
 
+        Args:
+            target_overlaps: The target overlaps of all pairs of objects. Pairs
+                without target are nan.
+            log_epoch_every: Log the training details every `log_epoch_every`
+                epochs if `self.log_flag` is set.
+            train_ids: Ids of the objects to train, e.g. the objects whose target
+                overlaps changed. All objects are trained if None.
+
         Returns:
             The stats dictionary for logging.
         """
@@ -321,31 +466,82 @@ class EncoderSDR:
         mask = ~np.isnan(target_overlaps)
         overlaps = np.nan_to_num(target_overlaps, nan=0)
 
+        # Restrict the training to the rows and columns of `train_ids`
+        stable_ids = self.stable_ids
+        trained_mask = mask
+        if train_ids is not None:
+            train_ids = np.asarray(train_ids, dtype=int)
+            if len(train_ids) == 0:
+                logging.info("No changed overlap targets. No training needed.")
+                self.stable_ids = np.array([]).astype(int)
+                return stats
+            stable_ids = np.intersect1d(stable_ids, train_ids)
+            is_trained = np.zeros(self.n_objects, dtype=bool)
+            is_trained[train_ids] = True
+            trained_mask = mask & (is_trained[:, np.newaxis] | is_trained)
+        rows = slice(None) if train_ids is None else train_ids
+        n_rows = self.n_objects if train_ids is None else len(train_ids)
+
         # logging details
         if self.log_flag:
             stats["mask"] = mask
             stats["target_overlap"] = overlaps
             stats["training"] = {}
 
+        bins = self.binarize(self.obj_sdrs)
+        pred_overlaps = self._get_buffer("pred_overlaps", (n_rows, self.n_objects))
+        overlap_error = overlaps.copy()
+        best_error = np.inf
+        epochs_without_improvement = 0
+        n_epochs_trained = 0
         for epoch in tqdm(range(self.n_epochs)):
             # These values are used to pull back the representations from moving
             # too far during training. Notice this is only applied on self.stable_ids.
-            sdrs_stable_before = self.obj_sdrs[self.stable_ids].copy()
+            sdrs_stable_before = self.obj_sdrs[stable_ids].copy()
 
             # calculate predicted overlaps from existing representations
-            reps = self.obj_sdrs
-            bins = self.binarize(reps)
-            pred_overlaps = bins @ bins.T
+            if epoch > 0:
+                bins[rows] = self.binarize(self.obj_sdrs[rows])
+            np.matmul(bins[rows], bins.T, out=pred_overlaps)
+
+            # calculate error of the trained rows and columns
+            overlap_error[rows] = overlaps[rows] - pred_overlaps
+            if train_ids is not None:
+                overlap_error[:, rows] = overlaps[:, rows] - pred_overlaps.T
+
+            if self.early_stopping_patience is not None:
+                mean_error = (
+                    np.abs(overlap_error[trained_mask]).mean()
+                    if trained_mask.any()
+                    else 0.0
+                )
+                if mean_error < best_error - self.early_stopping_min_delta:
+                    best_error = mean_error
+                    epochs_without_improvement = 0
+                else:
+                    epochs_without_improvement += 1
+                if (
+                    mean_error == 0
+                    or epochs_without_improvement >= self.early_stopping_patience
+                ):
+                    break
 
-            # calculate error and optimize
-            overlap_error = overlaps - pred_overlaps
+            if self.log_flag and epoch % log_epoch_every == 0:
+                # Errors of the fixed pairs are not updated in incremental training
+                logged_error = (
+                    overlap_error.copy()
+                    if train_ids is None
+                    else overlaps - bins @ bins.T
+                )
+                summed_distance = self.summed_distance(logged_error, mask)
 
-            summed_distance = self.optimize(overlap_error, mask)
+            self.optimize(overlap_error, mask, train_ids)
+            n_epochs_trained += 1
 
             # stabilize the SDRs at `self.stable_ids` by pulling them back towards
             # sdrs_stable_before
-            sdrs_stable_after = self.obj_sdrs[self.stable_ids].copy()
-            self.obj_sdrs[self.stable_ids] = (self.stability * sdrs_stable_before) + (
+            sdrs_stable_after = self.obj_sdrs[stable_ids].copy()
+            self.obj_sdrs[stable_ids] = (self.stability * sdrs_stable_before) + (
                 (1 - self.stability) * sdrs_stable_after
             )
 
@@ -354,9 +550,11 @@ class EncoderSDR:
                 stats["training"][epoch] = {}
                 stats["training"][epoch]["obj_dense"] = self.obj_sdrs.copy()
                 stats["training"][epoch]["obj_sdr"] = bins.copy()
-                stats["training"][epoch]["overlap_error"] = overlap_error
+                stats["training"][epoch]["overlap_error"] = logged_error
                 stats["training"][epoch]["summed_distance"] = summed_distance
 
+        stats["n_epochs_trained"] = n_epochs_trained
+
         # Reset stable ids.
         # Stability training only used after adding new objects
         self.stable_ids = np.array([]).astype(int)
@@ -368,7 +566,10 @@ class EncoderSDR:
         Returns:
             The SDRs.
         """
-        topk_indices = np.argsort(emb, axis=1)[:, -self.sdr_on_bits :]
+        # Only the set of top-k indices matters, not their order.
+        topk_indices = np.argpartition(emb, -self.sdr_on_bits, axis=1)[
+            :, -self.sdr_on_bits :
+        ]
         mask = np.zeros_like(emb)
         np.put_along_axis(mask, topk_indices, 1, axis=1)
         return mask
@@ -521,6 +722,15 @@ class EvidenceSDRLMMixin:
                 applied and 1.0 is fixed SDRs.
         - `sdr_log_flag` (bool): Flag indicating whether to log the results or not
 
+    And can optionally contain:
+        - `sdr_early_stopping_patience` (int): Stop training the SDRs of an episode
+                after this many epochs without improvement of the overlap error.
+                Defaults to None, i.e. train for `n_sdr_epochs`.
+        - `sdr_early_stopping_min_delta` (float): Minimum decrease of the overlap
+                error that counts as an improvement. Defaults to 0.0.
+        - `sdr_incremental` (bool): Only train the SDRs of objects whose target
+                overlaps changed in the episode. Defaults to False.
+
     See the `monty_lab` repo for reference. Specifically,
     `experiments/configs/evidence_sdr_evaluation.py`
 
@@ -534,6 +744,9 @@ class EvidenceSDRLMMixin:
 
         """
         self.sdr_args = kwargs.pop("sdr_args")
+        # (node feature array, node SDRs, packed SDRs) per (graph_id, input_channel),
+        # see _get_node_sdrs. Set before super().__init__ builds the matchers.
+        self._packed_node_sdrs = {}
         super().__init__(*args, **kwargs)
 
         # keeps track of the Graph objects and their ids
@@ -550,8 +763,15 @@ class EvidenceSDRLMMixin:
             lr=self.sdr_args["sdr_lr"],
             n_epochs=self.sdr_args["n_sdr_epochs"],
             log_flag=self.sdr_args["sdr_log_flag"],
+            early_stopping_patience=self.sdr_args.get("sdr_early_stopping_patience"),
+            early_stopping_min_delta=self.sdr_args.get(
+                "sdr_early_stopping_min_delta", 0.0
+            ),
         )
 
+        # training time of the SDRs in seconds, per episode
+        self.sdr_training_times = []
+
         # TODO: remove this logger and merge with the Monty Loggers after
         # issue #328 is fixed.
         if self.sdr_args["sdr_log_flag"]:
@@ -618,10 +838,23 @@ class EvidenceSDRLMMixin:
         super().post_episode(*args, **kwargs)
 
         # collect the evidences from Learning Module
+        previous_overlaps = self.target_overlaps.overlaps
         self.collect_evidences()
 
         # Train the SDR Encoder based on overlap targets
-        stats = self.sdr_encoder.train_sdrs(self.target_overlaps.overlaps)
+        train_ids = None
+        if self.sdr_args.get("sdr_incremental", False):
+            train_ids = self._get_changed_object_ids(previous_overlaps)
+        with timed_context() as training_time:
+            stats = self.sdr_encoder.train_sdrs(
+                self.target_overlaps.overlaps, train_ids=train_ids
+            )
+        self.sdr_training_times.append(training_time())
+        stats["training_time"] = training_time()
+        logging.info(
+            f"Trained SDRs of {self.sdr_encoder.n_objects} objects for "
+            f"{stats.get('n_epochs_trained', 0)} epochs in {training_time():.3f}s"
+        )
 
         # logging episode information if flag set to True
         if self.sdr_args["sdr_log_flag"]:
@@ -633,6 +866,26 @@ class EvidenceSDRLMMixin:
             )
             self.tmp_logger.log_episode(stats)
 
+    def _get_changed_object_ids(self, previous_overlaps):
+        """Return the ids of objects whose target overlaps changed.
+
+        Args:
+            previous_overlaps: The target overlaps before collecting the evidences
+                of this episode. Objects added since then have no previous overlaps.
+
+        Returns:
+            The sorted ids of the objects in a row or column of a changed overlap.
+        """
+        overlaps = self.target_overlaps.overlaps
+        n_previous = previous_overlaps.shape[0]
+        padded_overlaps = np.full_like(overlaps, np.nan)
+        padded_overlaps[:n_previous, :n_previous] = previous_overlaps
+        unchanged = (padded_overlaps == overlaps) | (
+            np.isnan(padded_overlaps) & np.isnan(overlaps)
+        )
+        rows, columns = np.nonzero(~unchanged)
+        return np.union1d(rows, columns)
+
     def _check_use_features_for_matching(self):
         """Check if features should be used for matching.
 
@@ -664,6 +917,66 @@ class EvidenceSDRLMMixin:
         else:
             return np.zeros(self.sdr_args["sdr_length"])
 
+    def _build_feature_matchers(self):
+        """Build FeatureMatchers for sensor inputs and pack the SDRs of LM inputs."""
+        self._feature_matchers = {}
+        self._stacked_feature_matchers = {}
+        self._packed_node_sdrs = {}
+        self._stacked_packed_node_sdrs = {}
+        for graph_id in self.get_all_known_object_ids():
+            for input_channel in self.get_input_channels_in_graph(graph_id):
+                if not self.use_features_for_matching.get(input_channel, False):
+                    continue
+                if input_channel.startswith("learning_module"):
+                    self._get_packed_node_sdrs(graph_id, input_channel)
+                else:
+                    self._get_feature_matcher(graph_id, input_channel)
+
+    def _get_packed_node_sdrs(self, graph_id, input_channel):
+        """Return the object ID SDRs stored at all nodes of a graph as packed bits.
+
+        The `object_id` columns of the node feature array of a learning module input
+        channel are packed once and reused until the array is rebuilt (see
+        `GraphMemory.initialize_feature_arrays`). The graph memory is not changed.
+
+        Returns:
+            The packed SDRs of all nodes, shape=(n, ceil(sdr_length / 64)), or None
+            if the node SDRs are not binary. This happens when several observations
+            with different SDRs fall into the same voxel of a `GridObjectModel`,
+            since their features are averaged.
+        """
+        return self._get_node_sdrs(graph_id, input_channel)[1]
+
+    def _get_node_sdrs(self, graph_id, input_channel):
+        """Return the object ID SDRs stored at all nodes of a graph.
+
+        Returns:
+            The `object_id` columns of the node feature array, shape=(n, sdr_length),
+            and their packed bits (see `_get_packed_node_sdrs`).
+        """
+        node_features = self.graph_memory.get_feature_array(graph_id)[input_channel]
+        cached = self._packed_node_sdrs.get((graph_id, input_channel))
+        if cached is None or cached[0] is not node_features:
+            feature_order = self.graph_memory.get_feature_order(graph_id)
+            feature_mapping = self.graph_memory.get_graph(
+                graph_id, input_channel
+            ).feature_mapping
+            # Node feature arrays store the features in feature_order one after the
+            # other, with the number of columns they have in the graph.
+            start = 0
+            for feature in feature_order[input_channel]:
+                num_columns = np.diff(feature_mapping[feature])[0]
+                if feature == "object_id":
+                    break
+                start += num_columns
+            node_sdrs = node_features[:, start : start + num_columns]
+            packed_node_sdrs = None
+            if _is_binary(node_sdrs):
+                packed_node_sdrs = pack_sdrs(node_sdrs)
+            cached = (node_features, node_sdrs, packed_node_sdrs)
+            self._packed_node_sdrs[(graph_id, input_channel)] = cached
+        return cached[1:]
+
     def _calculate_feature_evidence_sdr_for_all_nodes(
         self, query_features, input_channel, graph_id
     ):
@@ -683,23 +996,43 @@ class EvidenceSDRLMMixin:
         multiplied by the feature weight of object_ids which scales all of the
         evidence points to the range [0, feature_weights[input_channel]["object_id"]].
 
-        The below variables have the following shapes:
-            - feature_array: (n, sdr_length)
+        If the node SDRs and the query SDR are binary, the overlaps are counted on
+        the packed SDRs (see `pack_sdrs`):
+            - packed node SDRs: (n, ceil(sdr_length / 64))
             - query_features[input_channel]["object_id"]: (sdr_length)
-            - query_feat: (sdr_length, 1)
-            - np.matmul(feature_array, query_feat): (n, 1)
+            - packed query SDR: (ceil(sdr_length / 64))
             - overlaps: (n)
+        Otherwise, e.g. if node SDRs were averaged within a voxel, the overlaps are
+        the dot products of the node SDRs with the query SDR.
 
         Returns:
             The normalized overlaps.
         """
-        feature_array = self.graph_memory.get_feature_array(graph_id)[input_channel]
+        node_sdrs, packed_node_sdrs = self._get_node_sdrs(graph_id, input_channel)
+        return self._sdr_feature_evidence(
+            node_sdrs, packed_node_sdrs, query_features, input_channel
+        )
 
-        query_feat = np.expand_dims(query_features[input_channel]["object_id"], 1)
-        tolerance = self.tolerances[input_channel]["object_id"]
-        sdr_on_bits = query_feat.sum(axis=0)
+    def _sdr_feature_evidence(
+        self, node_sdrs, packed_node_sdrs, query_features, input_channel
+    ):
+        """Map the overlaps of node SDRs with the query SDR to evidence.
+
+        See `_calculate_feature_evidence_sdr_for_all_nodes`. The packed node SDRs
+        are used if they are not None and the query SDR is binary.
 
-        overlaps = feature_array @ query_feat.squeeze(-1)
+        Returns:
+            The normalized overlaps.
+        """
+        query_sdr = query_features[input_channel]["object_id"]
+        tolerance = self.tolerances[input_channel]["object_id"]
+        if packed_node_sdrs is not None and _is_binary(query_sdr):
+            packed_query = pack_sdrs(query_sdr)
+            sdr_on_bits = popcount(packed_query).sum(dtype=np.int64)
+            overlaps = packed_overlaps(packed_node_sdrs, packed_query)
+        else:
+            sdr_on_bits = np.sum(query_sdr)
+            overlaps = node_sdrs @ query_sdr
         normalized_overlaps = (overlaps - tolerance) / (sdr_on_bits - tolerance)
         normalized_overlaps[normalized_overlaps < 0] = 0.0
 
@@ -722,6 +1055,12 @@ class EvidenceSDRLMMixin:
             The feature evidence for all nodes.
         """
         if input_channel.startswith("learning_module"):
+            node_feature_evidence = self._node_feature_evidence.get(
+                (graph_id, input_channel)
+            )
+            if node_feature_evidence is not None:
+                # Already calculated for all graphs at once in this step
+                return node_feature_evidence
             return self._calculate_feature_evidence_sdr_for_all_nodes(
                 query_features, input_channel, graph_id
             )
@@ -730,6 +1069,66 @@ class EvidenceSDRLMMixin:
             query_features, input_channel, graph_id
         )
 
+    def _calculate_feature_evidence_for_all_graphs(self, query_features):
+        """Calculate the feature evidence for the nodes of all graphs at once.
+
+        Sensor module features are handled by the stacked FeatureMatchers of the
+        EvidenceGraphLM. For learning module inputs, the packed SDRs of all graphs
+        are concatenated and their overlaps with the query SDR counted in one call.
+
+        Returns:
+            Dictionary of {(graph_id, input_channel): node feature evidence}.
+        """
+        sensor_query_features = {
+            input_channel: features
+            for input_channel, features in query_features.items()
+            if not input_channel.startswith("learning_module")
+        }
+        node_feature_evidence = super()._calculate_feature_evidence_for_all_graphs(
+            sensor_query_features
+        )
+        if isinstance(self.evidence_update_executor, ProcessPoolEvidenceUpdateExecutor):
+            return node_feature_evidence
+        for input_channel in query_features.keys():
+            if not (
+                input_channel.startswith("learning_module")
+                and self.use_features_for_matching.get(input_channel, False)
+            ):
+                continue
+            graph_ids = [
+                graph_id
+                for graph_id in self.get_all_known_object_ids()
+                if input_channel in self.get_input_channels_in_graph(graph_id)
+            ]
+            if len(graph_ids) < 2:
+                continue
+            packed_node_sdrs = [
+                self._get_packed_node_sdrs(graph_id, input_channel)
+                for graph_id in graph_ids
+            ]
+            if any(packed is None for packed in packed_node_sdrs) or not _is_binary(
+                query_features[input_channel]["object_id"]
+            ):
+                # Non binary SDRs can't be packed. Their evidence is calculated per
+                # graph with dense dot products.
+                continue
+            stacked = self._stacked_packed_node_sdrs.get(input_channel)
+            if stacked is None or not (
+                len(stacked[0]) == len(packed_node_sdrs)
+                and all(a is b for a, b in zip(stacked[0], packed_node_sdrs))
+            ):
+                stacked = (packed_node_sdrs, np.concatenate(packed_node_sdrs))
+                self._stacked_packed_node_sdrs[input_channel] = stacked
+            evidence = self._sdr_feature_evidence(
+                None, stacked[1], query_features, input_channel
+            )
+            split_ids = np.cumsum([len(sdrs) for sdrs in packed_node_sdrs])[:-1]
+            for graph_id, graph_evidence in zip(
+                graph_ids, np.split(evidence, split_ids)
+            ):
+                node_feature_evidence[(graph_id, input_channel)] = graph_evidence
+        return node_feature_evidence
+
 
 class EvidenceSDRGraphLM(EvidenceSDRLMMixin, EvidenceGraphLM):
     """Class that incorporates the EvidenceSDR Mixin with the EvidenceGraphLM."""
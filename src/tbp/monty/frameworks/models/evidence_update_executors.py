@@ -0,0 +1,540 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Executors for running per-graph evidence updates of an `EvidenceGraphLM`.
+
+The evidence updates of different graphs (objects) are independent of each other
+which means they can be computed in parallel. An executor takes the name of a method
+of the learning module and calls it once for each graph as
+`method(*args, *graph_args[graph_id], graph_id)`. How these calls are distributed is
+up to the executor:
+
+- "serial": One call after the other in the main thread.
+- "threads": One new `threading.Thread` per graph and call (legacy behavior).
+- "thread_pool": A persistent pool of threads. Graphs are sharded across the threads
+  so each thread processes a fixed subset of the graphs.
+- "process_pool": A persistent pool of forked worker processes. Graphs are sharded
+  across the workers and the hypothesis arrays of each graph live in shared memory
+  so they don't need to be pickled at every step.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import threading
+import traceback
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class EvidenceUpdateExecutor(ABC):
+    """Calls a method of a learning module once for each graph.
+
+    Executors are persistent and are reused across steps and episodes.
+    """
+
+    def __init__(self, learning_module, num_workers: Optional[int] = None) -> None:
+        """Initialize the executor.
+
+        Args:
+            learning_module: The learning module whose methods are called.
+            num_workers: Number of parallel workers. If None, use one worker per
+                CPU. Ignored by executors that don't use a fixed number of workers.
+        """
+        self.learning_module = learning_module
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+
+    @abstractmethod
+    def map(
+        self,
+        method_name: str,
+        graph_ids: Iterable[str],
+        args: Sequence = (),
+        graph_args: Optional[Dict[str, Sequence]] = None,
+    ) -> None:
+        """Call `method_name` for each graph and wait until all calls are done.
+
+        Args:
+            method_name: Name of the learning module method to call.
+            graph_ids: Graphs to call the method for.
+            args: Arguments passed to all calls.
+            graph_args: Optional additional arguments for each graph. They are
+                passed after args and before the graph_id.
+        """
+
+    def invalidate(self) -> None:  # noqa: B027
+        """Notify the executor that the graph memory of the learning module changed."""
+        pass
+
+    def close(self) -> None:  # noqa: B027
+        """Release all resources held by the executor."""
+        pass
+
+    def _call(self, method_name, graph_id, args, graph_args):
+        graph_args = graph_args[graph_id] if graph_args is not None else ()
+        getattr(self.learning_module, method_name)(*args, *graph_args, graph_id)
+
+
+class SerialEvidenceUpdateExecutor(EvidenceUpdateExecutor):
+    """Updates one graph after the other in the calling thread."""
+
+    def map(self, method_name, graph_ids, args=(), graph_args=None):
+        for graph_id in graph_ids:
+            self._call(method_name, graph_id, args, graph_args)
+
+
+class ThreadPerGraphEvidenceUpdateExecutor(EvidenceUpdateExecutor):
+    """Starts a new thread for each graph at every call."""
+
+    def map(self, method_name, graph_ids, args=(), graph_args=None):
+        thread_list = []
+        for graph_id in graph_ids:
+            # assign separate thread on same CPU to each objects update.
+            # Since the updates of different objects are independent of
+            # each other we can do this.
+            thread_list.append(
+                threading.Thread(
+                    target=self._call,
+                    args=(method_name, graph_id, args, graph_args),
+                )
+            )
+        # TODO: deal with keyboard interrupt
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            # call this to prevent main thread from continuing in code
+            # before all evidences are updated.
+            thread.join()
+
+
+class ThreadPoolEvidenceUpdateExecutor(EvidenceUpdateExecutor):
+    """Shards the graphs across a persistent pool of threads.
+
+    Each thread processes its shard serially so there is only one task per thread and
+    call instead of one thread per graph.
+    """
+
+    def __init__(self, learning_module, num_workers=None):
+        super().__init__(learning_module, num_workers)
+        self._pool = None
+
+    def map(self, method_name, graph_ids, args=(), graph_args=None):
+        graph_ids = list(graph_ids)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.num_workers,
+                thread_name_prefix="evidence_update",
+            )
+        futures = [
+            self._pool.submit(self._map_shard, method_name, shard, args, graph_args)
+            for shard in shard_graph_ids(graph_ids, self.num_workers)
+        ]
+        for future in futures:
+            # Re-raises exceptions of the workers in the calling thread.
+            future.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _map_shard(self, method_name, graph_ids, args, graph_args):
+        for graph_id in graph_ids:
+            self._call(method_name, graph_id, args, graph_args)
+
+
+class ProcessPoolEvidenceUpdateExecutor(EvidenceUpdateExecutor):
+    """Shards the graphs across a persistent pool of forked worker processes.
+
+    The workers are forked from the process that owns the learning module the first
+    time `map` is called. They therefore inherit the graph memory and all parameters
+    of the learning module without any pickling. Whenever the graph memory changes,
+    `invalidate` needs to be called so that the workers are restarted at the next call.
+
+    Each graph is always processed by the same worker. Per-graph state of the learning
+    module is synchronized in the following ways:
+        - shared_array_attributes (e.g. possible_locations, possible_poses,
+          evidence): Dictionaries of {graph_id: np.ndarray}. The arrays are stored in
+          shared memory which is mapped into the owner and the worker process. Updates
+          that don't change the shape of an array are written into the shared memory
+          directly. Arrays are only pickled when their shape changes (e.g. when the
+          hypothesis space is initialized at the beginning of an episode).
+        - synced_graph_attributes (e.g. channel_hypothesis_mapping): Dictionaries of
+          {graph_id: small object} which are sent to the worker and back at every
+          call.
+        - synced_attributes (e.g. current_mlh): Attributes of the learning module
+          which are sent to the workers at every call.
+
+    This executor requires the "fork" start method and is therefore not available on
+    Windows.
+    """
+
+    def __init__(
+        self,
+        learning_module,
+        num_workers=None,
+        shared_array_attributes: Sequence[str] = (),
+        synced_graph_attributes: Sequence[str] = (),
+        synced_attributes: Sequence[str] = (),
+    ):
+        super().__init__(learning_module, num_workers)
+        self.shared_array_attributes = tuple(shared_array_attributes)
+        self.synced_graph_attributes = tuple(synced_graph_attributes)
+        self.synced_attributes = tuple(synced_attributes)
+        # Raises a ValueError if fork is not supported on this platform.
+        self._context = get_context("fork")
+        self._workers: List[Tuple[Any, Any]] = []
+        self._graph_to_worker: Dict[str, int] = {}
+        # {(attribute, graph_id): SharedArray} in the owner process.
+        self._shared_arrays: Dict[Tuple[str, str], SharedArray] = {}
+        # Shared arrays that were replaced but are still referenced somewhere.
+        self._retired_arrays: List[SharedArray] = []
+        # {(attribute, graph_id): name of the shared memory the worker has attached}
+        self._sent_arrays: Dict[Tuple[str, str], Optional[str]] = {}
+        self._finalizer = weakref.finalize(
+            self,
+            _shutdown_process_pool,
+            os.getpid(),
+            self._workers,
+            self._shared_arrays,
+            self._retired_arrays,
+        )
+
+    def map(self, method_name, graph_ids, args=(), graph_args=None):
+        graph_ids = list(graph_ids)
+        if len(graph_ids) == 0:
+            return
+        if len(self._workers) == 0:
+            self._start_workers()
+
+        learning_module = self.learning_module
+        tasks = [[] for _ in self._workers]
+        for graph_id in graph_ids:
+            if graph_id not in self._graph_to_worker:
+                self._graph_to_worker[graph_id] = len(self._graph_to_worker) % len(
+                    self._workers
+                )
+            tasks[self._graph_to_worker[graph_id]].append(
+                (
+                    graph_id,
+                    graph_args[graph_id] if graph_args is not None else (),
+                    self._share_graph_arrays(graph_id),
+                    {
+                        attribute: getattr(learning_module, attribute).get(graph_id)
+                        for attribute in self.synced_graph_attributes
+                    },
+                )
+            )
+        synced_values = {
+            attribute: getattr(learning_module, attribute)
+            for attribute in self.synced_attributes
+        }
+        for (_, connection), worker_tasks in zip(self._workers, tasks):
+            if len(worker_tasks) > 0:
+                connection.send((method_name, args, synced_values, worker_tasks))
+
+        errors = []
+        for (_, connection), worker_tasks in zip(self._workers, tasks):
+            if len(worker_tasks) == 0:
+                continue
+            status, results = connection.recv()
+            if status == "error":
+                errors.append(results)
+                continue
+            for graph_id, graph_values, new_arrays in results:
+                for attribute, value in graph_values.items():
+                    _set_graph_value(learning_module, attribute, graph_id, value)
+                for attribute, array in new_arrays.items():
+                    # Moved into shared memory at the next call.
+                    _set_graph_value(learning_module, attribute, graph_id, array)
+        if len(errors) > 0:
+            raise RuntimeError(
+                f"{method_name} failed in evidence update worker:\n" + errors[0]
+            )
+        self._release_retired_arrays()
+
+    def invalidate(self):
+        self._stop_workers()
+
+    def close(self):
+        self._finalizer()
+
+    def _start_workers(self):
+        # Start the resource tracker before forking so the workers share it with the
+        # owner. Otherwise each worker starts its own tracker which would unlink all
+        # blocks the worker attached to when it exits.
+        resource_tracker.ensure_running()
+        num_workers = min(
+            self.num_workers,
+            max(len(self.learning_module.get_all_known_object_ids()), 1),
+        )
+        for _ in range(num_workers):
+            connection, worker_connection = self._context.Pipe()
+            process = self._context.Process(
+                target=_process_pool_worker,
+                args=(
+                    self.learning_module,
+                    worker_connection,
+                    self.shared_array_attributes,
+                ),
+                daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self._workers.append((process, connection))
+        self._graph_to_worker.clear()
+        self._sent_arrays.clear()
+        logging.debug(f"Started {num_workers} evidence update workers.")
+
+    def _stop_workers(self):
+        _stop_process_pool_workers(self._workers)
+
+    def _share_graph_arrays(self, graph_id):
+        """Move the arrays of a graph into shared memory if they are not there yet.
+
+        Returns:
+            Dictionary of {attribute: SharedArray descriptor or None} for all arrays
+            whose shared memory changed since the last call. None means that the
+            learning module has no array for this graph.
+        """
+        descriptors = {}
+        for attribute in self.shared_array_attributes:
+            key = (attribute, graph_id)
+            array = getattr(self.learning_module, attribute).get(graph_id)
+            shared_array = self._shared_arrays.get(key)
+            if array is None:
+                name = None
+            elif shared_array is not None and array is shared_array.array:
+                name = shared_array.name
+            else:
+                if shared_array is not None:
+                    self._retire(shared_array)
+                shared_array = SharedArray.create(np.asarray(array))
+                self._shared_arrays[key] = shared_array
+                getattr(self.learning_module, attribute)[graph_id] = shared_array.array
+                name = shared_array.name
+            if name is None and shared_array is not None:
+                self._retire(self._shared_arrays.pop(key))
+            if key not in self._sent_arrays or self._sent_arrays[key] != name:
+                descriptors[attribute] = (
+                    None if name is None else shared_array.descriptor
+                )
+                self._sent_arrays[key] = name
+        return descriptors
+
+    def _retire(self, shared_array):
+        shared_array.unlink()
+        self._retired_arrays.append(shared_array)
+
+    def _release_retired_arrays(self):
+        self._retired_arrays[:] = [
+            shared_array
+            for shared_array in self._retired_arrays
+            if not shared_array.release()
+        ]
+
+
+class SharedArray:
+    """A numpy array backed by a `multiprocessing.shared_memory.SharedMemory` block."""
+
+    def __init__(self, shared_memory: SharedMemory, shape, dtype) -> None:
+        self.shared_memory = shared_memory
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+
+    @classmethod
+    def create(cls, array: np.ndarray) -> SharedArray:
+        """Create a new shared memory block and copy array into it.
+
+        Returns:
+            The new SharedArray.
+        """
+        # Shared memory blocks can't be empty.
+        shared_memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared_array = cls(shared_memory, array.shape, array.dtype)
+        shared_array.array[...] = array
+        return shared_array
+
+    @classmethod
+    def attach(cls, descriptor: Tuple[str, Tuple[int, ...], str]) -> SharedArray:
+        """Attach to an existing shared memory block.
+
+        Returns:
+            SharedArray viewing the existing block.
+        """
+        name, shape, dtype = descriptor
+        try:
+            shared_memory = SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13
+            # Registers the block with the resource tracker again. This is a no-op
+            # since forked workers share the resource tracker of the owner.
+            shared_memory = SharedMemory(name=name)
+        return cls(shared_memory, shape, np.dtype(dtype))
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    @property
+    def descriptor(self) -> Tuple[str, Tuple[int, ...], str]:
+        """Everything another process needs to attach to this array."""
+        return (self.name, self.array.shape, self.array.dtype.str)
+
+    def unlink(self) -> None:
+        """Free the shared memory block once all processes released it."""
+        with contextlib.suppress(FileNotFoundError):
+            self.shared_memory.unlink()
+
+    def release(self) -> bool:
+        """Unmap the shared memory from this process.
+
+        Returns:
+            Whether the memory could be released. This fails as long as views of the
+            array are still referenced somewhere else (e.g. in logged stats).
+        """
+        self.array = None
+        try:
+            self.shared_memory.close()
+        except BufferError:
+            return False
+        return True
+
+
+def shard_graph_ids(graph_ids: List[str], num_shards: int) -> List[List[str]]:
+    """Split graph_ids into at most num_shards interleaved, non-empty shards.
+
+    Returns:
+        List of shards.
+    """
+    num_shards = max(min(num_shards, len(graph_ids)), 1)
+    return [graph_ids[i::num_shards] for i in range(num_shards)]
+
+
+def _set_graph_value(learning_module, attribute, graph_id, value):
+    values = getattr(learning_module, attribute)
+    if value is None:
+        values.pop(graph_id, None)
+    else:
+        values[graph_id] = value
+
+
+def _process_pool_worker(learning_module, connection, shared_array_attributes):
+    """Main loop of a worker process of the ProcessPoolEvidenceUpdateExecutor."""
+    attached_arrays: Dict[Tuple[str, str], SharedArray] = {}
+    retired_arrays: List[SharedArray] = []
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        method_name, args, synced_values, tasks = message
+        try:
+            for attribute, value in synced_values.items():
+                setattr(learning_module, attribute, value)
+            results = []
+            for graph_id, graph_args, descriptors, graph_values in tasks:
+                for attribute, descriptor in descriptors.items():
+                    old_shared_array = attached_arrays.pop((attribute, graph_id), None)
+                    array = None
+                    if descriptor is not None:
+                        shared_array = SharedArray.attach(descriptor)
+                        attached_arrays[(attribute, graph_id)] = shared_array
+                        array = shared_array.array
+                    _set_graph_value(learning_module, attribute, graph_id, array)
+                    if old_shared_array is not None:
+                        retired_arrays.append(old_shared_array)
+                for attribute, value in graph_values.items():
+                    _set_graph_value(learning_module, attribute, graph_id, value)
+
+                getattr(learning_module, method_name)(*args, *graph_args, graph_id)
+
+                new_arrays = {}
+                for attribute in shared_array_attributes:
+                    array = getattr(learning_module, attribute).get(graph_id)
+                    shared_array = attached_arrays.get((attribute, graph_id))
+                    if shared_array is not None and array is shared_array.array:
+                        continue
+                    if (
+                        shared_array is not None
+                        and array is not None
+                        and array.shape == shared_array.array.shape
+                        and array.dtype == shared_array.array.dtype
+                    ):
+                        # Write the update into shared memory so the owner sees it.
+                        shared_array.array[...] = array
+                        _set_graph_value(
+                            learning_module, attribute, graph_id, shared_array.array
+                        )
+                    else:
+                        new_arrays[attribute] = (
+                            None if array is None else np.asarray(array)
+                        )
+                results.append(
+                    (
+                        graph_id,
+                        {
+                            attribute: getattr(learning_module, attribute).get(graph_id)
+                            for attribute in graph_values
+                        },
+                        new_arrays,
+                    )
+                )
+            connection.send(("ok", results))
+        except Exception:  # noqa: BLE001
+            # Send the error to the owner process which raises it.
+            connection.send(("error", traceback.format_exc()))
+        retired_arrays[:] = [
+            shared_array
+            for shared_array in retired_arrays
+            if not shared_array.release()
+        ]
+    connection.close()
+
+
+def _stop_process_pool_workers(workers):
+    for _, connection in workers:
+        with contextlib.suppress(OSError):
+            connection.send(None)
+    for process, connection in workers:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+        connection.close()
+    workers.clear()
+
+
+def _shutdown_process_pool(owner_pid, workers, shared_arrays, retired_arrays):
+    if os.getpid() != owner_pid:
+        # Forked workers inherit the executor but must not free the owner's memory.
+        return
+    _stop_process_pool_workers(workers)
+    for shared_array in shared_arrays.values():
+        shared_array.unlink()
+        shared_array.release()
+    shared_arrays.clear()
+    for shared_array in retired_arrays:
+        shared_array.release()
+    retired_arrays.clear()
+
+
+EVIDENCE_UPDATE_EXECUTORS = {
+    "serial": SerialEvidenceUpdateExecutor,
+    "threads": ThreadPerGraphEvidenceUpdateExecutor,
+    "thread_pool": ThreadPoolEvidenceUpdateExecutor,
+    "process_pool": ProcessPoolEvidenceUpdateExecutor,
+}
@@ -67,6 +67,15 @@ class MontyForGraphMatching(MontyBase):
             f"Models in memory: {self.learning_modules[0].get_all_known_object_ids()}"
         )
 
+    def _receive_vote(self, lm, lm_id, combined_votes):
+        """Send the combined votes to an LM and update its stats.
+
+        Only changes the given LM, so it can be run in parallel for different LMs.
+        """
+        logging.debug(f"------ Sending votes to LM {lm_id} -------")
+        self.send_vote_to_lm(lm, lm_id, combined_votes)
+        self.update_stats_after_vote(lm)
+
     def send_vote_to_lm(self, lm, lm_id, combined_votes):
         """Route correct votes to a given LM."""
         logging.debug(
@@ -223,7 +232,11 @@ class MontyForGraphMatching(MontyBase):
     # ------------------- Main Algorithm -----------------------
 
     def _step_learning_modules(self):
-        """Collect inputs and step each learning module."""
+        """Collect inputs and step each learning module.
+
+        The learning modules that have inputs are stepped by the lm_scheduler.
+        """
+        stepped_lms, stepped_lm_inputs = [], []
         for i in range(len(self.learning_modules)):
             sensory_inputs = self._collect_inputs_to_lm(i)
             # If LM has any inputs, take a step
@@ -236,14 +249,8 @@ class MontyForGraphMatching(MontyBase):
                         f"Sending input from {input_channels}"
                         f" to {self.learning_modules[i].learning_module_id}"
                     )
-                lm_step_method = getattr(self.learning_modules[i], self.step_type)
-                assert callable(lm_step_method), f"{lm_step_method} must be callable"
-                lm_step_method(sensory_inputs)
-                if self.step_type == "matching_step":
-                    logging.debug(f"Stepping learning module {i}")
-                self.learning_modules[i].add_lm_processing_to_buffer_stats(
-                    lm_processed=True
-                )
+                stepped_lms.append(self.learning_modules[i])
+                stepped_lm_inputs.append(sensory_inputs)
             else:
                 if self.step_type == "matching_step":
                     logging.info(f"Skipping step on learning module {i}")
@@ -263,6 +270,24 @@ class MontyForGraphMatching(MontyBase):
                 self.learning_modules[i].stepwise_targets_list.append(
                     self.learning_modules[i].stepwise_target_object
                 )
+        self.lm_scheduler.map(
+            self._step_learning_module, stepped_lms, stepped_lm_inputs
+        )
+
+    def _step_learning_module(self, learning_module, sensory_inputs):
+        """Step a learning module that has inputs.
+
+        Only changes the given learning module, so it can be run in parallel for
+        different learning modules.
+        """
+        lm_step_method = getattr(learning_module, self.step_type)
+        assert callable(lm_step_method), f"{lm_step_method} must be callable"
+        lm_step_method(sensory_inputs)
+        if self.step_type == "matching_step":
+            logging.debug(
+                f"Stepping learning module {learning_module.learning_module_id}"
+            )
+        learning_module.add_lm_processing_to_buffer_stats(lm_processed=True)
 
     def _get_union_of_possible_matches(self):
         """Take union of matches between LMs.
@@ -414,16 +439,17 @@ class MontyForGraphMatching(MontyBase):
         """Use lm_to_lm_vote_matrix to transmit votes between lms."""
         if self.lm_to_lm_vote_matrix is not None:
             # Send out votes
-            votes_per_lm = []
-            for i in range(len(self.learning_modules)):
-                votes_per_lm.append(self.learning_modules[i].send_out_vote())
+            votes_per_lm = self.lm_scheduler.map(
+                lambda lm: lm.send_out_vote(), self.learning_modules
+            )
 
             combined_votes = self._combine_votes(votes_per_lm)
             # Receive votes
-            for i in range(len(self.learning_modules)):
-                logging.debug(f"------ Sending votes to LM {i} -------")
-                self.send_vote_to_lm(self.learning_modules[i], i, combined_votes)
-                self.update_stats_after_vote(self.learning_modules[i])
+            self.lm_scheduler.map(
+                lambda lm, lm_id: self._receive_vote(lm, lm_id, combined_votes),
+                self.learning_modules,
+                range(len(self.learning_modules)),
+            )
 
         # Update IoPM, needed for checking terminal condition
         self.union_of_possible_matches = self._get_union_of_possible_matches()
@@ -0,0 +1,187 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Schedulers for running the learning modules of a Monty model.
+
+Within a step, the learning modules of a Monty model don't depend on each other
+until they vote. A scheduler calls a function once for each learning module, e.g.,
+to run their matching steps, send out their votes, or receive the combined votes,
+and returns the results in the order of the learning modules:
+
+- "serial": One learning module after the other in the main thread.
+- "thread_pool": A persistent pool of threads with one task per learning module.
+  Most of the work of a learning module happens in numpy and scipy calls that
+  release the GIL, so this lets the learning modules run at the same time.
+
+Learning modules usually share the random number generator of the experiment. To
+give the same results as running them serially, the "thread_pool" scheduler lets a
+learning module only use its `rng` once all learning modules before it are done.
+Since random numbers are mostly drawn at the end of a step (e.g. by the goal state
+generator), the bulk of the work still runs in parallel.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+
+class LMScheduler(ABC):
+    """Calls a function once for each learning module.
+
+    Schedulers are persistent and are reused across steps and episodes.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            num_workers: Number of parallel workers. If None, use one worker per
+                CPU. Ignored by schedulers that don't run in parallel.
+        """
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+
+    @abstractmethod
+    def map(
+        self,
+        function: Callable,
+        learning_modules: Sequence,
+        *iterables: Iterable,
+    ) -> List[Any]:
+        """Call function for each learning module and wait until all calls are done.
+
+        Like the builtin `map`, the learning module is passed as first argument and
+        the nth element of each iterable as further arguments. The function may only
+        change the learning module it is called with.
+
+        Args:
+            function: The function to call.
+            learning_modules: The learning modules to call the function for.
+            *iterables: Additional arguments, one element per learning module.
+
+        Returns:
+            The return values of all calls, in the order of learning_modules.
+        """
+
+    def close(self) -> None:  # noqa: B027
+        """Release all resources held by the scheduler."""
+        pass
+
+
+class SerialLMScheduler(LMScheduler):
+    """Runs one learning module after the other in the calling thread."""
+
+    def map(self, function, learning_modules, *iterables):
+        return list(map(function, learning_modules, *iterables))
+
+
+class ThreadPoolLMScheduler(LMScheduler):
+    """Runs the learning modules in a persistent pool of threads."""
+
+    def __init__(self, num_workers=None):
+        super().__init__(num_workers)
+        self._pool = None
+
+    def map(self, function, learning_modules, *iterables):
+        learning_modules = list(learning_modules)
+        if len(learning_modules) < 2:
+            return list(map(function, learning_modules, *iterables))
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.num_workers,
+                thread_name_prefix="lm_scheduler",
+            )
+        turns = _Turns(len(learning_modules))
+        shared_rngs = {}
+        for i, learning_module in enumerate(learning_modules):
+            rng = getattr(learning_module, "rng", None)
+            if rng is not None:
+                shared_rngs[i] = rng
+                learning_module.rng = _OrderedRandomState(rng, turns, i)
+        try:
+            # Tasks are started in order, so the learning modules a task may wait for
+            # in _OrderedRandomState are always already running.
+            futures = [
+                self._pool.submit(self._run, turns, i, function, *args)
+                for i, args in enumerate(zip(learning_modules, *iterables))
+            ]
+            # Re-raises exceptions of the workers in the calling thread.
+            return [future.result() for future in futures]
+        finally:
+            for i, rng in shared_rngs.items():
+                learning_modules[i].rng = rng
+
+    def __getstate__(self):
+        # The pool can't be copied or pickled. A copy starts its own pool.
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    @staticmethod
+    def _run(turns, index, function, *args) -> Any:
+        try:
+            return function(*args)
+        finally:
+            turns.finish(index)
+
+
+class _Turns:
+    """Keeps track of which of the tasks of a map call are done."""
+
+    def __init__(self, num_tasks):
+        self._done = [False] * num_tasks
+        self._num_leading_done = 0
+        self._condition = threading.Condition()
+
+    def finish(self, index):
+        with self._condition:
+            self._done[index] = True
+            while (
+                self._num_leading_done < len(self._done)
+                and self._done[self._num_leading_done]
+            ):
+                self._num_leading_done += 1
+            self._condition.notify_all()
+
+    def wait_for_predecessors(self, index):
+        """Wait until all tasks before index are done."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._num_leading_done >= index)
+
+
+class _OrderedRandomState:
+    """Gives a learning module access to a shared random generator in order.
+
+    Any attribute access (e.g. `rng.uniform`) waits until the learning modules
+    before this one are done, so random numbers are drawn in the same order as when
+    the learning modules run serially.
+    """
+
+    def __init__(self, rng, turns, index):
+        self._rng = rng
+        self._turns = turns
+        self._index = index
+
+    def __getattr__(self, name):
+        self._turns.wait_for_predecessors(self._index)
+        return getattr(self._rng, name)
+
+
+LM_SCHEDULERS = {
+    "serial": SerialLMScheduler,
+    "thread_pool": ThreadPoolLMScheduler,
+}
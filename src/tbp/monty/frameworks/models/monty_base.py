@@ -9,6 +9,7 @@
 # https://opensource.org/licenses/MIT.
 
 import logging
+from collections import defaultdict
 
 import numpy as np
 
@@ -19,6 +20,10 @@ from tbp.monty.frameworks.models.abstract_monty_classes import (
     Monty,
     SensorModule,
 )
+from tbp.monty.frameworks.models.evidence_update_executors import (
+    ProcessPoolEvidenceUpdateExecutor,
+)
+from tbp.monty.frameworks.models.lm_schedulers import LM_SCHEDULERS
 from tbp.monty.frameworks.models.motor_system import MotorSystem
 from tbp.monty.frameworks.models.states import State
 from tbp.monty.frameworks.utils.communication_utils import get_first_sensory_state
@@ -40,6 +45,8 @@ class MontyBase(Monty):
         min_train_steps,
         num_exploratory_steps,
         max_total_steps,
+        lm_scheduler="serial",
+        num_lm_scheduler_workers=None,
     ):
         """Initialize the base class.
 
@@ -71,6 +78,10 @@ class MontyBase(Monty):
             min_train_steps: Minimum number of steps required for training.
             num_exploratory_steps: Number of steps required by the exploratory phase.
             max_total_steps: Maximum number of steps to run the experiment.
+            lm_scheduler: How to run the steps and voting of the learning modules.
+                See `lm_schedulers.py` for the options. Defaults to "serial".
+            num_lm_scheduler_workers: Number of workers of the lm_scheduler. If
+                None, use one worker per CPU.
 
         Raises:
             ValueError: If `sm_to_lm_matrix` is not defined
@@ -78,6 +89,8 @@ class MontyBase(Monty):
                 do not match
             ValueError: If the keys of `sm_to_agent_dict` do not match the
                 `sensor_module_id`s of `sensor_modules`
+            ValueError: If the "thread_pool" lm_scheduler is used with learning
+                modules that fork evidence update workers
         """
         # Basic instance attributes
         self.sensor_modules = sensor_modules
@@ -93,6 +106,22 @@ class MontyBase(Monty):
         self.min_train_steps = min_train_steps
         self.num_exploratory_steps = num_exploratory_steps
         self.max_total_steps = max_total_steps
+        # The process pool forks its workers lazily from the thread that steps the
+        # LM. Forking while the threads of other LMs are running can deadlock.
+        if lm_scheduler == "thread_pool" and any(
+            isinstance(
+                getattr(lm, "evidence_update_executor", None),
+                ProcessPoolEvidenceUpdateExecutor,
+            )
+            for lm in learning_modules
+        ):
+            raise ValueError(
+                'The "thread_pool" lm_scheduler can\'t be used with the '
+                '"process_pool" evidence_update_executor.'
+            )
+        self.lm_scheduler = LM_SCHEDULERS[lm_scheduler](
+            num_workers=num_lm_scheduler_workers
+        )
 
         # Counters, logging, default step_type
         self.step_type = "matching_step"
@@ -149,10 +178,21 @@ class MontyBase(Monty):
             raise ValueError(f"step type {self.step_type} not found in base monty")
 
     def aggregate_sensory_inputs(self, observation):
-        sensor_module_outputs = []
+        raw_observations = []
+        sensor_module_groups = defaultdict(list)
         for sensor_module in self.sensor_modules:
             raw_obs = self.get_observations(observation, sensor_module.sensor_module_id)
+            raw_observations.append(raw_obs)
             sensor_module.update_state(self.get_agent_state())
+            sensor_module_groups[type(sensor_module)].append(len(raw_observations) - 1)
+        # Let sensor modules of the same class process their observations together
+        for sensor_module_class, sm_ids in sensor_module_groups.items():
+            sensor_module_class.prepare_step(
+                [self.sensor_modules[i] for i in sm_ids],
+                [raw_observations[i] for i in sm_ids],
+            )
+        sensor_module_outputs = []
+        for sensor_module, raw_obs in zip(self.sensor_modules, raw_observations):
             sm_output = sensor_module.step(raw_obs)
             sensor_module_outputs.append(sm_output)
         # Aggregate LM outputs here to be input to higher level LM at next step
@@ -203,9 +243,11 @@ class MontyBase(Monty):
         pass
 
     def _step_learning_modules(self):
-        for i in range(len(self.learning_modules)):
-            sensory_inputs = self._collect_inputs_to_lm(i)
-            getattr(self.learning_modules[i], self.step_type)(sensory_inputs)
+        self.lm_scheduler.map(
+            lambda lm, sensory_inputs: getattr(lm, self.step_type)(sensory_inputs),
+            self.learning_modules,
+            [self._collect_inputs_to_lm(i) for i in range(len(self.learning_modules))],
+        )
 
     def _collect_inputs_to_lm(self, lm_id):
         """Use sm_to_lm_matrix and lm_to_lm_matrix to collect inputs to LM i.
@@ -270,13 +312,18 @@ class MontyBase(Monty):
     def _vote(self):
         if self.lm_to_lm_vote_matrix is not None:
             # Send out votes
-            votes_per_lm = []
-            for i in range(len(self.learning_modules)):
-                votes_per_lm.append(self.learning_modules[i].send_out_vote())
+            votes_per_lm = self.lm_scheduler.map(
+                lambda lm: lm.send_out_vote(), self.learning_modules
+            )
             # Receive votes
-            for i in range(len(self.learning_modules)):
-                voting_data = [votes_per_lm[j] for j in self.lm_to_lm_vote_matrix[i]]
-                self.learning_modules[i].receive_votes(voting_data)
+            self.lm_scheduler.map(
+                lambda lm, voting_data: lm.receive_votes(voting_data),
+                self.learning_modules,
+                [
+                    [votes_per_lm[j] for j in self.lm_to_lm_vote_matrix[i]]
+                    for i in range(len(self.learning_modules))
+                ],
+            )
 
     def _pass_goal_states(self):
         """Pass goal states between learning modules.
@@ -358,6 +405,12 @@ class MontyBase(Monty):
         for sm in self.sensor_modules:
             sm.post_episode()
 
+    def close(self):
+        """Shut down the LM scheduler and the workers of all learning modules."""
+        self.lm_scheduler.close()
+        for lm in self.learning_modules:
+            lm.close()
+
     ###
     # Methods for saving and loading
     ###
@@ -57,7 +57,16 @@ from tbp.monty.frameworks.utils.transform_utils import scipy_to_numpy_quat
 
 
 class MotorPolicy(abc.ABC):
-    """The abstract scaffold for motor policies."""
+    """The abstract scaffold for motor policies.
+
+    Attributes:
+        depends_on_observations: Whether selecting an action needs the observations
+            or motor system state resulting from the previous action. If not, the
+            next action can be selected and applied while the current observations
+            are still being processed (see `EnvironmentDataLoader` prefetching).
+    """
+
+    depends_on_observations = True
 
     def __init__(self) -> None:
         self.is_predefined = False
@@ -145,6 +154,9 @@ class MotorPolicy(abc.ABC):
 
 
 class BasePolicy(MotorPolicy):
+    # Random or predefined actions ignore the observations and state.
+    depends_on_observations = False
+
     def __init__(
         self,
         rng,
@@ -394,6 +406,8 @@ class PositioningProcedure(BasePolicy):
     indicates that the procedure has terminated or truncated.
     """
 
+    depends_on_observations = True
+
     @abc.abstractmethod
     def positioning_call(
         self,
@@ -787,6 +801,8 @@ class InformedPolicy(BasePolicy, JumpToGoalStateMixin):
             get back on the object. TODO: Not used anywhere?
     """
 
+    depends_on_observations = True
+
     def __init__(
         self,
         min_perc_on_obj,
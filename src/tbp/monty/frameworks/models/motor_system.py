@@ -36,6 +36,11 @@ class MotorSystem:
         """Returns the last action taken by the motor system."""
         return self._policy.last_action
 
+    @property
+    def depends_on_observations(self) -> bool:
+        """Whether the motor policy needs the latest observations to select actions."""
+        return self._policy.depends_on_observations
+
     def post_episode(self) -> None:
         """Post episode hook."""
         self._policy.post_episode()
@@ -20,16 +20,14 @@ from sklearn.neighbors import kneighbors_graph
 from torch_geometric.data import Data
 
 from tbp.monty.frameworks.models.abstract_monty_classes import ObjectModel
+from tbp.monty.frameworks.models.voxel_stores import VOXEL_STORES, ArrayVoxelStore
 from tbp.monty.frameworks.utils.graph_matching_utils import get_correct_k_n
 from tbp.monty.frameworks.utils.object_model_utils import (
     NumpyGraph,
+    batched_pose_vector_mean,
     build_point_cloud_graph,
     circular_mean,
-    expand_index_dims,
-    get_most_common_bool,
-    get_values_from_dense_last_dim,
-    increment_sparse_tensor_by_count,
-    pose_vector_mean,
+    group_observations_by_voxel,
     remove_close_points,
     torch_graph_to_numpy,
 )
@@ -333,7 +331,14 @@ class GridObjectModel(GraphObjectModel):
         - remove .norm as attribute and store as feature instead?
     """
 
-    def __init__(self, object_id, max_nodes, max_size, num_voxels_per_dim):
+    def __init__(
+        self,
+        object_id,
+        max_nodes,
+        max_size,
+        num_voxels_per_dim,
+        voxel_store="arrays",
+    ):
         """Initialize a grid object model.
 
         Args:
@@ -344,23 +349,26 @@ class GridObjectModel(GraphObjectModel):
                 that can be represented and how locations are mapped into voxels.
             num_voxels_per_dim: number of voxels per dimension in the models grids.
                 Defines the resolution of the model.
+            voxel_store: How to store the content of the voxels of the model grid.
+                "arrays" stores one row per voxel with observations in NumPy arrays.
+                "sparse_tensor" uses 4d torch sparse tensors (legacy). Both give the
+                same results. See `VOXEL_STORES`.
+
+        Raises:
+            ValueError: If voxel_store is not known.
         """
+        if voxel_store not in VOXEL_STORES:
+            raise ValueError(f"Unknown voxel store: {voxel_store}")
         logging.info(f"init object model with id {object_id}")
         self.object_id = object_id
         self._graph = None
         self._max_nodes = max_nodes
         self._max_size = max_size  # 1=1meter
         self._num_voxels_per_dim = num_voxels_per_dim
-        # Sparse, 4d torch tensors that store content in the voxels of the model grid.
-        # number of observations in each voxel
-        self._observation_count = None
-        # Average features in each voxel with observations
-        # The first 3 dims are the 3d voxel indices, the forth dimensions are features
-        self._feature_grid = None
-        # Average location in each voxel with observations
-        # The first 3 dims are the 3d voxel indices, xyz in the fourth dimension is
-        # the average location in that voxel at float precision.
-        self._location_grid = None
+        self._voxel_store_type = voxel_store
+        # Number of observations, average location and average features in each
+        # voxel of the model grid with observations.
+        self._voxel_store = None
         # For backward compatibility. May remove later on.
         # This will be true if we load a pretrained graph. If True, grids are not
         # filled or used to constrain nodes in graph.
@@ -489,8 +497,8 @@ class GridObjectModel(GraphObjectModel):
         """Return a string representation of the object."""
         if self._graph is None:
             return f"Model for {self.object_id}:\n   No graph stored yet."
-        if self._feature_grid is not None:
-            grid_shape = self._feature_grid.shape
+        if self._voxel_store is not None:
+            grid_shape = self._voxel_store.shape
         else:
             grid_shape = 0
         repr_string = (
@@ -505,6 +513,24 @@ class GridObjectModel(GraphObjectModel):
 
         return repr_string
 
+    def __setstate__(self, state):
+        """Restore a pickled model, converting the grids of older versions.
+
+        Models saved before voxel stores were added kept their grids in sparse torch
+        tensors. These are converted into an `ArrayVoxelStore`.
+        """
+        if "_observation_count" in state:
+            state["_voxel_store_type"] = "arrays"
+            state["_voxel_store"] = None
+            observation_count = state.pop("_observation_count")
+            location_grid = state.pop("_location_grid")
+            feature_grid = state.pop("_feature_grid")
+            if observation_count is not None:
+                state["_voxel_store"] = ArrayVoxelStore.from_sparse_tensors(
+                    observation_count, location_grid, feature_grid
+                )
+        self.__dict__.update(state)
+
     # ======================= Private ==========================
     # ------------------- Main Algorithm -----------------------
     def _initialize_location_mapping(self, start_location):
@@ -524,22 +550,15 @@ class GridObjectModel(GraphObjectModel):
     def _initialize_and_fill_grid(
         self, locations, features, observation_feature_mapping
     ):
-        # TODO: Do we still need to do this with sparse tensors?
-        self._observation_count = self._generate_empty_grid(
-            self._num_voxels_per_dim, n_entries=1
-        )
         # initialize location mapping by calculating the scale factor and offset.
         # The offset is set such that the first observed location starts at the
         # center of the grid. To preserve the relative locations, the offset is
         # applied to all following locations.
         self._initialize_location_mapping(start_location=locations[0])
-        # initialize self._feature_grid with feat_dim calculated from features
+        # initialize self._voxel_store with feat_dim calculated from features
         feat_dim = features.shape[-1]
-        self._feature_grid = self._generate_empty_grid(
-            self._num_voxels_per_dim, n_entries=feat_dim
-        )
-        self._location_grid = self._generate_empty_grid(
-            self._num_voxels_per_dim, n_entries=3
+        self._voxel_store = VOXEL_STORES[self._voxel_store_type](
+            self._num_voxels_per_dim, feat_dim
         )
         # increment counters in observation_count
         self._update_grids(
@@ -567,9 +586,7 @@ class GridObjectModel(GraphObjectModel):
             )
             raise GridTooSmallError
         voxel_ids_of_new_obs = location_grid_ids[locations_in_bounds]
-        self._observation_count = increment_sparse_tensor_by_count(
-            self._observation_count, voxel_ids_of_new_obs
-        )
+        self._voxel_store.add_observations(voxel_ids_of_new_obs)
 
         # if new features contain input channel or features, add them to mapping
         if self.feature_mapping is not None:
@@ -578,84 +595,37 @@ class GridObjectModel(GraphObjectModel):
             updated_fm = feature_mapping
             new_feat_dim = features.shape[-1]
 
-        # Since we have dense entries in the last dimension that we want associated
-        # with the voxel id in the first 3 dims, we need to extract them a bit
-        # tediously to do the averaging. TODO: Maybe there is a better way to do this
-        new_features = []
-        previous_features_at_indices = []
-        new_locations = []
-        previous_locations_at_indices = []
-        new_indices = []
-
         locations = locations[locations_in_bounds]
         features = features[locations_in_bounds]
-        # update average features for each voxel with content
-        # The indices() function will give us the voxel indices that have values
-        voxels_with_values = self._observation_count.indices()
-        # Calculate average of new features and put in new_feature_grid
-        for voxel in zip(
-            voxels_with_values[0],
-            voxels_with_values[1],
-            voxels_with_values[2],
-        ):
-            observations_in_voxel_ids = np.where(
-                (voxel_ids_of_new_obs == voxel).all(axis=1)
-            )[0]
-            # Only update if there are new observations for this voxel
-            if len(observations_in_voxel_ids) > 0:
-                new_indices.append(np.array(voxel))
-                previous_loc_in_voxel = get_values_from_dense_last_dim(
-                    self._location_grid, voxel
-                )
-                previous_locations_at_indices.append(previous_loc_in_voxel)
-                locations_in_voxel = locations[observations_in_voxel_ids]
-                new_avg_location = self._get_new_voxel_location(
-                    locations_in_voxel,
-                    previous_loc_in_voxel,
-                    voxel,
-                )
-                new_locations.append(new_avg_location)
-
-                previous_feat_in_voxel = get_values_from_dense_last_dim(
-                    self._feature_grid, voxel
-                )
-
-                previous_features_at_indices.append(previous_feat_in_voxel)
-                features_in_voxel = features[observations_in_voxel_ids]
-                new_avg_feat = self._get_new_voxel_features(
-                    features_in_voxel,
-                    np.array(previous_feat_in_voxel),
-                    voxel,
-                    feature_mapping,
-                    updated_fm,
-                    new_feat_dim,
-                )
-                new_features.append(new_avg_feat)
-
-        (
-            prev_sparse_locs,
-            new_sparse_locs,
-        ) = self._old_new_lists_to_sparse_tensors(
-            indices=new_indices,
-            new_values=new_locations,
-            old_values=previous_locations_at_indices,
-            target_mat_shape=self._location_grid.shape,
+        # Average the new observations of all voxels with the same number of new
+        # observations at once.
+        new_indices, groups = group_observations_by_voxel(
+            voxel_ids_of_new_obs, self._num_voxels_per_dim
         )
-        # Subtract old locations since new ones already contain them in their average
-        # Don't just overwrite with new_sparse_locs since we may have voxels in the
-        # _location_grid that did not get updated and should not be set to 0 now.
-        self._location_grid = self._location_grid - prev_sparse_locs + new_sparse_locs
+        previous_locations_at_indices = self._voxel_store.get_locations(new_indices)
+        previous_features_at_indices = self._voxel_store.get_features(new_indices)
+        # Since the observation count already includes the new observations, a
+        # voxel had observations before if its count is > its number of new ones.
+        observation_counts = self._voxel_store.get_counts(new_indices)
+        new_locations = np.zeros((len(new_indices), 3))
+        new_features = np.zeros((len(new_indices), new_feat_dim))
+        for voxel_rows, observation_ids in groups:
+            has_previous = observation_counts[voxel_rows] > observation_ids.shape[1]
+            new_locations[voxel_rows] = self._get_new_voxel_locations(
+                locations[observation_ids],
+                previous_locations_at_indices[voxel_rows],
+                has_previous,
+            )
+            new_features[voxel_rows] = self._get_new_voxel_features(
+                features[observation_ids],
+                previous_features_at_indices[voxel_rows],
+                has_previous,
+                feature_mapping,
+                updated_fm,
+                new_feat_dim,
+            )
 
-        (
-            prev_sparse_feats,
-            new_sparse_feats,
-        ) = self._old_new_lists_to_sparse_tensors(
-            new_indices,
-            new_features,
-            previous_features_at_indices,
-            self._feature_grid.shape,
-        )
-        self._feature_grid = self._feature_grid - prev_sparse_feats + new_sparse_feats
+        self._voxel_store.set_values(new_indices, new_locations, new_features)
         self._current_feature_mapping = updated_fm
 
     def _build_graph_from_grids(self):
@@ -665,16 +635,9 @@ class GridObjectModel(GraphObjectModel):
             Graph with locations and features at the top k voxels with content.
         """
         top_voxel_idxs = self._get_top_k_voxel_indices()
-
-        locations_at_ids = self._location_grid.to_dense()[
-            top_voxel_idxs[0], top_voxel_idxs[1], top_voxel_idxs[2]
-        ]
-        features_at_ids = self._feature_grid.to_dense()[
-            top_voxel_idxs[0], top_voxel_idxs[1], top_voxel_idxs[2]
-        ]
         graph = build_point_cloud_graph(
-            locations=np.array(locations_at_ids),
-            features=np.array(features_at_ids),
+            locations=self._voxel_store.get_locations(top_voxel_idxs),
+            features=self._voxel_store.get_features(top_voxel_idxs),
             feature_mapping=self._current_feature_mapping,
         )
         # TODO: remove eventually and do search directly in grid?
@@ -689,7 +652,6 @@ class GridObjectModel(GraphObjectModel):
 
         This affects:
         - Graph node positions (`self._graph.pos`)
-        - Locations in the sparse `_location_grid`
 
         Args:
             scale_factor (float): Factor by which to scale all spatial data.
@@ -744,90 +706,99 @@ class GridObjectModel(GraphObjectModel):
             ]
         return feature_array, feature_mapping
 
-    def _generate_empty_grid(self, num_voxels, n_entries):
-        # NOTE: torch sparse is made for 2D tensors. We use it for 4D tensors.
-        # Some operations may not work as expected on these.
-        shape = (num_voxels, num_voxels, num_voxels, n_entries)
-        # Create empty sparse tensor
-        sparse_tensor = torch.sparse_coo_tensor(
-            torch.zeros((4, 0), dtype=torch.long), torch.tensor([]), size=shape
-        )
-        return sparse_tensor.coalesce()
-
-    def _get_new_voxel_location(
-        self, new_locations_in_voxel, previous_loc_in_voxel, voxel
+    def _get_new_voxel_locations(
+        self, new_locations_in_voxels, previous_locations, has_previous
     ):
-        """Calculate new average location for a voxel.
+        """Calculate new average locations for voxels with n new observations each.
+
+        Args:
+            new_locations_in_voxels: New locations in each voxel. shape=(V, n, 3)
+            previous_locations: Previous average location in each voxel.
+                shape=(V, 3)
+            has_previous: Whether there was a location stored in each voxel before.
+                shape=(V,)
 
         Returns:
-            New average location for a voxel.
+            New average location for each voxel. shape=(V, 3)
         """
-        avg_loc = np.mean(new_locations_in_voxel, axis=0)
+        avg_locs = np.mean(new_locations_in_voxels, axis=1)
         # Only average with previous location if there was one stored there before.
-        # since self._observation_count already includes the new observations it needs
-        # to be > the number of new observations in the voxel.
-        if self._observation_count[voxel[0], voxel[1], voxel[2], 0] > len(
-            new_locations_in_voxel
-        ):
-            # NOTE: could weight these
-            avg_loc = (avg_loc + previous_loc_in_voxel) / 2
-        return avg_loc
+        # NOTE: could weight these
+        avg_locs[has_previous] = (
+            avg_locs[has_previous] + previous_locations[has_previous]
+        ) / 2
+        return avg_locs
 
     def _get_new_voxel_features(
         self,
-        new_features_in_voxel,
-        previous_feat_in_voxel,
-        voxel,
+        new_features_in_voxels,
+        previous_features,
+        has_previous,
         obs_fm,
         target_fm,
         target_feat_dim,
     ):
-        """Calculate new average features for a voxel.
+        """Calculate new average features for voxels with n new observations each.
+
+        Args:
+            new_features_in_voxels: New features in each voxel. shape=(V, n, F)
+            previous_features: Previous average features in each voxel, ordered
+                according to self.feature_mapping.
+            has_previous: Whether there were features stored in each voxel before.
+                shape=(V,)
+            obs_fm: Feature mapping of the new features.
+            target_fm: Feature mapping of the returned features.
+            target_feat_dim: Dimension of the returned features.
 
         Returns:
-            New average features for a voxel.
+            New average features for each voxel. shape=(V, target_feat_dim)
         """
-        new_feature_avg = np.zeros(target_feat_dim)
+        new_feature_avg = np.zeros((new_features_in_voxels.shape[0], target_feat_dim))
         if ("pose_vectors" in obs_fm.keys()) and (
             "pose_fully_defined" in obs_fm.keys()
         ):
             # TODO: deal with case where not all of those keys are present
             pv_ids = obs_fm["pose_vectors"]
             pdefined_ids = obs_fm["pose_fully_defined"]
-            pose_vecs = new_features_in_voxel[:, pv_ids[0] : pv_ids[1]]
-            pdefined = new_features_in_voxel[:, pdefined_ids[0] : pdefined_ids[1]]
-            pv_mean, use_cds_to_update = pose_vector_mean(pose_vecs, pdefined)
+            pose_vecs = new_features_in_voxels[:, :, pv_ids[0] : pv_ids[1]]
+            pdefined = new_features_in_voxels[:, :, pdefined_ids[0] : pdefined_ids[1]]
+            pv_means, use_cds_to_update = batched_pose_vector_mean(pose_vecs, pdefined)
         for feature in obs_fm:
             ids = obs_fm[feature]
-            feats = new_features_in_voxel[:, ids[0] : ids[1]]
+            feats = new_features_in_voxels[:, :, ids[0] : ids[1]]
             if feature == "hsv":
-                avg_feat = np.zeros(3)
-                avg_feat[0] = circular_mean(feats[:, 0])
-                avg_feat[1:] = np.mean(feats[:, 1:], axis=0)
+                avg_feat = np.zeros((feats.shape[0], 3))
+                avg_feat[:, 0] = circular_mean(feats[:, :, 0], axis=1)
+                avg_feat[:, 1:] = np.mean(feats[:, :, 1:], axis=1)
             elif feature == "pose_vectors":
-                avg_feat = pv_mean
+                avg_feat = pv_means
             elif feature in ["on_object", "pose_fully_defined"]:
-                avg_feat = get_most_common_bool(feats)
+                # Most common value, True when there are equally many True as False
+                # entries (see get_most_common_bool).
+                avg_feat = np.sum(feats, axis=(1, 2)) >= np.sum(
+                    np.logical_not(feats), axis=(1, 2)
+                )
+                avg_feat = avg_feat[:, np.newaxis].astype(float)
                 # NOTE: object_id may need its own most common function until
                 # IDs actually represent similarities
             else:
-                avg_feat = np.mean(feats, axis=0)
+                avg_feat = np.mean(feats, axis=1)
             # Only take average if there was a feature stored here before.
-            # since self._observation_count already includes the new obs
-            # this needs to be > the number of new feature obs in the voxel.
-            if self._observation_count[voxel[0], voxel[1], voxel[2], 0] > len(feats):
+            if np.any(has_previous):
                 old_ids = self.feature_mapping[feature]
-                previous_average = previous_feat_in_voxel[old_ids[0] : old_ids[1],]
+                previous_average = previous_features[:, old_ids[0] : old_ids[1]]
 
                 if feature == "pose_vectors":
-                    if avg_feat is None:
-                        avg_feat = previous_average
-                    elif use_cds_to_update is False:
-                        avg_feat[3:] = previous_average[3:]
+                    no_new_average = has_previous & np.isnan(avg_feat[:, 0])
+                    avg_feat[no_new_average] = previous_average[no_new_average]
+                    keep_cds = has_previous & ~use_cds_to_update
+                    avg_feat[keep_cds, 3:] = previous_average[keep_cds, 3:]
                 # NOTE: could weight these
-                avg_feat = (avg_feat + previous_average) / 2
+                avg_feat[has_previous] = (
+                    avg_feat[has_previous] + previous_average[has_previous]
+                ) / 2
             target_ids = target_fm[feature]
-            new_feature_avg[target_ids[0] : target_ids[1]] = avg_feat
+            new_feature_avg[:, target_ids[0] : target_ids[1]] = avg_feat
         return new_feature_avg
 
     def _update_feature_mapping(self, new_fm):
@@ -857,17 +828,15 @@ class GridObjectModel(GraphObjectModel):
             less than k voxels with content.
 
         Returns:
-            Indices of the top k voxels with content.
+            Indices of the top k voxels with content. shape=(k, 3)
         """
-        num_non_zero_voxels = len(self._observation_count.values())
+        num_non_zero_voxels = len(self._voxel_store)
         if num_non_zero_voxels < self._max_nodes:
             print("There are less than max_nodes voxels with content.")
             k = num_non_zero_voxels
         else:
             k = self._max_nodes
-        _counts, top_k_indices = self._observation_count.values().topk(k)
-        indices_3d = self._observation_count.indices()[:3, top_k_indices]
-        return indices_3d
+        return self._voxel_store.get_top_k_voxels(k)
 
     def _locations_to_grid_ids(self, locations):
         """Convert locations to grid ids using scale_factor and location_offset.
@@ -881,33 +850,4 @@ class GridObjectModel(GraphObjectModel):
         )
         return location_grid_ids
 
-    def _old_new_lists_to_sparse_tensors(
-        self, indices, new_values, old_values, target_mat_shape
-    ):
-        """Turn two lists of old and new values into sparse tensors.
-
-        Args:
-            indices: list of indices of the form [x, y, z] (Will be expanded
-                to 4d for sparse tensor)
-            new_values: list of new values to be put into sparse tensor
-            old_values: list of old values to be put into another sparse tensor
-            target_mat_shape: shape of the two sparse tensors
-
-        Returns:
-            old_sparse_mat: Sparse tensor with old values.
-            new_sparse_mat: Sparse tensor with new values.
-        """
-        indices_4d = expand_index_dims(indices, last_dim_size=target_mat_shape[-1])
-        new_sparse_mat = torch.sparse_coo_tensor(
-            indices_4d,
-            np.array(new_values).flatten(),
-            target_mat_shape,
-        ).coalesce()
-        old_sparse_mat = torch.sparse_coo_tensor(
-            indices_4d,
-            np.array(old_values).flatten(),
-            target_mat_shape,
-        ).coalesce()
-        return old_sparse_mat, new_sparse_mat
-
     # ----------------------- Logging --------------------------
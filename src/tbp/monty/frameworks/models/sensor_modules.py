@@ -21,7 +21,9 @@ from tbp.monty.frameworks.utils.sensor_processing import (
     get_point_normal_naive,
     get_point_normal_ordinary_least_squares,
     get_point_normal_total_least_squares,
+    get_point_normals_total_least_squares_batch,
     get_principal_curvatures,
+    get_principal_curvatures_batch,
     log_sign,
     scale_clip,
 )
@@ -61,6 +63,9 @@ class DetailedLoggingSM(SensorModuleBase):
         self.pc1_is_pc2_threshold = pc1_is_pc2_threshold
         self.point_normal_method = point_normal_method
         self.weight_curvature = weight_curvature
+        # Point normal and curvatures of the next observation if they were
+        # already extracted together with other sensor modules, see prepare_step.
+        self._surface_geometry = None
 
     def state_dict(self):
         """Return state_dict."""
@@ -139,14 +144,19 @@ class DetailedLoggingSM(SensorModuleBase):
                 were ill-defined.
         """
         # ------------ Extract Morphological Features ------------
-        # Get point normal for graph matching with features
-        point_normal, valid_pn = self._get_point_normals(
-            obs_3d, sensor_frame_data, center_id, world_camera
-        )
+        if self._surface_geometry is not None and self._surface_geometry[0] is obs_3d:
+            point_normal, valid_pn, k1, k2, dir1, dir2, valid_pc = (
+                self._surface_geometry[1]
+            )
+        else:
+            # Get point normal for graph matching with features
+            point_normal, valid_pn = self._get_point_normals(
+                obs_3d, sensor_frame_data, center_id, world_camera
+            )
 
-        k1, k2, dir1, dir2, valid_pc = get_principal_curvatures(
-            obs_3d, center_id, point_normal, weighted=self.weight_curvature
-        )
+            k1, k2, dir1, dir2, valid_pc = get_principal_curvatures(
+                obs_3d, center_id, point_normal, weighted=self.weight_curvature
+            )
         # TODO: test using log curvatures instead
         if np.abs(k1 - k2) < self.pc1_is_pc2_threshold:
             pose_fully_defined = False
@@ -266,6 +276,7 @@ class DetailedLoggingSM(SensorModuleBase):
         else:
             invalid_signals = True
             morphological_features = {}
+        self._surface_geometry = None
 
         obs_3d_center = obs_3d[center_id]
         x, y, z, semantic_id = obs_3d_center
@@ -500,6 +511,54 @@ class HabitatDistantPatchSM(DetailedLoggingSM, NoiseMixin):
         self.processed_obs = []
         self.states = []
 
+    @classmethod
+    def prepare_step(cls, sensor_modules, data):
+        """Extract the surface geometry of all patches of the same size together.
+
+        Point normals (with TLS) and principal curvatures of patches that would be
+        processed one after another in step are calculated in a batch instead and
+        stored on each sensor module until its next step.
+
+        Args:
+            sensor_modules: Sensor modules of this class that are stepped next.
+            data: Raw observations of each of the sensor modules.
+        """
+        groups = {}
+        for sm, obs in zip(sensor_modules, data):
+            if sm.point_normal_method != "TLS" or "semantic_3d" not in obs:
+                continue
+            obs_3d = obs["semantic_3d"]
+            obs_dim = int(np.sqrt(obs_3d.shape[0]))
+            center_id = obs_dim // 2 + obs_dim * (obs_dim // 2)
+            if obs_3d[center_id, 3] or not sm.on_object_obs_only:
+                key = (obs_3d.shape, sm.weight_curvature)
+                groups.setdefault(key, []).append((sm, obs, center_id))
+        for (_, weight_curvature), group in groups.items():
+            if len(group) < 2:
+                continue
+            sms, obs, center_ids = zip(*group)
+            obs_3d = np.stack([o["semantic_3d"] for o in obs])
+            view_dirs = np.stack([o["world_camera"][:3, 2] for o in obs])
+            point_normals, valid_pns = get_point_normals_total_least_squares_batch(
+                obs_3d, center_ids, view_dirs
+            )
+            k1, k2, dir1, dir2, valid_pcs = get_principal_curvatures_batch(
+                obs_3d, center_ids, point_normals, weighted=weight_curvature
+            )
+            for i, sm in enumerate(sms):
+                sm._surface_geometry = (
+                    obs[i]["semantic_3d"],
+                    (
+                        point_normals[i],
+                        bool(valid_pns[i]),
+                        k1[i],
+                        k2[i],
+                        dir1[i],
+                        dir2[i],
+                        bool(valid_pcs[i]),
+                    ),
+                )
+
     def update_state(self, state):
         """Update information about the sensors location and rotation."""
         agent_position = state["position"]
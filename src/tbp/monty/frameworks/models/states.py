@@ -8,7 +8,7 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 
@@ -330,6 +330,118 @@ class GoalState(State):
         assert isinstance(self.info, dict), "info must be a dictionary"
 
 
+class PoseVotes:
+    """Votes of a learning module on the poses of one object.
+
+    Stores the hypotheses an LM votes on as arrays instead of as one `State` per
+    hypothesis, so that they can be sent, transformed, and received with a few
+    array operations. `from_states` and `to_states` convert from and to the list of
+    States format.
+
+    Attributes:
+        locations: Hypothesized locations of the sensor on the object. Shape=(V, 3).
+        pose_vectors: Hypothesized rotations of the object as pose vectors, i.e.,
+            the transposed rotation matrices, as in the morphological features of a
+            `State`. Shape=(V, 3, 3).
+        confidences: Scaled evidence for each hypothesis. Shape=(V,).
+    """
+
+    def __init__(self, locations, pose_vectors, confidences):
+        """Initialize votes."""
+        self.locations = locations
+        self.pose_vectors = pose_vectors
+        self.confidences = confidences
+
+    def __len__(self):
+        """Return the number of votes."""
+        return len(self.confidences)
+
+    def __repr__(self):
+        """Return a string representation of the object."""
+        return f"PoseVotes({len(self)} votes)"
+
+    @classmethod
+    def from_states(cls, states: List[State]) -> "PoseVotes":
+        """Create votes from a list of hypothesized states.
+
+        Args:
+            states: One State per hypothesis.
+
+        Returns:
+            The votes.
+        """
+        return cls(
+            locations=np.array([state.location for state in states]).reshape(-1, 3),
+            pose_vectors=np.array(
+                [state.get_pose_vectors() for state in states]
+            ).reshape(-1, 3, 3),
+            confidences=np.array([state.confidence for state in states]),
+        )
+
+    @classmethod
+    def concatenate(cls, votes: List["PoseVotes"]) -> "PoseVotes":
+        """Concatenate the votes of several LMs.
+
+        Returns:
+            Votes containing all given votes, in order.
+        """
+        return cls(
+            locations=np.concatenate([v.locations for v in votes]),
+            pose_vectors=np.concatenate([v.pose_vectors for v in votes]),
+            confidences=np.concatenate([v.confidences for v in votes]),
+        )
+
+    def transformed(self, translation=None, rotation=None) -> "PoseVotes":
+        """Return the votes with translation and/or rotation applied.
+
+        Same as `State.transform_morphological_features` for each vote, but doesn't
+        modify the votes themselves.
+
+        Args:
+            translation: Translation of all votes (shape=(3,)) or of each vote
+                (shape=(V, 3)).
+            rotation: Rotation matrix applied to the pose vectors of all votes.
+
+        Returns:
+            The transformed votes.
+        """
+        locations, pose_vectors = self.locations, self.pose_vectors
+        if translation is not None:
+            locations = locations + translation
+        if rotation is not None:
+            pose_vectors = np.matmul(rotation, pose_vectors)
+        return PoseVotes(locations, pose_vectors, self.confidences)
+
+    def to_states(self, sender_id: str) -> List[State]:
+        """Convert the votes to one State per vote.
+
+        Args:
+            sender_id: ID of the LM that sent the votes.
+
+        Returns:
+            The votes as hypothesized states. They don't share memory with the votes,
+            so they can be transformed in place.
+        """
+        return [
+            State(
+                location=location.copy(),
+                morphological_features={
+                    "pose_vectors": pose_vectors.copy(),
+                    "pose_fully_defined": True,
+                },
+                # No feature when voting.
+                non_morphological_features=None,
+                confidence=confidence,
+                use_state=True,
+                sender_id=sender_id,
+                sender_type="LM",
+            )
+            for location, pose_vectors, confidence in zip(
+                self.locations, self.pose_vectors, self.confidences
+            )
+        ]
+
+
 def encode_goal_state(goal_state: GoalState) -> Dict[str, Any]:
     """Encode a goal state into a dictionary.
 
@@ -0,0 +1,354 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Storage for the content of the voxel grid of a `GridObjectModel`.
+
+A voxel store holds the number of observations, the average location and the
+average features of each voxel of a (num_voxels_per_dim)^3 grid that contains
+observations. Voxels are addressed by their 3d index in the grid. How the content is
+stored is up to the store:
+
+- "arrays": Compact NumPy arrays with one row per occupied voxel, sorted by the flat
+  index of the voxels. Voxels are looked up with a binary search on the flat indices,
+  so memory only grows with the number of occupied voxels.
+- "sparse_tensor": Three 4d torch sparse COO tensors of shape
+  (num_voxels, num_voxels, num_voxels, n) (legacy behavior).
+
+Both stores give the same results.
+"""
+
+from __future__ import annotations
+
+import abc
+
+import numpy as np
+import torch
+
+from tbp.monty.frameworks.utils.object_model_utils import (
+    expand_index_dims,
+    get_values_at_voxels,
+    increment_sparse_tensor_by_count,
+)
+
+
+class VoxelStore(abc.ABC):
+    """Counts, average locations and average features of the voxels of a grid."""
+
+    def __init__(self, num_voxels_per_dim: int, feature_dim: int) -> None:
+        """Initialize an empty store.
+
+        Args:
+            num_voxels_per_dim: Number of voxels per dimension of the grid.
+            feature_dim: Number of feature values stored per voxel.
+        """
+        self.num_voxels_per_dim = num_voxels_per_dim
+        self.feature_dim = feature_dim
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Return the number of voxels with observations."""
+        pass
+
+    @property
+    def shape(self) -> tuple:
+        """Shape of the dense feature grid represented by the store."""
+        return (self.num_voxels_per_dim,) * 3 + (self.feature_dim,)
+
+    @abc.abstractmethod
+    def add_observations(self, voxels: np.ndarray) -> None:
+        """Increment the observation count of each voxel by its number of occurrences.
+
+        Args:
+            voxels: 3d voxel index of each observation. shape=(N, 3)
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_counts(self, voxels: np.ndarray) -> np.ndarray:
+        """Return the observation count of each voxel (0 if not occupied).
+
+        Returns:
+            Observation counts. shape=(V,)
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_locations(self, voxels: np.ndarray) -> np.ndarray:
+        """Return the average location in each voxel (0 if not set).
+
+        Returns:
+            Average locations. shape=(V, 3)
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_features(self, voxels: np.ndarray) -> np.ndarray:
+        """Return the average features in each voxel (0 if not set).
+
+        Returns:
+            Average features. shape=(V, feature_dim)
+        """
+        pass
+
+    @abc.abstractmethod
+    def set_values(
+        self, voxels: np.ndarray, locations: np.ndarray, features: np.ndarray
+    ) -> None:
+        """Overwrite the average location and features of voxels with observations.
+
+        Args:
+            voxels: Unique 3d voxel indices. shape=(V, 3)
+            locations: New average location of each voxel. shape=(V, 3)
+            features: New average features of each voxel. shape=(V, feature_dim)
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_top_k_voxels(self, k: int) -> np.ndarray:
+        """Return the k voxels with the highest observation counts.
+
+        Voxels are sorted by count. Ties are broken in the same way for all stores.
+
+        Returns:
+            3d indices of the top k voxels. shape=(k, 3)
+        """
+        pass
+
+
+class ArrayVoxelStore(VoxelStore):
+    """Stores one row per occupied voxel in compact NumPy arrays."""
+
+    def __init__(self, num_voxels_per_dim: int, feature_dim: int) -> None:
+        super().__init__(num_voxels_per_dim, feature_dim)
+        # Flat index of each occupied voxel, sorted in ascending order. The rows of
+        # all other arrays are in the same order.
+        self._voxel_ids = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._locations = np.zeros((0, 3))
+        self._features = np.zeros((0, feature_dim))
+
+    def __len__(self) -> int:
+        return len(self._voxel_ids)
+
+    def add_observations(self, voxels: np.ndarray) -> None:
+        voxel_ids, counts = np.unique(self._to_voxel_ids(voxels), return_counts=True)
+        rows = np.searchsorted(self._voxel_ids, voxel_ids)
+        is_new = ~self._is_stored(rows, voxel_ids)
+        self._counts[rows[~is_new]] += counts[~is_new]
+        # Insert new voxels such that the flat indices stay sorted.
+        new_rows = rows[is_new]
+        self._voxel_ids = np.insert(self._voxel_ids, new_rows, voxel_ids[is_new])
+        self._counts = np.insert(self._counts, new_rows, counts[is_new])
+        self._locations = np.insert(self._locations, new_rows, 0, axis=0)
+        self._features = np.insert(self._features, new_rows, 0, axis=0)
+
+    def get_counts(self, voxels: np.ndarray) -> np.ndarray:
+        return self._get_rows_values(self._counts, voxels)
+
+    def get_locations(self, voxels: np.ndarray) -> np.ndarray:
+        return self._get_rows_values(self._locations, voxels)
+
+    def get_features(self, voxels: np.ndarray) -> np.ndarray:
+        return self._get_rows_values(self._features, voxels)
+
+    def set_values(
+        self, voxels: np.ndarray, locations: np.ndarray, features: np.ndarray
+    ) -> None:
+        if features.shape[1] > self.feature_dim:
+            # New features were added to the model.
+            self._features = np.pad(
+                self._features, ((0, 0), (0, features.shape[1] - self.feature_dim))
+            )
+            self.feature_dim = features.shape[1]
+        rows = self._rows(voxels)
+        self._locations[rows] = locations
+        self._features[rows, : features.shape[1]] = features
+
+    def get_top_k_voxels(self, k: int) -> np.ndarray:
+        # Same as topk on the values of a coalesced sparse tensor, whose entries are
+        # also sorted by flat index. This keeps the order of equally often observed
+        # voxels (and therefore the order of the graph nodes) the same.
+        _counts, top_k_rows = torch.from_numpy(self._counts).topk(k)
+        return np.stack(
+            np.unravel_index(
+                self._voxel_ids[top_k_rows.numpy()], (self.num_voxels_per_dim,) * 3
+            ),
+            axis=1,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        num_voxels_per_dim: int,
+        voxels: np.ndarray,
+        counts: np.ndarray,
+        locations: np.ndarray,
+        features: np.ndarray,
+    ) -> ArrayVoxelStore:
+        """Create a store from the content of its occupied voxels.
+
+        Args:
+            num_voxels_per_dim: Number of voxels per dimension of the grid.
+            voxels: Unique 3d voxel indices. shape=(V, 3)
+            counts: Observation count of each voxel. shape=(V,)
+            locations: Average location of each voxel. shape=(V, 3)
+            features: Average features of each voxel. shape=(V, F)
+
+        Returns:
+            Store containing the voxels.
+        """
+        store = cls(num_voxels_per_dim, features.shape[1])
+        voxel_ids = store._to_voxel_ids(voxels)
+        order = np.argsort(voxel_ids)
+        store._voxel_ids = voxel_ids[order]
+        store._counts = np.asarray(counts, dtype=np.int64)[order]
+        store._locations = np.asarray(locations, dtype=float)[order]
+        store._features = np.asarray(features, dtype=float)[order]
+        return store
+
+    @classmethod
+    def from_sparse_tensors(
+        cls,
+        observation_count: torch.Tensor,
+        location_grid: torch.Tensor,
+        feature_grid: torch.Tensor,
+    ) -> ArrayVoxelStore:
+        """Create a store from the sparse tensors of a `SparseTensorVoxelStore`.
+
+        Used to load models that were saved with sparse tensor grids.
+
+        Args:
+            observation_count: Sparse tensor with the observation count of each voxel.
+            location_grid: Sparse tensor with the average location of each voxel.
+            feature_grid: Sparse tensor with the average features of each voxel.
+
+        Returns:
+            Store containing the voxels with observations.
+        """
+        observation_count = observation_count.coalesce()
+        voxels = observation_count.indices()[:3].numpy().T
+        return cls.from_arrays(
+            num_voxels_per_dim=observation_count.shape[0],
+            voxels=voxels,
+            counts=observation_count.values().numpy(),
+            locations=get_values_at_voxels(location_grid, voxels),
+            features=get_values_at_voxels(feature_grid, voxels),
+        )
+
+    def _to_voxel_ids(self, voxels):
+        return np.ravel_multi_index(
+            np.asarray(voxels, dtype=np.int64).T, (self.num_voxels_per_dim,) * 3
+        )
+
+    def _is_stored(self, rows, voxel_ids):
+        is_stored = rows < len(self._voxel_ids)
+        is_stored[is_stored] = self._voxel_ids[rows[is_stored]] == voxel_ids[is_stored]
+        return is_stored
+
+    def _rows(self, voxels):
+        """Return the rows of occupied voxels."""
+        voxel_ids = self._to_voxel_ids(voxels)
+        rows = np.searchsorted(self._voxel_ids, voxel_ids)
+        assert np.all(self._is_stored(rows, voxel_ids)), "voxels are not occupied"
+        return rows
+
+    def _get_rows_values(self, values, voxels):
+        voxel_ids = self._to_voxel_ids(voxels)
+        rows = np.searchsorted(self._voxel_ids, voxel_ids)
+        is_stored = self._is_stored(rows, voxel_ids)
+        result = np.zeros((len(voxel_ids), *values.shape[1:]), dtype=values.dtype)
+        result[is_stored] = values[rows[is_stored]]
+        return result
+
+
+class SparseTensorVoxelStore(VoxelStore):
+    """Stores counts, locations and features in 4d torch sparse COO tensors.
+
+    NOTE: torch sparse is made for 2D tensors. We use it for 4D tensors.
+    Some operations may not work as expected on these.
+    """
+
+    def __init__(self, num_voxels_per_dim: int, feature_dim: int) -> None:
+        super().__init__(num_voxels_per_dim, feature_dim)
+        # number of observations in each voxel
+        self.observation_count = self._generate_empty_grid(1)
+        # Average features in each voxel with observations
+        # The first 3 dims are the 3d voxel indices, the forth dimensions are features
+        self.feature_grid = self._generate_empty_grid(feature_dim)
+        # Average location in each voxel with observations
+        # The first 3 dims are the 3d voxel indices, xyz in the fourth dimension is
+        # the average location in that voxel at float precision.
+        self.location_grid = self._generate_empty_grid(3)
+
+    def __len__(self) -> int:
+        return len(self.observation_count.values())
+
+    def add_observations(self, voxels: np.ndarray) -> None:
+        self.observation_count = increment_sparse_tensor_by_count(
+            self.observation_count, voxels
+        )
+
+    def get_counts(self, voxels: np.ndarray) -> np.ndarray:
+        return get_values_at_voxels(self.observation_count, voxels)[:, 0].astype(int)
+
+    def get_locations(self, voxels: np.ndarray) -> np.ndarray:
+        return get_values_at_voxels(self.location_grid, voxels)
+
+    def get_features(self, voxels: np.ndarray) -> np.ndarray:
+        return get_values_at_voxels(self.feature_grid, voxels)
+
+    def set_values(
+        self, voxels: np.ndarray, locations: np.ndarray, features: np.ndarray
+    ) -> None:
+        # Subtract old values since new ones already contain them in their average
+        # Don't just overwrite with the new values since we may have voxels in the
+        # grids that did not get updated and should not be set to 0 now.
+        self.location_grid = (
+            self.location_grid
+            - self._to_sparse_tensor(voxels, self.get_locations(voxels), 3)
+            + self._to_sparse_tensor(voxels, locations, 3)
+        )
+        self.feature_grid = (
+            self.feature_grid
+            - self._to_sparse_tensor(
+                voxels, self.get_features(voxels), self.feature_dim
+            )
+            + self._to_sparse_tensor(voxels, features, self.feature_dim)
+        )
+
+    def get_top_k_voxels(self, k: int) -> np.ndarray:
+        _counts, top_k_indices = self.observation_count.values().topk(k)
+        return self.observation_count.indices()[:3, top_k_indices].numpy().T
+
+    def _generate_empty_grid(self, n_entries):
+        shape = (self.num_voxels_per_dim,) * 3 + (n_entries,)
+        # Create empty sparse tensor
+        sparse_tensor = torch.sparse_coo_tensor(
+            torch.zeros((4, 0), dtype=torch.long), torch.tensor([]), size=shape
+        )
+        return sparse_tensor.coalesce()
+
+    def _to_sparse_tensor(self, voxels, values, n_entries):
+        """Turn values at 3d voxel indices into a sparse tensor.
+
+        Returns:
+            Coalesced sparse tensor with the values in the last dimension.
+        """
+        indices_4d = expand_index_dims(voxels, last_dim_size=n_entries)
+        return torch.sparse_coo_tensor(
+            indices_4d,
+            np.array(values).flatten(),
+            (self.num_voxels_per_dim,) * 3 + (n_entries,),
+        ).coalesce()
+
+
+VOXEL_STORES = {
+    "arrays": ArrayVoxelStore,
+    "sparse_tensor": SparseTensorVoxelStore,
+}
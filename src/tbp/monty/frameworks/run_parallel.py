@@ -10,8 +10,10 @@
 
 import copy
 import os
+import queue
 import shutil
 import time
+import traceback
 from pathlib import Path
 from typing import List, Mapping, Optional
 
@@ -32,11 +34,19 @@ from tbp.monty.frameworks.experiments import (
 )
 from tbp.monty.frameworks.loggers.monty_handlers import (
     BasicCSVStatsHandler,
+    DetailedEpisodeLogHandler,
     DetailedJSONHandler,
     ReproduceEpisodeHandler,
 )
 from tbp.monty.frameworks.run import print_config
 from tbp.monty.frameworks.utils.dataclass_utils import config_to_dict
+from tbp.monty.frameworks.utils.episode_log import EPISODE_LOG_FILE_NAME
+from tbp.monty.frameworks.utils.model_store import (
+    MODEL_STORE_FILE_NAME,
+    convert_model_to_store,
+    get_model_file,
+    is_model_store,
+)
 
 """
 Just like run.py, but run episodes in parallel. Running in parallel is as simple as
@@ -55,8 +65,17 @@ Assumptions and notes:
     on SupervisedPreTraning. Some classes like ObjectRecognition are inherently
     not parallelizable because each episode depends on results from the previous.
 --- Testing is experimental and not yet tested.
+--- With `--share_pretrained_model`, the pretrained model of an evaluation is converted
+    once into a model store (see utils/model_store.py) that all workers memory map,
+    instead of each of them loading its own copy of model.pt.
+--- With `--persistent_workers`, each evaluation worker sets up its experiment (and
+    environment) once and then runs the episode configs it pulls from a queue,
+    resetting the experiment between them (see `MontyExperiment.reset_experiment`).
 """
 
+# Seconds to wait for a result before checking whether the workers are still alive
+RESULT_POLL_INTERVAL = 1.0
+
 
 def single_train(config):
     os.makedirs(config["logging_config"]["output_dir"], exist_ok=True)
@@ -75,6 +94,135 @@ def single_evaluate(config):
             return eval_stats
 
 
+def evaluate_in_persistent_worker(task_queue, result_queue):
+    """Evaluate the configs of a task queue with one experiment.
+
+    Pulls configs from task_queue until it gets None. The experiment is set up for the
+    first config and reset for each following one, so the environment and model are
+    only created once. After each config, ("done", eval_stats) is put into
+    result_queue, with eval_stats being None if the config doesn't log to wandb. If
+    a config fails, ("error", traceback) is put into result_queue and the worker
+    stops.
+
+    Args:
+        task_queue: Queue of configs to evaluate, ended by None.
+        result_queue: Queue to report the result of each config to.
+    """
+    exp = None
+    try:
+        for config in iter(task_queue.get, None):
+            os.makedirs(config["logging_config"]["output_dir"], exist_ok=True)
+            if exp is None:
+                exp = config["experiment_class"](config)
+                exp.setup_experiment(exp.config)
+            else:
+                exp.reset_experiment(config)
+            print("---------evaluating---------")
+            exp.evaluate()
+            eval_stats = None
+            if config["logging_config"]["log_parallel_wandb"]:
+                eval_stats = get_episode_stats(exp, "eval")
+            result_queue.put(("done", eval_stats))
+    except Exception:  # noqa: BLE001
+        result_queue.put(("error", traceback.format_exc()))
+    finally:
+        if exp is not None:
+            exp.close()
+
+
+def evaluate_with_persistent_workers(configs, num_parallel, is_unittest=False):
+    """Evaluate configs with workers that each reuse one experiment.
+
+    Args:
+        configs (List[Mapping]): Configs to evaluate.
+        num_parallel (int): Number of worker processes.
+        is_unittest (bool): Whether to run a single worker in this process instead.
+
+    Yields:
+        The eval stats of each config (see `evaluate_in_persistent_worker`), in the
+        order in which the configs finish.
+
+    Raises:
+        RuntimeError: If a worker failed to evaluate a config or exited before all
+            configs were evaluated.
+    """
+    if is_unittest:
+        task_queue, result_queue = queue.Queue(), queue.Queue()
+    else:
+        task_queue, result_queue = mp.Queue(), mp.Queue()
+    for config in configs:
+        task_queue.put(config)
+    for _ in range(num_parallel):
+        task_queue.put(None)
+
+    workers = []
+    if is_unittest:
+        evaluate_in_persistent_worker(task_queue, result_queue)
+    else:
+        for _ in range(num_parallel):
+            worker = mp.Process(
+                target=evaluate_in_persistent_worker, args=(task_queue, result_queue)
+            )
+            worker.start()
+            workers.append(worker)
+    status, num_finished = "done", 0
+    try:
+        while num_finished < len(configs):
+            try:
+                status, result = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                # A worker that crashed (e.g. was killed for running out of memory)
+                # never reports its config, so don't wait for it forever
+                exit_codes = [worker.exitcode for worker in workers]
+                crashed = any(code not in (None, 0) for code in exit_codes)
+                if not crashed and None in exit_codes:
+                    continue
+                status = "error"
+                result = (
+                    f"Workers exited with codes {exit_codes} after evaluating "
+                    f"{num_finished} of {len(configs)} configs"
+                )
+            if status == "error":
+                break
+            yield result
+            num_finished += 1
+    finally:
+        for worker in workers:
+            # Stop the other workers if a config failed or the results are not needed
+            if num_finished < len(configs):
+                worker.terminate()
+            worker.join()
+    if status == "error":
+        raise RuntimeError(f"Parallel evaluation worker failed:\n{result}")
+
+
+def log_parallel_eval_stats(run, results, start_time, num_parallel):
+    """Log the eval stats of each episode and the overall stats to wandb.
+
+    Args:
+        run: wandb run to log to.
+        results: Iterable of the eval stats of each episode.
+        start_time (float): Time at which the parallel evaluation started.
+        num_parallel (int): Number of parallel processes.
+    """
+    all_episode_stats = {}
+    for result in results:
+        run.log(result)
+        if not all_episode_stats:  # first episode
+            for key in list(result.keys()):
+                all_episode_stats[key] = [result[key]]
+        else:
+            for key in list(result.keys()):
+                all_episode_stats[key].append(result[key])
+    overall_stats = get_overall_stats(all_episode_stats)
+    # episode/run_time is the sum over individual episode run times.
+    # when running parallel this may not be the actual run time so we
+    # log this here additionally.
+    overall_stats["overall/parallel_run_time"] = time.time() - start_time
+    overall_stats["overall/num_processes"] = num_parallel
+    run.log(overall_stats)
+
+
 def get_episode_stats(exp, mode):
     eval_stats = exp.monty_logger.get_formatted_overall_stats(mode, 0)
     exp.monty_logger.flush()
@@ -238,6 +386,15 @@ def post_parallel_eval(configs: List[Mapping], base_dir: str) -> None:
             post_parallel_log_cleanup(filenames, outfile, cat_fn=cat_files)
             continue
 
+        if issubclass(handler, DetailedEpisodeLogHandler):
+            # Records of episode logs are aligned, so the files can be concatenated
+            filenames = [
+                os.path.join(pdir, EPISODE_LOG_FILE_NAME) for pdir in parallel_dirs
+            ]
+            outfile = os.path.join(base_dir, EPISODE_LOG_FILE_NAME)
+            post_parallel_log_cleanup(filenames, outfile, cat_fn=cat_files)
+            continue
+
         if issubclass(handler, BasicCSVStatsHandler):
             filename = "eval_stats.csv"
             filenames = [os.path.join(pdir, filename) for pdir in parallel_dirs]
@@ -311,12 +468,54 @@ def post_parallel_train(configs: List[Mapping], base_dir: str) -> None:
             shutil.rmtree(pdir)
 
 
+def share_pretrained_model(configs: List[Mapping], shared_model_dir: str) -> bool:
+    """Let all parallel configs memory map the same copy of the pretrained model.
+
+    The pretrained model is loaded once in this process and saved as a model store
+    which the configs are then pointed to. The workers map the file instead of each
+    loading and deserializing model.pt, so they share the memory of the model arrays
+    and start their episodes faster. If the model already is a model store, or its
+    directory contains one, the configs just use that. Pretrained `GraphObjectModel`s
+    are still converted into `GridObjectModel`s by each worker that loads them into an
+    `EvidenceGraphLM` (see utils/model_store.py).
+
+    Args:
+        configs (List[Mapping]): Configs to run in parallel. Their model path is
+            updated in place.
+        shared_model_dir (str): Directory to save the model store in if it needs to be
+            converted.
+
+    Returns:
+        Whether a model store was written to shared_model_dir, which should be removed
+        once all configs were run.
+    """
+    model_path = configs[0]["experiment_args"]["model_name_or_path"]
+    if not model_path:
+        return False
+    model_path = get_model_file(model_path)
+    if is_model_store(model_path):
+        store_path = model_path
+        converted = False
+    else:
+        os.makedirs(shared_model_dir, exist_ok=True)
+        store_path = convert_model_to_store(
+            model_path, os.path.join(shared_model_dir, MODEL_STORE_FILE_NAME)
+        )
+        converted = True
+    print(f"Sharing pretrained model {store_path} between parallel workers")
+    for config in configs:
+        config["experiment_args"]["model_name_or_path"] = store_path
+    return converted
+
+
 def run_episodes_parallel(
     configs: List[Mapping],
     num_parallel: int,
     experiment_name: str,
     train: bool = True,
     is_unittest: bool = False,
+    share_model: bool = False,
+    persistent_workers: bool = False,
 ) -> None:
     """Run episodes in parallel.
 
@@ -328,6 +527,11 @@ def run_episodes_parallel(
         experiment_name (str): name of experiment
         train (bool): whether to run training or evaluation
         is_unittest (bool): whether to run in unittest mode
+        share_model (bool): whether evaluation workers should memory map a shared
+            copy of the pretrained model (see `share_pretrained_model`)
+        persistent_workers (bool): whether each evaluation worker should set up one
+            experiment and reuse it for all configs it runs (see
+            `evaluate_with_persistent_workers`)
     """
     # Use fewer processes if there are fewer configs than `num_parallel`.
     num_parallel = min(len(configs), num_parallel)
@@ -346,47 +550,56 @@ def run_episodes_parallel(
             id=configs[0]["logging_config"]["wandb_id"],
         )
     print(f"Wandb setup took {time.time() - start_time} seconds")
-    start_time = time.time()
-    # Avoid complications with unittests running in parallel and just do in serial
-    # but test the config gen and cleanup functions
-    if is_unittest:
-        run_fn = single_train if train else single_evaluate
-        for config in configs:
-            run_fn(config)
-    else:
-        with mp.Pool(num_parallel) as p:
-            if train:
-                # NOTE: since we don't use wandb logging for training right now
-                # it is also not covered here. Might want to add that in the future.
-                p.map(single_train, configs)
+    output_dir = configs[0]["logging_config"]["output_dir"]
+    base_dir = os.path.dirname(output_dir)
+    shared_model_dir = os.path.join(base_dir, "shared_model")
+    remove_shared_model = False
+    try:
+        if share_model and not train:
+            start_time = time.time()
+            remove_shared_model = share_pretrained_model(configs, shared_model_dir)
+            print(
+                f"Sharing the pretrained model took {time.time() - start_time} seconds"
+            )
+        start_time = time.time()
+        if persistent_workers and not train:
+            results = evaluate_with_persistent_workers(
+                configs, num_parallel, is_unittest
+            )
+            if configs[0]["logging_config"]["log_parallel_wandb"]:
+                log_parallel_eval_stats(run, results, start_time, num_parallel)
             else:
-                if configs[0]["logging_config"]["log_parallel_wandb"]:
-                    all_episode_stats = {}
-                    for result in p.imap(single_evaluate, configs):
-                        run.log(result)
-                        if not all_episode_stats:  # first episode
-                            for key in list(result.keys()):
-                                all_episode_stats[key] = [result[key]]
-                        else:
-                            for key in list(result.keys()):
-                                all_episode_stats[key].append(result[key])
-                    overall_stats = get_overall_stats(all_episode_stats)
-                    # episode/run_time is the sum over individual episode run times.
-                    # when running parallel this may not be the actual run time so we
-                    # log this here additionally.
-                    overall_stats["overall/parallel_run_time"] = (
-                        time.time() - start_time
-                    )
-                    overall_stats["overall/num_processes"] = num_parallel
-                    run.log(overall_stats)
+                for _ in results:
+                    pass
+        # Avoid complications with unittests running in parallel and just do in serial
+        # but test the config gen and cleanup functions
+        elif is_unittest:
+            run_fn = single_train if train else single_evaluate
+            for config in configs:
+                run_fn(config)
+        else:
+            with mp.Pool(num_parallel) as p:
+                if train:
+                    # NOTE: since we don't use wandb logging for training right now
+                    # it is also not covered here. Might want to add that in the future.
+                    p.map(single_train, configs)
                 else:
-                    p.map(single_evaluate, configs)
-    end_time = time.time()
+                    if configs[0]["logging_config"]["log_parallel_wandb"]:
+                        log_parallel_eval_stats(
+                            run,
+                            p.imap(single_evaluate, configs),
+                            start_time,
+                            num_parallel,
+                        )
+                    else:
+                        p.map(single_evaluate, configs)
+        end_time = time.time()
+    finally:
+        # Also remove the shared model if a worker failed
+        if remove_shared_model:
+            shutil.rmtree(shared_model_dir)
     total_time = end_time - start_time
 
-    output_dir = configs[0]["logging_config"]["output_dir"]
-    base_dir = os.path.dirname(output_dir)
-
     if train:
         post_parallel_train(configs, base_dir)
         if configs[0]["logging_config"]["log_parallel_wandb"]:
@@ -563,6 +776,8 @@ def main(
     quiet_habitat_logs: bool = True,
     print_cfg: bool = False,
     is_unittest: bool = False,
+    share_model: bool = False,
+    persistent_workers: bool = False,
 ):
     """Run an experiment in parallel.
 
@@ -609,6 +824,13 @@ def main(
             False.
         is_unittest (bool): Whether to run in unittest mode. If `True`, parallel runs
             are done in serial. Defaults to False.
+        share_model (bool): Whether the evaluation workers should memory map one
+            shared copy of the pretrained model instead of each loading it from
+            model.pt. Defaults to False.
+        persistent_workers (bool): Whether each evaluation worker should set up its
+            experiment and environment once and reuse it for all the episode configs
+            it runs, instead of setting up a new experiment for each of them.
+            Defaults to False.
     """
     # Handle args passed directly (only used by unittest) or command line (normal)
     if experiment:
@@ -622,6 +844,8 @@ def main(
         num_parallel = cmd_args.num_parallel
         quiet_habitat_logs = cmd_args.quiet_habitat_logs
         print_cfg = cmd_args.print_cfg
+        share_model = cmd_args.share_pretrained_model
+        persistent_workers = cmd_args.persistent_workers
         is_unittest = False
 
     if quiet_habitat_logs:
@@ -672,4 +896,6 @@ def main(
                 experiment,
                 train=False,
                 is_unittest=is_unittest,
+                share_model=share_model,
+                persistent_workers=persistent_workers,
             )
@@ -0,0 +1,81 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Binary encoding of arrays sent between processes, e.g. by the robot's servers.
+
+An array is sent as a message dict holding its raw bytes and the dtype and shape
+needed to interpret them, instead of as nested Python lists. Messages only contain
+strings, lists, booleans, and bytes, so any Pyro5 serializer can send them.
+
+Note:
+    The servers in `scripts/servers` run on the robot's Raspberry Pis, where tbp.monty
+    isn't installed. They download this file and import it as a standalone module, so
+    it may only import numpy and the standard library.
+"""
+
+from __future__ import annotations
+
+import base64
+import zlib
+
+import numpy as np
+
+COMPRESSION_LEVEL = 1
+
+
+def encode_array(array: np.ndarray, compress: bool = False) -> dict:
+    """Encode an array as a message.
+
+    Args:
+        array: The array to encode.
+        compress: Whether to compress the bytes of the array with zlib. Worth it for
+            slow networks, not for large, noisy float images.
+
+    Returns:
+        The message, i.e., a dict with the dtype, shape, compression, and bytes of
+        the array.
+    """
+    data = np.ascontiguousarray(array).tobytes()
+    if compress:
+        data = zlib.compress(data, COMPRESSION_LEVEL)
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "compression": "zlib" if compress else None,
+        "data": data,
+    }
+
+
+def decode_array(message: dict) -> np.ndarray:
+    """Decode a message created by `encode_array`.
+
+    The returned array is a read only view of the bytes of the message, so decoding
+    an uncompressed message doesn't copy any data.
+
+    Args:
+        message: The message to decode.
+
+    Returns:
+        The decoded array.
+
+    Raises:
+        ValueError: If the message uses an unknown compression.
+    """
+    data = message["data"]
+    if isinstance(data, dict) and data.get("encoding") == "base64":
+        # Pyro5's default serpent serializer sends bytes as base64 encoded strings
+        data = base64.b64decode(data["data"])
+    compression = message.get("compression")
+    if compression == "zlib":
+        data = zlib.decompress(data)
+    elif compression is not None:
+        raise ValueError(f"Unknown compression {compression}")
+    return np.frombuffer(data, dtype=np.dtype(message["dtype"])).reshape(
+        message["shape"]
+    )
@@ -0,0 +1,353 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Append-only binary log of detailed episode stats.
+
+`DetailedJSONHandler` writes each episode as a single line of JSON, so every
+evidence and possible location array of every step becomes text, and reading any
+of it means parsing the whole line. An episode log instead stores each episode as
+a sequence of records that are appended to the file as the stats are traversed:
+
+- an episode record with the key of the episode,
+- one record per numeric array with its path in the stats (e.g.
+  `["LM_0", "evidences", 12, "mug"]`), dtype and shape, followed by the raw data,
+- one record per other value (strings, numbers, actions, lists of mixed types,
+  ...) with its path, followed by the value encoded as JSON with `BufferEncoder`.
+
+Lists of numbers and lists of equally shaped arrays are stored as a single array.
+All records are 8 byte aligned, so log files can be concatenated (as done for
+parallel runs) and the arrays can be memory mapped. The index of the records is
+built by :class:`EpisodeLog` from their headers only, so single steps, objects or
+fields can be loaded lazily as views of the memory mapped file.
+
+Existing JSON logs can be converted with::
+
+    python -m tbp.monty.frameworks.utils.episode_log path/to/detailed_run_stats.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from tbp.monty.frameworks.models.buffer import BufferEncoder
+
+__all__ = [
+    "EPISODE_LOG_FILE_NAME",
+    "EpisodeLog",
+    "EpisodeLogWriter",
+    "convert_json_log",
+    "load_episode_log",
+]
+
+EPISODE_LOG_FILE_NAME = "detailed_run_stats.bin"
+
+_MAGIC = b"MEL\x01"
+# magic, record kind, size of the JSON metadata, size of the payload
+_HEADER = struct.Struct("<4sB3xIQ")
+_ALIGNMENT = 8
+
+_EPISODE = 0
+_ARRAY = 1
+_JSON = 2
+
+
+def _padding(size):
+    return b"\x00" * (-size % _ALIGNMENT)
+
+
+def _as_numeric_array(value):
+    """Return a list of numbers or equally shaped arrays as one array, else None."""
+    if len(value) == 0:
+        return None
+    try:
+        array = np.asarray(value)
+    except (ValueError, TypeError):
+        # e.g. lists of arrays with different shapes
+        return None
+    if array.dtype.kind not in "biufc":
+        return None
+    return array
+
+
+class EpisodeLogWriter:
+    """Appends episodes to an episode log file.
+
+    Example::
+
+        with EpisodeLogWriter("detailed_run_stats.bin") as writer:
+            writer.write_episode(0, episode_stats)
+
+    Attributes:
+        log_file: Path of the episode log. Episodes are appended if it exists.
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self._file = open(log_file, "ab")  # noqa: SIM115
+        if self._file.tell() % _ALIGNMENT != 0:
+            self._file.close()
+            raise ValueError(f"{log_file} is not an episode log")
+
+    def write_episode(self, key, stats):
+        """Append the stats of an episode.
+
+        The stats are written one record at a time while traversing them, without
+        copying them or building the whole episode in memory first.
+
+        Args:
+            key: Key of the episode, e.g. the total number of episodes.
+            stats: Nested dictionaries and lists of stats. Dictionary keys are
+                converted to strings, as in JSON.
+        """
+        self._write_record(_EPISODE, {"key": str(key)})
+        self._write_value([], stats)
+        self._file.flush()
+
+    def _write_value(self, path, value):
+        if isinstance(value, np.ndarray) and value.dtype.kind in "biufc":
+            self._write_array(path, value)
+        elif type(value) is dict and len(value) > 0:
+            for key, val in value.items():
+                self._write_value(path + [str(key)], val)
+        elif isinstance(value, (list, tuple)) and len(value) > 0:
+            array = _as_numeric_array(value)
+            if array is not None:
+                self._write_array(path, array)
+            elif any(isinstance(val, (dict, list, tuple, np.ndarray)) for val in value):
+                for index, val in enumerate(value):
+                    self._write_value(path + [index], val)
+            else:
+                self._write_json(path, value)
+        else:
+            self._write_json(path, value)
+
+    def _write_array(self, path, array):
+        meta = {"path": path, "dtype": array.dtype.str, "shape": list(array.shape)}
+        self._write_record(_ARRAY, meta, np.ascontiguousarray(array).data)
+
+    def _write_json(self, path, value):
+        payload = json.dumps(value, cls=BufferEncoder).encode()
+        self._write_record(_JSON, {"path": path}, payload)
+
+    def _write_record(self, kind, meta, payload=b""):
+        meta = json.dumps(meta).encode()
+        payload = memoryview(payload).cast("B")
+        header = _HEADER.pack(_MAGIC, kind, len(meta), payload.nbytes)
+        self._file.write(header)
+        self._file.write(meta)
+        self._file.write(_padding(len(header) + len(meta)))
+        self._file.write(payload)
+        self._file.write(_padding(payload.nbytes))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class EpisodeLog:
+    """Lazy reader of an episode log.
+
+    Opening a log memory maps the file and reads the headers of its records.
+    Values are only decoded when requested, and arrays are read-only views of the
+    file. Episodes are numbered in the order they were appended, like the lines
+    read by `deserialize_json_chunks`.
+
+    Example::
+
+        log = EpisodeLog("detailed_run_stats.bin")
+        evidences = log.get(0, "LM_0", "evidences", 12, "mug")
+
+    Attributes:
+        log_file: Path of the episode log.
+        episode_keys: Key each episode was written with.
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.episode_keys = []
+        # Per episode: path -> (kind, payload offset, payload size, meta)
+        self._records = []
+        # Per episode: path -> keys of its children, in the order they were written
+        self._children = []
+        size = Path(log_file).stat().st_size
+        self._buffer = np.memmap(log_file, dtype=np.uint8, mode="r") if size else b""
+        self._read_index(size)
+
+    def _read_index(self, size):
+        offset = 0
+        while offset < size:
+            if offset + _HEADER.size > size:
+                logging.warning(f"Ignoring truncated record at the end of {self}")
+                break
+            magic, kind, meta_size, payload_size = _HEADER.unpack_from(
+                self._buffer, offset
+            )
+            if magic != _MAGIC:
+                raise ValueError(f"{self.log_file} is not an episode log")
+            meta_offset = offset + _HEADER.size
+            payload_offset = meta_offset + meta_size
+            payload_offset += -payload_offset % _ALIGNMENT
+            next_offset = payload_offset + payload_size
+            next_offset += -next_offset % _ALIGNMENT
+            if next_offset > size:
+                logging.warning(f"Ignoring truncated record at the end of {self}")
+                break
+            meta = json.loads(
+                bytes(self._buffer[meta_offset : meta_offset + meta_size])
+            )
+            if kind == _EPISODE:
+                self.episode_keys.append(meta["key"])
+                self._records.append({})
+                self._children.append({})
+            elif not self._records:
+                raise ValueError(f"{self.log_file} does not start with an episode")
+            else:
+                path = tuple(meta["path"])
+                self._records[-1][path] = (kind, payload_offset, payload_size, meta)
+                children = self._children[-1]
+                for depth in range(len(path)):
+                    children.setdefault(path[:depth], {})[path[depth]] = None
+            offset = next_offset
+
+    def __len__(self):
+        return len(self.episode_keys)
+
+    def __repr__(self):
+        return f"EpisodeLog({self.log_file!r})"
+
+    def keys(self, episode, *path):
+        """Return the keys or list indices one level below a path of an episode.
+
+        Raises:
+            KeyError: If the episode has no nested stats at this path.
+        """
+        children = self._children[episode].get(path)
+        if children is None:
+            raise KeyError(path)
+        return list(children)
+
+    def get(self, episode, *path):
+        """Load the stats at a path of an episode.
+
+        Args:
+            episode: Index of the episode in the log.
+            *path: Dictionary keys (strings) and list indices (ints) leading to the
+                stats to load, e.g. `"LM_0", "evidences", 12, "mug"`. If empty, all
+                stats of the episode are loaded.
+
+        Returns:
+            The stats at the path. Arrays are read-only views of the log file,
+            other values are decoded from JSON.
+
+        Raises:
+            KeyError: If the episode has no stats at this path.
+        """
+        record = self._records[episode].get(path)
+        if record is not None:
+            return self._read_record(*record)
+        children = self._children[episode].get(path)
+        if children is None:
+            raise KeyError(path)
+        keys = list(children)
+        if all(isinstance(key, int) for key in keys):
+            return [self.get(episode, *path, index) for index in sorted(keys)]
+        return {key: self.get(episode, *path, key) for key in keys}
+
+    def load_episode(self, episode):
+        """Load all stats of an episode.
+
+        Returns:
+            The stats of the episode.
+        """
+        return self.get(episode)
+
+    def _read_record(self, kind, offset, size, meta):
+        data = self._buffer[offset : offset + size]
+        if kind == _ARRAY:
+            dtype = np.dtype(meta["dtype"])
+            return np.asarray(data).view(dtype).reshape(meta["shape"])
+        return json.loads(bytes(data))
+
+
+def load_episode_log(log_file, start=0, stop=None, episodes=None):
+    """Load episodes from an episode log, like `deserialize_json_chunks`.
+
+    Note:
+        The stats are not exactly the same as the ones loaded from a JSON log. Arrays
+        as well as lists of numbers and lists of equally shaped arrays are returned
+        as (read-only) NumPy arrays instead of (nested) lists. Use `np.array_equal`
+        or `.tolist()` on them where code expects lists.
+
+    Args:
+        log_file: Full path to the episode log.
+        start: Get episodes starting at this episode.
+        stop: Get episodes ending at this episode, not inclusive.
+        episodes: Iterable of ints with the episodes to get. Overrides start and
+            stop.
+
+    Returns:
+        Dictionary mapping the string of each episode index to its stats.
+    """
+    log = EpisodeLog(log_file)
+    if episodes is None:
+        episodes = range(len(log))[start:stop]
+    return {str(episode): log.load_episode(episode) for episode in episodes}
+
+
+def convert_json_log(json_file, log_file=None):
+    """Convert a detailed JSON log into an episode log.
+
+    The JSON log is read one line (episode) at a time.
+
+    Args:
+        json_file: Full path to the JSON log, e.g. detailed_run_stats.json.
+        log_file: Path of the episode log to write. Defaults to
+            `EPISODE_LOG_FILE_NAME` next to the JSON log.
+
+    Returns:
+        Path of the written episode log.
+    """
+    if log_file is None:
+        log_file = os.path.join(os.path.dirname(json_file), EPISODE_LOG_FILE_NAME)
+    temp_file = f"{log_file}.tmp"
+    with open(json_file, "r") as f, EpisodeLogWriter(temp_file) as writer:
+        for line in f:
+            if line.strip():
+                ((key, stats),) = json.loads(line).items()
+                writer.write_episode(key, stats)
+    Path(temp_file).replace(log_file)
+    return log_file
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a detailed JSON log into a binary episode log."
+    )
+    parser.add_argument("json_file", help="JSON log, e.g. detailed_run_stats.json")
+    parser.add_argument(
+        "--log_file",
+        default=None,
+        help=f"Output file. Defaults to {EPISODE_LOG_FILE_NAME} next to json_file",
+    )
+    args = parser.parse_args()
+    print(convert_json_log(args.json_file, args.log_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+from __future__ import annotations
+
+import math
 from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from typing import OrderedDict as OrderedDictType
@@ -77,6 +80,19 @@ class ChannelMapper:
                 return (start, start + size)
             start += size
 
+    def channel_ranges(self) -> Dict[str, Tuple[int, int]]:
+        """Returns the start and end indices of all channels.
+
+        Returns:
+            Dict[str, Tuple[int, int]]: Dictionary of {channel_name: (start, end)}.
+        """
+        ranges = {}
+        start = 0
+        for name, size in self.channel_sizes.items():
+            ranges[name] = (start, start + size)
+            start += size
+        return ranges
+
     def resize_channel_by(self, channel_name: str, value: int) -> None:
         """Increases or decreases the channel by a specific amount.
 
@@ -202,6 +218,35 @@ class ChannelMapper:
 
         return original
 
+    def compact(self, keep: np.ndarray) -> None:
+        """Shrinks each channel to the number of its hypotheses that are kept.
+
+        Used when hypotheses are removed from the stacked arrays, i.e., when the
+        arrays are replaced by `original[keep]`. Since the order of the hypotheses
+        doesn't change, the kept hypotheses of each channel stay consecutive.
+
+        Args:
+            keep (np.ndarray): Boolean mask over the hypotheses of all channels.
+                shape=(total_size,)
+
+        Raises:
+            ValueError: If the mask doesn't match the total size or if no hypothesis
+                would be left in a channel.
+        """
+        if keep.shape != (self.total_size,):
+            raise ValueError(
+                f"Mask of shape {keep.shape} doesn't match total size "
+                f"{self.total_size}."
+            )
+        new_sizes = {
+            channel: int(np.count_nonzero(keep[start:end]))
+            for channel, (start, end) in self.channel_ranges().items()
+        }
+        for channel, size in new_sizes.items():
+            if size == 0:
+                raise ValueError(f"Channel '{channel}' size cannot be zero.")
+        self.channel_sizes.update(new_sizes)
+
     def __repr__(self) -> str:
         """Returns a string representation of the current channel mapping.
 
@@ -210,3 +255,509 @@ class ChannelMapper:
         """
         ranges = {ch: self.channel_range(ch) for ch in self.channel_sizes}
         return f"ChannelMapper({ranges})"
+
+
+class StackedHypotheses:
+    """Stores the hypotheses of all graphs in contiguous arrays.
+
+    `EvidenceGraphLM` stores the locations, poses and evidence of the hypotheses in
+    one array per graph. Operations that look at the hypotheses of all graphs, such
+    as thresholding the possible matches, finding the most likely hypothesis or
+    selecting the hypotheses to vote on, therefore loop over the graphs, which
+    dominates their run time when many objects are in memory. This class stacks the
+    arrays of all graphs into one array of shape (N_total, ...) per attribute, such
+    that these operations can be done with single vectorized calls. Similar to how
+    hypotheses of different input channels are stacked within a graph, a
+    `ChannelMapper` with the graph ids as channel names keeps track of the range of
+    hypotheses of each graph.
+
+    The per-graph arrays are replaced by views into the stacked arrays. Per-graph
+    updates that write into these arrays in place therefore directly update the
+    stacked arrays. Per-graph arrays that were replaced by new arrays are copied into
+    the stacked arrays by the next call to `update`.
+    """
+
+    def __init__(self, attributes: List[str]) -> None:
+        """Initializes an empty stack.
+
+        Args:
+            attributes (List[str]): Names of the hypotheses attributes to stack,
+                i.e. `["possible_locations", "possible_poses", "evidence"]`.
+        """
+        self.attributes = attributes
+        self.graph_mapper = ChannelMapper()
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.graph_starts = np.zeros(0, dtype=int)
+        self._views: Dict[str, Dict[str, np.ndarray]] = {}
+
+    @property
+    def graph_ids(self) -> List[str]:
+        """Returns the ids of the stacked graphs in the order they are stacked in.
+
+        Returns:
+            List[str]: List of graph ids.
+        """
+        return self.graph_mapper.channels
+
+    def update(
+        self, hypotheses: Dict[str, Dict[str, np.ndarray]], graph_ids: List[str]
+    ) -> None:
+        """Stacks the hypotheses and replaces them by views into the stacked arrays.
+
+        Only arrays that are not yet views into the stacked arrays are copied. If the
+        graphs or the number of hypotheses of any graph changed, all arrays are
+        stacked again.
+
+        Args:
+            hypotheses (Dict[str, Dict[str, np.ndarray]]): Dictionary of
+                {attribute: {graph_id: array}} for all stacked attributes. The arrays
+                in these dictionaries are replaced by views into the stacked arrays.
+            graph_ids (List[str]): Ids of the graphs to stack.
+        """
+        if graph_ids != self.graph_ids:
+            self._stack(hypotheses, graph_ids)
+            return
+        changed = []
+        for attribute in self.attributes:
+            views = self._views[attribute]
+            for graph_id in graph_ids:
+                array = hypotheses[attribute][graph_id]
+                if array is views[graph_id]:
+                    continue
+                if array.shape != views[graph_id].shape:
+                    self._stack(hypotheses, graph_ids)
+                    return
+                changed.append((attribute, graph_id))
+        for attribute, graph_id in changed:
+            view = self._views[attribute][graph_id]
+            view[...] = hypotheses[attribute][graph_id]
+            hypotheses[attribute][graph_id] = view
+
+    def max_per_graph(self, attribute: str) -> np.ndarray:
+        """Returns the maximum value of an attribute for each graph.
+
+        Args:
+            attribute (str): Name of the stacked attribute, i.e. "evidence".
+
+        Returns:
+            np.ndarray: Maximum of each graph in the order of `graph_ids`.
+        """
+        return np.maximum.reduceat(self.arrays[attribute], self.graph_starts)
+
+    def locate(self, stack_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the graph and the index within the graph of stacked hypotheses.
+
+        Args:
+            stack_ids (np.ndarray): Indices into the stacked arrays.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices into `graph_ids` and indices of the
+                hypotheses within the arrays of their graph.
+        """
+        graph_indices = np.searchsorted(self.graph_starts, stack_ids, side="right") - 1
+        return graph_indices, stack_ids - self.graph_starts[graph_indices]
+
+    def _stack(
+        self, hypotheses: Dict[str, Dict[str, np.ndarray]], graph_ids: List[str]
+    ) -> None:
+        first_attribute = hypotheses[self.attributes[0]]
+        self.graph_mapper = ChannelMapper(
+            {graph_id: len(first_attribute[graph_id]) for graph_id in graph_ids}
+        )
+        ranges = self.graph_mapper.channel_ranges()
+        self.graph_starts = np.array([ranges[graph_id][0] for graph_id in graph_ids])
+        for attribute in self.attributes:
+            self.arrays[attribute] = np.concatenate(
+                [np.asarray(hypotheses[attribute][graph_id]) for graph_id in graph_ids]
+            )
+            self._views[attribute] = {}
+            for graph_id in graph_ids:
+                start, end = ranges[graph_id]
+                view = self.arrays[attribute][start:end]
+                self._views[attribute][graph_id] = view
+                hypotheses[attribute][graph_id] = view
+
+
+class FusedEvidenceKernel:
+    """Computes the location evidence of many hypotheses in a single pass.
+
+    `EvidenceGraphLM._calculate_evidence_for_new_locations` chains several helper
+    functions (`rotate_pose_dependent_features`, `get_custom_distances`,
+    `_get_pose_evidence_matrix`, ...) which each allocate their own (H, K)
+    temporaries. This kernel performs the same arithmetic, in the same order, but
+    writes every intermediate result into scratch buffers that are kept between
+    calls and only grow when more hypotheses need to be tested than ever before.
+    The results are therefore bit-identical to the default path. Unlike the default
+    path, the kernel also handles graphs with fewer than K nodes.
+
+    One kernel should be used per graph and input channel. Since the evidence for
+    different graphs may be updated in parallel threads, kernels must not be shared
+    between graphs.
+    """
+
+    def __init__(self) -> None:
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def location_evidence(
+        self,
+        search_locations: np.ndarray,
+        hypotheses_poses: np.ndarray,
+        nearest_node_ids: np.ndarray,
+        node_locations: np.ndarray,
+        node_pose_vectors: np.ndarray,
+        node_pose_fully_defined: np.ndarray,
+        sensed_pose_vectors: np.ndarray,
+        sensed_pose_fully_defined: bool,
+        search_curvature: float,
+        max_match_distance: float,
+        pose_vector_weights: np.ndarray,
+        node_feature_evidence: Optional[np.ndarray] = None,
+        feature_evidence_increment: float = 1,
+    ) -> np.ndarray:
+        """Calculate the evidence for each hypothesis at its search location.
+
+        Args:
+            search_locations (np.ndarray): Locations to test. shape=(H, 3)
+            hypotheses_poses (np.ndarray): Rotation of each hypothesis.
+                shape=(H, 3, 3)
+            nearest_node_ids (np.ndarray): Ids of the K nearest nodes of each search
+                location. Ids of N mark missing neighbors (as returned by a KDTree
+                query for more neighbors than there are nodes, or beyond its
+                distance_upper_bound) and are treated like nodes outside of the
+                search radius. shape=(H, K)
+            node_locations (np.ndarray): Locations of all nodes in the graph.
+                shape=(N, 3)
+            node_pose_vectors (np.ndarray): Pose vectors of all nodes in the graph.
+                shape=(N, 9)
+            node_pose_fully_defined (np.ndarray): Whether the curvature directions
+                stored at each node are meaningful. shape=(N,)
+            sensed_pose_vectors (np.ndarray): Sensed pose vectors. shape=(3, 3)
+            sensed_pose_fully_defined (bool): Whether the sensed curvature
+                directions are meaningful.
+            search_curvature (float): Magnitude of the sensed curvature.
+            max_match_distance (float): Maximum distance of a node to a search
+                location to still be considered a match.
+            pose_vector_weights (np.ndarray): Weights of the point normal and
+                curvature direction evidence.
+            node_feature_evidence (Optional[np.ndarray]): Evidence of the non-pose
+                features at each node, or None if features are not used for
+                matching. shape=(N,)
+            feature_evidence_increment (float): Factor applied to the feature
+                evidence before adding it to the pose evidence.
+
+        Returns:
+            np.ndarray: The location evidence of each hypothesis. shape=(H,). This is
+                a view into a scratch buffer which is overwritten by the next call.
+        """
+        num_hyp, num_nn = nearest_node_ids.shape
+
+        # Rotate the sensed pose vectors by each hypothesized pose. The vectors end
+        # up in the columns of the (3, 3) matrices, i.e. [:, :, 0] is the point
+        # normal and [:, :, 1] the first curvature direction.
+        rotated_pv = self._buffer("rotated_pv", (num_hyp, 3, 3), np.float64)
+        np.dot(hypotheses_poses, sensed_pose_vectors.T, out=rotated_pv)
+        search_pns = rotated_pv[:, :, 0]
+
+        # Custom distances between the search locations and their nearest nodes
+        # (see `get_custom_distances`).
+        nearest_node_locs = self._buffer(
+            "nearest_node_locs", (num_hyp, num_nn, 3), node_locations.dtype
+        )
+        node_locations.take(
+            nearest_node_ids,
+            axis=0,
+            out=nearest_node_locs,
+            mode="clip",
+        )
+        differences = self._buffer("differences", (num_hyp, num_nn, 3), np.float64)
+        np.subtract(nearest_node_locs, search_locations[:, np.newaxis], out=differences)
+        distances = self._buffer("distances", (num_hyp, num_nn), np.float64)
+        dot_products = self._buffer("dot_products", (num_hyp, num_nn), np.float64)
+        np.einsum("ijk,ik->ij", differences, search_pns, out=dot_products)
+        np.multiply(differences, differences, out=differences)
+        np.add.reduce(differences, axis=2, out=distances)
+        np.sqrt(distances, out=distances)
+        np.abs(dot_products, out=dot_products)
+        np.multiply(
+            dot_products, 1 / (np.abs(search_curvature) + 0.5), out=dot_products
+        )
+        np.add(distances, dot_products, out=distances)
+
+        # Node distance weights and mask of nodes outside of the search radius.
+        np.subtract(max_match_distance, distances, out=distances)
+        np.divide(distances, max_match_distance, out=distances)
+        too_far_away = self._buffer("too_far_away", (num_hyp, num_nn), np.bool_)
+        np.less_equal(distances, 0, out=too_far_away)
+        # The ids of missing neighbors were clipped to the last node above.
+        missing = self._buffer("missing", (num_hyp, num_nn), np.bool_)
+        np.greater_equal(nearest_node_ids, len(node_locations), out=missing)
+        np.logical_or(too_far_away, missing, out=too_far_away)
+
+        # Pose evidence (see `EvidenceGraphLM._get_pose_evidence_matrix`).
+        nearest_node_pvs = self._buffer(
+            "nearest_node_pvs", (num_hyp, num_nn, 9), node_pose_vectors.dtype
+        )
+        node_pose_vectors.take(
+            nearest_node_ids,
+            axis=0,
+            out=nearest_node_pvs,
+            mode="clip",
+        )
+        radius_evidence = self._buffer("radius_evidence", (num_hyp, num_nn), np.float64)
+        self._angle_evidence(
+            nearest_node_pvs[:, :, :3], search_pns, out=radius_evidence, halve=True
+        )
+        np.multiply(radius_evidence, pose_vector_weights[0], out=radius_evidence)
+        if sensed_pose_fully_defined:
+            use_cd = self._buffer("use_cd", (num_hyp, num_nn), np.bool_)
+            nearest_node_pfd = self._buffer(
+                "nearest_node_pfd", (num_hyp, num_nn), node_pose_fully_defined.dtype
+            )
+            node_pose_fully_defined.take(
+                nearest_node_ids,
+                out=nearest_node_pfd,
+                mode="clip",
+            )
+            np.not_equal(nearest_node_pfd, 0, out=use_cd)
+            cd1_evidence = self._buffer("cd1_evidence", (num_hyp, num_nn), np.float64)
+            self._angle_evidence(
+                nearest_node_pvs[:, :, 3:6],
+                rotated_pv[:, :, 1],
+                out=cd1_evidence,
+                halve=False,
+            )
+            np.multiply(cd1_evidence, use_cd, out=cd1_evidence)
+            np.multiply(cd1_evidence, pose_vector_weights[1], out=cd1_evidence)
+            np.add(radius_evidence, cd1_evidence, out=radius_evidence)
+        np.copyto(radius_evidence, -1, where=too_far_away)
+
+        # Add the evidence for matching non-pose features at the nearest nodes.
+        if node_feature_evidence is not None:
+            radius_feature_evidence = self._buffer(
+                "radius_feature_evidence",
+                (num_hyp, num_nn),
+                node_feature_evidence.dtype,
+            )
+            node_feature_evidence.take(
+                nearest_node_ids,
+                out=radius_feature_evidence,
+                mode="clip",
+            )
+            np.copyto(radius_feature_evidence, 0, where=too_far_away)
+            np.multiply(
+                radius_feature_evidence,
+                feature_evidence_increment,
+                out=radius_feature_evidence,
+            )
+            np.add(radius_evidence, radius_feature_evidence, out=radius_evidence)
+
+        location_evidence = self._buffer("location_evidence", (num_hyp,), np.float64)
+        np.maximum.reduce(radius_evidence, axis=1, out=location_evidence)
+        return location_evidence
+
+    def _angle_evidence(self, node_vectors, query_vectors, out, halve):
+        """Turn the angles between node and query vectors into evidence.
+
+        If halve is True, the angle error is halved so it is in [0, pi/2] (as done for
+        point normals). Otherwise the error is treated as direction-less so that
+        angles of 0 and pi are equal (as done for curvature directions).
+        """
+        np.einsum("ijk,ik->ij", node_vectors, query_vectors, out=out)
+        np.maximum(out, -1, out=out)
+        np.minimum(out, 1, out=out)
+        np.arccos(out, out=out)
+        if halve:
+            np.divide(out, 2, out=out)
+        else:
+            np.subtract(out, np.pi / 2, out=out)
+            np.abs(out, out=out)
+            np.subtract(np.pi / 2, out, out=out)
+        np.sin(out, out=out)
+        np.subtract(out, 0.5, out=out)
+        np.negative(out, out=out)
+
+    def _buffer(self, name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """Return a contiguous scratch array of the given shape and dtype.
+
+        The underlying memory is only reallocated if it is too small or of a
+        different dtype. It then grows by at least a factor of two to amortize
+        reallocations.
+
+        Returns:
+            np.ndarray: View into the scratch buffer with the requested shape.
+        """
+        size = math.prod(shape)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            capacity = size if buffer is None else max(size, 2 * buffer.size)
+            buffer = np.empty(capacity, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+
+class FeatureMatcher:
+    """Calculates how well sensed features match the features stored at all nodes.
+
+    `EvidenceGraphLM` compares the sensed non-pose features (e.g. hsv, curvature)
+    with the node feature array of a graph (see `GraphMemory.feature_array`). The
+    columns of this array, their tolerances and weights, and which columns are
+    circular (hue) only depend on the graph and the parameters of the LM. A matcher
+    is built once per graph and input channel and caches all of them, so that
+    evaluating a new observation only takes a few vectorized operations over the
+    node features. The results are bit-identical to building these vectors at every
+    step.
+
+    The node features of several graphs can be stacked into one matcher (see
+    `stack`) to evaluate them all with a single call.
+    """
+
+    def __init__(
+        self,
+        node_features: np.ndarray,
+        feature_order: List[str],
+        tolerances: Dict[str, np.ndarray],
+        feature_weights: Dict[str, np.ndarray],
+        sections: Optional[List[int]] = None,
+    ) -> None:
+        """Initializes the matcher.
+
+        Args:
+            node_features (np.ndarray): Features stored at each node. Pose features
+                are not included. shape=(N, F)
+            feature_order (List[str]): Features in the order in which they are stored
+                in the columns of node_features.
+            tolerances (Dict[str, np.ndarray]): Tolerance of each feature.
+            feature_weights (Dict[str, np.ndarray]): Weight of each feature.
+            sections (Optional[List[int]]): Number of nodes of each graph if the
+                node features of several graphs are stacked. Defaults to all nodes
+                belonging to one graph.
+        """
+        self.node_features = node_features
+        self.feature_order = [
+            feature
+            for feature in feature_order
+            if feature not in ["pose_vectors", "pose_fully_defined"]
+        ]
+        self.tolerances = tolerances
+        self.feature_weights = feature_weights
+        self.sections = sections if sections is not None else [len(node_features)]
+        self._feature_lengths = None
+
+    @classmethod
+    def stack(cls, matchers: List[FeatureMatcher]) -> FeatureMatcher:
+        """Stacks the node features of several matchers into one matcher.
+
+        Args:
+            matchers (List[FeatureMatcher]): Matchers with the same feature order,
+                tolerances and weights, e.g. of the same input channel of different
+                graphs.
+
+        Returns:
+            FeatureMatcher: Matcher whose evidence can be split into the evidence of
+                each of the matchers with `split`.
+
+        Raises:
+            ValueError: If the matchers store different features.
+        """
+        first = matchers[0]
+        for matcher in matchers[1:]:
+            if (
+                matcher.feature_order != first.feature_order
+                or matcher.node_features.shape[1] != first.node_features.shape[1]
+            ):
+                raise ValueError("Can only stack matchers with the same features.")
+        return cls(
+            np.concatenate([matcher.node_features for matcher in matchers]),
+            first.feature_order,
+            first.tolerances,
+            first.feature_weights,
+            sections=[section for matcher in matchers for section in matcher.sections],
+        )
+
+    def split(self, node_evidence: np.ndarray) -> List[np.ndarray]:
+        """Splits evidence for all nodes into the evidence for each stacked graph.
+
+        Args:
+            node_evidence (np.ndarray): Evidence for the nodes of all stacked graphs.
+                shape=(N,)
+
+        Returns:
+            List[np.ndarray]: The evidence for the nodes of each graph (views).
+        """
+        return np.split(node_evidence, np.cumsum(self.sections)[:-1])
+
+    def node_feature_evidence(self, query_features: dict) -> np.ndarray:
+        """Calculates the feature evidence for all nodes.
+
+        Evidence is a float between 0 and 1. An evidence of 1 is a perfect match,
+        the larger the difference between observed and stored features, the closer
+        to 0 goes the evidence. Evidence is 0 if the difference is >= the tolerance
+        for this feature. If a node does not store a given feature, evidence will be
+        nan.
+
+        Args:
+            query_features (dict): Sensed features of the input channel.
+
+        Returns:
+            np.ndarray: The weighted feature evidence for each node. shape=(N,)
+        """
+        query = self._query_vector(query_features)
+        differences = np.abs(self.node_features - query)
+        if len(self._circular_ids) > 0:
+            # Hue is circular, i.e., 0 and 1 are the same value.
+            circular_nodes = self._circular_node_features
+            circular_query = query[self._circular_ids]
+            differences[:, self._circular_ids] = np.minimum(
+                np.minimum(
+                    np.abs(1 + circular_nodes - circular_query),
+                    np.abs(circular_nodes - circular_query),
+                ),
+                np.abs(circular_nodes - (circular_query + 1)),
+            )
+        # any difference < tolerance should be positive evidence
+        # any difference >= tolerance should be 0 evidence
+        feature_evidence = np.subtract(self._tolerances, differences, out=differences)
+        np.clip(feature_evidence, 0, np.inf, out=feature_evidence)
+        # normalize evidence to be in [0, 1]
+        feature_evidence /= self._tolerances
+        # Same as np.average(feature_evidence, weights=weights, axis=1)
+        return (
+            np.multiply(feature_evidence, self._weights).sum(axis=1) / self._weight_sum
+        )
+
+    def _query_vector(self, query_features: dict) -> np.ndarray:
+        """Returns the sensed features in the order of the node feature columns.
+
+        Also sets up the cached column layout at the first call (or if the length of
+        the sensed features changed).
+
+        Returns:
+            np.ndarray: The sensed features. shape=(F,)
+        """
+        values = [np.ravel(query_features[feature]) for feature in self.feature_order]
+        feature_lengths = [len(value) for value in values]
+        if feature_lengths != self._feature_lengths:
+            self._set_layout(feature_lengths)
+        query = np.full(self.node_features.shape[1], np.nan)
+        query[: self._num_query_columns] = np.concatenate(values)
+        return query
+
+    def _set_layout(self, feature_lengths: List[int]) -> None:
+        num_columns = self.node_features.shape[1]
+        self._tolerances = np.full(num_columns, np.nan)
+        self._weights = np.full(num_columns, np.nan)
+        circular = np.zeros(num_columns, dtype=bool)
+        start_idx = 0
+        for feature, feature_length in zip(self.feature_order, feature_lengths):
+            end_idx = start_idx + feature_length
+            self._tolerances[start_idx:end_idx] = self.tolerances[feature]
+            self._weights[start_idx:end_idx] = self.feature_weights[feature]
+            circular[start_idx:end_idx] = (
+                [True, False, False] if feature == "hsv" else False
+            )
+            start_idx = end_idx
+        self._num_query_columns = start_idx
+        self._weight_sum = self._weights.sum()
+        self._circular_ids = np.flatnonzero(circular)
+        self._circular_node_features = self.node_features[:, self._circular_ids]
+        self._feature_lengths = feature_lengths
@@ -250,19 +250,32 @@ def get_scaled_evidences(evidences, per_object=False):
             if maxev > max_evidence:
                 max_evidence = maxev
         for graph_id in evidences.keys():
-            if max_evidence >= 1:
-                scaled_evidences[graph_id] = (evidences[graph_id] - min_evidence) / (
-                    max_evidence - min_evidence
-                )
-                # put in range(-1, 1)
-                scaled_evidences[graph_id] = (scaled_evidences[graph_id] - 0.5) * 2
-            else:
-                # If largest value is <1, don't scale them -> don't increase any
-                # evidences. Instead just make sure they are in the right range.
-                scaled_evidences[graph_id] = np.clip(evidences[graph_id], -1, 1)
+            scaled_evidences[graph_id] = scale_evidences(
+                evidences[graph_id], min_evidence, max_evidence
+            )
     return scaled_evidences
 
 
+def scale_evidences(evidences, min_evidence, max_evidence):
+    """Scale an array of evidences to be in range [-1, 1] for voting.
+
+    Args:
+        evidences: Array of evidences.
+        min_evidence: Smallest evidence over all objects.
+        max_evidence: Largest evidence over all objects.
+
+    Returns:
+        Scaled evidences.
+    """
+    if max_evidence >= 1:
+        scaled_evidences = (evidences - min_evidence) / (max_evidence - min_evidence)
+        # put in range(-1, 1)
+        return (scaled_evidences - 0.5) * 2
+    # If largest value is <1, don't scale them -> don't increase any
+    # evidences. Instead just make sure they are in the right range.
+    return np.clip(evidences, -1, 1)
+
+
 def get_custom_distances(nearest_node_locs, search_locs, search_pns, search_curvature):
     """Calculate custom distances modulated by point normal and curvature.
 
@@ -22,6 +22,10 @@ import quaternion
 import torch
 from scipy.spatial.transform import Rotation
 
+from tbp.monty.frameworks.utils.episode_log import (
+    EPISODE_LOG_FILE_NAME,
+    load_episode_log,
+)
 from tbp.monty.frameworks.utils.spatial_arithmetics import (
     get_unique_rotations,
     rotations_to_quats,
@@ -38,6 +42,11 @@ def load_stats(
 ):
     """Load experiment statistics from an experiment for analysis.
 
+    Detailed statistics are loaded from detailed_run_stats.json, or from the binary
+    episode log if there is no JSON log. In the latter case, arrays and lists of
+    numbers or of equally shaped arrays are NumPy arrays instead of lists (see
+    `load_episode_log`).
+
     Returns:
         train_stats: pandas DataFrame with training statistics
         eval_stats: pandas DataFrame with evaluation statistics
@@ -56,12 +65,16 @@ def load_stats(
     if load_detailed:
         print("...loading detailed run statistics...")
         json_file = os.path.join(exp_path, "detailed_run_stats.json")
-        try:
-            with open(json_file, "r") as f:
-                detailed_stats = json.load(f)
-        except ValueError:
-            detailed_stats = deserialize_json_chunks(json_file)
-        f.close()
+        log_file = os.path.join(exp_path, EPISODE_LOG_FILE_NAME)
+        if not os.path.exists(json_file) and os.path.exists(log_file):
+            detailed_stats = load_episode_log(log_file)
+        else:
+            try:
+                with open(json_file, "r") as f:
+                    detailed_stats = json.load(f)
+            except ValueError:
+                detailed_stats = deserialize_json_chunks(json_file)
+            f.close()
 
     if load_models:
         print("...loading LM models...")
@@ -0,0 +1,331 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Binary model store that can be memory mapped by many processes.
+
+A `model.pt` file is a pickle in which every array of every object model is
+deserialized (and copied) into each process that loads it. A model store keeps the
+same state dict in a single file with three sections:
+
+- all numeric arrays and tensors of the state dict (node locations, node features,
+  edges, voxel store rows, KDTree nodes and indices, ...) stored contiguously and
+  aligned to 64 bytes,
+- a pickle of the rest of the state dict (feature mappings, model parameters, the
+  sensor module and motor system state, ...) in which each array is replaced by its
+  offset, dtype and shape,
+- the size and modification time of the files the store was converted from (e.g.
+  the `model.pt` file), so that stores which are out of date can be detected.
+
+Loading a model store memory maps the file and turns each array into a view of the
+mapping. Nothing is copied or rebuilt, so loading is fast and parallel workers share
+the same pages of the page cache. The mapping is copy-on-write by default, so models
+can still be updated in place (e.g. while learning) without changing the file.
+
+Models are stored as they were saved. `GraphObjectModel`s (e.g. from a
+`DisplacementGraphLM`) loaded into an `EvidenceGraphLM` are still converted into
+`GridObjectModel`s, and their KDTrees built, in every process that loads the store,
+since the grid parameters of the converted models come from the config of the
+loading learning module. Only `GridObjectModel`s are loaded without rebuilding them.
+
+When a directory contains both a `model.pt` file and a model store, the model store
+is only loaded if `model.pt` did not change since the store was converted from it
+(e.g. by training again into the same output directory).
+
+Existing models can be converted with::
+
+    python -m tbp.monty.frameworks.utils.model_store path/to/model.pt
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import pickle
+import struct
+from pathlib import Path
+
+import numpy as np
+import torch
+
+MODEL_STORE_FILE_NAME = "model_store.bin"
+
+_MAGIC = b"MONTYMS\x00"
+_FORMAT_VERSION = 1
+# magic, format version, offset and size of the pickle, offset and size of the
+# JSON with the source files
+_HEADER = struct.Struct("<8sQQQQQ")
+_ALIGNMENT = 64
+
+
+class _ArrayExtractingPickler(pickle.Pickler):
+    """Pickler that writes arrays and tensors to a file instead of the pickle."""
+
+    def __init__(self, file, array_file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.array_file = array_file
+        # id -> (object, persistent id). Keeps the objects alive so ids are not reused.
+        self.stored = {}
+
+    def persistent_id(self, obj):
+        if id(obj) in self.stored:
+            return self.stored[id(obj)][1]
+        if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+            kind, array = "ndarray", obj
+        elif (
+            type(obj) is torch.Tensor
+            and obj.layout == torch.strided
+            and obj.device.type == "cpu"
+            and not obj.requires_grad
+            and obj.dtype != torch.bfloat16
+        ):
+            kind, array = "tensor", obj.numpy()
+        else:
+            return None
+        array = np.ascontiguousarray(array)
+        offset = self.array_file.tell()
+        padding = -offset % _ALIGNMENT
+        self.array_file.write(b"\x00" * padding)
+        self.array_file.write(array.tobytes())
+        pid = (kind, offset + padding, array.dtype.str, array.shape)
+        self.stored[id(obj)] = (obj, pid)
+        return pid
+
+
+class _ArrayMappingUnpickler(pickle.Unpickler):
+    """Unpickler that returns views of a memory mapped file for stored arrays."""
+
+    def __init__(self, file, buffer):
+        super().__init__(file)
+        self.buffer = buffer
+
+    def persistent_load(self, pid):
+        kind, offset, dtype, shape = pid
+        dtype = np.dtype(dtype)
+        num_bytes = dtype.itemsize * int(np.prod(shape))
+        array = self.buffer[offset : offset + num_bytes].view(dtype).reshape(shape)
+        if kind == "tensor":
+            return torch.from_numpy(array)
+        return array
+
+
+def _get_file_stats(path):
+    """Return the size and modification time of a file, or None if it is missing."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def save_model_store(state_dict, store_path, source_files=()):
+    """Save a state dict as a model store.
+
+    Args:
+        state_dict: State dict to save. Usually the dict returned by
+            `MontyBase.state_dict`, but any picklable object works.
+        store_path: Path of the model store file. Is written to a temporary file
+            first and only replaced once the store is complete.
+        source_files: Files the state dict was loaded from. Their size and
+            modification time are saved in the store, see `get_changed_sources`.
+    """
+    store_dir = Path(store_path).resolve().parent
+    # Relative to the store, so directories with both can be moved together
+    sources = {
+        os.path.relpath(Path(path).resolve(), store_dir): _get_file_stats(path)
+        for path in source_files
+    }
+    temp_path = f"{store_path}.tmp"
+    with open(temp_path, "wb") as store_file:
+        store_file.write(b"\x00" * _HEADER.size)
+        pickled_state = io.BytesIO()
+        _ArrayExtractingPickler(pickled_state, store_file).dump(state_dict)
+        pickle_offset = store_file.tell()
+        store_file.write(pickled_state.getbuffer())
+        sources_offset = store_file.tell()
+        sources_size = store_file.write(json.dumps(sources).encode())
+        store_file.seek(0)
+        store_file.write(
+            _HEADER.pack(
+                _MAGIC,
+                _FORMAT_VERSION,
+                pickle_offset,
+                pickled_state.tell(),
+                sources_offset,
+                sources_size,
+            )
+        )
+    Path(temp_path).replace(store_path)
+
+
+def _read_header(store_path, buffer):
+    """Return the pickle offset and size and the source files of a model store.
+
+    Raises:
+        ValueError: If the file is not a model store of a supported format version.
+    """
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"{store_path} is not a model store")
+    (
+        magic,
+        format_version,
+        pickle_offset,
+        pickle_size,
+        sources_offset,
+        sources_size,
+    ) = _HEADER.unpack(bytes(buffer[: _HEADER.size]))
+    if magic != _MAGIC:
+        raise ValueError(f"{store_path} is not a model store")
+    if format_version != _FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model store format version {format_version} "
+            f"(expected {_FORMAT_VERSION})"
+        )
+    sources = json.loads(bytes(buffer[sources_offset : sources_offset + sources_size]))
+    return pickle_offset, pickle_size, sources
+
+
+def load_model_store(store_path, mode="c"):
+    """Load a state dict from a model store.
+
+    Args:
+        store_path: Path of the model store file.
+        mode: Mode used to memory map the file. "c" (copy-on-write) lets arrays be
+            modified in memory without changing the file, "r" makes them read only.
+
+    Returns:
+        The saved state dict with all stored arrays and tensors being views of the
+        memory mapped file.
+    """
+    buffer = np.memmap(store_path, dtype=np.uint8, mode=mode)
+    pickle_offset, pickle_size, _ = _read_header(store_path, buffer)
+    pickled_state = io.BytesIO(
+        buffer[pickle_offset : pickle_offset + pickle_size].tobytes()
+    )
+    return _ArrayMappingUnpickler(pickled_state, buffer).load()
+
+
+def get_changed_sources(store_path):
+    """Return the source files that changed since a model store was saved.
+
+    Source files that no longer exist are not considered changed, so stores can be
+    used without the files they were converted from.
+
+    Args:
+        store_path: Path of the model store file.
+
+    Returns:
+        List of paths of the source files whose size or modification time differs
+        from when the store was saved.
+    """
+    buffer = np.memmap(store_path, dtype=np.uint8, mode="r")
+    _, _, sources = _read_header(store_path, buffer)
+    store_dir = Path(store_path).absolute().parent
+    changed = []
+    for relative_path, file_stats in sources.items():
+        path = os.path.normpath(store_dir / relative_path)
+        current_stats = _get_file_stats(path)
+        if current_stats is not None and current_stats != file_stats:
+            changed.append(path)
+    return changed
+
+
+def is_model_store(path):
+    """Return whether path is a model store file."""
+    if not Path(path).is_file():
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+def get_model_file(model_path):
+    """Return the file to load a saved model from.
+
+    Args:
+        model_path: Full name of a "model.pt" file or model store file, or the
+            directory containing it.
+
+    Returns:
+        The model store file if model_path is a directory containing one whose
+        source files did not change, the "model.pt" file in it if it is a directory
+        without a model store or with an out of date one, and model_path otherwise.
+    """
+    if Path(model_path).is_dir():
+        store_path = os.path.join(model_path, MODEL_STORE_FILE_NAME)
+        if os.path.exists(store_path):
+            changed_sources = get_changed_sources(store_path)
+            if not changed_sources:
+                return store_path
+            logging.warning(
+                f"Ignoring model store {store_path}, since {changed_sources} changed "
+                "after it was saved. Convert the model again to use a model store."
+            )
+        return os.path.join(model_path, "model.pt")
+    return model_path
+
+
+def load_model_state_dict(model_path):
+    """Load the state dict of a saved model.
+
+    Args:
+        model_path: Full name of a "model.pt" file or model store file, or the
+            directory containing it. If a directory contains both, the model store is
+            loaded unless "model.pt" changed after the store was converted from it.
+
+    Returns:
+        The saved state dict.
+    """
+    model_path = get_model_file(model_path)
+    if is_model_store(model_path):
+        logging.info(f"memory mapping model store {model_path}")
+        return load_model_store(model_path)
+    return torch.load(model_path)
+
+
+def convert_model_to_store(model_path, store_path=None):
+    """Convert a saved "model.pt" file into a model store.
+
+    `GraphObjectModel`s are stored without converting them into `GridObjectModel`s,
+    so an `EvidenceGraphLM` still converts them (and builds their KDTree) when
+    loading the store. See the module docstring.
+
+    Args:
+        model_path: Full name of the "model.pt" file or the directory containing it.
+        store_path: Path of the model store to write. Defaults to
+            `MODEL_STORE_FILE_NAME` next to the "model.pt" file.
+
+    Returns:
+        Path of the written model store.
+    """
+    if Path(model_path).is_dir():
+        model_path = os.path.join(model_path, "model.pt")
+    if store_path is None:
+        store_path = os.path.join(os.path.dirname(model_path), MODEL_STORE_FILE_NAME)
+    save_model_store(torch.load(model_path), store_path, source_files=[model_path])
+    return store_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a model.pt file into a memory mappable model store."
+    )
+    parser.add_argument(
+        "model_path", help="model.pt file or the directory containing it"
+    )
+    parser.add_argument(
+        "--store_path",
+        default=None,
+        help=f"Output file. Defaults to {MODEL_STORE_FILE_NAME} next to model.pt",
+    )
+    args = parser.parse_args()
+    print(convert_model_to_store(args.model_path, args.store_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,6 @@ import torch
 
 from tbp.monty.frameworks.utils.spatial_arithmetics import (
     get_angle,
-    get_right_hand_angle,
 )
 
 
@@ -261,6 +260,75 @@ def get_values_from_dense_last_dim(tensor, index_3d):
     return values
 
 
+def get_values_at_voxels(tensor, voxels):
+    """Get the values of a 4d sparse tensor at many 3d voxel indices at once.
+
+    Vectorized version of `get_values_from_dense_last_dim`. Entries that are not
+    stored in the sparse tensor are 0.
+
+    Args:
+        tensor: Sparse tensor of shape (num_voxels, num_voxels, num_voxels, n).
+        voxels: 3d voxel indices. shape=(V, 3)
+
+    Returns:
+        Values at the voxels. shape=(V, n)
+    """
+    tensor = tensor.coalesce()
+    shape = tuple(tensor.shape)
+    # Coalesced indices are sorted lexicographically which is the order of their
+    # flat indices.
+    stored_ids = np.ravel_multi_index(tensor.indices().numpy(), shape)
+    stored_values = tensor.values().numpy()
+    query_ids = np.ravel_multi_index(
+        (
+            *np.repeat(voxels, shape[-1], axis=0).T,
+            np.tile(np.arange(shape[-1]), len(voxels)),
+        ),
+        shape,
+    )
+    positions = np.minimum(np.searchsorted(stored_ids, query_ids), len(stored_ids) - 1)
+    values = np.zeros(len(query_ids), dtype=float)
+    if len(stored_ids) > 0:
+        is_stored = stored_ids[positions] == query_ids
+        values[is_stored] = stored_values[positions[is_stored]]
+    return values.reshape((len(voxels), shape[-1]))
+
+
+def group_observations_by_voxel(voxel_ids, num_voxels_per_dim):
+    """Group observations by the voxel they fall into.
+
+    Voxels with the same number of observations are grouped together such that
+    their observations can be averaged at once along a new axis. This gives exactly
+    the same results as averaging the observations of each voxel separately.
+
+    Args:
+        voxel_ids: 3d voxel index of each observation. shape=(N, 3)
+        num_voxels_per_dim: Size of the grid in each dimension.
+
+    Returns:
+        voxels: Voxels that contain observations, sorted lexicographically.
+            shape=(V, 3)
+        groups: List of (voxel_rows, observation_ids) tuples, one for each number n
+            of observations per voxel. voxel_rows are the rows in voxels that
+            contain n observations and observation_ids are the indices of these
+            observations in their original order. shape=(len(voxel_rows), n)
+    """
+    flat_ids = np.ravel_multi_index(voxel_ids.T, (num_voxels_per_dim,) * 3)
+    order = np.argsort(flat_ids, kind="stable")
+    sorted_ids = flat_ids[order]
+    is_first_in_voxel = np.ones(len(sorted_ids), dtype=bool)
+    is_first_in_voxel[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    first_ids = np.flatnonzero(is_first_in_voxel)
+    num_obs_in_voxel = np.diff(np.append(first_ids, len(sorted_ids)))
+    voxels = voxel_ids[order[first_ids]]
+    groups = []
+    for num_obs in np.unique(num_obs_in_voxel):
+        voxel_rows = np.flatnonzero(num_obs_in_voxel == num_obs)
+        observation_ids = order[first_ids[voxel_rows, np.newaxis] + np.arange(num_obs)]
+        groups.append((voxel_rows, observation_ids))
+    return voxels, groups
+
+
 def expand_index_dims(indices_3d, last_dim_size):
     """Expand 3d indices to 4d indices by adding a 4th dimension with size.
 
@@ -316,57 +384,114 @@ def pose_vector_mean(pose_vecs, pose_fully_defined):
     some computation time.
 
     Returns:
-        ?
+        pv_means: Mean pose vectors or None if there are no valid pose vectors.
+        use_cds_to_update: Whether the curvature directions were averaged.
+    """
+    pv_means, use_cds_to_update = batched_pose_vector_mean(
+        pose_vecs[np.newaxis], np.reshape(pose_fully_defined, (1, -1, 1))
+    )
+    if np.isnan(pv_means[0, 0]):
+        logging.debug(f"no valid pose vecs: {pose_vecs}")
+        return None, False
+    return pv_means[0], bool(use_cds_to_update[0])
+
+
+def batched_pose_vector_mean(pose_vecs, pose_fully_defined):
+    """Calculate `pose_vector_mean` for a batch of equally sized sets of pose vectors.
+
+    Pose vectors that are all 0 are not valid and are ignored.
+
+    Args:
+        pose_vecs: Pose vectors of B sets of n observations. shape=(B, n, 9)
+        pose_fully_defined: Whether the pose of each observation is fully defined.
+            shape=(B, n, 1)
+
+    Returns:
+        pv_means: Mean pose vectors of each set, NaN where a set contains no
+            valid pose vectors. shape=(B, 9)
+        use_cds_to_update: Whether the curvature directions of each set were
+            averaged. shape=(B,)
     """
+    valid = np.any(pose_vecs, axis=2)
+    has_valid = np.any(valid, axis=1)
+    num_valid = np.sum(valid, axis=1)
+    first_valid = pose_vecs[np.arange(pose_vecs.shape[0]), np.argmax(valid, axis=1)]
+    # TODO: more generic names
+    pns = pose_vecs[:, :, :3]
+    cds1 = pose_vecs[:, :, 3:6]
+    first_cd1 = first_valid[:, np.newaxis, 3:6]
+    first_cd2 = first_valid[:, np.newaxis, 6:9]
     # Check the angle between all point normals relative to the first curvature
     # directions. Then look at how many are positive vs. negative and use the ones
     # that make up the majority. So if 5 pns point one way and 10 in the opposite,
     # we will use the 10 and discard the rest. This avoids averaging over pns that
     # are from opposite sides of an objects surface.
-    valid_pose_vecs = np.where(np.any(pose_vecs, axis=1))[0]
-    if len(valid_pose_vecs) == 0:
-        logging.debug(f"no valid pose vecs: {pose_vecs}")
-        return None, False
-    # TODO: more generic names
-    pns = pose_vecs[valid_pose_vecs, :3]
-    cds1 = pose_vecs[valid_pose_vecs, 3:6]
-    cds2 = pose_vecs[valid_pose_vecs, 6:9]
-    pns_to_use = get_right_hand_angle(pns, cds1[0], cds2[0]) > 0
-    if (sum(pns_to_use) < len(pns_to_use) // 2) or (sum(pns_to_use) == 0):
-        pns_to_use = np.logical_not(pns_to_use)
-    # Take the mean of all pns pointing in the same half sphere spanned by the cds.
-    norm_mean = np.mean(pns[pns_to_use], axis=0)
-    # Make sure the mean vector still has unit length.
-    normed_norm_mean = norm_mean / np.linalg.norm(norm_mean)
-
-    if sum(pose_fully_defined) < len(pose_fully_defined) // 2:
-        # print(
-        #     "cd dirs not sufficiently defined, averaging only introduces noise"
-        # )
-        # Just take 1st one. Shouldn't matter since cd should not be used anyways if
-        # not pose_fully_defined. Only has a small effect on sampled possible poses.
-        pv_means = np.hstack([normed_norm_mean, cds1[0], cds2[0]])
-        use_cds_to_update = False
-    else:
+    pns_to_use = (_batched_right_hand_angle(pns, first_cd1, first_cd2) > 0) & valid
+    num_used = np.sum(pns_to_use, axis=1)
+    use_opposite = (num_used < num_valid // 2) | (num_used == 0)
+    pns_to_use[use_opposite] = valid[use_opposite] & ~pns_to_use[use_opposite]
+    num_used[use_opposite] = num_valid[use_opposite] - num_used[use_opposite]
+    # Sets without valid pose vectors are set to NaN at the end.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Take the mean of all pns pointing in the same half sphere spanned by the
+        # cds. Pose vectors that are not used are masked out by adding 0.
+        norm_mean = (
+            np.sum(np.where(pns_to_use[:, :, np.newaxis], pns, 0), axis=1)
+            / num_used[:, np.newaxis]
+        )
+        # Make sure the mean vector still has unit length.
+        normed_norm_mean = norm_mean / np.linalg.norm(norm_mean, axis=1, keepdims=True)
+        # If the cds are not sufficiently defined, averaging only introduces noise.
+        # Then we just take the 1st one. Shouldn't matter since cd should not be used
+        # anyways if not pose_fully_defined. Only has a small effect on sampled
+        # possible poses.
+        use_cds_to_update = np.sum(pose_fully_defined, axis=(1, 2)) >= (
+            pose_fully_defined.shape[1] // 2
+        )
         # Find cds pointing in opposing directions and invert them. This is needed
         # because the curvature directions are ambiguous and both directions are
         # equivalent. If we average over opposing directions, we will get noise.
-        cd1_dirs = get_right_hand_angle(cds1, cds2[0], normed_norm_mean) < 0
-        cds1[cd1_dirs] = -cds1[cd1_dirs]
-        cd1_mean = np.mean(cds1, axis=0)
-        normed_cd1_mean = cd1_mean / np.linalg.norm(cd1_mean)
+        cd1_dirs = (
+            _batched_right_hand_angle(
+                cds1, first_cd2, normed_norm_mean[:, np.newaxis, :]
+            )
+            < 0
+        )
+        cds1 = np.where(cd1_dirs[:, :, np.newaxis], -cds1, cds1)
+        cd1_mean = (
+            np.sum(np.where(valid[:, :, np.newaxis], cds1, 0), axis=1)
+            / num_valid[:, np.newaxis]
+        )
+        normed_cd1_mean = cd1_mean / np.linalg.norm(cd1_mean, axis=1, keepdims=True)
         # Get the second cd by calculating a vector orthogonal to cd1 and pn.
         cd2_mean = np.cross(normed_norm_mean, normed_cd1_mean)
-        normed_cd2_mean = cd2_mean / np.linalg.norm(cd2_mean)
-        if get_right_hand_angle(normed_cd1_mean, cd2_mean, normed_norm_mean) < 0:
-            normed_cd2_mean = -normed_cd2_mean
-        use_cds_to_update = True
-        pv_means = np.hstack([normed_norm_mean, normed_cd1_mean, normed_cd2_mean])
-
-    assert not np.any(np.isnan(pv_means)), "NaN in pose vector mean"
+        normed_cd2_mean = cd2_mean / np.linalg.norm(cd2_mean, axis=1, keepdims=True)
+        flip_cd2 = (
+            _batched_right_hand_angle(normed_cd1_mean, cd2_mean, normed_norm_mean) < 0
+        )
+    normed_cd2_mean[flip_cd2] = -normed_cd2_mean[flip_cd2]
+    pv_means = np.where(
+        use_cds_to_update[:, np.newaxis],
+        np.hstack([normed_norm_mean, normed_cd1_mean, normed_cd2_mean]),
+        np.hstack([normed_norm_mean, first_valid[:, 3:9]]),
+    )
+    pv_means[~has_valid] = np.nan
+    use_cds_to_update &= has_valid
+    assert not np.any(np.isnan(pv_means[has_valid])), "NaN in pose vector mean"
     return pv_means, use_cds_to_update
 
 
+def _batched_right_hand_angle(v1, v2, pn):
+    """Vectorized version of `get_right_hand_angle` along the last axis.
+
+    Returns:
+        Right hand angles.
+    """
+    a = np.sum(np.cross(v1, v2) * pn, axis=-1)
+    b = np.sum(v1 * v2, axis=-1)
+    return np.arctan2(a, b)
+
+
 def get_most_common_bool(booleans):
     """Get most common value out of a list of boolean values.
 
@@ -387,19 +512,25 @@ def get_most_common_bool(booleans):
         return False
 
 
-def circular_mean(values):
+def circular_mean(values, axis=None):
     """Calculate the mean of a circular value such as hue where 0==1.
 
+    Args:
+        values: Values in [0, 1].
+        axis: Axis along which to calculate the mean. By default, the mean of all
+            values is calculated.
+
     Returns:
         Mean value.
     """
     # convert to radians
     angles = np.array(values) * 2 * np.pi
     # calculate circular mean
-    mean_angle = np.arctan2(np.mean(np.sin(angles)), np.mean(np.cos(angles)))
+    mean_angle = np.arctan2(
+        np.mean(np.sin(angles), axis=axis), np.mean(np.cos(angles), axis=axis)
+    )
     # Make sure returned values are positive
-    if mean_angle < 0:
-        mean_angle += 2 * np.pi
+    mean_angle = mean_angle + 2 * np.pi * (mean_angle < 0)
     # convert back to [0, 1] range
     mean = mean_angle / (2 * np.pi)
     return mean
@@ -8,7 +8,9 @@
 # license that can be found in the LICENSE file or at
 # https://opensource.org/licenses/MIT.
 
+import functools
 import logging
+import sys
 
 import numpy as np
 import torch
@@ -19,6 +21,10 @@ from tbp.monty.frameworks.utils.spatial_arithmetics import (
     non_singular_mat,
 )
 
+# Maximum number of points (summed over patches) that get_principal_curvatures_batch
+# processes at once.
+MAX_CURVATURE_BATCH_POINTS = 2**14
+
 
 def get_point_normal_naive(point_cloud, patch_radius_frac=2.5):
     """Estimate point normal.
@@ -202,7 +208,8 @@ def get_point_normal_total_least_squares(
     """Extracts the point-normal direction from a noisy point-cloud.
 
     Uses total least-square fitting. Error minimization is independent of view
-    direction.
+    direction. See get_point_normals_total_least_squares_batch to extract the
+    point-normals of several patches at once.
 
     Args:
         point_cloud_base: point-cloud in world coordinates (assumes full
@@ -219,42 +226,86 @@ def get_point_normal_total_least_squares(
             to True. An invalid point-normal means there were not enough points in
             the patch to make any estimate of the point-normal
     """
-    point_cloud = point_cloud_base.copy()
-    # Make sure that patch center is on the object
-    if point_cloud[center_id, 3] > 0:
-        # Define local neighborhood for least-squares fitting
-        # Only use neighbors that lie on an object to extract point normals
-        neighbors_on_obj = get_center_neighbors(
-            point_cloud, center_id, neighbor_patch_frac
-        )
+    point_normals, valid_pns = get_point_normals_total_least_squares_batch(
+        point_cloud_base[np.newaxis],
+        [center_id],
+        np.asarray(view_dir)[np.newaxis],
+        neighbor_patch_frac=neighbor_patch_frac,
+    )
+    return point_normals[0], bool(valid_pns[0])
 
-        # Compute matrix M and p_mean for TLS regression
-        n_points = neighbors_on_obj.shape[0]
-        x_mat = neighbors_on_obj.copy()
-        p_mean = 1 / n_points * np.mean(x_mat, axis=0, keepdims=True).T
-        m_mat = 1 / n_points * np.matmul(x_mat.T, x_mat) - np.matmul(p_mean, p_mean.T)
-
-        try:
-            # find eigenvector of M with min eigenvalue
-            eig_val, eig_vec = np.linalg.eig(m_mat)
-            n_dir = eig_vec[:, np.argmin(eig_val)]
-            valid_pn = True
-
-            # Align PN with viewing direction
-            if np.dot(view_dir, n_dir) < 0:
-                n_dir *= -1
-        except np.linalg.LinAlgError:
-            n_dir = np.array([0.0, 0.0, 1.0])
-            valid_pn = False
-            logging.debug("Warning : Non-diagonalizable matrix for PN estimation!")
 
-    # Patch center does not lie on an object
-    else:
-        n_dir = np.array([0.0, 0.0, 1.0])
-        valid_pn = False
+def get_point_normals_total_least_squares_batch(
+    point_clouds, center_ids, view_dirs, neighbor_patch_frac=3.2
+):
+    """Extracts the point-normal directions of several patches at once.
+
+    Batched version of get_point_normal_total_least_squares. The patches can be
+    observed by different sensors or be several centers in the same patch, but
+    must have the same size.
+
+    Args:
+        point_clouds: point-clouds in world coordinates. shape = (B, n, 4)
+        center_ids: id of the center point in each point cloud. shape = (B,)
+        view_dirs: viewing direction of each patch used to adjust the sign of the
+            estimated point-normal. shape = (B, 3)
+        neighbor_patch_frac: fraction of the patch width that defines the
+            local neighborhood within which to perform the least-squares fitting.
+
+    Returns:
+        point_normals: Estimated point normal at the center of each patch.
+            shape = (B, 3)
+        valid_pns: Whether the point-normal of each patch was valid. shape = (B,)
+    """
+    point_clouds = np.asarray(point_clouds, dtype=float)
+    num_patches, n_points = point_clouds.shape[:2]
+    patch_width = int(np.sqrt(n_points))
+    centers = point_clouds[np.arange(num_patches), center_ids]
+    # Make sure that patch center is on the object
+    valid_pns = centers[:, 3] > 0
+    if not np.all(valid_pns):
         logging.debug("Warning : Patch center does not lie on an object!")
 
-    return n_dir, valid_pn
+    # Define local neighborhood for least-squares fitting. Neighborhoods at the
+    # border of the patch have fewer points, so the ids are padded and masked.
+    neighbor_ids = [
+        get_center_neighbor_ids(n_points, center_id, neighbor_patch_frac)
+        for center_id in center_ids
+    ]
+    padded_ids = np.zeros((num_patches, max(len(ids) for ids in neighbor_ids)), int)
+    is_neighbor = np.zeros(padded_ids.shape, dtype=bool)
+    for i, ids in enumerate(neighbor_ids):
+        padded_ids[i, : len(ids)] = ids
+        is_neighbor[i, : len(ids)] = True
+    neighbors = point_clouds[np.arange(num_patches)[:, np.newaxis], padded_ids]
+    # Only use neighbors that lie on an object to extract point normals
+    is_neighbor &= neighbors[:, :, 3] > 0
+    # Set patch centers as origin of coordinate frame
+    x_mat_t = get_masked_points_relative_to_centers(neighbors, centers, is_neighbor)
+
+    # Compute matrix M and p_mean for TLS regression
+    n_neighbors = np.maximum(np.count_nonzero(is_neighbor, axis=1), 1)[:, np.newaxis]
+    p_mean = 1 / n_neighbors * (x_mat_t.sum(axis=2) / n_neighbors)
+    m_mat = np.matmul(x_mat_t, x_mat_t.transpose(0, 2, 1)) / n_neighbors[
+        :, :, np.newaxis
+    ] - np.einsum("bi,bj->bij", p_mean, p_mean)
+    valid_pns &= np.all(np.isfinite(m_mat), axis=(1, 2))
+
+    point_normals = np.zeros((num_patches, 3))
+    point_normals[:, 2] = 1.0
+    try:
+        # M is symmetric so its eigenvalues are returned in ascending order. Take
+        # the eigenvector with min eigenvalue.
+        _, eig_vecs = np.linalg.eigh(m_mat[valid_pns])
+        n_dirs = eig_vecs[:, :, 0]
+        # Align PN with viewing direction
+        flip = np.einsum("bi,bi->b", np.asarray(view_dirs)[valid_pns], n_dirs) < 0
+        n_dirs[flip] *= -1
+        point_normals[valid_pns] = n_dirs
+    except np.linalg.LinAlgError:
+        valid_pns[:] = False
+        logging.debug("Warning : Non-diagonalizable matrix for PN estimation!")
+    return point_normals, valid_pns
 
 
 # Old version to get point normal with open3d. Leaving it here in
@@ -429,7 +480,8 @@ def get_principal_curvatures(
     """Compute principal curvatures from point cloud.
 
     Computes the two principal curvatures of a 2D surface and corresponding
-    principal directions
+    principal directions. See get_principal_curvatures_batch to compute the
+    principal curvatures of several patches at once.
 
     Args:
         point_cloud_base: point cloud (2d numpy array) based on which the 2D
@@ -451,118 +503,286 @@ def get_principal_curvatures(
         dir1:   first principal direction
         dir2:   second principal direction
     """
-    point_cloud = point_cloud_base.copy()
-    if point_cloud[center_id, 3] > 0:
-        # Make sure point positions are expressed relative to the center point
-        point_cloud[:, :3] -= point_cloud[center_id, :3]
+    k1, k2, pc1_dirs, pc2_dirs, valid_pcs = get_principal_curvatures_batch(
+        point_cloud_base[np.newaxis],
+        [center_id],
+        np.asarray(n_dir)[np.newaxis],
+        neighbor_patch_frac=neighbor_patch_frac,
+        weighted=weighted,
+        fit_intercept=fit_intercept,
+    )
+    return k1[0], k2[0], pc1_dirs[0], pc2_dirs[0], bool(valid_pcs[0])
 
-        # Filter out points that are not on the object
-        on_obj = point_cloud[:, 3] > 0
-        point_cloud = point_cloud[on_obj, :3]
 
-        # find two directions u_dir and v_dir orthogonal to point-normal (n_dir):
-        # If n_dir's z coef is 0 then normal is pointing in (x,y) plane
-        u_dir = (
-            np.array([1.0, 0.0, -n_dir[0] / n_dir[2]])
-            if n_dir[2]
-            else np.array([0.0, 0.0, 1.0])
+def get_principal_curvatures_batch(
+    point_clouds,
+    center_ids,
+    n_dirs,
+    neighbor_patch_frac=2.13,
+    weighted=True,
+    fit_intercept=True,
+):
+    """Compute the principal curvatures of several patches at once.
+
+    Batched version of get_principal_curvatures. The patches can be observed by
+    different sensors or be several centers in the same patch, but must have the
+    same size. Off-object points are excluded from the regression by giving them
+    zero weight, and the eigenvalues and eigenvectors of the 2x2 shape operator
+    are computed in closed form.
+
+    Args:
+        point_clouds: point clouds based on which the 2D surfaces are
+            approximated. shape = (B, n, 4)
+        center_ids: center point of each point cloud around which the local
+            curvature is estimated. shape = (B,)
+        n_dirs: surface normal at each center point. shape = (B, 3)
+        neighbor_patch_frac: fraction of the patch width that defines the std
+            of the gaussian distribution used to sample the weights. Defines a
+            local neighborhood for principal curvature computation.
+        weighted: boolean flag that determines if regression is weighted or not.
+            Weighting scheme is defined in get_weight_matrix.
+        fit_intercept: boolean flag that determines whether to fit an intercept
+                term for the regression.
+
+    Returns:
+        k1: first principal curvature of each patch. shape = (B,)
+        k2: second principal curvature of each patch. shape = (B,)
+        pc1_dirs: first principal direction of each patch. shape = (B, 3)
+        pc2_dirs: second principal direction of each patch. shape = (B, 3)
+        valid_pcs: Whether the principal curvatures of each patch were valid.
+            shape = (B,)
+    """
+    point_clouds = np.asarray(point_clouds, dtype=float)
+    n_dirs = np.asarray(n_dirs, dtype=float)
+    center_ids = np.asarray(center_ids)
+    # The regression works on (B, n_features, n) arrays. Split large batches so
+    # that these stay small enough to be cache friendly.
+    chunk_size = max(1, MAX_CURVATURE_BATCH_POINTS // point_clouds.shape[1])
+    if len(point_clouds) <= chunk_size:
+        return _get_principal_curvatures_chunk(
+            point_clouds,
+            center_ids,
+            n_dirs,
+            neighbor_patch_frac,
+            weighted,
+            fit_intercept,
         )
-        u_dir /= np.linalg.norm(u_dir)
-        v_dir = np.cross(n_dir, u_dir)
-        v_dir /= np.linalg.norm(v_dir)
-
-        # Project point coordinates onto local reference frame
-        u = np.matmul(point_cloud, u_dir)
-        v = np.matmul(point_cloud, v_dir)
-        n = np.matmul(point_cloud, n_dir)
-
-        # Compute the basis functions (features) for quadratic regression (only
-        # fit the intercept if fit_intercept = True)
-        # n = a * u^2 + b * v^2 + c * u * v + d * u + e * v (+ d)
-        n_features = 6 if fit_intercept else 5
-        x_mat = np.zeros((len(point_cloud), n_features))
-        x_mat[:, 0] = np.multiply(u, u)
-        x_mat[:, 1] = np.multiply(v, v)
-        x_mat[:, 2] = np.multiply(u, v)
-        x_mat[:, 3] = u
-        x_mat[:, 4] = v
-        if fit_intercept:
-            x_mat[:, 5] = np.ones(u.shape)
-
-        # Quadratic regression comes down to solving a linear system: A * u = b
-        # Expressions for A and b differ depending on if regression is weighted.
-        if weighted:
-            # Compute the weights for weighted least-square regression
-            n_points = on_obj.shape[0]
-            weights = get_weight_matrix(
-                n_points, center_id, neighbor_patch_frac=neighbor_patch_frac
-            )
-            weights = weights[on_obj, :]  # Filter off-object points
+    chunks = [
+        _get_principal_curvatures_chunk(
+            point_clouds[start : start + chunk_size],
+            center_ids[start : start + chunk_size],
+            n_dirs[start : start + chunk_size],
+            neighbor_patch_frac,
+            weighted,
+            fit_intercept,
+        )
+        for start in range(0, len(point_clouds), chunk_size)
+    ]
+    return tuple(np.concatenate(results) for results in zip(*chunks))
 
-            # Extract matrices for weighted least-squares regression.
-            # A = X.T * W * X and b = X.T * W * n
-            a_mat = np.matmul(x_mat.T, np.multiply(weights, x_mat))
-            b = np.matmul(x_mat.T, np.multiply(weights, n[:, np.newaxis]))
-        else:
-            # Extract matrices for non-weighted least-squares regression.
-            # A = X.T * X and b = X.T * n
-            a_mat = np.matmul(x_mat.T, x_mat)
-            b = np.matmul(x_mat.T, n[:, np.newaxis])
 
-        # Rarely, "a" can be singular, causing numpy to throw an error; appears
-        # to be caused by touch-sensor gathering observations that are largely off the
-        # object, but not entirely (e.g. <25% visible), resulting in a system
-        # with insufficient data to be solvable
-        if non_singular_mat(a_mat):
-            # Step 2) do least-squares fit to get the parameters of the quadratic form
-            params = np.linalg.solve(a_mat, b)
+def _get_principal_curvatures_chunk(
+    point_clouds, center_ids, n_dirs, neighbor_patch_frac, weighted, fit_intercept
+):
+    """Compute the principal curvatures of a chunk of patches.
 
-            # Step 3) compute 1st and 2nd fundamental forms guv and buv:
-            # TODO: Extract improved point normal estimate from fitted curve
-            guv = np.zeros((2, 2))
-            guv[0, 0] = 1 + params[3] * params[3]
-            guv[0, 1] = params[3] * params[4]
-            guv[1, 0] = guv[0, 1]
-            guv[1, 1] = 1 + params[4] * params[4]
+    See get_principal_curvatures_batch.
 
-            buv = np.zeros((2, 2))
-            buv[0, 0] = 2 * params[0]
-            buv[0, 1] = params[2]
-            buv[1, 0] = buv[0, 1]
-            buv[1, 1] = 2 * params[1]
+    Returns:
+        k1, k2, pc1_dirs, pc2_dirs and valid_pcs of each patch in the chunk.
+    """
+    num_patches, n_points = point_clouds.shape[:2]
+    centers = point_clouds[np.arange(num_patches), center_ids]
+    on_obj = point_clouds[:, :, 3] > 0
+    # Make sure point positions are expressed relative to the center point
+    points_t = get_masked_points_relative_to_centers(point_clouds, centers, on_obj)
+
+    # find two directions u_dir and v_dir orthogonal to point-normal (n_dir):
+    # If n_dir's z coef is 0 then normal is pointing in (x,y) plane
+    # The rows of frames are u_dir, v_dir and n_dir.
+    frames = np.zeros((num_patches, 3, 3))
+    in_plane = n_dirs[:, 2] == 0
+    frames[:, 0, 0] = ~in_plane
+    np.divide(-n_dirs[:, 0], n_dirs[:, 2], out=frames[:, 0, 2], where=~in_plane)
+    frames[in_plane, 0, 2] = 1.0
+    frames[:, 0] /= np.linalg.norm(frames[:, 0], axis=1, keepdims=True)
+    frames[:, 1] = np.cross(n_dirs, frames[:, 0])
+    frames[:, 1] /= np.linalg.norm(frames[:, 1], axis=1, keepdims=True)
+    frames[:, 2] = n_dirs
+
+    # Project point coordinates onto local reference frame. The projections and
+    # features are stored with shape (B, 3 or n_features, n) so that each one is
+    # contiguous in memory.
+    u, v, n = np.matmul(frames, points_t).transpose(1, 0, 2)
+
+    # Compute the basis functions (features) for quadratic regression (only
+    # fit the intercept if fit_intercept = True)
+    # n = a * u^2 + b * v^2 + c * u * v + d * u + e * v (+ d)
+    n_features = 6 if fit_intercept else 5
+    x_mat_t = np.empty((num_patches, n_features, n_points))
+    np.multiply(u, u, out=x_mat_t[:, 0])
+    np.multiply(v, v, out=x_mat_t[:, 1])
+    np.multiply(u, v, out=x_mat_t[:, 2])
+    x_mat_t[:, 3] = u
+    x_mat_t[:, 4] = v
+    if fit_intercept:
+        x_mat_t[:, 5] = 1.0
+
+    # Quadratic regression comes down to solving a linear system: A * u = b
+    # with A = X.T * W * X and b = X.T * W * n. Without weighting W only filters
+    # out off-object points. The features and n are scaled by the square root of
+    # the (diagonal) weights in place, so that A = X'.T * X' and b = X'.T * n'.
+    if weighted:
+        sqrt_weights = np.stack(
+            [
+                get_weight_matrix(
+                    n_points, center_id, neighbor_patch_frac=neighbor_patch_frac
+                )[:, 0]
+                for center_id in center_ids
+            ]
+        )
+        np.sqrt(sqrt_weights, out=sqrt_weights)
+        sqrt_weights *= on_obj
+    else:
+        sqrt_weights = on_obj.astype(float)
+    x_mat_t *= sqrt_weights[:, np.newaxis, :]
+    n *= sqrt_weights
+    a_mat = np.matmul(x_mat_t, x_mat_t.transpose(0, 2, 1))
+    b = np.matmul(x_mat_t, n[:, :, np.newaxis])[:, :, 0]
+
+    # Rarely, "a" can be singular, causing numpy to throw an error; appears
+    # to be caused by touch-sensor gathering observations that are largely off the
+    # object, but not entirely (e.g. <25% visible), resulting in a system
+    # with insufficient data to be solvable
+    valid_pcs = centers[:, 3] > 0
+    valid_pcs &= np.all(np.isfinite(a_mat), axis=(1, 2))
+    valid_pcs[valid_pcs] = np.linalg.cond(a_mat[valid_pcs]) < 1 / sys.float_info.epsilon
+    if np.any((centers[:, 3] > 0) & ~valid_pcs):
+        logging.debug(
+            "Warning : Singular matrix encountered in get-curvature-at-point!"
+        )
 
-            # Step 4) compute the principle curvatures and directions:
-            # TODO: here convex PCs are negative but I think they should be positive
-            m = np.linalg.inv(guv).dot(buv)
-            eigval, eigvec = np.linalg.eig(m)
-            idx = eigval.argsort()[::-1]
-            eigval_sorted = eigval[idx]
-            eigvec_sorted = eigvec[:, idx]
+    k1 = np.zeros(num_patches)
+    k2 = np.zeros(num_patches)
+    pc1_dirs = np.zeros((num_patches, 3))
+    pc2_dirs = np.zeros((num_patches, 3))
+    if not np.any(valid_pcs):
+        return k1, k2, pc1_dirs, pc2_dirs, valid_pcs
+
+    # Step 2) do least-squares fit to get the parameters of the quadratic form
+    params = np.linalg.solve(a_mat[valid_pcs], b[valid_pcs][:, :, np.newaxis])[:, :, 0]
+
+    # Step 3) compute 1st and 2nd fundamental forms guv and buv:
+    # TODO: Extract improved point normal estimate from fitted curve
+    guv = np.empty((len(params), 2, 2))
+    guv[:, 0, 0] = 1 + params[:, 3] * params[:, 3]
+    guv[:, 0, 1] = guv[:, 1, 0] = params[:, 3] * params[:, 4]
+    guv[:, 1, 1] = 1 + params[:, 4] * params[:, 4]
+
+    buv = np.empty((len(params), 2, 2))
+    buv[:, 0, 0] = 2 * params[:, 0]
+    buv[:, 0, 1] = buv[:, 1, 0] = params[:, 2]
+    buv[:, 1, 1] = 2 * params[:, 1]
+
+    # Step 4) compute the principle curvatures and directions:
+    # TODO: here convex PCs are negative but I think they should be positive
+    m = inverse_2x2(guv) @ buv
+    eigval, eigvec = eig_2x2(m)
+
+    k1[valid_pcs] = eigval[:, 0]
+    k2[valid_pcs] = eigval[:, 1]
+
+    # always have dir2 point to the righthand side of dir1. Since
+    # cross(u_dir, v_dir) = n_dir this is the case if the eigenvectors (in u, v
+    # coordinates) have a positive determinant.
+    left_hand = eigvec[:, 0, 0] * eigvec[:, 1, 1] < eigvec[:, 1, 0] * eigvec[:, 0, 1]
+    eigvec[left_hand, :, 1] *= -1
+
+    # TODO: sometimes dir1 and dir2 are not orthogonal, why?
+    # principal directions in the same coordinate frame as points:
+    pc_dirs = np.matmul(eigvec.transpose(0, 2, 1), frames[valid_pcs, :2])
+    pc1_dirs[valid_pcs] = pc_dirs[:, 0]
+    pc2_dirs[valid_pcs] = pc_dirs[:, 1]
+    return k1, k2, pc1_dirs, pc2_dirs, valid_pcs
+
+
+def inverse_2x2(mats):
+    """Invert multiple 2x2 matrices in closed form.
 
-            k1 = eigval_sorted[0]
-            k2 = eigval_sorted[1]
+    Args:
+        mats: Invertible matrices. shape = (B, 2, 2)
 
-            # TODO: sometimes dir1 and dir2 are not orthogonal, why?
-            # principal directions in the same coordinate frame as points:
-            pc1_dir = eigvec_sorted[0, 0] * u_dir + eigvec_sorted[1, 0] * v_dir
-            pc2_dir = eigvec_sorted[0, 1] * u_dir + eigvec_sorted[1, 1] * v_dir
-            if get_right_hand_angle(pc1_dir, pc2_dir, n_dir) < 0:
-                # always have dir2 point to the righthand side of dir1
-                pc2_dir = -pc2_dir
-            valid_pc = True
+    Returns:
+        The inverse of each matrix. shape = (B, 2, 2)
+    """
+    det = mats[:, 0, 0] * mats[:, 1, 1] - mats[:, 0, 1] * mats[:, 1, 0]
+    inverse = np.empty_like(mats)
+    inverse[:, 0, 0] = mats[:, 1, 1]
+    inverse[:, 0, 1] = -mats[:, 0, 1]
+    inverse[:, 1, 0] = -mats[:, 1, 0]
+    inverse[:, 1, 1] = mats[:, 0, 0]
+    return inverse / det[:, np.newaxis, np.newaxis]
 
-        else:
-            k1, k2, pc1_dir, pc2_dir = 0, 0, [0, 0, 0], [0, 0, 0]
-            valid_pc = False
-            logging.debug(
-                "Warning : Singular matrix encountered in get-curvature-at-point!"
-            )
 
-    else:
-        k1, k2, pc1_dir, pc2_dir = 0, 0, [0, 0, 0], [0, 0, 0]
-        valid_pc = False
+def eig_2x2(mats):
+    """Compute eigenvalues and eigenvectors of multiple 2x2 matrices in closed form.
+
+    Assumes that the eigenvalues are real, which is the case for symmetric matrices
+    and for the shape operator inv(G) * B used in get_principal_curvatures_batch.
+
+    Args:
+        mats: Matrices with real eigenvalues. shape = (B, 2, 2)
+
+    Returns:
+        eigval: Eigenvalues of each matrix in descending order. shape = (B, 2)
+        eigvec: Unit eigenvectors of each matrix as columns, in the order of the
+            eigenvalues. shape = (B, 2, 2)
+    """
+    a, b = mats[:, 0, 0], mats[:, 0, 1]
+    c, d = mats[:, 1, 0], mats[:, 1, 1]
+    half_trace = (a + d) / 2
+    # Clip the discriminant at 0 since it can be slightly negative due to rounding
+    # for matrices with two equal eigenvalues.
+    disc = np.sqrt(np.maximum(half_trace**2 - (a * d - b * c), 0))
+    eigval = np.stack([half_trace + disc, half_trace - disc], axis=1)
+
+    eigvec = np.empty(mats.shape)
+    for i in range(2):
+        # (b, l - a) and (l - d, c) are both eigenvectors of eigenvalue l, use the
+        # longer one for numerical stability.
+        row_x, row_y = b, eigval[:, i] - a
+        col_x, col_y = eigval[:, i] - d, c
+        row_norm = row_x**2 + row_y**2
+        col_norm = col_x**2 + col_y**2
+        use_row = row_norm >= col_norm
+        eigvec[:, 0, i] = np.where(use_row, row_x, col_x)
+        eigvec[:, 1, i] = np.where(use_row, row_y, col_y)
+        norm = np.sqrt(np.maximum(row_norm, col_norm))
+        # Multiples of the identity have any vector as eigenvector.
+        is_identity = norm == 0
+        eigvec[is_identity, :, i] = np.eye(2)[i]
+        norm[is_identity] = 1
+        eigvec[:, :, i] /= norm[:, np.newaxis]
+    return eigval, eigvec
+
+
+def get_masked_points_relative_to_centers(point_clouds, centers, mask):
+    """Get locations relative to the patch centers, with masked out points at 0.
+
+    Args:
+        point_clouds: point clouds with locations and semantic ids.
+            shape = (B, n, 4)
+        centers: patch center of each point cloud. shape = (B, 4)
+        mask: which points to keep. shape = (B, n)
 
-    return k1, k2, pc1_dir, pc2_dir, valid_pc
+    Returns:
+        Transposed locations relative to the centers, so that each coordinate is
+        contiguous in memory. shape = (B, 3, n)
+    """
+    points_t = np.ascontiguousarray(point_clouds[:, :, :3].transpose(0, 2, 1))
+    points_t -= centers[:, :3, np.newaxis]
+    np.copyto(points_t, 0.0, where=~mask[:, np.newaxis, :])
+    return points_t
 
 
 def get_center_neighbors(point_cloud, center_id, neighbor_patch_frac):
@@ -575,8 +795,31 @@ def get_center_neighbors(point_cloud, center_id, neighbor_patch_frac):
     # Set patch center as origin of coordinate frame
     point_cloud[:, :3] -= point_cloud[center_id, :3]
 
-    # Extract high-level parameters
-    n_points = point_cloud.shape[0]
+    neighbor_ids = get_center_neighbor_ids(
+        point_cloud.shape[0], center_id, neighbor_patch_frac
+    )
+    neighbors = point_cloud[neighbor_ids, :]
+
+    # Filter out points that do not lie on an object
+    neighbors_on_obj = neighbors[neighbors[:, 3] > 0, :3]
+    return neighbors_on_obj
+
+
+@functools.lru_cache(maxsize=128)
+def get_center_neighbor_ids(n_points, center_id, neighbor_patch_frac):
+    """Get ids of the points within a given neighborhood of the patch center.
+
+    The ids are cached and returned as a read-only array.
+
+    Args:
+        n_points: total number of points in the full RGB-D square patch.
+        center_id: id of the center point in point_cloud.
+        neighbor_patch_frac: fraction of the patch width that defines the radius
+            of the neighborhood (in pixel space).
+
+    Returns:
+        Ids of all points within the neighborhood, in ascending order.
+    """
     patch_width = int(np.sqrt(n_points))
     neighbor_radius = patch_width / neighbor_patch_frac
 
@@ -584,20 +827,18 @@ def get_center_neighbors(point_cloud, center_id, neighbor_patch_frac):
     dist_to_center = get_pixel_dist_to_center(n_points, patch_width, center_id)
 
     # Use distances to define local neighborhood.
-    is_neighbor = dist_to_center <= neighbor_radius
-    neighbors_idx = is_neighbor.reshape((n_points,))
-    neighbors = point_cloud[neighbors_idx, :]
-
-    # Filter out points that do not lie on an object
-    neighbors_on_obj = neighbors[neighbors[:, 3] > 0, :3]
-    return neighbors_on_obj
+    neighbor_ids = np.flatnonzero(dist_to_center.reshape(n_points) <= neighbor_radius)
+    neighbor_ids.flags.writeable = False
+    return neighbor_ids
 
 
+@functools.lru_cache(maxsize=128)
 def get_weight_matrix(n_points, center_id, neighbor_patch_frac=2.13):
     """Extracts individual pixel weights for least-squares fitting.
 
     Weight for each pixel is sampled from a gaussian distribution based on its distance
-    to the patch center.
+    to the patch center. The weights only depend on the patch size, center and
+    neighbor_patch_frac, so they are cached and returned as a read-only array.
 
     Args:
         n_points: total number of points in the full RGB-D square patch.
@@ -623,12 +864,16 @@ def get_weight_matrix(n_points, center_id, neighbor_patch_frac=2.13):
     )
     w_diag = w_coefs.reshape((n_points, 1))
     w_diag /= np.sum(w_diag)
+    w_diag.flags.writeable = False
     return w_diag
 
 
+@functools.lru_cache(maxsize=128)
 def get_pixel_dist_to_center(n_points, patch_width, center_id):
     """Extracts the relative distance of each pixel to patch center (in pixel space).
 
+    The distances are cached and returned as a read-only array.
+
     Returns:
         Relative distance of each pixel to patch center (in pixel space)
     """
@@ -640,6 +885,7 @@ def get_pixel_dist_to_center(n_points, patch_width, center_id):
     # Compute relative distance to patch center
     pos_center = pos[point_idx == center_id]
     dist_to_center = np.linalg.norm(pos - pos_center, axis=2)
+    dist_to_center.flags.writeable = False
     return dist_to_center
 
 
@@ -210,7 +210,9 @@ def align_multiple_orthonormal_vectors(ms1, ms2, as_scipy=True):
 
     Args:
         ms1: multiple orthonormal vectors. shape = (N, 3, 3)
-        ms2: orthonormal vectors to align with. shape = (3, 3)
+        ms2: orthonormal vectors to align with. shape = (3, 3). When as_scipy is
+            False, M sets of vectors with shape = (M, 1, 3, 3) can be aligned at
+            once, returning rotation matrices with shape = (M, N, 3, 3).
         as_scipy: Whether to return a list of N scipy.Rotation objects or
             a np.array of rotation matrices (N, 3, 3).
 
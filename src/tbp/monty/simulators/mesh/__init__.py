@@ -0,0 +1,14 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+from .actuator import *
+from .agents import *
+from .bvh import *
+from .meshes import *
+from .simulator import *
@@ -0,0 +1,225 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+import quaternion as qt
+
+from tbp.monty.frameworks.actions.actions import (
+    Action,
+    LookDown,
+    LookUp,
+    MoveForward,
+    MoveTangentially,
+    OrientHorizontal,
+    OrientVertical,
+    SetAgentPitch,
+    SetAgentPose,
+    SetSensorPitch,
+    SetSensorPose,
+    SetSensorRotation,
+    SetYaw,
+    TurnLeft,
+    TurnRight,
+)
+from tbp.monty.frameworks.actions.actuator import Actuator
+
+from .agents import MeshAgent
+
+__all__ = [
+    "MeshActuator",
+    "MeshActuatorRequirements",
+]
+
+_X_AXIS = 0
+_Y_AXIS = 1
+_Z_AXIS = 2
+
+Pose = Tuple[np.ndarray, qt.quaternion]
+
+
+def _as_quaternion(rotation) -> qt.quaternion:
+    if isinstance(rotation, qt.quaternion):
+        return rotation
+    return qt.quaternion(*rotation)
+
+
+def _axis_rotation(degrees: float, axis: int) -> qt.quaternion:
+    rotation_vector = np.zeros(3)
+    rotation_vector[axis] = np.radians(degrees)
+    return qt.from_rotation_vector(rotation_vector)
+
+
+def _move_along(pose: Pose, distance: float, axis: int) -> Pose:
+    """Translate along a local axis, like habitat-sim's `_move_along`.
+
+    Returns:
+        The new pose.
+    """
+    position, rotation = pose
+    direction = np.zeros(3)
+    direction[axis] = distance
+    return position + qt.rotate_vectors(rotation, direction), rotation
+
+
+def _rotate_local(
+    pose: Pose, degrees: float, axis: int, constraint: Optional[float] = None
+) -> Pose:
+    """Rotate about a local axis, like habitat-sim's `_rotate_local`.
+
+    Args:
+        pose: Position and rotation to update.
+        degrees: Rotation angle in degrees.
+        axis: Index of the local rotation axis.
+        constraint: Optional maximum absolute angle in degrees of the rotation
+            about the axis after the update.
+
+    Returns:
+        The new pose.
+    """
+    position, rotation = pose
+    if constraint is not None:
+        # Signed angle of the current rotation about the axis
+        current = np.degrees(qt.as_rotation_vector(rotation)[axis])
+        degrees = np.clip(current + degrees, -constraint, constraint) - current
+    return position, (rotation * _axis_rotation(degrees, axis)).normalized()
+
+
+class MeshActuatorRequirements(ABC):
+    """MeshActuator requires these to be available when mixed in."""
+
+    @abstractmethod
+    def get_agent(self, agent_id: str) -> MeshAgent:
+        pass
+
+
+class MeshActuator(Actuator, MeshActuatorRequirements):
+    """Applies Monty actions to the poses of :class:`MeshAgent` and its sensors.
+
+    Mirrors the actions of :class:`tbp.monty.simulators.habitat.HabitatActuator`.
+    Body actions update the pose of the agent, other actions update the pose of all
+    sensors of the agent relative to the agent. It is expected to be mixed into
+    :class:`MeshSim`.
+    """
+
+    def action_name(self, action: Action) -> str:
+        """Returns the action name prefixed by the agent ID."""
+        return f"{action.agent_id}.{action.name}"
+
+    def get_valid_agent(self, action: Action) -> MeshAgent:
+        """Return the agent of an action.
+
+        Raises:
+            ValueError: If the action is not in the action space of the agent.
+        """
+        agent = self.get_agent(action.agent_id)
+        action_name = self.action_name(action)
+        if action_name not in agent.action_space:
+            raise ValueError(f"Invalid action name: {action_name}")
+        return agent
+
+    def actuate_look_down(self, action: LookDown) -> None:
+        agent = self.get_valid_agent(action)
+        for sensor in agent.sensors.values():
+            sensor.pose = _rotate_local(
+                sensor.pose,
+                -action.rotation_degrees,
+                _X_AXIS,
+                constraint=action.constraint_degrees,
+            )
+
+    def actuate_look_up(self, action: LookUp) -> None:
+        agent = self.get_valid_agent(action)
+        for sensor in agent.sensors.values():
+            sensor.pose = _rotate_local(
+                sensor.pose,
+                action.rotation_degrees,
+                _X_AXIS,
+                constraint=action.constraint_degrees,
+            )
+
+    def actuate_move_forward(self, action: MoveForward) -> None:
+        agent = self.get_valid_agent(action)
+        agent.pose = _move_along(agent.pose, -action.distance, _Z_AXIS)
+
+    def actuate_move_tangentially(self, action: MoveTangentially) -> None:
+        agent = self.get_valid_agent(action)
+        position, rotation = agent.pose
+        direction = np.asarray(action.direction, dtype=np.float64)
+        agent.pose = (
+            position + qt.rotate_vectors(rotation, direction * action.distance),
+            rotation,
+        )
+
+    def actuate_orient_horizontal(self, action: OrientHorizontal) -> None:
+        # Move left to compensate for the right turn, such that the same point is
+        # fixated upon
+        agent = self.get_valid_agent(action)
+        pose = _move_along(agent.pose, -action.left_distance, _X_AXIS)
+        pose = _rotate_local(pose, -action.rotation_degrees, _Y_AXIS)
+        agent.pose = _move_along(pose, -action.forward_distance, _Z_AXIS)
+
+    def actuate_orient_vertical(self, action: OrientVertical) -> None:
+        # Move down and forward to compensate for the upward turn, such that the
+        # same point is fixated upon
+        agent = self.get_valid_agent(action)
+        pose = _move_along(agent.pose, -action.down_distance, _Y_AXIS)
+        pose = _rotate_local(pose, action.rotation_degrees, _X_AXIS)
+        agent.pose = _move_along(pose, -action.forward_distance, _Z_AXIS)
+
+    def actuate_set_agent_pitch(self, action: SetAgentPitch) -> None:
+        # Same axis as habitat-sim's SetAgentPitch, see the TODO there
+        agent = self.get_valid_agent(action)
+        agent.pose = (agent.pose[0], _axis_rotation(action.pitch_degrees, _Y_AXIS))
+
+    def actuate_set_agent_pose(self, action: SetAgentPose) -> None:
+        agent = self.get_valid_agent(action)
+        agent.pose = (
+            np.array(action.location, dtype=np.float64),
+            _as_quaternion(action.rotation_quat),
+        )
+
+    def actuate_set_sensor_pitch(self, action: SetSensorPitch) -> None:
+        # Same axis as habitat-sim's SetSensorPitch, see the TODO there
+        agent = self.get_valid_agent(action)
+        for sensor in agent.sensors.values():
+            sensor.pose = (
+                sensor.pose[0],
+                _axis_rotation(action.pitch_degrees, _Y_AXIS),
+            )
+
+    def actuate_set_sensor_pose(self, action: SetSensorPose) -> None:
+        agent = self.get_valid_agent(action)
+        for sensor in agent.sensors.values():
+            sensor.pose = (
+                np.array(action.location, dtype=np.float64),
+                _as_quaternion(action.rotation_quat),
+            )
+
+    def actuate_set_sensor_rotation(self, action: SetSensorRotation) -> None:
+        agent = self.get_valid_agent(action)
+        for sensor in agent.sensors.values():
+            sensor.pose = (sensor.pose[0], _as_quaternion(action.rotation_quat))
+
+    def actuate_set_yaw(self, action: SetYaw) -> None:
+        # Same axis as habitat-sim's SetYaw, see the TODO there
+        agent = self.get_valid_agent(action)
+        agent.pose = (agent.pose[0], _axis_rotation(action.rotation_degrees, _Z_AXIS))
+
+    def actuate_turn_left(self, action: TurnLeft) -> None:
+        agent = self.get_valid_agent(action)
+        agent.pose = _rotate_local(agent.pose, action.rotation_degrees, _Y_AXIS)
+
+    def actuate_turn_right(self, action: TurnRight) -> None:
+        agent = self.get_valid_agent(action)
+        agent.pose = _rotate_local(agent.pose, -action.rotation_degrees, _Y_AXIS)
@@ -0,0 +1,221 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import quaternion as qt
+
+__all__ = ["MeshAgent", "MeshSensor"]
+
+Vector3 = Tuple[float, float, float]
+Quaternion = Tuple[float, float, float, float]
+Size = Tuple[int, int]
+
+#: Actions available to each type of action space, see
+#: :class:`tbp.monty.simulators.habitat.ActionSpaceMixin`
+ACTION_SPACES = {
+    "absolute_only": (
+        "set_yaw",
+        "set_agent_pitch",
+        "set_sensor_pitch",
+        "set_agent_pose",
+        "set_sensor_rotation",
+        "set_sensor_pose",
+    ),
+    "distant_agent": (
+        "move_forward",
+        "turn_left",
+        "turn_right",
+        "look_up",
+        "look_down",
+        "set_agent_pose",
+        "set_sensor_rotation",
+    ),
+    "surface_agent": (
+        "move_forward",
+        "move_tangentially",
+        "orient_horizontal",
+        "orient_vertical",
+        "set_agent_pose",
+        "set_sensor_rotation",
+    ),
+}
+
+
+@dataclass
+class MeshSensor:
+    """Pinhole RGBD camera with an optional semantic sensor.
+
+    The camera has the same intrinsics as the habitat-sim cameras: a horizontal
+    field of view of 90 degrees divided by `zoom`, and pixels whose rays go through
+    the same points of the image plane that :class:`DepthTo3DLocations` unprojects.
+
+    Attributes:
+        sensor_id: Sensor ID, observations are grouped by it.
+        resolution: Resolution (height, width) of the images.
+        position: Initial position relative to the agent.
+        rotation: Initial rotation relative to the agent.
+        zoom: Camera zoom multiplier.
+        semantic: Whether the sensor also returns semantic images.
+        near: Distance along the optical axis below which surfaces are clipped.
+        far: Distance along the optical axis above which surfaces are clipped.
+    """
+
+    sensor_id: str
+    resolution: Size = (16, 16)
+    position: Vector3 = (0.0, 0.0, 0.0)
+    rotation: Quaternion = (1.0, 0.0, 0.0, 0.0)
+    zoom: float = 1.0
+    semantic: bool = False
+    near: float = 0.01
+    far: float = 1000.0
+
+    def __post_init__(self):
+        self.reset()
+        height, width = self.resolution
+        fx = np.tan(np.pi / 4) / self.zoom
+        fy = fx * height / width
+        x, y = np.meshgrid(np.linspace(-1, 1, width), np.linspace(1, -1, height))
+        rays = np.stack([x * fx, y * fy, -np.ones_like(x)], axis=-1).reshape(-1, 3)
+        rays.flags.writeable = False
+        self._rays = rays
+
+    @property
+    def rays(self) -> np.ndarray:
+        """Read-only ray direction of each pixel in camera coordinates.
+
+        Rays have unit length along the optical axis (-z), such that their ray
+        parameter at a hit equals the depth. shape = (height * width, 3)
+        """
+        return self._rays
+
+    @property
+    def sensor_types(self) -> List[str]:
+        return ["rgba", "depth", "semantic"] if self.semantic else ["rgba", "depth"]
+
+    def reset(self):
+        """Restore the initial pose relative to the agent."""
+        self.pose = (
+            np.array(self.position, dtype=np.float64),
+            qt.quaternion(*self.rotation),
+        )
+
+
+class MeshAgent:
+    """Agent with several RGBD sensors mounted, rendered by :class:`.MeshSim`.
+
+    Takes the same arguments as :class:`tbp.monty.simulators.habitat.MultiSensorAgent`
+    and supports the same actions, such that the mount configs of
+    `make_dataset_configs` can be used for both simulators.
+
+    Attributes:
+        agent_id: Actions provided by this agent will be prefixed by this id.
+        sensor_ids: List of ids for each sensor.
+        position: Initial absolute position of the agent.
+        rotation: Initial absolute rotation of the agent (quaternion).
+        height: Height of the mount itself in meters, added to the sensor positions.
+        rotation_step: Default rotation step in degrees. Unused, action amounts are
+            specified by the motor system.
+        translation_step: Default translation step in meters. Unused, action amounts
+            are specified by the motor system.
+        action_space_type: One of "distant_agent", "surface_agent" or
+            "absolute_only", see :const:`ACTION_SPACES`.
+        sensors: The :class:`MeshSensor` of each sensor ID.
+    """
+
+    def __init__(
+        self,
+        agent_id: str,
+        sensor_ids: Tuple[str],
+        position: Vector3 = (0.0, 1.5, 0.0),  # Agent position
+        rotation: Quaternion = (1.0, 0.0, 0.0, 0.0),
+        height: float = 0.0,
+        rotation_step: float = 0.0,
+        translation_step: float = 0.0,
+        action_space_type: str = "distant_agent",
+        resolutions: Tuple[Size] = ((16, 16),),
+        positions: Tuple[Vector3] = ((0.0, 0.0, 0.0),),
+        rotations: Tuple[Quaternion] = ((1.0, 0.0, 0.0, 0.0),),
+        zooms: Tuple[float] = (1.0,),
+        semantics: Tuple[bool] = (False,),
+    ):
+        if action_space_type not in ACTION_SPACES:
+            raise ValueError(f"Invalid action space type: {action_space_type}")
+        if sensor_ids is None:
+            sensor_ids = (uuid.uuid4().hex,)
+        param_lists = [sensor_ids, resolutions, positions, rotations, zooms, semantics]
+        assert all(len(p) == len(sensor_ids) for p in param_lists)
+
+        self.agent_id = agent_id
+        self.sensor_ids = sensor_ids
+        self.position = position
+        self.rotation = rotation
+        self.height = height
+        self.rotation_step = rotation_step
+        self.translation_step = translation_step
+        self.action_space_type = action_space_type
+        self.sensors: Dict[str, MeshSensor] = {}
+        for sid, res, pos, rot, zoom, sem in zip(*param_lists):
+            self.sensors[sid] = MeshSensor(
+                sensor_id=sid,
+                resolution=tuple(res),
+                position=(pos[0], pos[1] + height, pos[2]),
+                rotation=tuple(rot),
+                zoom=zoom,
+                semantic=sem,
+            )
+        self.reset()
+
+    @property
+    def action_space(self) -> List[str]:
+        """Names of the actions of this agent prefixed by the agent ID."""
+        return [
+            f"{self.agent_id}.{name}" for name in ACTION_SPACES[self.action_space_type]
+        ]
+
+    def reset(self):
+        """Restore the initial pose of the agent and its sensors."""
+        self.pose = (
+            np.array(self.position, dtype=np.float64),
+            qt.quaternion(*self.rotation),
+        )
+        for sensor in self.sensors.values():
+            sensor.reset()
+
+    def get_state(self) -> dict:
+        """Return the agent pose and the sensor poses relative to the agent.
+
+        Returns:
+            The state in the same format as :meth:`HabitatSim.get_states`.
+        """
+        position, rotation = self.pose
+        sensors = {}
+        for sensor_id, sensor in self.sensors.items():
+            sensor_position, sensor_rotation = sensor.pose
+            for sensor_type in sensor.sensor_types:
+                sensors[f"{sensor_id}.{sensor_type}"] = {
+                    "position": sensor_position.copy(),
+                    "rotation": sensor_rotation,
+                }
+        return {"position": position.copy(), "rotation": rotation, "sensors": sensors}
+
+    def get_sensor_world_pose(
+        self, sensor: MeshSensor
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the absolute position and rotation matrix of a sensor."""
+        position, rotation = self.pose
+        sensor_position, sensor_rotation = sensor.pose
+        world_position = position + qt.rotate_vectors(rotation, sensor_position)
+        world_rotation = qt.as_rotation_matrix(rotation * sensor_rotation)
+        return world_position, world_rotation
@@ -0,0 +1,256 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Bounding volume hierarchy for ray casting triangle meshes with NumPy."""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+__all__ = ["BVH", "intersect_triangles"]
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cross product, faster than `np.cross` for (N, 3) arrays.
+
+    Returns:
+        The cross products. shape = (N, 3)
+    """
+    result = np.empty_like(a)
+    result[:, 0] = a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1]
+    result[:, 1] = a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2]
+    result[:, 2] = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    return result
+
+
+def intersect_triangles(
+    origins: np.ndarray,
+    directions: np.ndarray,
+    v0: np.ndarray,
+    edges1: np.ndarray,
+    edges2: np.ndarray,
+    eps: float = 1e-12,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Intersect pairs of rays and triangles with the Möller-Trumbore algorithm.
+
+    Triangles are two-sided, i.e. they are hit from the front and from the back.
+
+    Args:
+        origins: Ray origins. shape = (N, 3)
+        directions: Ray directions, not necessarily normalized. shape = (N, 3)
+        v0: First vertex of each triangle. shape = (N, 3)
+        edges1: Second minus first vertex of each triangle. shape = (N, 3)
+        edges2: Third minus first vertex of each triangle. shape = (N, 3)
+        eps: Determinants below this value are parallel rays that miss.
+
+    Returns:
+        The ray parameter t of the hits (np.inf for misses) such that the hit
+        points are `origins + t * directions`, and the barycentric coordinates
+        u and v of the hit points w.r.t. the second and third vertex.
+    """
+    p = _cross(directions, edges2)
+    det = np.einsum("ij,ij->i", edges1, p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_det = 1.0 / det
+        s = origins - v0
+        u = np.einsum("ij,ij->i", s, p) * inv_det
+        q = _cross(s, edges1)
+        v = np.einsum("ij,ij->i", directions, q) * inv_det
+        t = np.einsum("ij,ij->i", edges2, q) * inv_det
+        hit = (np.abs(det) > eps) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return np.where(hit, t, np.inf), u, v
+
+
+class BVH:
+    """Bounding volume hierarchy of axis aligned boxes over the faces of a mesh.
+
+    The tree is built by splitting the faces at the median of their centroids along
+    the longest axis until at most `leaf_size` faces remain, and is stored in flat
+    arrays. Children of a node are stored next to each other, so node `i` has the
+    children `left[i]` and `left[i] + 1` if it is not a leaf.
+
+    Rays are traversed as one packet: each iteration tests all pending (ray, node)
+    pairs against the boxes at once, intersects the faces of the leaves that are hit
+    and replaces the inner nodes that are hit by their children. Pairs whose box is
+    further away than the closest hit found so far are culled.
+
+    Attributes:
+        node_min: Minimum corner of the box of each node. shape = (num_nodes, 3)
+        node_max: Maximum corner of the box of each node. shape = (num_nodes, 3)
+        left: Index of the first child of each node, -1 for leaves.
+        start: Index of the first face of each leaf in `face_ids`.
+        count: Number of faces of each leaf, 0 for inner nodes.
+        face_ids: Face indices of the mesh in tree order.
+    """
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray, leaf_size: int = 4):
+        """Build the tree.
+
+        Args:
+            vertices: Mesh vertices. shape = (V, 3)
+            faces: Vertex indices of the triangles. shape = (F, 3)
+            leaf_size: Maximum number of faces per leaf.
+        """
+        triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)]
+        face_min = triangles.min(axis=1)
+        face_max = triangles.max(axis=1)
+        centroids = triangles.mean(axis=1)
+
+        order = np.arange(len(triangles))
+        node_min, node_max, left, start, count = [], [], [], [], []
+        # Stack of (node index, first face, end face) to split
+        stack = [(0, 0, len(order))]
+        self._append_node(node_min, node_max, left, start, count)
+        while stack:
+            node, first, end = stack.pop()
+            face_range = order[first:end]
+            node_min[node] = face_min[face_range].min(axis=0, initial=np.inf)
+            node_max[node] = face_max[face_range].max(axis=0, initial=-np.inf)
+            if end - first <= leaf_size:
+                start[node], count[node] = first, end - first
+                continue
+            node_centroids = centroids[face_range]
+            axis = np.argmax(np.ptp(node_centroids, axis=0))
+            mid = (end - first) // 2
+            split = np.argpartition(node_centroids[:, axis], mid)
+            order[first:end] = face_range[split]
+            left[node] = len(left)
+            self._append_node(node_min, node_max, left, start, count)
+            self._append_node(node_min, node_max, left, start, count)
+            stack.append((left[node], first, first + mid))
+            stack.append((left[node] + 1, first + mid, end))
+
+        self.node_min = np.array(node_min).reshape(-1, 3)
+        self.node_max = np.array(node_max).reshape(-1, 3)
+        self.left = np.array(left)
+        self.start = np.array(start)
+        self.count = np.array(count)
+        self.face_ids = order
+
+        ordered = triangles[order]
+        self._v0 = ordered[:, 0]
+        self._edges1 = ordered[:, 1] - ordered[:, 0]
+        self._edges2 = ordered[:, 2] - ordered[:, 0]
+
+    @staticmethod
+    def _append_node(node_min, node_max, left, start, count) -> None:
+        node_min.append(np.full(3, np.inf))
+        node_max.append(np.full(3, -np.inf))
+        left.append(-1)
+        start.append(0)
+        count.append(0)
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """Minimum and maximum corner of the mesh. shape = (2, 3)."""
+        return np.stack([self.node_min[0], self.node_max[0]])
+
+    def intersect(
+        self,
+        origins: np.ndarray,
+        directions: np.ndarray,
+        t_max: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Find the closest face hit by each ray.
+
+        Args:
+            origins: Ray origins, or a single origin shared by all rays.
+                shape = (N, 3) or (3,)
+            directions: Ray directions, not necessarily normalized. shape = (N, 3)
+            t_max: Optional upper bound of the ray parameter of each ray, e.g. the
+                closest hit with other meshes. Hits further away are ignored.
+
+        Returns:
+            The ray parameter t of the closest hit of each ray such that the hit
+            point is `origin + t * direction` (np.inf for misses), the index of
+            the face that is hit (-1 for misses), and the barycentric coordinates
+            u and v of the hit points w.r.t. the second and third face vertex.
+        """
+        directions = np.asarray(directions, dtype=np.float64)
+        origins = np.broadcast_to(
+            np.asarray(origins, dtype=np.float64), directions.shape
+        )
+        num_rays = len(directions)
+        t_hit = np.full(num_rays, np.inf)
+        if t_max is not None:
+            t_hit[:] = t_max
+        faces = np.full(num_rays, -1)
+        u_hit = np.zeros(num_rays)
+        v_hit = np.zeros(num_rays)
+        with np.errstate(divide="ignore"):
+            inv_directions = 1.0 / directions
+
+        # Meshes without faces have an empty root that is not a leaf
+        rays = np.arange(num_rays if len(self.face_ids) else 0)
+        hits = (t_hit, faces, u_hit, v_hit)
+        root_distances = self._box_distances(origins, inv_directions, rays, 0 * rays)
+        rays = rays[root_distances < t_hit[rays]]
+
+        nodes = np.zeros(len(rays), dtype=int)
+        while rays.size:
+            distances = self._box_distances(origins, inv_directions, rays, nodes)
+            hit = distances < t_hit[rays]
+            rays, nodes = rays[hit], nodes[hit]
+            is_leaf = self.count[nodes] > 0
+            if np.any(is_leaf):
+                self._intersect_leaves(
+                    origins, directions, rays[is_leaf], nodes[is_leaf], hits
+                )
+            rays, nodes = rays[~is_leaf], self.left[nodes[~is_leaf]]
+            rays = np.repeat(rays, 2)
+            nodes = np.stack([nodes, nodes + 1], axis=1).ravel()
+
+        t_hit[faces < 0] = np.inf
+        return t_hit, faces, u_hit, v_hit
+
+    def _box_distances(self, origins, inv_directions, rays, nodes):
+        """Slab test of (ray, node) pairs.
+
+        Returns:
+            The ray parameter where each ray enters the box of its node, np.inf if
+            it misses the box.
+        """
+        # NaNs from 0 * inf are ignored by fmin and fmax
+        with np.errstate(invalid="ignore"):
+            t0 = (self.node_min[nodes] - origins[rays]) * inv_directions[rays]
+            t1 = (self.node_max[nodes] - origins[rays]) * inv_directions[rays]
+        t_min, t_max = np.fmin(t0, t1), np.fmax(t0, t1)
+        # Element-wise over the columns, much faster than reducing along axis 1
+        t_near = np.fmax(np.fmax(t_min[:, 0], t_min[:, 1]), t_min[:, 2])
+        t_far = np.fmin(np.fmin(t_max[:, 0], t_max[:, 1]), t_max[:, 2])
+        t_near[~((t_near <= t_far) & (t_far >= 0))] = np.inf
+        return t_near
+
+    def _intersect_leaves(self, origins, directions, rays, nodes, hits):
+        """Intersect rays with the faces of leaves and update the closest hits."""
+        t_hit, faces, u_hit, v_hit = hits
+        counts = self.count[nodes]
+        pair_rays = np.repeat(rays, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        pair_faces = np.repeat(self.start[nodes], counts) + offsets
+        t, u, v = intersect_triangles(
+            origins[pair_rays],
+            directions[pair_rays],
+            self._v0[pair_faces],
+            self._edges1[pair_faces],
+            self._edges2[pair_faces],
+        )
+        closer = t < t_hit[pair_rays]
+        pair_rays, pair_faces = pair_rays[closer], pair_faces[closer]
+        t, u, v = t[closer], u[closer], v[closer]
+        np.minimum.at(t_hit, pair_rays, t)
+        closest = t == t_hit[pair_rays]
+        pair_rays = pair_rays[closest]
+        faces[pair_rays] = self.face_ids[pair_faces[closest]]
+        u_hit[pair_rays] = u[closest]
+        v_hit[pair_rays] = v[closest]
@@ -0,0 +1,117 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Union
+
+from tbp.monty.frameworks.config_utils.make_dataset_configs import (
+    PatchAndViewFinderMountConfig,
+    SurfaceAndViewFinderMountConfig,
+)
+from tbp.monty.frameworks.environment_utils.transforms import (
+    DepthTo3DLocations,
+    MissingToMaxDepth,
+)
+from tbp.monty.simulators.mesh import MeshAgent
+from tbp.monty.simulators.mesh.environment import (
+    AgentConfig,
+    MeshEnvironment,
+    ObjectConfig,
+)
+
+__all__ = [
+    "EnvInitArgsMesh",
+    "EnvInitArgsMeshPatchViewMount",
+    "EnvInitArgsMeshSurfaceViewMount",
+    "PatchViewFinderMountMeshDatasetArgs",
+    "SurfaceViewFinderMountMeshDatasetArgs",
+]
+
+
+@dataclass
+class EnvInitArgsMesh:
+    """Args for :class:`MeshEnvironment`."""
+
+    agents: List[AgentConfig]
+    objects: List[ObjectConfig] = field(
+        default_factory=lambda: [ObjectConfig("coneSolid", position=(0.0, 1.5, -0.1))]
+    )
+    seed: int = field(default=42)
+    data_path: str = os.path.join(os.environ["MONTY_DATA"], "habitat/objects/ycb")
+
+
+@dataclass
+class EnvInitArgsMeshPatchViewMount(EnvInitArgsMesh):
+    agents: List[AgentConfig] = field(
+        default_factory=lambda: [
+            AgentConfig(MeshAgent, PatchAndViewFinderMountConfig().__dict__)
+        ]
+    )
+
+
+@dataclass
+class EnvInitArgsMeshSurfaceViewMount(EnvInitArgsMesh):
+    agents: List[AgentConfig] = field(
+        default_factory=lambda: [
+            AgentConfig(MeshAgent, SurfaceAndViewFinderMountConfig().__dict__)
+        ]
+    )
+
+
+@dataclass
+class PatchViewFinderMountMeshDatasetArgs:
+    """Same as `PatchViewFinderMountHabitatDatasetArgs` with a `MeshEnvironment`."""
+
+    env_init_func: Callable = field(default=MeshEnvironment)
+    env_init_args: Dict = field(
+        default_factory=lambda: EnvInitArgsMeshPatchViewMount().__dict__
+    )
+    transform: Union[Callable, list, None] = None
+    rng: Union[Callable, None] = None
+
+    def __post_init__(self):
+        agent_args = self.env_init_args["agents"][0].agent_args
+        self.transform = [
+            MissingToMaxDepth(agent_id=agent_args["agent_id"], max_depth=1),
+            DepthTo3DLocations(
+                agent_id=agent_args["agent_id"],
+                sensor_ids=agent_args["sensor_ids"],
+                resolutions=agent_args["resolutions"],
+                world_coord=True,
+                zooms=agent_args["zooms"],
+                get_all_points=True,
+                use_semantic_sensor=False,
+            ),
+        ]
+
+
+@dataclass
+class SurfaceViewFinderMountMeshDatasetArgs(PatchViewFinderMountMeshDatasetArgs):
+    """Same as `SurfaceViewFinderMountHabitatDatasetArgs` with a `MeshEnvironment`."""
+
+    env_init_args: Dict = field(
+        default_factory=lambda: EnvInitArgsMeshSurfaceViewMount().__dict__
+    )
+
+    def __post_init__(self):
+        agent_args = self.env_init_args["agents"][0].agent_args
+        self.transform = [
+            MissingToMaxDepth(agent_id=agent_args["agent_id"], max_depth=1),
+            DepthTo3DLocations(
+                agent_id=agent_args["agent_id"],
+                sensor_ids=agent_args["sensor_ids"],
+                resolutions=agent_args["resolutions"],
+                world_coord=True,
+                zooms=agent_args["zooms"],
+                get_all_points=True,
+                use_semantic_sensor=False,
+                depth_clip_sensors=(0,),  # comma needed to make it a tuple
+                clip_value=0.05,
+            ),
+        ]
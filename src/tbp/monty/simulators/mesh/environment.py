@@ -0,0 +1,139 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+from dataclasses import asdict, dataclass, is_dataclass
+from typing import Dict, List, Optional, Type, Union
+
+from tbp.monty.frameworks.actions.actions import Action
+from tbp.monty.frameworks.environments.embodied_environment import (
+    ActionSpace,
+    EmbodiedEnvironment,
+    QuaternionWXYZ,
+    VectorXYZ,
+)
+from tbp.monty.frameworks.utils.dataclass_utils import create_dataclass_args
+from tbp.monty.simulators.mesh import MeshAgent, MeshSim
+
+__all__ = [
+    "AgentConfig",
+    "MeshActionSpace",
+    "MeshAgentArgs",
+    "MeshEnvironment",
+    "ObjectConfig",
+]
+
+
+# ObjectConfig dataclass based on the arguments of `MeshSim.add_object` method
+ObjectConfig = create_dataclass_args("ObjectConfig", MeshSim.add_object)
+ObjectConfig.__module__ = __name__
+
+# MeshAgentArgs dataclass based on constructor args
+MeshAgentArgs = create_dataclass_args("MeshAgentArgs", MeshAgent.__init__)
+MeshAgentArgs.__module__ = __name__
+
+
+@dataclass
+class AgentConfig:
+    """Agent configuration used by :class:`MeshEnvironment`."""
+
+    agent_type: Type[MeshAgent]
+    agent_args: Union[dict, Type[MeshAgentArgs]]
+
+
+class MeshActionSpace(tuple, ActionSpace):
+    """`ActionSpace` of the action names of all agents of a :class:`MeshSim`."""
+
+    def sample(self):
+        return self.rng.choice(self)
+
+
+class MeshEnvironment(EmbodiedEnvironment):
+    """Ray casting mesh environment compatible with Monty.
+
+    Takes the same arguments as :class:`HabitatEnvironment` except for the scene,
+    and renders isolated objects on the CPU without habitat-sim.
+
+    Attributes:
+        agents: List of :class:`AgentConfig` to place in the scene.
+        objects: Optional list of :class:`ObjectConfig` to place in the scene.
+        seed: Simulator seed to use
+        data_path: Path to the dataset.
+    """
+
+    def __init__(
+        self,
+        agents: List[Union[dict, AgentConfig]],
+        objects: Optional[List[Union[dict, ObjectConfig]]] = None,
+        seed: int = 42,
+        data_path: Optional[str] = None,
+    ):
+        super().__init__()
+        self._agents = []
+        for config in agents:
+            cfg_dict = asdict(config) if is_dataclass(config) else config
+            agent_type = cfg_dict["agent_type"]
+            args = cfg_dict["agent_args"]
+            if is_dataclass(args):
+                args = asdict(args)
+            agent = agent_type(**args)
+            self._agents.append(agent)
+
+        self._env = MeshSim(agents=self._agents, seed=seed, data_path=data_path)
+
+        if objects is not None:
+            for obj in objects:
+                obj_dict = asdict(obj) if is_dataclass(obj) else obj
+                self._env.add_object(**obj_dict)
+
+    @property
+    def action_space(self):
+        return MeshActionSpace(sorted(self._env.get_action_space()))
+
+    def add_object(
+        self,
+        name: str,
+        position: VectorXYZ = (0.0, 0.0, 0.0),
+        rotation: QuaternionWXYZ = (1.0, 0.0, 0.0, 0.0),
+        scale: VectorXYZ = (1.0, 1.0, 1.0),
+        semantic_id: Optional[str] = None,
+        enable_physics: Optional[bool] = False,
+        object_to_avoid=False,
+        primary_target_object=None,
+    ):
+        primary_target_bb = None
+        if primary_target_object is not None:
+            primary_target_bb = list(primary_target_object.get_bounding_corners())
+        return self._env.add_object(
+            name,
+            position,
+            rotation,
+            scale,
+            semantic_id,
+            enable_physics,
+            object_to_avoid,
+            primary_target_bb,
+        )
+
+    def step(self, action: Action) -> Dict[str, Dict]:
+        return self._env.apply_action(action)
+
+    def remove_all_objects(self):
+        return self._env.remove_all_objects()
+
+    def reset(self):
+        return self._env.reset()
+
+    def close(self):
+        _env = getattr(self, "_env", None)
+        if _env is not None:
+            _env.close()
+            self._env = None
+
+    def get_state(self):
+        return self._env.get_states()
@@ -0,0 +1,604 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Triangle meshes of the objects rendered by :class:`MeshSim`.
+
+Meshes are loaded from the habitat object configs (`*.object_config.json`) and
+binary glTF (`.glb`) render assets of a dataset such as YCB, or generated for the
+habitat-sim primitive objects, without depending on habitat-sim.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import re
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .bvh import BVH
+
+__all__ = [
+    "PRIMITIVE_OBJECT_TYPES",
+    "Mesh",
+    "MeshLibrary",
+    "load_glb",
+    "make_primitive",
+]
+
+#: Maps habitat-sim pre-configure primitive object types to semantic IDs. Same as
+#: :const:`tbp.monty.simulators.habitat.PRIMITIVE_OBJECT_TYPES`.
+PRIMITIVE_OBJECT_TYPES = {
+    "capsule3DSolid": 101,
+    "coneSolid": 102,
+    "cubeSolid": 103,
+    "cylinderSolid": 104,
+    "icosphereSolid": 105,
+    "uvSphereSolid": 106,
+}
+
+# Radius and half extent of the primitives, such that they have the same size as
+# the habitat-sim primitives, e.g. the cube has a side length of 0.2
+PRIMITIVE_RADIUS = 0.1
+
+GLB_MAGIC = b"glTF"
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+GLTF_COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+GLTF_NUM_COMPONENTS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+GLTF_TRIANGLES = 4
+
+
+@dataclass
+class Mesh:
+    """Triangle mesh with colors and optional textures.
+
+    Attributes:
+        vertices: Vertex positions. shape = (V, 3)
+        faces: Vertex indices of each triangle. shape = (F, 3)
+        corner_colors: RGBA color in [0, 1] of the three corners of each face, i.e.
+            the base color of the material times the vertex colors.
+            shape = (F, 3, 4)
+        corner_uvs: Optional texture coordinates of the three corners of each face.
+            shape = (F, 3, 2)
+        face_textures: Index in `textures` of the texture of each face, -1 for
+            faces without texture. shape = (F,)
+        textures: RGBA texture images. shape = (H, W, 4) each
+    """
+
+    vertices: np.ndarray
+    faces: np.ndarray
+    corner_colors: np.ndarray
+    corner_uvs: Optional[np.ndarray] = None
+    face_textures: Optional[np.ndarray] = None
+    textures: List[np.ndarray] = field(default_factory=list)
+
+    @classmethod
+    def concatenate(cls, meshes: List[Mesh]) -> Mesh:
+        """Merge several meshes into one.
+
+        Returns:
+            The merged mesh.
+        """
+        vertex_offsets = np.cumsum([0] + [len(m.vertices) for m in meshes[:-1]])
+        texture_offsets = np.cumsum([0] + [len(m.textures) for m in meshes[:-1]])
+        textured = any(m.face_textures is not None for m in meshes)
+        corner_uvs, face_textures = None, None
+        if textured:
+            corner_uvs = np.concatenate(
+                [
+                    m.corner_uvs
+                    if m.corner_uvs is not None
+                    else np.zeros((len(m.faces), 3, 2))
+                    for m in meshes
+                ]
+            )
+            face_textures = np.concatenate(
+                [
+                    np.where(m.face_textures >= 0, m.face_textures + offset, -1)
+                    if m.face_textures is not None
+                    else np.full(len(m.faces), -1)
+                    for m, offset in zip(meshes, texture_offsets)
+                ]
+            )
+        return cls(
+            vertices=np.concatenate([m.vertices for m in meshes]),
+            faces=np.concatenate(
+                [m.faces + offset for m, offset in zip(meshes, vertex_offsets)]
+            ),
+            corner_colors=np.concatenate([m.corner_colors for m in meshes]),
+            corner_uvs=corner_uvs,
+            face_textures=face_textures,
+            textures=[texture for m in meshes for texture in m.textures],
+        )
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """Minimum and maximum corner of the mesh. shape = (2, 3)."""
+        return np.stack([self.vertices.min(axis=0), self.vertices.max(axis=0)])
+
+    def transformed(
+        self,
+        rotation: Optional[np.ndarray] = None,
+        scale: np.ndarray = (1.0, 1.0, 1.0),
+        translation: np.ndarray = (0.0, 0.0, 0.0),
+    ) -> Mesh:
+        """Return a copy of the mesh with rotated, scaled and translated vertices.
+
+        Vertices are first rotated, then scaled and then translated.
+
+        Args:
+            rotation: Optional rotation matrix. shape = (3, 3)
+            scale: Scale along each axis.
+            translation: Translation.
+
+        Returns:
+            The transformed mesh, sharing colors and textures with this mesh.
+        """
+        vertices = self.vertices
+        if rotation is not None:
+            vertices = vertices @ np.asarray(rotation).T
+        vertices = vertices * np.asarray(scale) + np.asarray(translation)
+        return Mesh(
+            vertices=vertices,
+            faces=self.faces,
+            corner_colors=self.corner_colors,
+            corner_uvs=self.corner_uvs,
+            face_textures=self.face_textures,
+            textures=self.textures,
+        )
+
+    def colors(self, face_ids: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """Interpolate the colors of points on faces of the mesh.
+
+        Textures are sampled with nearest neighbor interpolation and repeated
+        outside of [0, 1].
+
+        Args:
+            face_ids: Face of each point. shape = (N,)
+            u: Barycentric coordinate of each point w.r.t. the second face vertex.
+            v: Barycentric coordinate of each point w.r.t. the third face vertex.
+
+        Returns:
+            RGBA colors. shape = (N, 4), dtype = uint8
+        """
+        weights = np.stack([1 - u - v, u, v], axis=1)[:, :, np.newaxis]
+        colors = np.sum(self.corner_colors[face_ids] * weights, axis=1)
+        if self.face_textures is not None:
+            texture_ids = self.face_textures[face_ids]
+            uvs = np.sum(self.corner_uvs[face_ids] * weights, axis=1)
+            for texture_id in np.unique(texture_ids[texture_ids >= 0]):
+                texture = self.textures[texture_id]
+                points = texture_ids == texture_id
+                height, width = texture.shape[:2]
+                uv = uvs[points] % 1.0
+                cols = np.minimum((uv[:, 0] * width).astype(int), width - 1)
+                rows = np.minimum((uv[:, 1] * height).astype(int), height - 1)
+                colors[points] *= texture[rows, cols] / 255.0
+        return np.round(np.clip(colors, 0, 1) * 255).astype(np.uint8)
+
+
+def load_glb(path: str) -> Mesh:
+    """Load the triangles of a binary glTF file.
+
+    Supports the node hierarchy, indexed and non-indexed triangle primitives,
+    vertex colors and base colors and textures of the PBR materials. Lighting
+    related properties are ignored.
+
+    Args:
+        path: Path to the `.glb` file.
+
+    Returns:
+        The mesh of all triangles of the default scene in scene coordinates.
+
+    Raises:
+        ValueError: If the file is not a binary glTF file or uses unsupported
+            features such as compressed meshes or external buffers.
+    """
+    data = Path(path).read_bytes()
+    magic, _, length = struct.unpack_from("<4sII", data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError(f"{path} is not a binary glTF file")
+    gltf, binary = None, b""
+    offset = 12
+    while offset < length:
+        chunk_length, chunk_type = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8 : offset + 8 + chunk_length]
+        if chunk_type == GLB_CHUNK_JSON:
+            gltf = json.loads(chunk)
+        elif chunk_type == GLB_CHUNK_BIN:
+            binary = chunk
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise ValueError(f"{path} has no JSON chunk")
+    for extension in gltf.get("extensionsRequired", []):
+        raise ValueError(f"{path} requires the unsupported extension {extension}")
+    for buffer in gltf.get("buffers", [])[1:]:
+        raise ValueError(f"{path} uses the unsupported external buffer {buffer}")
+
+    loader = _GLBLoader(gltf, binary)
+    scene = gltf["scenes"][gltf.get("scene", 0)] if "scenes" in gltf else None
+    roots = scene["nodes"] if scene else range(len(gltf.get("nodes", [])))
+    meshes = []
+    for root in roots:
+        loader.load_node(root, np.eye(4), meshes)
+    if not meshes:
+        raise ValueError(f"{path} has no triangles")
+    return Mesh.concatenate(meshes)
+
+
+class _GLBLoader:
+    """Reads accessors, materials and nodes of a glTF document."""
+
+    def __init__(self, gltf: dict, binary: bytes):
+        self.gltf = gltf
+        self.binary = binary
+        self.textures: Dict[int, np.ndarray] = {}
+
+    def read_accessor(self, index: int) -> np.ndarray:
+        accessor = self.gltf["accessors"][index]
+        if "sparse" in accessor or "bufferView" not in accessor:
+            raise ValueError("Sparse glTF accessors are not supported")
+        view = self.gltf["bufferViews"][accessor["bufferView"]]
+        dtype = np.dtype(GLTF_COMPONENT_TYPES[accessor["componentType"]])
+        dtype = dtype.newbyteorder("<")
+        num_components = GLTF_NUM_COMPONENTS[accessor["type"]]
+        stride = view.get("byteStride", dtype.itemsize * num_components)
+        values = np.ndarray(
+            (accessor["count"], num_components),
+            dtype=dtype,
+            buffer=self.binary,
+            offset=view.get("byteOffset", 0) + accessor.get("byteOffset", 0),
+            strides=(stride, dtype.itemsize),
+        )
+        if accessor.get("normalized", False):
+            return values / np.iinfo(dtype).max
+        return np.array(values)
+
+    def read_texture(self, index: int) -> np.ndarray:
+        if index not in self.textures:
+            texture = self.gltf["textures"][index]
+            image = self.gltf["images"][texture["source"]]
+            if "bufferView" not in image:
+                raise ValueError("External glTF images are not supported")
+            view = self.gltf["bufferViews"][image["bufferView"]]
+            start = view.get("byteOffset", 0)
+            content = self.binary[start : start + view["byteLength"]]
+            with Image.open(io.BytesIO(content)) as img:
+                self.textures[index] = np.asarray(img.convert("RGBA"))
+        return self.textures[index]
+
+    def load_node(self, index: int, parent: np.ndarray, meshes: List[Mesh]):
+        node = self.gltf["nodes"][index]
+        transform = parent @ _node_matrix(node)
+        if "mesh" in node:
+            for primitive in self.gltf["meshes"][node["mesh"]]["primitives"]:
+                mesh = self.load_primitive(primitive)
+                if mesh is not None:
+                    meshes.append(
+                        mesh.transformed(
+                            transform[:3, :3], translation=transform[:3, 3]
+                        )
+                    )
+        for child in node.get("children", []):
+            self.load_node(child, transform, meshes)
+
+    def load_primitive(self, primitive: dict) -> Optional[Mesh]:
+        if primitive.get("mode", GLTF_TRIANGLES) != GLTF_TRIANGLES:
+            return None
+        if "extensions" in primitive:
+            raise ValueError(
+                f"glTF primitive extensions {list(primitive['extensions'])} "
+                "are not supported"
+            )
+        attributes = primitive["attributes"]
+        vertices = self.read_accessor(attributes["POSITION"]).astype(np.float64)
+        if "indices" in primitive:
+            faces = self.read_accessor(primitive["indices"]).astype(np.int64)
+        else:
+            faces = np.arange(len(vertices))
+        faces = faces.reshape(-1, 3)
+
+        base_color = np.ones(4)
+        corner_uvs, face_textures, textures = None, None, []
+        if "material" in primitive:
+            material = self.gltf["materials"][primitive["material"]]
+            pbr = material.get("pbrMetallicRoughness", {})
+            base_color = np.array(pbr.get("baseColorFactor", base_color))
+            texture_info = pbr.get("baseColorTexture")
+            texcoord = f"TEXCOORD_{(texture_info or {}).get('texCoord', 0)}"
+            if texture_info is not None and texcoord in attributes:
+                uvs = self.read_accessor(attributes[texcoord])
+                corner_uvs = uvs[faces]
+                face_textures = np.zeros(len(faces), dtype=int)
+                textures = [self.read_texture(texture_info["index"])]
+
+        corner_colors = np.broadcast_to(base_color, (len(faces), 3, 4)).copy()
+        if "COLOR_0" in attributes:
+            vertex_colors = self.read_accessor(attributes["COLOR_0"])
+            if vertex_colors.shape[1] == 3:
+                vertex_colors = np.hstack([vertex_colors, np.ones((len(vertices), 1))])
+            corner_colors *= vertex_colors[faces]
+        return Mesh(
+            vertices=vertices,
+            faces=faces,
+            corner_colors=corner_colors,
+            corner_uvs=corner_uvs,
+            face_textures=face_textures,
+            textures=textures,
+        )
+
+
+def _node_matrix(node: dict) -> np.ndarray:
+    """Return the local 4x4 transform of a glTF node."""
+    if "matrix" in node:
+        # glTF matrices are stored in column-major order
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    rotation = np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.asarray(node.get("scale", (1.0, 1.0, 1.0)))
+    matrix[:3, 3] = node.get("translation", (0.0, 0.0, 0.0))
+    return matrix
+
+
+def make_primitive(handle: str, color=(1.0, 1.0, 1.0, 1.0)) -> Mesh:
+    """Generate the mesh of a habitat-sim primitive object.
+
+    Primitives are centered at the origin and have a radius (or half extent) of
+    0.1, with their axis of symmetry along y. The capsule is 0.35 long.
+
+    Args:
+        handle: One of :const:`PRIMITIVE_OBJECT_TYPES`, optionally followed by a
+            number of subdivisions for icospheres such as
+            "icosphereSolid_subdivs_1".
+        color: RGBA color of the primitive in [0, 1].
+
+    Returns:
+        The primitive mesh.
+
+    Raises:
+        ValueError: If the handle is not a primitive object.
+    """
+    r = PRIMITIVE_RADIUS
+    match = re.fullmatch(r"(\w+?)(?:_subdivs_(\d+))?", handle)
+    primitive = match.group(1) if match else handle
+    if primitive == "cubeSolid":
+        vertices = np.array(np.meshgrid([-r, r], [-r, r], [-r, r], indexing="ij"))
+        vertices = vertices.reshape(3, -1).T
+        # Corners are indexed by 4 * x + 2 * y + z with coordinates in {0, 1}
+        faces = np.array(
+            [
+                [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],  # -x, +x
+                [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],  # -y, +y
+                [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],  # -z, +z
+            ]
+        )  # fmt: skip
+    elif primitive == "icosphereSolid":
+        subdivisions = int(match.group(2) or 1)
+        vertices, faces = _icosphere(subdivisions)
+        vertices = vertices * r
+    else:
+        if primitive == "uvSphereSolid":
+            angles = np.linspace(0, np.pi, 17)
+            radii, heights = r * np.sin(angles), -r * np.cos(angles)
+        elif primitive == "capsule3DSolid":
+            # Hemispheres at the ends of a cylinder with a half length of 0.75
+            # times the radius, like the capsule of habitat-sim.
+            angles = np.linspace(0, np.pi / 2, 9)
+            radii = r * np.concatenate([np.sin(angles), np.sin(angles)[::-1]])
+            heights = r * np.concatenate(
+                [-np.cos(angles) - 0.75, np.cos(angles)[::-1] + 0.75]
+            )
+        elif primitive == "cylinderSolid":
+            radii, heights = np.array([0, r, r, 0]), np.array([-r, -r, r, r])
+        elif primitive == "coneSolid":
+            radii, heights = np.array([0, r, 0]), np.array([-r, -r, r])
+        else:
+            raise ValueError(f"Unknown primitive object {handle}")
+        vertices, faces = _surface_of_revolution(radii, heights)
+    corner_colors = np.broadcast_to(np.asarray(color, float), (len(faces), 3, 4))
+    return Mesh(
+        vertices=np.asarray(vertices, dtype=np.float64),
+        faces=faces,
+        corner_colors=corner_colors.copy(),
+    )
+
+
+def _surface_of_revolution(
+    radii: np.ndarray, heights: np.ndarray, segments: int = 32
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Revolve a profile of (radius, height) points from bottom to top around y.
+
+    Returns:
+        The vertices and faces.
+    """
+    angles = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    vertices = np.stack(
+        [
+            np.outer(radii, np.cos(angles)),
+            np.repeat(heights[:, np.newaxis], segments, axis=1),
+            -np.outer(radii, np.sin(angles)),
+        ],
+        axis=-1,
+    ).reshape(-1, 3)
+    ring = np.arange(len(radii) - 1)[:, np.newaxis] * segments
+    j = np.arange(segments)[np.newaxis]
+    a, b = ring + j, ring + (j + 1) % segments
+    c, d = a + segments, b + segments
+    faces = np.concatenate(
+        [np.stack([a, b, d], axis=-1), np.stack([a, d, c], axis=-1)], axis=1
+    ).reshape(-1, 3)
+    # Drop the degenerate faces at profile points with radius 0
+    triangles = vertices[faces]
+    areas = np.linalg.norm(
+        np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+        axis=1,
+    )
+    return vertices, faces[areas > 1e-12]
+
+
+def _icosphere(subdivisions: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the vertices and faces of a unit icosphere."""
+    t = (1 + np.sqrt(5)) / 2
+    vertices = np.array(
+        [
+            [-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+            [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+            [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1],
+        ],
+        dtype=np.float64,
+    )  # fmt: skip
+    faces = np.array(
+        [
+            [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+            [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+            [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+            [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1],
+        ]
+    )  # fmt: skip
+    for _ in range(subdivisions):
+        # Split each face into four with new vertices at the edge midpoints.
+        # Vertices of shared edges are duplicated, which does not matter for
+        # ray casting.
+        a, b, c = faces.T
+        num_vertices, num_faces = len(vertices), len(faces)
+        midpoints = np.concatenate(
+            [
+                (vertices[a] + vertices[b]) / 2,
+                (vertices[b] + vertices[c]) / 2,
+                (vertices[c] + vertices[a]) / 2,
+            ]
+        )
+        ab = num_vertices + np.arange(num_faces)
+        bc, ca = ab + num_faces, ab + 2 * num_faces
+        vertices = np.concatenate([vertices, midpoints])
+        faces = np.concatenate(
+            [
+                np.stack([a, ab, ca], axis=1),
+                np.stack([b, bc, ab], axis=1),
+                np.stack([c, ca, bc], axis=1),
+                np.stack([ab, bc, ca], axis=1),
+            ]
+        )
+    vertices /= np.linalg.norm(vertices, axis=1, keepdims=True)
+    return vertices, faces
+
+
+def _orientation_matrix(up, front) -> np.ndarray:
+    """Rotation from an asset frame with the given up and front to +y up, -z front.
+
+    Returns:
+        The rotation matrix.
+    """
+    up = np.asarray(up, dtype=np.float64) / np.linalg.norm(up)
+    front = np.asarray(front, dtype=np.float64) / np.linalg.norm(front)
+    right = np.cross(front, up)
+    asset_frame = np.stack([right, up, -front], axis=1)
+    return asset_frame.T
+
+
+class MeshLibrary:
+    """Finds, loads and caches the meshes of objects by name.
+
+    Objects are looked up like habitat-sim looks up object templates: the first
+    habitat object config in `data_path` whose handle contains the name is used,
+    followed by the primitive objects. Render assets are reoriented according to
+    the "up" and "front" vectors of the config, scaled, and centered at the center
+    of their bounding box.
+
+    Attributes:
+        data_path: Optional path to a directory with habitat object configs, such as
+            `habitat/objects/ycb`.
+    """
+
+    def __init__(self, data_path: Optional[str] = None):
+        self.data_path = data_path
+        self._configs: Dict[str, Path] = {}
+        if data_path is not None:
+            suffix = ".object_config.json"
+            for config in Path(data_path).expanduser().rglob(f"*{suffix}"):
+                self._configs[config.name[: -len(suffix)]] = config
+            if not self._configs:
+                raise ValueError(f"No valid habitat data found in {data_path}")
+        self._meshes: Dict[str, Mesh] = {}
+        self._bvhs: Dict[Tuple[str, Tuple[float, ...]], Tuple[Mesh, BVH]] = {}
+
+    def find(self, name: str) -> str:
+        """Return the handle of the first object config or primitive matching name.
+
+        Raises:
+            ValueError: If no object matches the name.
+        """
+        for handles in [sorted(self._configs), sorted(PRIMITIVE_OBJECT_TYPES)]:
+            for handle in handles:
+                if name in handle:
+                    return handle
+        if re.fullmatch(r"icosphereSolid_subdivs_\d+", name):
+            return name
+        raise ValueError(f"Object {name} not found in {self.data_path}")
+
+    def get_semantic_id(self, handle: str) -> int:
+        """Return the default semantic ID of an object, 0 if it has none."""
+        if handle in self._configs:
+            config = json.loads(self._configs[handle].read_text())
+            return config.get("semantic_id", 0)
+        return PRIMITIVE_OBJECT_TYPES.get(handle.split("_subdivs_")[0], 0)
+
+    def get_mesh(self, handle: str) -> Mesh:
+        """Return the unscaled mesh of an object."""
+        if handle not in self._meshes:
+            if handle in self._configs:
+                self._meshes[handle] = self._load_config(self._configs[handle])
+            else:
+                self._meshes[handle] = make_primitive(handle)
+        return self._meshes[handle]
+
+    def get(self, handle: str, scale=(1.0, 1.0, 1.0)) -> Tuple[Mesh, BVH]:
+        """Return the scaled mesh of an object and its BVH.
+
+        Returns:
+            The mesh and BVH, built once per object and scale.
+        """
+        key = (handle, tuple(float(s) for s in scale))
+        if key not in self._bvhs:
+            mesh = self.get_mesh(handle).transformed(scale=scale)
+            self._bvhs[key] = (mesh, BVH(mesh.vertices, mesh.faces))
+        return self._bvhs[key]
+
+    def _load_config(self, path: Path) -> Mesh:
+        config = json.loads(path.read_text())
+        asset = path.parent / config["render_asset"]
+        if asset.is_file():
+            mesh = load_glb(asset)
+        else:
+            mesh = make_primitive(Path(config["render_asset"]).name)
+        rotation = _orientation_matrix(
+            config.get("up", (0.0, 1.0, 0.0)), config.get("front", (0.0, 0.0, -1.0))
+        )
+        mesh = mesh.transformed(rotation, scale=config.get("scale", (1.0, 1.0, 1.0)))
+        return mesh.transformed(translation=-mesh.bounds.mean(axis=0))
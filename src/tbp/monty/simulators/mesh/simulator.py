@@ -0,0 +1,363 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+"""Ray casting simulator of triangle meshes for Monty that runs on plain CPUs.
+
+A drop-in alternative to :class:`tbp.monty.simulators.habitat.HabitatSim` for
+rendering isolated objects without habitat-sim or a GPU. Depth and semantic images
+are computed by casting one ray per pixel against the BVH of each object, and the
+color images show the unlit albedo of the objects.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import quaternion as qt
+
+from tbp.monty.frameworks.actions.actions import Action
+
+from .actuator import MeshActuator
+from .agents import MeshAgent, MeshSensor
+from .bvh import BVH
+from .meshes import Mesh, MeshLibrary
+
+__all__ = ["MeshObject", "MeshSim"]
+
+Vector3 = Tuple[float, float, float]
+Quaternion = Tuple[float, float, float, float]
+
+
+@dataclass
+class MeshObject:
+    """Object placed in a :class:`MeshSim`.
+
+    Attributes:
+        handle: Handle of the object config or primitive that was loaded.
+        position: Absolute position.
+        rotation: Absolute rotation.
+        scale: Scale along each axis of the object.
+        semantic_id: Semantic ID of the pixels showing the object.
+        mesh: The scaled mesh in object coordinates.
+        bvh: BVH of the mesh.
+    """
+
+    handle: str
+    position: np.ndarray
+    rotation: qt.quaternion
+    scale: Vector3
+    semantic_id: int
+    mesh: Mesh
+    bvh: BVH
+
+    @property
+    def rotation_matrix(self) -> np.ndarray:
+        return qt.as_rotation_matrix(self.rotation)
+
+    def get_bounding_corners(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the minimum and maximum corner of the world axis aligned box."""
+        vertices = self.mesh.vertices @ self.rotation_matrix.T + self.position
+        return vertices.min(axis=0), vertices.max(axis=0)
+
+
+class MeshSim(MeshActuator):
+    """Simulator rendering triangle meshes by CPU ray casting.
+
+    Example::
+
+        camera = MeshAgent(agent_id="camera", sensor_ids=("camera_id",))
+        with MeshSim(agents=[camera]) as sim:
+            sim.add_object(name="coneSolid", position=(0.0, 1.5, -0.2))
+            obs = sim.get_observations()
+
+    Attributes:
+        agents: List of :class:`MeshAgent` to place in the simulator.
+        data_path: Optional path to a directory with habitat object configs and
+            their render assets, e.g. `habitat/objects/ycb`.
+        seed: Seed of the random number generator.
+    """
+
+    def __init__(
+        self,
+        agents: List[MeshAgent],
+        data_path: Optional[str] = None,
+        seed: int = 42,
+    ):
+        self._agents = {agent.agent_id: agent for agent in agents}
+        self._action_space = set()
+        for agent in agents:
+            self._action_space.update(agent.action_space)
+        self._library = MeshLibrary(data_path)
+        self._objects: List[MeshObject] = []
+        self.np_rng = np.random.default_rng(seed)
+
+    def add_object(
+        self,
+        name: str,
+        position: Vector3 = (0.0, 0.0, 0.0),
+        rotation: Quaternion = (1.0, 0.0, 0.0, 0.0),
+        scale: Vector3 = (1.0, 1.0, 1.0),
+        semantic_id: Optional[int] = None,
+        enable_physics: Optional[bool] = False,
+        object_to_avoid=False,
+        primary_target_bb=None,
+    ) -> MeshObject:
+        """Add new object to the simulated environment.
+
+        Args:
+            name: Object name. It could be any of the habitat-sim primitive objects
+                or any habitat object config in `data_path` whose name contains it.
+            position: Object initial absolute position
+            rotation: Object rotation quaternion. Default (1, 0, 0, 0)
+            scale: Object scale. Default (1, 1, 1)
+            semantic_id: Optional override object semantic ID
+            enable_physics: Unused, objects are static.
+            object_to_avoid: If True, move the object until its bounding box does
+                not overlap with the bounding boxes of the other objects in the scene
+            primary_target_bb: If not None, the bounding box of the primary target
+                object, which the added object must not obscure from the initial
+                view; defined by a list of the min and max corners
+
+        Returns:
+            The newly added object.
+        """
+        handle = self._library.find(name)
+        mesh, bvh = self._library.get(handle, scale)
+        if semantic_id is None:
+            semantic_id = self._library.get_semantic_id(handle)
+        obj = MeshObject(
+            handle=handle,
+            position=np.array(position, dtype=np.float64),
+            rotation=qt.quaternion(*rotation),
+            scale=tuple(scale),
+            semantic_id=int(semantic_id),
+            mesh=mesh,
+            bvh=bvh,
+        )
+        if object_to_avoid:
+            obj.position = self.find_non_colliding_position(obj, primary_target_bb)
+        self._objects.append(obj)
+        return obj
+
+    def non_conflicting_vector(self) -> np.ndarray:
+        """Find a non-conflicting vector.
+
+        Same as :meth:`HabitatSim.non_conflicting_vector`, avoids sampling
+        directions that will be just in front of or behind a target object.
+
+        Returns:
+            The non-conflicting vector
+        """
+        angle_ranges = [
+            (0, 30),
+            # Forbidden 120 degrees
+            (150, 180),
+            (180, 210),
+            # Forbidden 120 degrees
+            (330, 360),
+        ]
+
+        # Choose which angle range to use
+        selected_range = self.np_rng.choice(np.array(angle_ranges))
+        angle_z = self.np_rng.uniform(selected_range[0], selected_range[1])
+
+        z = np.sin(np.deg2rad(angle_z))
+        x = self.np_rng.choice([-1.0, 1.0])
+        return np.array([x, 0, z])
+
+    def find_non_colliding_position(
+        self,
+        new_object: MeshObject,
+        primary_obj_bb=None,
+        max_distance: float = 1,
+        step_size: float = 0.00005,
+        overlap_threshold: float = 0.75,
+    ) -> np.ndarray:
+        """Find a position for the object being added.
+
+        Like :meth:`HabitatSim.find_non_colliding_positions`, the object is moved
+        along a random non-conflicting direction until it does not:
+        i) collide with other objects, approximated by overlapping world axis
+        aligned bounding boxes, since there is no physics simulation
+        ii) overlap more than `overlap_threshold` of the primary target along the
+        x-axis, which would obscure the initial view of the primary target
+
+        All positions along the direction are checked at once.
+
+        Args:
+            new_object: The object being added, not yet in the scene
+            primary_obj_bb: Bounding box of the primary target object (list of two
+                defining corners)
+            max_distance: The maximum distance to attempt moving the new object
+            step_size: The step size for moving the new object
+            overlap_threshold: Maximum proportion of the primary target's extent
+                along the x-axis that the new object may overlap
+
+        Returns:
+            The first non-colliding position
+
+        Raises:
+            RuntimeError: If failed to find a non-colliding position
+        """
+        direction = self.non_conflicting_vector()
+        direction /= np.linalg.norm(direction)
+
+        distances = np.arange(0, max_distance, step_size)
+        positions = new_object.position + distances[:, np.newaxis] * direction
+        min_corner, max_corner = new_object.get_bounding_corners()
+        # Bounding boxes of the new object at every position
+        min_corners = positions + (min_corner - new_object.position)
+        max_corners = positions + (max_corner - new_object.position)
+
+        colliding = np.zeros(len(distances), dtype=bool)
+        for obj in self._objects:
+            obj_min, obj_max = obj.get_bounding_corners()
+            colliding |= np.all(
+                (min_corners < obj_max) & (max_corners > obj_min), axis=1
+            )
+
+        if primary_obj_bb is not None:
+            primary_start, primary_end = primary_obj_bb[0][0], primary_obj_bb[1][0]
+            overlap_length = np.minimum(primary_end, max_corners[:, 0]) - np.maximum(
+                primary_start, min_corners[:, 0]
+            )
+            overlap_proportion = overlap_length / (primary_end - primary_start)
+            colliding |= overlap_proportion > overlap_threshold
+
+        free = np.flatnonzero(~colliding)
+        if len(free) == 0:
+            raise RuntimeError("Failed to find non-colliding positions")
+        return positions[free[0]]
+
+    def remove_all_objects(self):
+        self._objects = []
+
+    def get_num_objects(self) -> int:
+        return len(self._objects)
+
+    def get_action_space(self):
+        """Returns a set with all actions of all agents in the environment."""
+        return set(self._action_space)
+
+    def get_agent(self, agent_id: str) -> MeshAgent:
+        return self._agents[agent_id]
+
+    def apply_action(self, action: Action) -> Dict[str, Dict]:
+        """Execute given action in the environment.
+
+        Args:
+            action: The action to execute
+
+        Returns:
+            A dictionary with the observations grouped by agent_id
+
+        Raises:
+            ValueError: If the action name is invalid
+        """
+        action_name = self.action_name(action)
+        if action_name not in self._action_space:
+            raise ValueError(f"Invalid action name: {action_name}")
+
+        action.act(self)
+
+        return self.get_observations()
+
+    def get_observations(self) -> Dict[str, Dict]:
+        """Render the images of all sensors.
+
+        Returns:
+            The observations grouped by agent ID and sensor ID, in the same format
+            as :meth:`HabitatSim.get_observations`. Depth is 0 where no object is
+            hit.
+        """
+        obs = {}
+        for agent_id, agent in self._agents.items():
+            obs[agent_id] = {
+                sensor_id: self.render(*agent.get_sensor_world_pose(sensor), sensor)
+                for sensor_id, sensor in agent.sensors.items()
+            }
+        return obs
+
+    def render(
+        self, position: np.ndarray, rotation: np.ndarray, sensor: MeshSensor
+    ) -> Dict[str, np.ndarray]:
+        """Cast the rays of a sensor at a given pose against all objects.
+
+        Args:
+            position: Absolute sensor position.
+            rotation: Absolute sensor rotation matrix.
+            sensor: The sensor.
+
+        Returns:
+            The "rgba", "depth" and optional "semantic" images of the sensor.
+        """
+        directions = sensor.rays @ rotation.T
+        # Rays start at the near plane, since closer surfaces are clipped
+        origins = position + sensor.near * directions
+        num_rays = len(directions)
+        t_hit = np.full(num_rays, sensor.far - sensor.near)
+        hit_any = np.zeros(num_rays, dtype=bool)
+        rgba = np.zeros((num_rays, 4), dtype=np.uint8)
+        rgba[:, 3] = 255
+        semantic = np.zeros(num_rays, dtype=np.uint32)
+        for obj in self._objects:
+            # Cast the rays in object coordinates, which keeps the ray parameters
+            obj_rotation = obj.rotation_matrix
+            t, faces, u, v = obj.bvh.intersect(
+                (origins - obj.position) @ obj_rotation,
+                directions @ obj_rotation,
+                t_max=t_hit,
+            )
+            hit = faces >= 0
+            t_hit[hit] = t[hit]
+            hit_any |= hit
+            rgba[hit] = obj.mesh.colors(faces[hit], u[hit], v[hit])
+            semantic[hit] = obj.semantic_id
+
+        height, width = sensor.resolution
+        depth = np.where(hit_any, t_hit + sensor.near, 0).astype(np.float32)
+        observation = {
+            "rgba": rgba.reshape(height, width, 4),
+            "depth": depth.reshape(height, width),
+        }
+        if sensor.semantic:
+            observation["semantic"] = semantic.reshape(height, width)
+        return observation
+
+    def get_states(self) -> Dict[str, Dict]:
+        """Get agent and sensor states (position, rotation, etc..).
+
+        Returns:
+            A dictionary with the agent pose in world coordinates and every sensor
+            pose relative to the agent, in the same format as
+            :meth:`HabitatSim.get_states`.
+        """
+        return {agent_id: agent.get_state() for agent_id, agent in self._agents.items()}
+
+    def reset(self) -> Dict[str, Dict]:
+        """Restore the initial poses of all agents and sensors.
+
+        Returns:
+            The observations at the initial poses.
+        """
+        for agent in self._agents.values():
+            agent.reset()
+        return self.get_observations()
+
+    def close(self):
+        """Release the objects and meshes."""
+        self._objects = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -292,6 +292,83 @@ class EmbodiedDataTest(unittest.TestCase):
             if i >= DATASET_LEN - 1:
                 break
 
+    def make_dataloader_dist(self, **kwargs):
+        rng = np.random.RandomState(42)
+        dataset = EnvironmentDataset(
+            env_init_func=FakeEnvironmentRel, env_init_args={}, rng=rng
+        )
+        base_policy_config = make_base_policy_config(
+            action_space_type="distant_agent",
+            action_sampler_class=UniformlyDistributedSampler,
+            agent_id=AGENT_ID,
+        )
+        motor_system = MotorSystem(
+            policy=BasePolicy(rng=rng, **base_policy_config.__dict__)
+        )
+        return EnvironmentDataLoader(dataset, motor_system, rng, **kwargs)
+
+    def test_embodied_dataloader_prefetch(self):
+        dataloader = self.make_dataloader_dist()
+        prefetching_dataloader = self.make_dataloader_dist(prefetch=True)
+        # Leave room for the extra prefetched step in the fake environment.
+        for _ in range(DATASET_LEN - 1):
+            item = next(dataloader)
+            prefetched_item = next(prefetching_dataloader)
+            self.assertIsNotNone(prefetching_dataloader._prefetched_step)
+            self.assertEqual(
+                prefetched_item[AGENT_ID][SENSOR_ID]["sensor"],
+                item[AGENT_ID][SENSOR_ID]["sensor"],
+            )
+        # The same actions were logged. The prefetched one is only logged once its
+        # observation is returned, and not at all when it is discarded.
+        actions = [
+            action.name for (action,) in dataloader.motor_system._policy.action_sequence
+        ]
+        for discard in [False, True]:
+            if discard:
+                prefetching_dataloader.post_episode()
+                self.assertIsNone(prefetching_dataloader._prefetched_step)
+            prefetched_actions = [
+                action.name
+                for (action,) in (
+                    prefetching_dataloader.motor_system._policy.action_sequence
+                )
+            ]
+            self.assertEqual(prefetched_actions, actions)
+        prefetching_dataloader.finish()
+
+    def test_embodied_dataloader_prefetch_stops_at_max_steps(self):
+        dataloader = self.make_dataloader_dist(prefetch=True)
+        dataloader.max_steps = 3
+        for step, _ in enumerate(dataloader):
+            if step >= dataloader.max_steps:
+                break
+            self.assertIsNotNone(dataloader._prefetched_step)
+        self.assertIsNone(dataloader._prefetched_step)
+        self.assertEqual(dataloader.dataset.env._current_state, 3)
+        self.assertEqual(len(dataloader.motor_system._policy.action_sequence), 3)
+        dataloader.finish()
+
+    def test_embodied_dataloader_shutdown_keeps_dataset_open(self):
+        dataloader = self.make_dataloader_dist(prefetch=True)
+        next(dataloader)
+        next(dataloader)
+        dataloader.shutdown()
+        self.assertIsNone(dataloader._prefetched_step)
+        self.assertIsNone(dataloader._executor)
+        self.assertIsNotNone(dataloader.dataset.env._current_state)
+        # Without its executor, the data loader keeps working without prefetching
+        next(dataloader)
+        self.assertIsNone(dataloader._prefetched_step)
+
+    def test_embodied_dataloader_prefetch_needs_independent_policy(self):
+        dataloader = self.make_dataloader_dist(prefetch=True)
+        dataloader.motor_system._policy.depends_on_observations = True
+        next(dataloader)
+        next(dataloader)
+        self.assertIsNone(dataloader._prefetched_step)
+        self.assertEqual(dataloader._counter, 2)
+
     def check_two_d_patch_obs(self, obs, patch_size, expected_keys):
         for key in expected_keys:
             self.assertIn(
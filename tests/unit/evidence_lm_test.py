@@ -58,7 +58,12 @@ from tbp.monty.frameworks.models.sensor_modules import (
     DetailedLoggingSM,
     HabitatDistantPatchSM,
 )
+from tbp.monty.frameworks.utils.evidence_matching import StackedHypotheses
 from tbp.monty.frameworks.utils.logging_utils import load_models_from_dir
+from tbp.monty.frameworks.utils.spatial_arithmetics import (
+    align_multiple_orthonormal_vectors,
+    get_more_directions_in_plane,
+)
 from tbp.monty.simulators.habitat.configs import (
     EnvInitArgsFiveLMMount,
     EnvInitArgsPatchViewMount,
@@ -1215,6 +1220,246 @@ class EvidenceLMTest(BaseGraphTestCases.BaseGraphTest):
             "Should recognize rotation 0, 0, 0.",
         )
 
+    def test_fused_evidence_kernel_elm(self):
+        """Test that the fused evidence kernel gives the same evidence."""
+        graph_lm = self.get_elm_with_fake_object(self.fake_obs_learn)
+        graph_lm.mode = "eval"
+
+        evidence_per_kernel = {}
+        for evidence_kernel in ["default", "fused"]:
+            graph_lm.evidence_kernel = evidence_kernel
+            graph_lm.pre_episode(primary_target=self.placeholder_target)
+            evidence_per_kernel[evidence_kernel] = []
+            for observation in copy.deepcopy(self.fake_obs_learn):
+                graph_lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+                graph_lm.matching_step([observation])
+                evidence_per_kernel[evidence_kernel].append(
+                    graph_lm.evidence["new_object0"].copy()
+                )
+
+        for default_evidence, fused_evidence in zip(
+            evidence_per_kernel["default"], evidence_per_kernel["fused"]
+        ):
+            self.assertTrue(
+                np.array_equal(default_evidence, fused_evidence),
+                "Fused kernel should give exactly the same evidence.",
+            )
+
+    def loop_initial_hypothesis_space(self, graph_lm, features, graph_id):
+        """Build the initial hypotheses with the loops previously used by the LM.
+
+        Returns:
+            The initial locations, rotations and evidence.
+        """
+        input_channel = "patch"
+        locations = graph_lm.graph_memory.get_locations_in_graph(
+            graph_id, input_channel
+        )
+        if graph_lm.initial_possible_poses is None:
+            node_directions = graph_lm.graph_memory.get_rotation_features_at_all_nodes(
+                graph_id, input_channel
+            )
+            sensed_directions = features[input_channel]["pose_vectors"]
+            if features[input_channel]["pose_fully_defined"]:
+                possible_s_d = [sensed_directions.copy(), sensed_directions.copy()]
+                possible_s_d[1][1:] = possible_s_d[1][1:] * -1
+            else:
+                possible_s_d = get_more_directions_in_plane(sensed_directions, 8)
+            possible_locations = np.zeros((1, 3))
+            possible_rotations = np.zeros((1, 3, 3))
+            for s_d in possible_s_d:
+                r = align_multiple_orthonormal_vectors(
+                    node_directions, s_d, as_scipy=False
+                )
+                possible_locations = np.vstack(
+                    [possible_locations, np.array(locations)]
+                )
+                possible_rotations = np.vstack([possible_rotations, r])
+            possible_locations = possible_locations[1:]
+            possible_rotations = possible_rotations[1:]
+        else:
+            possible_locations = []
+            possible_rotations = []
+            for rotation in graph_lm.initial_possible_poses:
+                for node_id in range(len(locations)):
+                    possible_locations.append(locations[node_id])
+                    possible_rotations.append(rotation.as_matrix())
+            possible_locations = np.array(possible_locations)
+            possible_rotations = np.array(possible_rotations)
+        node_feature_evidence = graph_lm._calculate_feature_evidence_for_all_nodes(
+            features, input_channel, graph_id
+        )
+        nwmf_stacked = []
+        for _ in range(len(possible_rotations) // len(node_feature_evidence)):
+            nwmf_stacked.extend(node_feature_evidence)
+        evidence = np.array(nwmf_stacked) * graph_lm.feature_evidence_increment
+        return possible_locations, possible_rotations, evidence
+
+    def test_vectorized_initial_hypotheses_elm(self):
+        """Test that initial hypotheses are the same as when built in loops."""
+        for initial_possible_poses in ["informed", [[0, 0, 0], [45, 90, 0]]]:
+            graph_lm = self.get_elm_with_fake_object(
+                self.fake_obs_learn, initial_possible_poses=initial_possible_poses
+            )
+            graph_lm.mode = "eval"
+            graph_lm.pre_episode(primary_target=self.placeholder_target)
+            for pose_fully_defined in [True, False]:
+                observation = copy.deepcopy(self.fake_obs_learn[1])
+                observation.morphological_features["pose_fully_defined"] = (
+                    pose_fully_defined
+                )
+                features = graph_lm._select_features_to_use([observation])
+                hypotheses = graph_lm._get_initial_hypothesis_space(
+                    features, "new_object0", "patch"
+                )
+                expected_hypotheses = self.loop_initial_hypothesis_space(
+                    graph_lm, features, "new_object0"
+                )
+                for values, expected_values in zip(hypotheses, expected_hypotheses):
+                    self.assertEqual(values.dtype, expected_values.dtype)
+                    self.assertTrue(np.array_equal(values, expected_values))
+
+    def test_evidence_update_executors_elm(self):
+        """Test that all evidence update executors give the same evidence."""
+        graph_lm = self.get_elm_with_fake_object(self.fake_obs_learn)
+        graph_lm.mode = "eval"
+
+        evidence_per_executor = {}
+        for executor_name in ["threads", "serial", "thread_pool", "process_pool"]:
+            graph_lm.evidence_update_executor.close()
+            graph_lm.evidence_update_executor = (
+                graph_lm._create_evidence_update_executor(executor_name, 2)
+            )
+            graph_lm.pre_episode(primary_target=self.placeholder_target)
+            for observation in copy.deepcopy(self.fake_obs_learn):
+                graph_lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+                graph_lm.matching_step([observation])
+            self.assertEqual(
+                graph_lm.get_current_mlh()["graph_id"],
+                "new_object0",
+                f"new_object0 should be the mlh using {executor_name}.",
+            )
+            evidence_per_executor[executor_name] = graph_lm.evidence[
+                "new_object0"
+            ].copy()
+        graph_lm.evidence_update_executor.close()
+
+        for executor_name, evidence in evidence_per_executor.items():
+            self.assertTrue(
+                np.allclose(evidence, evidence_per_executor["threads"]),
+                f"{executor_name} should give the same evidence as threads.",
+            )
+
+    def test_stacked_hypotheses_elm(self):
+        """Test that stacking the hypotheses of all objects gives the same results."""
+        graph_lm = self.get_elm_with_two_fake_objects(
+            self.fake_obs_square,
+            self.fake_obs_house,
+            initial_possible_poses="informed",
+            gsg_class=GraphGoalStateGenerator,
+            gsg_args=None,
+        )
+        graph_lm.mode = "eval"
+        graph_lm.vote_evidence_threshold = 0
+
+        results_per_setting = {}
+        for stack_hypotheses in [False, True]:
+            graph_lm.hypotheses_stack = None
+            if stack_hypotheses:
+                graph_lm.hypotheses_stack = StackedHypotheses(
+                    ["possible_locations", "possible_poses", "evidence"]
+                )
+            graph_lm.pre_episode(primary_target=self.placeholder_target)
+            results = []
+            for observation in copy.deepcopy(self.fake_obs_house):
+                graph_lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+                graph_lm.matching_step([observation])
+                evidence_before_votes = dict(graph_lm.evidence)
+                graph_lm.receive_votes(graph_lm.send_out_vote()["possible_states"])
+                for graph_id, evidence in evidence_before_votes.items():
+                    self.assertIs(
+                        graph_lm.evidence[graph_id],
+                        evidence,
+                        "Votes should update the evidence in place.",
+                    )
+                vote = graph_lm.send_out_vote()["possible_states"]
+                results.append(
+                    (
+                        graph_lm.get_possible_matches(),
+                        graph_lm.get_current_mlh()["graph_id"],
+                        graph_lm.get_current_mlh()["location"].copy(),
+                        {g: len(vote[g]) for g in vote},
+                        {g: e.copy() for g, e in graph_lm.evidence.items()},
+                    )
+                )
+            results_per_setting[stack_hypotheses] = results
+
+        self.assertIs(
+            graph_lm.evidence["new_object1"].base,
+            graph_lm.hypotheses_stack.arrays["evidence"],
+            "Evidence should be stored as a view into the stacked evidence.",
+        )
+        for default, stacked in zip(
+            results_per_setting[False], results_per_setting[True]
+        ):
+            self.assertEqual(default[:2], stacked[:2])
+            self.assertTrue(np.array_equal(default[2], stacked[2]))
+            self.assertEqual(default[3], stacked[3])
+            for graph_id, evidence in default[4].items():
+                self.assertTrue(
+                    np.array_equal(evidence, stacked[4][graph_id]),
+                    "Stacked hypotheses should give exactly the same evidence.",
+                )
+
+    def test_hypotheses_pruning_elm(self):
+        """Test that pruning hypotheses removes them without changing the MLH."""
+        graph_lm = self.get_elm_with_two_fake_objects(
+            self.fake_obs_square,
+            self.fake_obs_house,
+            initial_possible_poses="informed",
+            gsg_class=GraphGoalStateGenerator,
+            gsg_args=None,
+        )
+        graph_lm.mode = "eval"
+
+        results_per_setting = {}
+        for pruning_margin in [None, 1]:
+            graph_lm.hypotheses_pruning_margin = pruning_margin
+            graph_lm.hypotheses_pruning_steps = 1
+            graph_lm.pre_episode(primary_target=self.placeholder_target)
+            num_initial_hypotheses = None
+            for observation in copy.deepcopy(self.fake_obs_house):
+                graph_lm.add_lm_processing_to_buffer_stats(lm_processed=True)
+                graph_lm.matching_step([observation])
+                if num_initial_hypotheses is None:
+                    num_initial_hypotheses = {
+                        g: len(e) for g, e in graph_lm.evidence.items()
+                    }
+                for graph_id, evidence in graph_lm.evidence.items():
+                    self.assertEqual(
+                        graph_lm.channel_hypothesis_mapping[graph_id].total_size,
+                        len(evidence),
+                    )
+                    self.assertEqual(
+                        len(graph_lm.possible_locations[graph_id]), len(evidence)
+                    )
+            results_per_setting[pruning_margin] = (
+                dict(graph_lm.get_current_mlh()),
+                num_initial_hypotheses,
+                {g: len(e) for g, e in graph_lm.evidence.items()},
+            )
+
+        default, pruned = results_per_setting[None], results_per_setting[1]
+        self.assertEqual(default[0]["graph_id"], pruned[0]["graph_id"])
+        self.assertTrue(np.allclose(default[0]["location"], pruned[0]["location"]))
+        self.assertEqual(default[2], default[1], "Hypotheses should not be pruned.")
+        self.assertLess(
+            sum(pruned[2].values()),
+            sum(pruned[1].values()),
+            "Some hypotheses should have been pruned.",
+        )
+        self.assertEqual(graph_lm.buffer.stats["num_hypotheses"][-1], pruned[2])
+
     def test_reverse_sequence_recognition_elm(self):
         """Test that object is recognized irrespective of sampling order."""
         fake_obs_test = copy.deepcopy(self.fake_obs_learn)
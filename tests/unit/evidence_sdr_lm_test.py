@@ -20,6 +20,9 @@ from tbp.monty.frameworks.models.evidence_sdr_matching import (
     EncoderSDR,
     EvidenceSDRGraphLM,
     EvidenceSDRTargetOverlaps,
+    packed_overlaps,
+    popcount,
+    unpack_sdrs,
 )
 from tbp.monty.frameworks.models.goal_state_generation import EvidenceGoalStateGenerator
 from tbp.monty.frameworks.models.states import State
@@ -332,6 +335,117 @@ class EvidenceSDRUnitTest(unittest.TestCase):
         sdrs = encoder.sdrs.copy()
         self.assertEqual((sdrs[0] * sdrs[1]).sum(), 41.0)
 
+    def test_unit_binarize_selects_top_k(self):
+        """Test that binarize sets exactly the sdr_on_bits largest values."""
+        encoder = EncoderSDR(sdr_length=2048, sdr_on_bits=41)
+        encoder.add_objects(10)
+        sdrs = encoder.sdrs
+        self.assertTrue(np.all(sdrs.sum(axis=1) == 41))
+        expected = np.zeros_like(sdrs)
+        np.put_along_axis(expected, np.argsort(encoder.obj_sdrs)[:, -41:], 1, axis=1)
+        self.assertTrue(np.array_equal(sdrs, expected))
+
+    def test_unit_packed_sdr_overlaps(self):
+        """Test that overlaps of packed SDRs match the dense overlaps.
+
+        Uses an SDR length that is not a multiple of the 64 bit words.
+        """
+        encoder = EncoderSDR(sdr_length=100, sdr_on_bits=20)
+        encoder.add_objects(6)
+        sdrs = encoder.sdrs
+        packed_sdrs = encoder.packed_sdrs
+        self.assertEqual(packed_sdrs.shape, (6, 2))
+        self.assertEqual(packed_sdrs.dtype, np.uint64)
+        self.assertTrue(np.array_equal(unpack_sdrs(packed_sdrs, 100), sdrs))
+        self.assertTrue(np.all(popcount(packed_sdrs).sum(axis=1) == 20))
+        # One query and a batch of queries
+        self.assertTrue(
+            np.array_equal(packed_overlaps(packed_sdrs, packed_sdrs[2]), sdrs @ sdrs[2])
+        )
+        self.assertTrue(
+            np.array_equal(packed_overlaps(packed_sdrs, packed_sdrs), sdrs @ sdrs.T)
+        )
+        words = np.random.randint(0, 2**62, 100, dtype=np.uint64) * np.uint64(3)
+        self.assertEqual(
+            popcount(words).tolist(), [bin(int(word)).count("1") for word in words]
+        )
+
+    def test_unit_vectorized_optimize_matches_pairwise_updates(self):
+        """Test that optimize applies the gradients of all pairs of objects.
+
+        Compares with the gradients accumulated one pair at a time, for all
+        representations and for a subset of them.
+        """
+        encoder = EncoderSDR(sdr_length=100, sdr_on_bits=5, lr=1e-2)
+        encoder.add_objects(6)
+        overlap_error = np.random.uniform(-5, 5, (6, 6))
+        mask = np.random.rand(6, 6) < 0.5
+
+        for train_ids in [None, np.array([1, 4])]:
+            dense_before = encoder.obj_sdrs.copy()
+            grad = np.zeros_like(dense_before)
+            for i, j in zip(*np.nonzero(mask)):
+                diff = dense_before[i] - dense_before[j]
+                grad[i] += overlap_error[i, j] * 2 * diff
+                grad[j] -= overlap_error[i, j] * 2 * diff
+            expected = dense_before - encoder.lr * grad
+            if train_ids is not None:
+                fixed_ids = np.setdiff1d(np.arange(6), train_ids)
+                expected[fixed_ids] = dense_before[fixed_ids]
+
+            encoder.optimize(overlap_error, mask, train_ids)
+            self.assertTrue(np.allclose(encoder.obj_sdrs, expected, atol=1e-12))
+
+    def test_unit_early_stopping(self):
+        """Test that training stops once the overlap error stops improving.
+
+        Identical SDRs are reached long before 1000 epochs, after which the error
+        is zero and training stops.
+        """
+        encoder = EncoderSDR(
+            sdr_length=2048,
+            sdr_on_bits=41,
+            lr=1e-2,
+            n_epochs=1000,
+            early_stopping_patience=100,
+        )
+        encoder.add_objects(2)
+        training_data = np.full((2, 2), np.nan)
+        training_data[0, 1] = 41
+
+        stats = encoder.train_sdrs(training_data)
+
+        self.assertLess(stats["n_epochs_trained"], 1000)
+        sdrs = encoder.sdrs
+        self.assertEqual((sdrs[0] * sdrs[1]).sum(), 41.0)
+
+    def test_unit_incremental_training(self):
+        """Test training only the objects whose target overlaps changed.
+
+        Expected behaviour:
+            - Representations of objects not in `train_ids` don't change
+            - Trained representations follow the targets to the fixed ones
+        """
+        encoder = EncoderSDR(sdr_length=2048, sdr_on_bits=41, lr=1e-2, n_epochs=1000)
+        encoder.add_objects(4)
+        training_data = np.full((4, 4), np.nan)
+        training_data[0, 1] = 12
+        training_data[0, 2] = 33
+        training_data[1, 2] = 17
+        training_data[2, 3] = 30
+        fixed_before = encoder.obj_sdrs[:3].copy()
+
+        stats = encoder.train_sdrs(training_data, train_ids=[3])
+
+        self.assertEqual(stats["n_epochs_trained"], 1000)
+        self.assertTrue(np.array_equal(encoder.obj_sdrs[:3], fixed_before))
+        sdrs = encoder.sdrs
+        self.assertLessEqual(abs((sdrs[2] * sdrs[3]).sum() - 30), 2)
+
+        # Nothing to train if no target overlaps changed
+        stats = encoder.train_sdrs(training_data, train_ids=[])
+        self.assertNotIn("n_epochs_trained", stats)
+
 
 class EvidenceSDRIntegrationTest(BaseGraphTestCases.BaseGraphTest):
     def setUp(self):
@@ -604,6 +718,162 @@ class EvidenceSDRIntegrationTest(BaseGraphTestCases.BaseGraphTest):
             overlaps[1, 2] > overlaps[0, 2] and overlaps[1, 2] > overlaps[0, 1]
         )
 
+    def test_can_train_sdrs_incrementally(self):
+        """Test training only the SDRs of objects with changed target overlaps.
+
+        Expected behavior:
+            - Only objects in a changed row or column of the targets are trained
+            - Rectangles are still clustered together
+            - The training time of each episode is recorded
+        """
+        eslm = self.get_eslm()
+        eslm.sdr_args["sdr_incremental"] = True
+        eslm.sdr_encoder.early_stopping_patience = 100
+
+        obs = [
+            self.get_triangle_obs(),
+            self.get_rectangle_obs(),
+            self.get_rectangle_long_obs(),
+        ]
+        for ob_i, ob in enumerate(obs):
+            self.learn_obj(eslm, ob, f"new_object{ob_i}")
+
+        previous_overlaps = eslm.target_overlaps.overlaps
+        self.assertEqual(eslm._get_changed_object_ids(previous_overlaps).size, 0)
+        eslm.target_overlaps._overlaps[0, 2] = 20
+        self.assertEqual(
+            eslm._get_changed_object_ids(previous_overlaps).tolist(), [0, 2]
+        )
+        eslm.target_overlaps._overlaps[0, 2] = previous_overlaps[0, 2]
+
+        for ob in obs:
+            self.eval_obj(eslm, ob)
+
+        self.assertEqual(len(eslm.sdr_training_times), 2 * len(obs))
+        sdrs = eslm.sdr_encoder.sdrs
+        overlaps = sdrs @ sdrs.T
+        self.assertTrue(
+            overlaps[1, 2] > overlaps[0, 2] and overlaps[1, 2] > overlaps[0, 1]
+        )
+
+    def learn_lm_input_objects(self, eslm):
+        """Learn two objects from object ID SDRs sent by a lower-level LM.
+
+        Returns:
+            The SDRs that were sent as object_id features.
+        """
+        eslm.tolerances["learning_module_0"] = {"object_id": 10}
+        eslm.feature_weights["learning_module_0"] = {"object_id": 1}
+        eslm.use_features_for_matching = eslm._check_use_features_for_matching()
+        sdrs = np.zeros((4, 2048))
+        for i in range(4):
+            sdrs[i, i * 10 : i * 10 + 41] = 1
+        for ob_i, ob in enumerate([self.get_rectangle_obs(), self.get_triangle_obs()]):
+            lm_obs = []
+            for i, observation in enumerate(ob):
+                lm_observation = copy.deepcopy(observation)
+                lm_observation.sender_id = "learning_module_0"
+                lm_observation.sender_type = "LM"
+                lm_observation.non_morphological_features = {
+                    "object_id": sdrs[(i + ob_i) % 4]
+                }
+                lm_obs.append(lm_observation)
+            eslm.mode = "train"
+            eslm.pre_episode(
+                primary_target={
+                    "object": f"new_object{ob_i}",
+                    "quat_rotation": [1, 0, 0, 0],
+                }
+            )
+            for observations in zip(ob, lm_obs):
+                eslm.exploratory_step(list(observations))
+            eslm.detected_object = f"new_object{ob_i}"
+            eslm.detected_rotation_r = None
+            eslm.buffer.stats["detected_location_rel_body"] = (
+                eslm.buffer.get_current_location(input_channel="first")
+            )
+            eslm.post_episode()
+
+        eslm.mode = "eval"
+        eslm.pre_episode(
+            primary_target={"object": "placeholder", "quat_rotation": [1, 0, 0, 0]}
+        )
+        return sdrs
+
+    def assert_sdr_evidence_matches_dense_overlaps(self, eslm, query_sdr):
+        """Check the SDR feature evidence against dense feature array overlaps."""
+        query_features = {"learning_module_0": {"object_id": query_sdr}}
+        node_feature_evidence = eslm._calculate_feature_evidence_for_all_graphs(
+            query_features
+        )
+        for graph_id in eslm.get_all_known_object_ids():
+            feature_array = eslm.graph_memory.get_feature_array(graph_id)[
+                "learning_module_0"
+            ]
+            overlaps = feature_array @ query_sdr
+            expected = np.clip((overlaps - 10) / (query_sdr.sum() - 10), 0, None)
+            if (graph_id, "learning_module_0") in node_feature_evidence:
+                np.testing.assert_array_equal(
+                    node_feature_evidence[(graph_id, "learning_module_0")], expected
+                )
+            np.testing.assert_array_equal(
+                eslm._calculate_feature_evidence_sdr_for_all_nodes(
+                    query_features, "learning_module_0", graph_id
+                ),
+                expected,
+            )
+
+    def test_lm_input_sdrs_are_packed(self):
+        """Test matching object ID SDRs received from a lower-level LM.
+
+        Expected behavior:
+            - The object_id features of the graphs are packed without changing the
+              node feature arrays in the graph memory
+            - The feature evidence equals the one of the dense node feature arrays
+        """
+        eslm = self.get_eslm()
+        sdrs = self.learn_lm_input_objects(eslm)
+        for graph_id in eslm.get_all_known_object_ids():
+            node_features = eslm.graph_memory.get_feature_array(graph_id)[
+                "learning_module_0"
+            ]
+            self.assertNotEqual(node_features.dtype, np.uint64)
+            self.assertIn(
+                "object_id",
+                eslm.graph_memory.get_feature_order(graph_id)["learning_module_0"],
+            )
+            packed_sdrs = eslm._get_packed_node_sdrs(graph_id, "learning_module_0")
+            self.assertEqual(packed_sdrs.dtype, np.uint64)
+            self.assertIs(
+                eslm._get_packed_node_sdrs(graph_id, "learning_module_0"), packed_sdrs
+            )
+        self.assert_sdr_evidence_matches_dense_overlaps(eslm, sdrs[1])
+        self.assertIn(
+            ("new_object0", "learning_module_0"),
+            eslm._calculate_feature_evidence_for_all_graphs(
+                {"learning_module_0": {"object_id": sdrs[1]}}
+            ),
+        )
+
+    def test_averaged_lm_input_sdrs_are_not_packed(self):
+        """Test matching object ID SDRs that were averaged within model voxels.
+
+        Expected behavior:
+            - Node SDRs with fractional values are not packed
+            - The feature evidence equals the one of the dense node feature arrays
+        """
+        eslm = self.get_eslm()
+        # Voxels of 5m so that several observations fall into the same voxel
+        eslm.graph_memory.num_model_voxels_per_dim = 2
+        sdrs = self.learn_lm_input_objects(eslm)
+        for graph_id in eslm.get_all_known_object_ids():
+            node_features = eslm.graph_memory.get_feature_array(graph_id)[
+                "learning_module_0"
+            ]
+            self.assertFalse(np.all(np.isin(node_features, [0, 1])))
+            self.assertIsNone(eslm._get_packed_node_sdrs(graph_id, "learning_module_0"))
+        self.assert_sdr_evidence_matches_dense_overlaps(eslm, sdrs[1])
+
     def tearDown(self):
         """Tear down function at the end of each experiment."""
         super().tearDown()
@@ -0,0 +1,154 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import Pyro5.api
+
+from tbp.monty.frameworks.environments.everything_is_awesome import (
+    EverythingIsAwesomeDataLoader,
+    EverythingIsAwesomeEnvironment,
+)
+from tbp.monty.frameworks.utils.array_transport import encode_array
+
+
+@Pyro5.api.expose
+class FakeActuatorServer:
+    def absolute_position(self, motor):
+        return 0
+
+    def position(self, motor):
+        return 0
+
+    def speed(self, motor):
+        return 0
+
+
+@Pyro5.api.expose
+class FakeListCameraServer:
+    """Camera server that only sends images as nested lists."""
+
+    def __init__(self, image):
+        self._image = image
+
+    def rgb(self, size=64):
+        return self._image[:size, :size].tolist()
+
+    def depth(self, size=64):
+        return self._image[:size, :size].tolist()
+
+
+@Pyro5.api.expose
+class FakeCameraServer(FakeListCameraServer):
+    """Camera server that can also send images as bytes."""
+
+    def rgb_bytes(self, size=64, compress=False):
+        return encode_array(self._image[:size, :size], compress)
+
+    def depth_bytes(self, size=64, compress=False):
+        return encode_array(self._image[:size, :size], compress)
+
+
+class EverythingIsAwesomeEnvironmentTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        rgb = rng.integers(0, 256, (100, 100, 3), dtype=np.uint8)
+        # The depth camera measures depth as float32
+        depth = rng.uniform(0, 2000, (180, 180)).astype(np.float32)
+        servers = {
+            "actuator": FakeActuatorServer(),
+            "rgb": FakeCameraServer(rgb),
+            "depth": FakeCameraServer(depth),
+            "rgb_list": FakeListCameraServer(rgb),
+            "depth_list": FakeListCameraServer(depth),
+        }
+        self.daemon = Pyro5.api.Daemon(host="localhost")
+        self.uris = {
+            name: self.daemon.register(server, objectId=name)
+            for name, server in servers.items()
+        }
+        self.server_thread = threading.Thread(
+            target=self.daemon.requestLoop, daemon=True
+        )
+        self.server_thread.start()
+        self.environments = []
+
+    def tearDown(self):
+        for environment in self.environments:
+            environment.close()
+        self.daemon.shutdown()
+        self.server_thread.join()
+
+    def create_environment(self, list_servers=False, **kwargs):
+        suffix = "_list" if list_servers else ""
+        environment = EverythingIsAwesomeEnvironment(
+            actuator_server_uri=self.uris["actuator"],
+            depth_server_uri=self.uris[f"depth{suffix}"],
+            pitch_diameter_rr=0.12318841,
+            rgb_server_uri=self.uris[f"rgb{suffix}"],
+            **kwargs,
+        )
+        self.environments.append(environment)
+        return environment
+
+    def assert_same_observations(self, environment, expected_environment):
+        patch = environment._observations()["agent_id_0"]["patch"]
+        expected_patch = expected_environment._observations()["agent_id_0"]["patch"]
+        for modality in ["rgba", "depth"]:
+            self.assertEqual(patch[modality].dtype, expected_patch[modality].dtype)
+            self.assertTrue(np.array_equal(patch[modality], expected_patch[modality]))
+
+    def test_binary_observations_are_the_same_as_list_observations(self):
+        list_environment = self.create_environment(binary_observations=False)
+        for compress in [False, True]:
+            environment = self.create_environment(compress_observations=compress)
+            self.assert_same_observations(environment, list_environment)
+            self.assertTrue(all(environment._binary_observations.values()))
+
+    def test_binary_observations_fall_back_to_lists(self):
+        list_environment = self.create_environment(binary_observations=False)
+        environment = self.create_environment(list_servers=True)
+        self.assert_same_observations(environment, list_environment)
+        self.assertFalse(any(environment._binary_observations.values()))
+        # Once fallen back, images are requested as lists right away
+        self.assert_same_observations(environment, list_environment)
+
+    def test_concurrent_observations_are_the_same_as_serial_observations(self):
+        serial_environment = self.create_environment(concurrent_observations=False)
+        environment = self.create_environment()
+        self.assertIsNotNone(environment._depth_executor)
+        for _ in range(3):
+            self.assert_same_observations(environment, serial_environment)
+
+    def test_data_loader_rejects_prefetching(self):
+        with self.assertRaises(ValueError):
+            EverythingIsAwesomeDataLoader("tissue_box", prefetch=True)
+
+    def test_environment_can_be_used_from_another_thread(self):
+        environment = self.create_environment()
+        expected_state = environment.get_state()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            state = executor.submit(environment.get_state).result()
+            patch = executor.submit(environment._observations).result()
+        self.assertEqual(state, expected_state)
+        # And again from the thread that created it.
+        expected_patch = environment._observations()["agent_id_0"]["patch"]
+        for modality in ["rgba", "depth"]:
+            self.assertTrue(
+                np.array_equal(
+                    patch["agent_id_0"]["patch"][modality], expected_patch[modality]
+                )
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
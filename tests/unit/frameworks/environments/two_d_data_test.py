@@ -0,0 +1,141 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from tbp.monty.frameworks.actions.actions import LookDown, TurnLeft
+from tbp.monty.frameworks.environments.two_d_data import (
+    SCENE_STORE_FILE_NAME,
+    SaccadeOnImageEnvironment,
+    build_scene_store,
+    load_scene_store,
+)
+from tbp.monty.frameworks.utils.model_store import save_model_store
+
+DATA_PATH = os.path.join(
+    Path(__file__).parent.parent.parent, "resources/dataloader_test_images/"
+)
+SCENE_ARRAYS = [
+    "current_depth_image",
+    "current_rgb_image",
+    "current_scene_point_cloud",
+    "current_sf_scene_point_cloud",
+    "world_camera",
+]
+
+
+class SceneStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.output_dir, SCENE_STORE_FILE_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_store_contains_all_scene_versions(self):
+        build_scene_store(DATA_PATH, self.store_path)
+        scene_store = load_scene_store(self.store_path)
+        self.assertEqual(list(scene_store.keys()), ["0_numenta_mug"])
+        self.assertEqual(sorted(scene_store["0_numenta_mug"].keys()), [0, 1])
+        scene = scene_store["0_numenta_mug"][1]
+        self.assertEqual(scene["depth_image"].shape, (480, 640))
+        self.assertEqual(scene["rgb_image"].shape, (480, 640, 4))
+        self.assertEqual(scene["scene_point_cloud"].shape, (480, 640, 4))
+        self.assertEqual(scene["sf_scene_point_cloud"].shape, (480, 640, 4))
+        self.assertEqual(scene["world_camera"].shape, (4, 4))
+
+    def test_same_scenes_and_observations_as_image_files(self):
+        build_scene_store(DATA_PATH, self.store_path)
+        env = SaccadeOnImageEnvironment(patch_size=48, data_path=DATA_PATH)
+        stored_env = SaccadeOnImageEnvironment(
+            patch_size=48, data_path=DATA_PATH, scene_store_path=self.store_path
+        )
+        self.assertEqual(env.scene_store, {})
+        for version in [1, 0]:
+            env.switch_to_object(0, version)
+            stored_env.switch_to_object(0, version)
+            for name in SCENE_ARRAYS:
+                np.testing.assert_array_equal(
+                    getattr(stored_env, name), getattr(env, name)
+                )
+            self.assertEqual(stored_env.current_loc, env.current_loc)
+            for action in [
+                LookDown(agent_id="agent_id_0", rotation_degrees=5),
+                TurnLeft(agent_id="agent_id_0", rotation_degrees=3),
+            ]:
+                obs = env.step(action)["agent_id_0"]["patch"]
+                stored_obs = stored_env.step(action)["agent_id_0"]["patch"]
+                for key, value in obs.items():
+                    np.testing.assert_array_equal(stored_obs[key], value)
+                np.testing.assert_array_equal(
+                    stored_env.get_state()["agent_id_0"]["sensors"]["patch.depth"][
+                        "position"
+                    ],
+                    env.get_state()["agent_id_0"]["sensors"]["patch.depth"]["position"],
+                )
+
+    def test_patches_are_views_of_store(self):
+        build_scene_store(DATA_PATH, self.store_path)
+        env = SaccadeOnImageEnvironment(
+            patch_size=48, data_path=DATA_PATH, scene_store_path=self.store_path
+        )
+        obs = env.reset()["agent_id_0"]
+        scene = env.scene_store["0_numenta_mug"][0]
+        self.assertTrue(np.shares_memory(obs["patch"]["depth"], scene["depth_image"]))
+        self.assertTrue(np.shares_memory(obs["patch"]["rgba"], scene["rgb_image"]))
+        self.assertIs(obs["view_finder"]["depth"], scene["depth_image"])
+
+    def test_default_store_path_in_dataset(self):
+        data_path = os.path.join(self.output_dir, "labeled_scenes/")
+        shutil.copytree(DATA_PATH, data_path)
+        store_path = build_scene_store(data_path)
+        self.assertEqual(store_path, os.path.join(data_path, SCENE_STORE_FILE_NAME))
+        env = SaccadeOnImageEnvironment(data_path=data_path)
+        self.assertEqual(env.scene_names, ["0_numenta_mug"])
+        self.assertEqual(list(env.scene_store.keys()), ["0_numenta_mug"])
+
+    def test_out_of_date_store_is_ignored(self):
+        data_path = os.path.join(self.output_dir, "labeled_scenes/")
+        shutil.copytree(DATA_PATH, data_path)
+        build_scene_store(data_path)
+        depth_file = os.path.join(data_path, "0_numenta_mug", "depth_1.data")
+        with open(depth_file, "ab") as f:
+            f.write(b"\x00")
+        with self.assertLogs(level="WARNING"):
+            env = SaccadeOnImageEnvironment(data_path=data_path)
+        self.assertEqual(env.scene_store, {})
+
+    def test_missing_scene_versions_are_loaded_from_image_files(self):
+        build_scene_store(DATA_PATH, self.store_path)
+        scene_store = load_scene_store(self.store_path)
+        del scene_store["0_numenta_mug"][1]
+        env = SaccadeOnImageEnvironment(data_path=DATA_PATH)
+        env.scene_store = scene_store
+        env.switch_to_object(0, 1)
+        self.assertEqual(env.current_depth_image.shape, (480, 640))
+        self.assertFalse(
+            np.shares_memory(
+                env.current_depth_image, scene_store["0_numenta_mug"][0]["depth_image"]
+            )
+        )
+
+    def test_load_rejects_other_model_stores(self):
+        save_model_store({"lm_dict": {}}, self.store_path)
+        with self.assertRaises(ValueError):
+            load_scene_store(self.store_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+import unittest
+
+import numpy as np
+
+from tbp.monty.frameworks.models.buffer import (
+    FeatureAtLocationBuffer,
+    GrowableArray,
+    copy_stat,
+)
+from tbp.monty.frameworks.models.states import State
+
+
+def make_state(location, sender_id="patch", hsv=None):
+    non_morphological_features = {} if hsv is None else {"hsv": hsv}
+    state = State(
+        location=np.array(location, dtype=float),
+        morphological_features={
+            "pose_vectors": np.eye(3),
+            "pose_fully_defined": True,
+            "on_object": 1,
+        },
+        non_morphological_features=non_morphological_features,
+        confidence=1.0,
+        use_state=True,
+        sender_id=sender_id,
+        sender_type="SM",
+    )
+    state.set_displacement(np.zeros(3))
+    return state
+
+
+class GrowableArrayTest(unittest.TestCase):
+    def test_grows_past_capacity(self):
+        rows = GrowableArray(num_columns=2, capacity=2)
+        for i in range(5):
+            rows.set_row(i, [i, -i])
+        self.assertEqual(len(rows), 5)
+        np.testing.assert_array_equal(
+            rows.array, np.stack([np.arange(5), -np.arange(5)], axis=1)
+        )
+
+    def test_pads_skipped_rows_and_columns_with_nans(self):
+        rows = GrowableArray(num_columns=1)
+        rows.set_row(1, 1.0)
+        rows.set_row(3, [3.0, 4.0])
+        np.testing.assert_array_equal(
+            rows.array,
+            [[np.nan, np.nan], [1.0, np.nan], [np.nan, np.nan], [3.0, 4.0]],
+        )
+        rows.pad(6, 0)
+        np.testing.assert_array_equal(rows.array[4:], np.zeros((2, 2)))
+
+    def test_array_is_view_of_written_rows(self):
+        rows = GrowableArray(num_columns=3)
+        rows.set_row(0, np.ones(3))
+        view = rows.array
+        rows.set_row(1, np.zeros(3))
+        self.assertEqual(view.shape, (1, 3))
+        self.assertEqual(rows.array.shape, (2, 3))
+
+
+class FeatureAtLocationBufferTest(unittest.TestCase):
+    def test_append_aligns_steps(self):
+        buffer = FeatureAtLocationBuffer()
+        num_steps = 40
+        for step in range(num_steps):
+            states = [make_state([step, 0, 0])]
+            if step >= 10:
+                # A second input channel starts sending with a new feature.
+                states.append(make_state([0, step, 0], "patch_1", hsv=[step, 0, 0]))
+            buffer.append(states)
+        self.assertEqual(len(buffer), num_steps)
+        np.testing.assert_array_equal(
+            buffer.locations["patch"][:, 0], np.arange(num_steps)
+        )
+        self.assertEqual(buffer.features["patch"]["pose_vectors"].shape, (40, 9))
+        self.assertTrue(np.all(np.isnan(buffer.locations["patch_1"][:10])))
+        np.testing.assert_array_equal(
+            buffer.features["patch_1"]["hsv"][10:, 0], np.arange(10, num_steps)
+        )
+        self.assertEqual(buffer.get_buffer_len_by_channel("patch_1"), 30)
+        self.assertEqual(buffer.displacements["patch_1"]["displacement"].shape[0], 40)
+        np.testing.assert_array_equal(
+            buffer.get_current_location("patch"), [num_steps - 1, 0, 0]
+        )
+
+    def test_get_all_features_on_object_pads_missing_steps(self):
+        buffer = FeatureAtLocationBuffer()
+        buffer.append([make_state([0, 0, 0], hsv=[0, 0, 0])])
+        buffer.append([make_state([1, 0, 0])])
+        features = buffer.get_all_features_on_object()["patch"]
+        np.testing.assert_array_equal(features["hsv"], np.zeros((2, 3)))
+        self.assertEqual(features["on_object"].shape, (2, 1))
+
+    def test_update_stats_copies_values(self):
+        buffer = FeatureAtLocationBuffer()
+        evidence = {"mug": np.zeros(3)}
+        buffer.update_stats({"evidences": evidence})
+        evidence["mug"] += 1
+        np.testing.assert_array_equal(buffer.stats["evidences"][0]["mug"], np.zeros(3))
+
+
+class CopyStatTest(unittest.TestCase):
+    def test_copies_containers_and_arrays(self):
+        stat = {"a": [np.ones(2), {"b": np.zeros(1)}], "c": np.float64(1.0)}
+        copied = copy_stat(stat)
+        self.assertIsNot(copied["a"], stat["a"])
+        self.assertIsNot(copied["a"][0], stat["a"][0])
+        self.assertIsNot(copied["a"][1]["b"], stat["a"][1]["b"])
+        self.assertIs(copied["c"], stat["c"])
+        np.testing.assert_array_equal(copied["a"][0], stat["a"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
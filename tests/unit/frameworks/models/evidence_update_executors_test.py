@@ -0,0 +1,149 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import unittest
+
+import numpy as np
+
+from tbp.monty.frameworks.models.evidence_update_executors import (
+    EVIDENCE_UPDATE_EXECUTORS,
+    shard_graph_ids,
+)
+
+GRAPH_IDS = ["a", "b", "c", "d", "e"]
+
+
+class FakeLearningModule:
+    """Stores one array per graph, similar to the hypotheses of an EvidenceGraphLM."""
+
+    def __init__(self):
+        self.values = {}
+        self.num_updates = {}
+        self.offset = 0
+
+    def get_all_known_object_ids(self):
+        return GRAPH_IDS
+
+    def add(self, increment, graph_id):
+        if graph_id not in self.values:
+            self.values[graph_id] = np.zeros(3)
+        # In place update
+        self.values[graph_id] += increment + self.offset
+        self.num_updates[graph_id] = self.num_updates.get(graph_id, 0) + 1
+
+    def scale(self, factor, graph_id):
+        # Update that creates a new array of the same shape
+        self.values[graph_id] = self.values[graph_id] * factor
+
+    def grow(self, graph_id):
+        self.values[graph_id] = np.append(self.values[graph_id], len(graph_id))
+
+    def fail(self, graph_id):
+        raise ValueError(f"can't update {graph_id}")
+
+
+class EvidenceUpdateExecutorTest(unittest.TestCase):
+    def get_executor(self, name, learning_module):
+        kwargs = {}
+        if name == "process_pool":
+            kwargs = dict(
+                shared_array_attributes=["values"],
+                synced_graph_attributes=["num_updates"],
+                synced_attributes=["offset"],
+            )
+        executor = EVIDENCE_UPDATE_EXECUTORS[name](learning_module, 2, **kwargs)
+        self.addCleanup(executor.close)
+        return executor
+
+    def run_updates(self, executor, learning_module):
+        executor.map("add", GRAPH_IDS, args=(1,))
+        executor.map(
+            "scale",
+            GRAPH_IDS[:3],
+            graph_args={graph_id: (i + 2,) for i, graph_id in enumerate(GRAPH_IDS)},
+        )
+        learning_module.offset = 10
+        executor.map("add", GRAPH_IDS, args=(1,))
+        executor.map("grow", GRAPH_IDS[1:])
+        executor.map("add", GRAPH_IDS, args=(2,))
+
+    def test_all_executors_give_same_results(self):
+        """Test that all executors apply the same updates."""
+        results = {}
+        for name in EVIDENCE_UPDATE_EXECUTORS:
+            learning_module = FakeLearningModule()
+            executor = self.get_executor(name, learning_module)
+            self.run_updates(executor, learning_module)
+            results[name] = learning_module
+
+        expected = results["serial"]
+        self.assertEqual(expected.values["a"].tolist(), [25, 25, 25])
+        self.assertEqual(expected.values["b"].tolist(), [26, 26, 26, 13])
+        for name, learning_module in results.items():
+            self.assertEqual(learning_module.values.keys(), expected.values.keys())
+            for graph_id, values in expected.values.items():
+                self.assertTrue(
+                    np.array_equal(learning_module.values[graph_id], values),
+                    f"{name} gives different values for {graph_id}",
+                )
+            self.assertEqual(learning_module.num_updates, expected.num_updates)
+
+    def test_process_pool_uses_shared_memory(self):
+        """Test that the process pool keeps updates of the same shape in place."""
+        learning_module = FakeLearningModule()
+        executor = self.get_executor("process_pool", learning_module)
+        executor.map("add", GRAPH_IDS, args=(1,))
+        # Initialized arrays are copied to shared memory at the next call
+        executor.map("add", GRAPH_IDS, args=(1,))
+        shared_values = dict(learning_module.values)
+        executor.map("scale", GRAPH_IDS, args=(3,))
+        executor.map("add", GRAPH_IDS, args=(1,))
+        for graph_id in GRAPH_IDS:
+            self.assertIs(learning_module.values[graph_id], shared_values[graph_id])
+            self.assertEqual(learning_module.values[graph_id].tolist(), [7, 7, 7])
+        # Updates in the owner process are sent to the workers
+        learning_module.values["a"] = np.ones(3)
+        del learning_module.values["b"]
+        executor.map("add", GRAPH_IDS, args=(1,))
+        self.assertEqual(learning_module.values["a"].tolist(), [2, 2, 2])
+        self.assertEqual(learning_module.values["b"].tolist(), [1, 1, 1])
+
+    def test_process_pool_restarts_after_invalidate(self):
+        """Test that workers are restarted and still see the shared arrays."""
+        learning_module = FakeLearningModule()
+        executor = self.get_executor("process_pool", learning_module)
+        executor.map("add", GRAPH_IDS, args=(1,))
+        executor.map("add", GRAPH_IDS, args=(1,))
+        workers = list(executor._workers)
+        executor.invalidate()
+        self.assertEqual(len(executor._workers), 0)
+        executor.map("add", GRAPH_IDS, args=(1,))
+        self.assertNotEqual(executor._workers, workers)
+        for graph_id in GRAPH_IDS:
+            self.assertEqual(learning_module.values[graph_id].tolist(), [3, 3, 3])
+
+    def test_errors_are_raised(self):
+        """Test that errors in pool workers are raised in the calling thread."""
+        for name, error in [
+            ("thread_pool", ValueError),
+            ("process_pool", RuntimeError),
+        ]:
+            executor = self.get_executor(name, FakeLearningModule())
+            with self.assertRaises(error):
+                executor.map("fail", GRAPH_IDS)
+
+    def test_shard_graph_ids(self):
+        """Test that graphs are split into balanced shards."""
+        self.assertEqual(shard_graph_ids(GRAPH_IDS, 2), [["a", "c", "e"], ["b", "d"]])
+        self.assertEqual(shard_graph_ids(GRAPH_IDS[:2], 4), [["a"], ["b"]])
+        self.assertEqual(shard_graph_ids([], 4), [[]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import copy
+import time
+import unittest
+
+import numpy as np
+
+from tbp.monty.frameworks.models.evidence_update_executors import (
+    EVIDENCE_UPDATE_EXECUTORS,
+)
+from tbp.monty.frameworks.models.lm_schedulers import (
+    LM_SCHEDULERS,
+    SerialLMScheduler,
+    ThreadPoolLMScheduler,
+)
+from tbp.monty.frameworks.models.monty_base import MontyBase
+
+
+class FakeLM:
+    def __init__(self, lm_id, rng):
+        self.learning_module_id = lm_id
+        self.rng = rng
+        self.draws = []
+
+    def step(self, num_draws):
+        # Let later LMs get ahead of earlier ones
+        time.sleep(0.01 * (5 - self.learning_module_id))
+        for _ in range(num_draws):
+            self.draws.append(self.rng.uniform())
+        return self.learning_module_id
+
+
+class LMSchedulerTest(unittest.TestCase):
+    def run_fake_lms(self, scheduler):
+        rng = np.random.RandomState(42)
+        lms = [FakeLM(i, rng) for i in range(5)]
+        results = scheduler.map(lambda lm, n: lm.step(n), lms, [1, 3, 0, 2, 1])
+        return lms, results
+
+    def test_results_are_in_order(self):
+        for name, scheduler_class in LM_SCHEDULERS.items():
+            with self.subTest(name):
+                scheduler = scheduler_class(num_workers=3)
+                _, results = self.run_fake_lms(scheduler)
+                self.assertEqual(results, [0, 1, 2, 3, 4])
+                scheduler.close()
+
+    def test_thread_pool_draws_same_random_numbers_as_serial(self):
+        serial_lms, _ = self.run_fake_lms(SerialLMScheduler())
+        scheduler = ThreadPoolLMScheduler(num_workers=5)
+        for _ in range(2):
+            thread_pool_lms, _ = self.run_fake_lms(scheduler)
+            for serial_lm, thread_pool_lm in zip(serial_lms, thread_pool_lms):
+                self.assertEqual(serial_lm.draws, thread_pool_lm.draws)
+                self.assertIsInstance(thread_pool_lm.rng, np.random.RandomState)
+        scheduler.close()
+
+    def test_thread_pool_reraises_exceptions(self):
+        def step(lm):
+            if lm.learning_module_id == 1:
+                raise RuntimeError("failed step")
+            return lm.step(1)
+
+        rng = np.random.RandomState(0)
+        lms = [FakeLM(i, rng) for i in range(3)]
+        scheduler = ThreadPoolLMScheduler(num_workers=2)
+        with self.assertRaises(RuntimeError):
+            scheduler.map(step, lms)
+        # Later LMs must not wait forever on the rng of the failed LM
+        self.assertEqual(len(lms[2].draws), 1)
+        self.assertIs(lms[2].rng, rng)
+        scheduler.close()
+
+    def test_thread_pool_can_be_copied(self):
+        scheduler = ThreadPoolLMScheduler(num_workers=2)
+        self.run_fake_lms(scheduler)
+        scheduler_copy = copy.deepcopy(scheduler)
+        _, results = self.run_fake_lms(scheduler_copy)
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+        scheduler.close()
+        scheduler_copy.close()
+
+
+class ClosableFakeLM(FakeLM):
+    def __init__(self, lm_id, rng, evidence_update_executor="serial"):
+        super().__init__(lm_id, rng)
+        self.evidence_update_executor = EVIDENCE_UPDATE_EXECUTORS[
+            evidence_update_executor
+        ](self, num_workers=1)
+        self.closed = False
+
+    def get_all_known_object_ids(self):
+        return []
+
+    def close(self):
+        self.evidence_update_executor.close()
+        self.closed = True
+
+
+class MontySchedulerTest(unittest.TestCase):
+    def create_monty(self, learning_modules, lm_scheduler):
+        return MontyBase(
+            sensor_modules=[],
+            learning_modules=learning_modules,
+            motor_system=None,
+            sm_to_agent_dict={},
+            sm_to_lm_matrix=[[] for _ in learning_modules],
+            lm_to_lm_matrix=None,
+            lm_to_lm_vote_matrix=None,
+            min_eval_steps=1,
+            min_train_steps=1,
+            num_exploratory_steps=1,
+            max_total_steps=1,
+            lm_scheduler=lm_scheduler,
+        )
+
+    def test_close_shuts_down_scheduler_and_learning_modules(self):
+        rng = np.random.RandomState(0)
+        lms = [ClosableFakeLM(i, rng) for i in range(3)]
+        monty = self.create_monty(lms, "thread_pool")
+        monty.lm_scheduler.map(lambda lm: lm.step(1), lms)
+        self.assertIsNotNone(monty.lm_scheduler._pool)
+        monty.close()
+        self.assertIsNone(monty.lm_scheduler._pool)
+        self.assertTrue(all(lm.closed for lm in lms))
+
+    def test_thread_pool_rejects_process_pool_executors(self):
+        rng = np.random.RandomState(0)
+        lms = [ClosableFakeLM(i, rng, "process_pool") for i in range(2)]
+        for lm in lms:
+            self.addCleanup(lm.close)
+        with self.assertRaises(ValueError):
+            self.create_monty(lms, "thread_pool")
+        self.create_monty(lms, "serial").close()
+
+
+if __name__ == "__main__":
+    unittest.main()
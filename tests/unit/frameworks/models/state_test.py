@@ -13,7 +13,11 @@ import numpy as np
 from scipy.spatial.transform import Rotation
 
 from tbp.monty.frameworks.models.buffer import BufferEncoder
-from tbp.monty.frameworks.models.states import GoalState, encode_goal_state
+from tbp.monty.frameworks.models.states import (
+    GoalState,
+    PoseVotes,
+    encode_goal_state,
+)
 
 
 class EncodeGoalStateTest(unittest.TestCase):
@@ -63,5 +67,56 @@ class EncodeGoalStateTest(unittest.TestCase):
         )
 
 
+class PoseVotesTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.votes = PoseVotes(
+            locations=rng.normal(0, 0.05, (20, 3)),
+            pose_vectors=Rotation.random(20, random_state=0).as_matrix(),
+            confidences=rng.uniform(0, 1, 20),
+        )
+
+    def assert_same_votes(self, votes, states):
+        self.assertEqual(len(votes), len(states))
+        for n, state in enumerate(states):
+            self.assertTrue(np.allclose(votes.locations[n], state.location))
+            self.assertTrue(
+                np.allclose(votes.pose_vectors[n], state.get_pose_vectors())
+            )
+            self.assertEqual(votes.confidences[n], state.confidence)
+
+    def test_votes_can_be_converted_to_and_from_states(self):
+        states = self.votes.to_states("LM_0")
+        self.assertTrue(all(state.sender_id == "LM_0" for state in states))
+        self.assert_same_votes(self.votes, states)
+        self.assert_same_votes(PoseVotes.from_states(states), states)
+        self.assertEqual(len(PoseVotes.from_states([])), 0)
+
+    def test_transformed_votes_match_transformed_states(self):
+        states = self.votes.to_states("LM_0")
+        sensor_disp = np.array([0.01, -0.02, 0.005])
+        rotation = Rotation.from_euler("xyz", [10, 20, 30], degrees=True).as_matrix()
+        transformed = self.votes.transformed(
+            translation=self.votes.pose_vectors.dot(sensor_disp), rotation=rotation
+        )
+        for state in states:
+            state.transform_morphological_features(
+                translation=state.get_pose_vectors().dot(sensor_disp),
+                rotation=rotation,
+            )
+        self.assert_same_votes(transformed, states)
+        # The votes themselves are not changed
+        self.assert_same_votes(self.votes, self.votes.to_states("LM_0"))
+        self.assertFalse(np.allclose(transformed.locations, self.votes.locations))
+
+    def test_votes_can_be_concatenated(self):
+        votes = PoseVotes.concatenate([self.votes, self.votes.transformed(np.ones(3))])
+        self.assertEqual(len(votes), 2 * len(self.votes))
+        self.assertTrue(np.array_equal(votes.locations[20:], self.votes.locations + 1))
+        self.assertTrue(
+            np.array_equal(votes.pose_vectors[:20], self.votes.pose_vectors)
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,111 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import unittest
+
+import numpy as np
+
+from tbp.monty.frameworks.models.voxel_stores import (
+    VOXEL_STORES,
+    ArrayVoxelStore,
+)
+
+
+class VoxelStoreTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.num_voxels_per_dim = 10
+        # Few voxels with many observations so that counts tie.
+        self.observations = [rng.integers(0, 4, size=(30, 3)) for _ in range(3)]
+        self.values = [
+            (rng.normal(size=(len(np.unique(o, axis=0)), 3)), rng.random((len(o), 5)))
+            for o in self.observations
+        ]
+
+    def fill_store(self, store):
+        for voxels, (locations, features) in zip(self.observations, self.values):
+            store.add_observations(voxels)
+            unique_voxels = np.unique(voxels, axis=0)
+            store.set_values(unique_voxels, locations, features[: len(unique_voxels)])
+
+    def test_all_stores_give_same_results(self):
+        """Test that all stores return the same content."""
+        all_voxels = np.stack(
+            np.unravel_index(np.arange(10**3), (self.num_voxels_per_dim,) * 3), axis=1
+        )
+        results = {}
+        for name, store_class in VOXEL_STORES.items():
+            store = store_class(self.num_voxels_per_dim, 5)
+            self.fill_store(store)
+            top_k_voxels = store.get_top_k_voxels(20)
+            results[name] = (
+                len(store),
+                store.shape,
+                store.get_counts(all_voxels),
+                store.get_locations(all_voxels),
+                store.get_features(all_voxels),
+                top_k_voxels,
+                store.get_counts(top_k_voxels),
+            )
+        expected = results["sparse_tensor"]
+        self.assertEqual(expected[1], (10, 10, 10, 5))
+        self.assertEqual(np.sum(expected[2]), 90)
+        for name, result in results.items():
+            for value, expected_value in zip(result, expected):
+                self.assertTrue(
+                    np.array_equal(value, expected_value),
+                    f"{name} gives different results",
+                )
+
+    def test_array_store_only_stores_occupied_voxels(self):
+        store = ArrayVoxelStore(1000, 5)
+        self.fill_store(store)
+        num_occupied = len(np.unique(np.concatenate(self.observations), axis=0))
+        self.assertEqual(len(store), num_occupied)
+        self.assertEqual(store._features.shape, (num_occupied, 5))
+        # Unoccupied voxels are 0
+        voxels = np.array([[999, 999, 999], [0, 0, 0]])
+        self.assertEqual(store.get_counts(voxels)[0], 0)
+        self.assertEqual(store.get_features(voxels)[0].tolist(), [0] * 5)
+
+    def test_array_store_adds_new_features(self):
+        store = ArrayVoxelStore(self.num_voxels_per_dim, 2)
+        store.add_observations(np.array([[1, 2, 3], [3, 2, 1]]))
+        store.set_values(
+            np.array([[1, 2, 3], [3, 2, 1]]), np.ones((2, 3)), np.ones((2, 2))
+        )
+        store.add_observations(np.array([[1, 2, 3]]))
+        store.set_values(np.array([[1, 2, 3]]), np.ones((1, 3)), np.full((1, 4), 2))
+        self.assertEqual(store.shape[-1], 4)
+        self.assertEqual(
+            store.get_features(np.array([[1, 2, 3], [3, 2, 1]])).tolist(),
+            [[2, 2, 2, 2], [1, 1, 0, 0]],
+        )
+
+    def test_array_store_from_sparse_tensors(self):
+        """Test that grids stored in sparse tensors can be converted."""
+        sparse_store = VOXEL_STORES["sparse_tensor"](self.num_voxels_per_dim, 5)
+        self.fill_store(sparse_store)
+        store = ArrayVoxelStore.from_sparse_tensors(
+            sparse_store.observation_count,
+            sparse_store.location_grid,
+            sparse_store.feature_grid,
+        )
+        expected_store = ArrayVoxelStore(self.num_voxels_per_dim, 5)
+        self.fill_store(expected_store)
+        for attribute in ["_voxel_ids", "_counts", "_locations", "_features"]:
+            self.assertTrue(
+                np.array_equal(
+                    getattr(store, attribute), getattr(expected_store, attribute)
+                )
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
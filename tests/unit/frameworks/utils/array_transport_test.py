@@ -0,0 +1,86 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import ast
+import base64
+import importlib.util
+import unittest
+
+import numpy as np
+
+from tbp.monty.frameworks.utils import array_transport
+from tbp.monty.frameworks.utils.array_transport import decode_array, encode_array
+
+
+class ArrayTransportTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.arrays = [
+            rng.integers(0, 256, (100, 100, 3), dtype=np.uint8),
+            rng.random((180, 180), dtype=np.float32),
+            rng.random((4, 5)),
+        ]
+
+    def test_arrays_are_decoded_unchanged(self):
+        for array in self.arrays:
+            for compress in [False, True]:
+                decoded = decode_array(encode_array(array, compress=compress))
+                self.assertEqual(decoded.dtype, array.dtype)
+                self.assertTrue(np.array_equal(decoded, array))
+
+    def test_non_contiguous_arrays_are_encoded(self):
+        array = self.arrays[0][10:20, 30:50]
+        self.assertTrue(np.array_equal(decode_array(encode_array(array)), array))
+
+    def test_decoding_does_not_copy(self):
+        message = encode_array(self.arrays[1])
+        decoded = decode_array(message)
+        self.assertTrue(np.shares_memory(decoded, np.frombuffer(message["data"])))
+        self.assertFalse(decoded.flags.writeable)
+
+    def test_base64_encoded_data_is_decoded(self):
+        message = encode_array(self.arrays[2])
+        message["data"] = {
+            "data": base64.b64encode(message["data"]).decode(),
+            "encoding": "base64",
+        }
+        self.assertTrue(np.array_equal(decode_array(message), self.arrays[2]))
+
+    def test_unknown_compression_raises_error(self):
+        message = encode_array(self.arrays[2])
+        message["compression"] = "lz4"
+        with self.assertRaises(ValueError):
+            decode_array(message)
+
+    def test_servers_can_use_module_standalone(self):
+        """Test the module the same way the servers in scripts/servers use it."""
+        with open(array_transport.__file__) as f:
+            tree = ast.parse(f.read())
+        imported_modules = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imported_modules.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                imported_modules.add(node.module)
+        self.assertEqual(imported_modules, {"__future__", "base64", "zlib", "numpy"})
+
+        spec = importlib.util.spec_from_file_location(
+            "array_transport", array_transport.__file__
+        )
+        server_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(server_module)
+        for array in self.arrays:
+            for compress in [False, True]:
+                message = server_module.encode_array(array, compress=compress)
+                self.assertEqual(message, encode_array(array, compress=compress))
+                self.assertTrue(np.array_equal(decode_array(message), array))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import quaternion as qt
+
+from tbp.monty.frameworks.actions.actions import LookUp
+from tbp.monty.frameworks.loggers.monty_handlers import (
+    DetailedEpisodeLogHandler,
+    DetailedJSONHandler,
+)
+from tbp.monty.frameworks.models.buffer import BufferEncoder
+from tbp.monty.frameworks.run_parallel import cat_files
+from tbp.monty.frameworks.utils.episode_log import (
+    EPISODE_LOG_FILE_NAME,
+    EpisodeLog,
+    EpisodeLogWriter,
+    convert_json_log,
+    load_episode_log,
+)
+from tbp.monty.frameworks.utils.logging_utils import deserialize_json_chunks
+
+
+def make_episode_stats(rng, num_steps=4):
+    return {
+        "LM_0": {
+            "possible_locations": [
+                {"mug": rng.random((5, 3)), "bowl": rng.random((7, 3))}
+                for _ in range(num_steps)
+            ],
+            "evidences": [
+                {"mug": rng.random(5), "bowl": rng.random(7).astype(np.float32)}
+                for _ in range(num_steps)
+            ],
+            "possible_matches": [["mug", "bowl"], ["mug"], [], ["mug"]],
+            "current_mlh": [
+                {"graph_id": "mug", "rotation": qt.one, "evidence": 1.5}
+                for _ in range(num_steps)
+            ],
+            "time": [0.1 * step for step in range(num_steps)],
+            "locations": {"patch": rng.random((num_steps, 3))},
+            "on_object": np.array([True, False, True, True]),
+            "num_steps": np.int64(num_steps),
+            "mode": "eval",
+            "primary_target": None,
+            "empty": {},
+        },
+        "motor_system": {
+            "action_sequence": [
+                [LookUp(agent_id="agent_id_0", rotation_degrees=5.0), {}]
+                for _ in range(num_steps)
+            ],
+        },
+        2: {"int_keys": [1, 2, 3]},
+    }
+
+
+def to_json(stats):
+    """Return the stats as they are loaded from a detailed JSON log."""
+    return json.loads(json.dumps(stats, cls=BufferEncoder))
+
+
+class EpisodeLogTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.output_dir, EPISODE_LOG_FILE_NAME)
+        rng = np.random.default_rng(0)
+        self.episodes = [make_episode_stats(rng) for _ in range(3)]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def write_log(self, log_file, episodes):
+        with EpisodeLogWriter(log_file) as writer:
+            for key, stats in enumerate(episodes):
+                writer.write_episode(key, stats)
+
+    def assert_equal_to_json(self, loaded, expected):
+        """Assert that loaded stats equal the stats loaded from a JSON log."""
+        if isinstance(loaded, np.ndarray):
+            np.testing.assert_allclose(loaded, np.array(expected, dtype=float))
+        elif isinstance(loaded, dict):
+            self.assertEqual(list(loaded.keys()), list(expected.keys()))
+            for key, value in loaded.items():
+                self.assert_equal_to_json(value, expected[key])
+        elif isinstance(loaded, list):
+            self.assertEqual(len(loaded), len(expected))
+            for value, expected_value in zip(loaded, expected):
+                self.assert_equal_to_json(value, expected_value)
+        else:
+            self.assertEqual(loaded, expected)
+
+    def test_round_trip(self):
+        self.write_log(self.log_file, self.episodes)
+        log = EpisodeLog(self.log_file)
+        self.assertEqual(len(log), 3)
+        self.assertEqual(log.episode_keys, ["0", "1", "2"])
+        for episode, stats in enumerate(self.episodes):
+            self.assert_equal_to_json(log.load_episode(episode), to_json(stats))
+
+    def test_arrays_keep_dtype_and_shape(self):
+        self.write_log(self.log_file, self.episodes)
+        log = EpisodeLog(self.log_file)
+        stats = self.episodes[1]["LM_0"]
+        evidence = log.get(1, "LM_0", "evidences", 2, "bowl")
+        self.assertEqual(evidence.dtype, np.float32)
+        np.testing.assert_array_equal(evidence, stats["evidences"][2]["bowl"])
+        locations = log.get(1, "LM_0", "locations", "patch")
+        np.testing.assert_array_equal(locations, stats["locations"]["patch"])
+        np.testing.assert_array_equal(
+            log.get(1, "LM_0", "on_object"), stats["on_object"]
+        )
+        # Lists of numbers are stored as one array
+        np.testing.assert_allclose(log.get(1, "LM_0", "time"), stats["time"])
+
+    def test_lazy_access_to_single_step(self):
+        self.write_log(self.log_file, self.episodes)
+        log = EpisodeLog(self.log_file)
+        self.assertEqual(log.keys(2, "LM_0", "possible_locations"), [0, 1, 2, 3])
+        self.assertEqual(log.keys(2, "LM_0", "possible_locations", 3), ["mug", "bowl"])
+        locations = log.get(2, "LM_0", "possible_locations", 3, "mug")
+        # A view of the memory mapped file
+        self.assertFalse(locations.flags.owndata)
+        self.assertFalse(locations.flags.writeable)
+        np.testing.assert_array_equal(
+            locations, self.episodes[2]["LM_0"]["possible_locations"][3]["mug"]
+        )
+        self.assertEqual(log.get(2, "LM_0", "current_mlh", 1, "graph_id"), "mug")
+        self.assertEqual(log.get(2, "2", "int_keys").tolist(), [1, 2, 3])
+        with self.assertRaises(KeyError):
+            log.get(2, "LM_0", "missing")
+
+    def test_appends_and_concatenates_episodes(self):
+        self.write_log(self.log_file, self.episodes[:1])
+        self.write_log(self.log_file, self.episodes[1:2])
+        other_file = os.path.join(self.output_dir, "other.bin")
+        # Every parallel run writes episode 0
+        self.write_log(other_file, self.episodes[2:])
+        merged_file = os.path.join(self.output_dir, "merged.bin")
+        cat_files([self.log_file, other_file], merged_file)
+
+        detailed_stats = load_episode_log(merged_file)
+        self.assertEqual(list(detailed_stats.keys()), ["0", "1", "2"])
+        for episode, stats in enumerate(self.episodes):
+            self.assert_equal_to_json(detailed_stats[str(episode)], to_json(stats))
+        self.assertEqual(
+            list(load_episode_log(merged_file, start=1).keys()), ["1", "2"]
+        )
+        self.assertEqual(
+            list(load_episode_log(merged_file, episodes=[2, 0]).keys()), ["2", "0"]
+        )
+
+    def test_ignores_truncated_record(self):
+        self.write_log(self.log_file, self.episodes[:2])
+        size = Path(self.log_file).stat().st_size
+        with open(self.log_file, "r+b") as f:
+            f.truncate(size - 10)
+        log = EpisodeLog(self.log_file)
+        self.assertEqual(len(log), 2)
+        self.assert_equal_to_json(log.load_episode(0), to_json(self.episodes[0]))
+
+    def test_rejects_other_files(self):
+        json_file = os.path.join(self.output_dir, "detailed_run_stats.json")
+        with open(json_file, "w") as f:
+            f.write('{"0": {"LM_0": {}}}\n')
+        with self.assertRaises(ValueError):
+            EpisodeLog(json_file)
+
+    def test_convert_json_log(self):
+        json_file = os.path.join(self.output_dir, "detailed_run_stats.json")
+        with open(json_file, "w") as f:
+            for key, stats in enumerate(self.episodes):
+                json.dump({key: stats}, f, cls=BufferEncoder)
+                f.write(os.linesep)
+        log_file = convert_json_log(json_file)
+        self.assertEqual(log_file, self.log_file)
+
+        detailed_json = deserialize_json_chunks(json_file)
+        detailed_stats = load_episode_log(log_file)
+        self.assertEqual(list(detailed_stats.keys()), list(detailed_json.keys()))
+        for episode, stats in detailed_json.items():
+            self.assert_equal_to_json(detailed_stats[episode], stats)
+        np.testing.assert_allclose(
+            EpisodeLog(log_file).get(0, "LM_0", "possible_locations", 1, "bowl"),
+            self.episodes[0]["LM_0"]["possible_locations"][1]["bowl"],
+        )
+
+
+class DetailedEpisodeLogHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_same_stats_as_json_handler(self):
+        rng = np.random.default_rng(0)
+        data = {"BASIC": {"eval_stats": {}}, "DETAILED": {}}
+        json_handler = DetailedJSONHandler()
+        log_handler = DetailedEpisodeLogHandler()
+        for episode in range(2):
+            data["BASIC"]["eval_stats"][episode] = {"LM_0": {"num_steps": 4}}
+            data["DETAILED"][episode] = make_episode_stats(rng)
+            for handler in [json_handler, log_handler]:
+                handler.report_episode(
+                    data,
+                    self.output_dir,
+                    episode,
+                    mode="eval",
+                    eval_episodes_to_total={0: 0, 1: 1},
+                )
+        self.assertEqual(data["BASIC"]["eval_stats"][0], {"LM_0": {"num_steps": 4}})
+
+        detailed_json = deserialize_json_chunks(
+            os.path.join(self.output_dir, "detailed_run_stats.json")
+        )
+        log = EpisodeLog(os.path.join(self.output_dir, EPISODE_LOG_FILE_NAME))
+        self.assertEqual(len(log), 2)
+        for episode in range(2):
+            stats = detailed_json[str(episode)]
+            self.assertEqual(log.keys(episode), list(stats.keys()))
+            np.testing.assert_allclose(
+                log.get(episode, "LM_0", "evidences", 3, "mug"),
+                stats["LM_0"]["evidences"][3]["mug"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,7 +9,21 @@
 
 import unittest
 
-from tbp.monty.frameworks.utils.evidence_matching import ChannelMapper
+import numpy as np
+from scipy.spatial import KDTree
+from scipy.spatial.transform import Rotation
+
+from tbp.monty.frameworks.utils.evidence_matching import (
+    ChannelMapper,
+    FeatureMatcher,
+    FusedEvidenceKernel,
+    StackedHypotheses,
+)
+from tbp.monty.frameworks.utils.graph_matching_utils import get_custom_distances
+from tbp.monty.frameworks.utils.spatial_arithmetics import (
+    get_angles_for_all_hypotheses,
+    rotate_pose_dependent_features,
+)
 
 
 class ChannelMapperTest(unittest.TestCase):
@@ -141,11 +155,386 @@ class ChannelMapperTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.mapper.update(original, "Z", new_data)
 
+    def test_channel_ranges(self):
+        """Test retrieving the ranges of all channels at once."""
+        self.assertEqual(
+            self.mapper.channel_ranges(),
+            {"A": (0, 5), "B": (5, 15), "C": (15, 30)},
+        )
+
+    def test_compact(self):
+        """Test shrinking the channels to the kept hypotheses."""
+        keep = np.zeros(30, dtype=bool)
+        keep[[0, 1, 7, 20, 21, 29]] = True
+        self.mapper.compact(keep)
+        self.assertEqual(
+            self.mapper.channel_ranges(),
+            {"A": (0, 2), "B": (2, 3), "C": (3, 6)},
+        )
+
+        with self.assertRaises(ValueError):
+            self.mapper.compact(np.ones(5, dtype=bool))
+        with self.assertRaises(ValueError):
+            self.mapper.compact(np.array([True, True, False, True, True, True]))
+
     def test_repr(self):
         """Test string representation of the ChannelMapper."""
         expected_repr = "ChannelMapper({'A': (0, 5), 'B': (5, 15), 'C': (15, 30)})"
         self.assertEqual(repr(self.mapper), expected_repr)
 
 
+class StackedHypothesesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        """Sets up hypotheses for three graphs."""
+        rng = np.random.default_rng(0)
+        self.sizes = {"a": 4, "b": 2, "c": 3}
+        self.hypotheses = {
+            "locations": {g: rng.normal(size=(n, 3)) for g, n in self.sizes.items()},
+            "evidence": {g: rng.normal(size=n) for g, n in self.sizes.items()},
+        }
+        self.graph_ids = list(self.sizes.keys())
+        self.stack = StackedHypotheses(["locations", "evidence"])
+        self.stack.update(self.hypotheses, self.graph_ids)
+
+    def assert_views_into_stack(self):
+        for attribute, per_graph in self.hypotheses.items():
+            for array in per_graph.values():
+                self.assertIs(array.base, self.stack.arrays[attribute])
+
+    def test_stack(self):
+        """Test that hypotheses are replaced by views into the stacked arrays."""
+        self.assertEqual(self.stack.graph_ids, self.graph_ids)
+        self.assertEqual(self.stack.graph_starts.tolist(), [0, 4, 6])
+        self.assertEqual(self.stack.arrays["locations"].shape, (9, 3))
+        self.assert_views_into_stack()
+        # In place updates of the per-graph arrays update the stacked arrays
+        self.hypotheses["evidence"]["b"][1] = 10
+        self.assertEqual(self.stack.arrays["evidence"][5], 10)
+
+    def test_update_copies_replaced_arrays(self):
+        """Test that replaced arrays are copied into the stacked arrays."""
+        stacked_evidence = self.stack.arrays["evidence"]
+        self.hypotheses["evidence"]["c"] = np.arange(3.0)
+        self.stack.update(self.hypotheses, self.graph_ids)
+        self.assertIs(self.stack.arrays["evidence"], stacked_evidence)
+        self.assertEqual(stacked_evidence[6:].tolist(), [0, 1, 2])
+        self.assert_views_into_stack()
+
+    def test_update_restacks_resized_arrays(self):
+        """Test that arrays are stacked again if a graph changes its size."""
+        self.hypotheses["evidence"]["a"] = np.ones(5)
+        self.hypotheses["locations"]["a"] = np.ones((5, 3))
+        self.stack.update(self.hypotheses, self.graph_ids)
+        self.assertEqual(self.stack.graph_starts.tolist(), [0, 5, 7])
+        self.assertEqual(self.stack.arrays["evidence"][:5].tolist(), [1] * 5)
+        self.assert_views_into_stack()
+
+        self.stack.update(self.hypotheses, ["c", "a"])
+        self.assertEqual(self.stack.graph_ids, ["c", "a"])
+        self.assertEqual(self.stack.arrays["evidence"].shape, (8,))
+
+    def test_vectorized_operations(self):
+        """Test per-graph maxima and locating stacked hypotheses."""
+        evidence = self.hypotheses["evidence"]
+        self.assertEqual(
+            self.stack.max_per_graph("evidence").tolist(),
+            [np.max(evidence[g]) for g in self.graph_ids],
+        )
+        graph_indices, hyp_ids = self.stack.locate(np.arange(9))
+        self.assertEqual(graph_indices.tolist(), [0, 0, 0, 0, 1, 1, 2, 2, 2])
+        self.assertEqual(hyp_ids.tolist(), [0, 1, 2, 3, 0, 1, 0, 1, 2])
+
+
+class FusedEvidenceKernelTest(unittest.TestCase):
+    def setUp(self) -> None:
+        """Sets up a random graph and sensed features."""
+        self.rng = np.random.default_rng(42)
+        self.num_nodes = 200
+        self.max_match_distance = 0.01
+        self.pose_vector_weights = np.array([1.0, 0.5, 0.5])
+        self.node_locations = self.rng.uniform(-0.05, 0.05, (self.num_nodes, 3))
+        self.node_pose_vectors = Rotation.random(
+            self.num_nodes, random_state=1
+        ).as_matrix()
+        self.node_pose_vectors = self.node_pose_vectors.reshape(-1, 9)
+        self.node_pose_fully_defined = self.rng.random(self.num_nodes) > 0.3
+        self.node_feature_evidence = self.rng.random(self.num_nodes)
+        self.sensed_pose_vectors = Rotation.random(random_state=2).as_matrix()
+        self.search_curvature = 3.5
+
+    def _sample_hypotheses(self, num_hyp):
+        search_locations = self.rng.uniform(-0.05, 0.05, (num_hyp, 3))
+        poses = Rotation.random(num_hyp, random_state=num_hyp).as_matrix()
+        nearest_node_ids = self.rng.integers(0, self.num_nodes, (num_hyp, 3))
+        return search_locations, poses, nearest_node_ids
+
+    def _reference_evidence(
+        self,
+        search_locations,
+        poses,
+        nearest_node_ids,
+        pose_fully_defined,
+        use_features,
+    ):
+        """Replicates EvidenceGraphLM._calculate_evidence_for_new_locations.
+
+        Returns:
+            The location evidence of each hypothesis.
+        """
+        rotated = rotate_pose_dependent_features(
+            {
+                "pose_vectors": self.sensed_pose_vectors,
+                "pose_fully_defined": pose_fully_defined,
+            },
+            poses,
+        )["pose_vectors"]
+        distances = get_custom_distances(
+            self.node_locations[nearest_node_ids],
+            search_locations,
+            rotated[:, 0],
+            self.search_curvature,
+        )
+        weights = (self.max_match_distance - distances) / self.max_match_distance
+        mask = weights <= 0
+        node_pvs = self.node_pose_vectors[nearest_node_ids]
+        pn_error = get_angles_for_all_hypotheses(node_pvs[:, :, :3], rotated[:, 0])
+        pn_evidence = -(np.sin(pn_error / 2) - 0.5)
+        if pose_fully_defined:
+            use_cd = np.array(self.node_pose_fully_defined[nearest_node_ids], bool)
+            cd1_angle = get_angles_for_all_hypotheses(
+                node_pvs[:, :, 3:6], rotated[:, 1]
+            )
+            cd1_error = np.pi / 2 - np.abs(cd1_angle - np.pi / 2)
+            cd1_evidence = -(np.sin(cd1_error) - 0.5) * use_cd
+            cd1_weight = self.pose_vector_weights[1]
+        else:
+            cd1_evidence = np.zeros(pn_error.shape)
+            cd1_weight = 0
+        radius_evidence = np.zeros(weights.shape)
+        radius_evidence += (
+            pn_evidence * self.pose_vector_weights[0] + cd1_evidence * cd1_weight
+        )
+        radius_evidence[mask] = -1
+        if use_features:
+            feature_evidence = self.node_feature_evidence[nearest_node_ids]
+            feature_evidence[mask] = 0
+            radius_evidence = radius_evidence + feature_evidence * 1
+        return np.max(radius_evidence, axis=1)
+
+    def _kernel_evidence(
+        self,
+        kernel,
+        search_locations,
+        poses,
+        nearest_node_ids,
+        pose_fully_defined,
+        use_features,
+    ):
+        return kernel.location_evidence(
+            search_locations=search_locations,
+            hypotheses_poses=poses,
+            nearest_node_ids=nearest_node_ids,
+            node_locations=self.node_locations,
+            node_pose_vectors=self.node_pose_vectors,
+            node_pose_fully_defined=self.node_pose_fully_defined,
+            sensed_pose_vectors=self.sensed_pose_vectors,
+            sensed_pose_fully_defined=pose_fully_defined,
+            search_curvature=self.search_curvature,
+            max_match_distance=self.max_match_distance,
+            pose_vector_weights=self.pose_vector_weights,
+            node_feature_evidence=(
+                self.node_feature_evidence if use_features else None
+            ),
+        )
+
+    def test_matches_reference(self):
+        """Test that the kernel gives bit-identical results to the default path."""
+        kernel = FusedEvidenceKernel()
+        for pose_fully_defined in [True, False]:
+            for use_features in [True, False]:
+                hypotheses = self._sample_hypotheses(500)
+                expected = self._reference_evidence(
+                    *hypotheses, pose_fully_defined, use_features
+                )
+                evidence = self._kernel_evidence(
+                    kernel, *hypotheses, pose_fully_defined, use_features
+                )
+                self.assertTrue(np.array_equal(evidence, expected))
+                # Some, but not all hypotheses should be outside the search radius.
+                self.assertTrue(np.any(evidence == -1))
+                self.assertFalse(np.all(evidence == -1))
+
+    def test_missing_neighbors_are_ignored(self):
+        """Test that neighbor ids equal to the number of nodes are ignored."""
+        num_nodes = 3
+        self.node_locations = self.node_locations[:num_nodes]
+        self.node_pose_vectors = self.node_pose_vectors[:num_nodes]
+        self.node_pose_fully_defined = self.node_pose_fully_defined[:num_nodes]
+        self.node_feature_evidence = self.node_feature_evidence[:num_nodes]
+        # Search next to the last node, which missing neighbor ids would be clipped
+        # to, and far away from all nodes.
+        search_locations = np.concatenate(
+            [
+                self.node_locations[-1] + self.rng.normal(0, 0.001, (50, 3)),
+                np.full((50, 3), 1.0),
+            ]
+        )
+        poses = Rotation.random(100, random_state=3).as_matrix()
+        # More neighbors than the graph has nodes
+        _, nearest_node_ids = KDTree(self.node_locations).query(search_locations, k=5)
+        self.assertTrue(np.all(nearest_node_ids[:, num_nodes:] == num_nodes))
+        # Only the farthest node is a valid neighbor (e.g. with distance_upper_bound)
+        farthest_node_ids = np.full_like(nearest_node_ids, num_nodes)
+        farthest_node_ids[:, 0] = nearest_node_ids[:, num_nodes - 1]
+        kernel = FusedEvidenceKernel()
+        for node_ids, num_valid in [
+            (nearest_node_ids, num_nodes),
+            (farthest_node_ids, 1),
+        ]:
+            for pose_fully_defined in [True, False]:
+                for use_features in [True, False]:
+                    expected = self._reference_evidence(
+                        search_locations,
+                        poses,
+                        node_ids[:, :num_valid],
+                        pose_fully_defined,
+                        use_features,
+                    )
+                    evidence = self._kernel_evidence(
+                        kernel,
+                        search_locations,
+                        poses,
+                        node_ids,
+                        pose_fully_defined,
+                        use_features,
+                    )
+                    self.assertTrue(np.array_equal(evidence, expected))
+                    self.assertTrue(np.all(evidence[50:] == -1))
+
+    def test_buffers_are_reused(self):
+        """Test that buffers only grow and smaller inputs reuse them."""
+        kernel = FusedEvidenceKernel()
+        self._kernel_evidence(kernel, *self._sample_hypotheses(300), True, True)
+        buffer_ids = {k: id(v) for k, v in kernel._buffers.items()}
+        for num_hyp in [10, 300, 123]:
+            hypotheses = self._sample_hypotheses(num_hyp)
+            evidence = self._kernel_evidence(kernel, *hypotheses, True, True)
+            self.assertEqual(evidence.shape, (num_hyp,))
+            self.assertTrue(
+                np.array_equal(
+                    evidence, self._reference_evidence(*hypotheses, True, True)
+                )
+            )
+        self.assertEqual(buffer_ids, {k: id(v) for k, v in kernel._buffers.items()})
+        self._kernel_evidence(kernel, *self._sample_hypotheses(301), True, True)
+        self.assertGreaterEqual(kernel._buffers["location_evidence"].size, 600)
+
+
+class FeatureMatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        """Sets up random node features with missing values and sensed features."""
+        self.rng = np.random.default_rng(3)
+        self.feature_order = ["hsv", "pose_vectors", "principal_curvatures_log"]
+        self.tolerances = {
+            "hsv": np.array([0.1, 0.2, 0.2]),
+            "principal_curvatures_log": np.ones(2),
+        }
+        self.feature_weights = {
+            "hsv": np.array([1, 0.5, 0.5]),
+            "principal_curvatures_log": np.array([0.5, 0.5]),
+        }
+        self.node_features = [self._random_node_features(n) for n in [50, 80, 20]]
+        self.query_features = {
+            "hsv": np.array([0.98, 0.5, 0.5]),
+            "pose_vectors": np.eye(3),
+            "principal_curvatures_log": np.array([1.0, -1.0]),
+        }
+
+    def _random_node_features(self, num_nodes):
+        node_features = np.column_stack(
+            [self.rng.random((num_nodes, 3)), self.rng.normal(0, 2, (num_nodes, 2))]
+        )
+        node_features[self.rng.random(num_nodes) > 0.9, 3:] = np.nan
+        return node_features
+
+    def _reference_evidence(self, node_features):
+        """Replicates the loop previously used by the EvidenceGraphLM.
+
+        Returns:
+            The feature evidence of each node.
+        """
+        feature_list = np.concatenate(
+            [
+                self.query_features["hsv"],
+                self.query_features["principal_curvatures_log"],
+            ]
+        )
+        tolerance_list = np.concatenate(
+            [self.tolerances["hsv"], self.tolerances["principal_curvatures_log"]]
+        )
+        weight_list = np.concatenate(
+            [
+                self.feature_weights["hsv"],
+                self.feature_weights["principal_curvatures_log"],
+            ]
+        )
+        circular_var = np.array([True, False, False, False, False])
+        feature_differences = np.zeros_like(node_features)
+        feature_differences[:, ~circular_var] = np.abs(
+            node_features[:, ~circular_var] - feature_list[~circular_var]
+        )
+        cnode_fs = node_features[:, circular_var]
+        cquery_fs = feature_list[circular_var]
+        feature_differences[:, circular_var] = np.min(
+            [
+                np.abs(1 + cnode_fs - cquery_fs),
+                np.abs(cnode_fs - cquery_fs),
+                np.abs(cnode_fs - (cquery_fs + 1)),
+            ],
+            axis=0,
+        )
+        feature_evidence = np.clip(tolerance_list - feature_differences, 0, np.inf)
+        feature_evidence = feature_evidence / tolerance_list
+        return np.average(feature_evidence, weights=weight_list, axis=1)
+
+    def test_matches_reference(self):
+        for node_features in self.node_features:
+            matcher = FeatureMatcher(
+                node_features, self.feature_order, self.tolerances, self.feature_weights
+            )
+            for _ in range(2):
+                evidence = matcher.node_feature_evidence(self.query_features)
+                reference = self._reference_evidence(node_features)
+                self.assertTrue(np.array_equal(evidence, reference, equal_nan=True))
+                self.assertTrue(np.any(np.isnan(evidence)))
+                self.assertTrue(np.any(evidence > 0))
+                self.query_features["hsv"] = np.array([0.03, 0.4, 0.6])
+
+    def test_stacked_matches_separate(self):
+        matchers = [
+            FeatureMatcher(
+                node_features, self.feature_order, self.tolerances, self.feature_weights
+            )
+            for node_features in self.node_features
+        ]
+        stacked = FeatureMatcher.stack(matchers)
+        self.assertEqual(stacked.sections, [50, 80, 20])
+        evidences = stacked.split(stacked.node_feature_evidence(self.query_features))
+        for matcher, evidence in zip(matchers, evidences):
+            self.assertTrue(
+                np.array_equal(
+                    evidence,
+                    matcher.node_feature_evidence(self.query_features),
+                    equal_nan=True,
+                )
+            )
+
+        other_matcher = FeatureMatcher(
+            self.node_features[0][:, :3], ["hsv"], self.tolerances, self.feature_weights
+        )
+        with self.assertRaises(ValueError):
+            FeatureMatcher.stack([matchers[0], other_matcher])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,190 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import torch
+from scipy.spatial.transform import Rotation
+
+from tbp.monty.frameworks.models.evidence_matching import EvidenceGraphMemory
+from tbp.monty.frameworks.models.object_model import GridObjectModel
+from tbp.monty.frameworks.utils.model_store import (
+    MODEL_STORE_FILE_NAME,
+    convert_model_to_store,
+    get_changed_sources,
+    get_model_file,
+    is_model_store,
+    load_model_state_dict,
+    load_model_store,
+    save_model_store,
+)
+
+
+def make_features(rng, num_observations):
+    return {
+        "pose_vectors": np.tile(np.eye(3).flatten(), (num_observations, 1)),
+        "pose_fully_defined": np.ones(num_observations, dtype=bool),
+        "hsv": rng.random((num_observations, 3)),
+    }
+
+
+class ModelStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.output_dir, MODEL_STORE_FILE_NAME)
+        rng = np.random.default_rng(0)
+        self.graph_memory = {}
+        for object_id in ["cup", "bowl"]:
+            model = GridObjectModel(
+                object_id, max_nodes=50, max_size=0.2, num_voxels_per_dim=20
+            )
+            locations = rng.normal(0, 0.02, (100, 3))
+            locations[0] = 0
+            model.build_model(locations, make_features(rng, 100))
+            self.graph_memory[object_id] = {"patch": model}
+        self.state_dict = {
+            "lm_dict": {
+                0: dict(
+                    graph_memory=self.graph_memory,
+                    target_to_graph_id={"cup": {"cup"}, "bowl": {"bowl"}},
+                    graph_id_to_target={"cup": {"cup"}, "bowl": {"bowl"}},
+                )
+            },
+            "lm_to_lm_matrix": None,
+            "tensor": torch.arange(6, dtype=torch.float).reshape(2, 3),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_model_store_is_memory_mapped(self):
+        save_model_store(self.state_dict, self.store_path)
+        self.assertTrue(is_model_store(self.store_path))
+        loaded = load_model_store(self.store_path)
+        self.assertEqual(
+            loaded["lm_dict"][0]["target_to_graph_id"],
+            {"cup": {"cup"}, "bowl": {"bowl"}},
+        )
+        self.assertIsNone(loaded["lm_to_lm_matrix"])
+        self.assertTrue(torch.equal(loaded["tensor"], self.state_dict["tensor"]))
+        for object_id, models in self.graph_memory.items():
+            model = models["patch"]
+            loaded_model = loaded["lm_dict"][0]["graph_memory"][object_id]["patch"]
+            self.assertIsInstance(loaded_model.pos, np.memmap)
+            self.assertIsInstance(loaded_model.x, np.memmap)
+            self.assertIsInstance(loaded_model._voxel_store._features, np.memmap)
+            self.assertEqual(loaded_model.feature_mapping, model.feature_mapping)
+            self.assertTrue(np.array_equal(loaded_model.pos, model.pos))
+            self.assertTrue(np.array_equal(loaded_model.x, model.x))
+            search_locations = np.random.default_rng(1).normal(0, 0.02, (20, 3))
+            self.assertTrue(
+                np.array_equal(
+                    loaded_model.find_nearest_neighbors(search_locations, 3),
+                    model.find_nearest_neighbors(search_locations, 3),
+                )
+            )
+
+    def test_loaded_models_can_be_updated(self):
+        """Test that updating a loaded model does not change the model store."""
+        save_model_store(self.state_dict, self.store_path)
+        with open(self.store_path, "rb") as f:
+            store_content = f.read()
+        loaded = load_model_store(self.store_path)
+        loaded["tensor"] += 1
+        rng = np.random.default_rng(2)
+        for models in [self.graph_memory, loaded["lm_dict"][0]["graph_memory"]]:
+            models["cup"]["patch"].update_model(
+                rng.normal(0, 0.02, (50, 3)),
+                make_features(rng, 50),
+                location_rel_model=np.zeros(3),
+                object_location_rel_body=np.zeros(3),
+                object_rotation=Rotation.identity(),
+            )
+            rng = np.random.default_rng(2)
+        loaded_model = loaded["lm_dict"][0]["graph_memory"]["cup"]["patch"]
+        self.assertTrue(
+            np.array_equal(loaded_model.pos, self.graph_memory["cup"]["patch"].pos)
+        )
+        with open(self.store_path, "rb") as f:
+            self.assertEqual(f.read(), store_content)
+
+    def test_graph_memory_loads_model_store(self):
+        save_model_store(self.state_dict, self.store_path)
+        graph_memory = EvidenceGraphMemory(
+            max_nodes_per_graph=50,
+            max_graph_size=0.2,
+            num_model_voxels_per_dim=20,
+            graph_delta_thresholds=None,
+        )
+        graph_memory.load_state_dict(
+            load_model_state_dict(self.output_dir)["lm_dict"][0]["graph_memory"]
+        )
+        self.assertEqual(set(graph_memory.get_memory_ids()), {"cup", "bowl"})
+        self.assertTrue(
+            np.array_equal(
+                graph_memory.get_graph("cup", "patch").pos,
+                self.graph_memory["cup"]["patch"].pos,
+            )
+        )
+
+    def test_model_pt_can_be_converted(self):
+        state_dict = {"lm_dict": {0: {"tensor": torch.ones(4)}}}
+        torch.save(state_dict, os.path.join(self.output_dir, "model.pt"))
+        # Without a model store, model.pt is loaded
+        self.assertFalse(is_model_store(os.path.join(self.output_dir, "model.pt")))
+        loaded = load_model_state_dict(self.output_dir)
+        self.assertTrue(torch.equal(loaded["lm_dict"][0]["tensor"], torch.ones(4)))
+
+        store_path = convert_model_to_store(self.output_dir)
+        self.assertEqual(store_path, self.store_path)
+        loaded = load_model_state_dict(self.output_dir)
+        self.assertTrue(torch.equal(loaded["lm_dict"][0]["tensor"], torch.ones(4)))
+        self.assertTrue(is_model_store(store_path))
+
+    def test_out_of_date_model_store_is_ignored(self):
+        model_file = os.path.join(self.output_dir, "model.pt")
+        torch.save({"lm_dict": {0: {"tensor": torch.ones(4)}}}, model_file)
+        convert_model_to_store(self.output_dir)
+        self.assertEqual(get_changed_sources(self.store_path), [])
+        self.assertEqual(get_model_file(self.output_dir), self.store_path)
+
+        # Training again into the same directory only overwrites model.pt
+        torch.save({"lm_dict": {0: {"tensor": torch.zeros(8)}}}, model_file)
+        self.assertEqual(get_changed_sources(self.store_path), [model_file])
+        with self.assertLogs(level="WARNING"):
+            loaded = load_model_state_dict(self.output_dir)
+        self.assertTrue(torch.equal(loaded["lm_dict"][0]["tensor"], torch.zeros(8)))
+
+        # Stores are still used without the files they were converted from
+        os.remove(model_file)
+        self.assertEqual(get_model_file(self.output_dir), self.store_path)
+
+    def test_arrays_are_stored_once(self):
+        array = np.arange(1000, dtype=np.float64)
+        save_model_store({"a": array, "b": array}, self.store_path)
+        self.assertLess(Path(self.store_path).stat().st_size, 2 * array.nbytes)
+        loaded = load_model_store(self.store_path)
+        self.assertTrue(np.array_equal(loaded["a"], array))
+        self.assertTrue(np.array_equal(loaded["b"], array))
+
+    def test_invalid_model_store_raises_error(self):
+        with open(self.store_path, "wb") as f:
+            f.write(b"not a model store" * 10)
+        self.assertFalse(is_model_store(self.store_path))
+        with self.assertRaises(ValueError):
+            load_model_store(self.store_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
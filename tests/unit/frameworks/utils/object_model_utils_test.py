@@ -0,0 +1,94 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import unittest
+
+import numpy as np
+import torch
+from scipy.spatial.transform import Rotation
+
+from tbp.monty.frameworks.utils.object_model_utils import (
+    batched_pose_vector_mean,
+    circular_mean,
+    get_values_at_voxels,
+    get_values_from_dense_last_dim,
+    group_observations_by_voxel,
+    pose_vector_mean,
+)
+
+
+class VoxelAggregationTest(unittest.TestCase):
+    def test_group_observations_by_voxel(self):
+        voxel_ids = np.array([[1, 2, 3], [0, 0, 1], [1, 2, 3], [4, 0, 0], [1, 2, 3]])
+        voxels, groups = group_observations_by_voxel(voxel_ids, 5)
+        self.assertEqual(voxels.tolist(), [[0, 0, 1], [1, 2, 3], [4, 0, 0]])
+        self.assertEqual(len(groups), 2)
+        voxel_rows, observation_ids = groups[0]
+        self.assertEqual(voxel_rows.tolist(), [0, 2])
+        self.assertEqual(observation_ids.tolist(), [[1], [3]])
+        voxel_rows, observation_ids = groups[1]
+        self.assertEqual(voxel_rows.tolist(), [1])
+        # Observations keep their original order
+        self.assertEqual(observation_ids.tolist(), [[0, 2, 4]])
+
+    def test_get_values_at_voxels(self):
+        indices = torch.tensor([[1, 1, 3, 3], [0, 0, 2, 2], [2, 2, 1, 1], [0, 1, 0, 1]])
+        values = torch.tensor([1.0, 2.0, 3.0, 4.0], dtype=torch.float64)
+        tensor = torch.sparse_coo_tensor(indices, values, (4, 4, 4, 2)).coalesce()
+        voxels = np.array([[3, 2, 1], [0, 0, 0], [1, 0, 2]])
+        values_at_voxels = get_values_at_voxels(tensor, voxels)
+        self.assertEqual(values_at_voxels.tolist(), [[3, 4], [0, 0], [1, 2]])
+        for voxel, voxel_values in zip(voxels, values_at_voxels):
+            self.assertEqual(
+                get_values_from_dense_last_dim(tensor, voxel), voxel_values.tolist()
+            )
+        empty_tensor = torch.sparse_coo_tensor(
+            torch.zeros((4, 0), dtype=torch.long), torch.tensor([]), (4, 4, 4, 2)
+        )
+        self.assertEqual(get_values_at_voxels(empty_tensor, voxels).shape, (3, 2))
+
+    def test_circular_mean_along_axis(self):
+        hues = np.array([[0.9, 0.1, 0.0], [0.2, 0.3, 0.4], [0.95, 0.9, 0.85]])
+        means = circular_mean(hues, axis=1)
+        for hue, mean in zip(hues, means):
+            self.assertEqual(mean, circular_mean(hue))
+        self.assertAlmostEqual(means[1], 0.3)
+        self.assertAlmostEqual(means[2], 0.9)
+
+    def test_batched_pose_vector_mean(self):
+        """Test that each set of pose vectors is averaged independently."""
+        rng = np.random.default_rng(0)
+        rotations = Rotation.random(4 * 5, random_state=0)
+        # Rows of the rotation matrices are orthonormal pose vectors
+        pose_vecs = rotations.as_matrix().reshape((4, 5, 9))
+        # Flip some point normals to the other side of the surface
+        pose_vecs[rng.random((4, 5)) < 0.3, :3] *= -1
+        # Invalid pose vectors are ignored
+        pose_vecs[0, 1] = 0
+        pose_vecs[3] = 0
+        pose_fully_defined = (rng.random((4, 5, 1)) < 0.5).astype(float)
+        pv_means, use_cds_to_update = batched_pose_vector_mean(
+            pose_vecs, pose_fully_defined
+        )
+        for i in range(3):
+            expected, expected_use_cds = pose_vector_mean(
+                pose_vecs[i], pose_fully_defined[i]
+            )
+            self.assertTrue(np.allclose(pv_means[i], expected))
+            self.assertEqual(use_cds_to_update[i], expected_use_cds)
+            self.assertTrue(np.allclose(np.linalg.norm(pv_means[i, :3]), 1))
+        self.assertTrue(np.all(np.isnan(pv_means[3])))
+        self.assertFalse(use_cds_to_update[3])
+        self.assertEqual(
+            pose_vector_mean(pose_vecs[3], pose_fully_defined[3]), (None, False)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import unittest
+
+import numpy as np
+import quaternion
+
+from tbp.monty.frameworks.models.sensor_modules import HabitatDistantPatchSM
+from tbp.monty.frameworks.utils.sensor_processing import (
+    eig_2x2,
+    get_point_normal_total_least_squares,
+    get_point_normals_total_least_squares_batch,
+    get_principal_curvatures,
+    get_principal_curvatures_batch,
+    get_weight_matrix,
+)
+
+PATCH_SIZE = 64
+
+
+def make_patch(radius, cylinder=False, offset=(0, 0, 0), pixel_size=0.0006):
+    """Return a (N, 4) point cloud of a sphere or cylinder seen from +z.
+
+    The center pixel of the patch is at the top of the surface. Points on the
+    surface are labeled with semantic id 1, other points with 0.
+    """
+    coords = (np.arange(PATCH_SIZE) - PATCH_SIZE // 2) * pixel_size
+    x, y = np.meshgrid(coords, coords)
+    squared_dist = x**2 if cylinder else x**2 + y**2
+    on_object = squared_dist < radius**2
+    z = np.sqrt(np.clip(radius**2 - squared_dist, 0, None)) - radius
+    points = np.stack([x, y, z], axis=-1).reshape(-1, 3) + offset
+    return np.hstack([points, on_object.reshape(-1, 1)])
+
+
+class PrincipalCurvaturesTest(unittest.TestCase):
+    def setUp(self):
+        self.center_id = PATCH_SIZE // 2 + PATCH_SIZE * (PATCH_SIZE // 2)
+        self.view_dir = np.array([0.0, 0.0, -1.0])
+
+    def test_sphere_and_cylinder_curvatures(self):
+        radius = 0.05
+        for cylinder in [False, True]:
+            patch = make_patch(radius, cylinder=cylinder)
+            point_normal, valid_pn = get_point_normal_total_least_squares(
+                patch, self.center_id, self.view_dir
+            )
+            self.assertTrue(valid_pn)
+            np.testing.assert_allclose(np.abs(point_normal), [0, 0, 1], atol=1e-3)
+            k1, k2, dir1, dir2, valid_pc = get_principal_curvatures(
+                patch, self.center_id, point_normal
+            )
+            self.assertTrue(valid_pc)
+            expected = [1 / radius, 0] if cylinder else [1 / radius, 1 / radius]
+            np.testing.assert_allclose(np.abs([k1, k2]), expected, rtol=0.05, atol=0.5)
+            if cylinder:
+                # Largest curvature is across the cylinder axis.
+                np.testing.assert_allclose(np.abs(dir1), [1, 0, 0], atol=1e-3)
+            self.assertGreater(np.dot(np.cross(dir1, dir2), point_normal), 0)
+
+    def test_batch_matches_single_patches(self):
+        patches = np.stack(
+            [
+                make_patch(0.05),
+                make_patch(0.03, cylinder=True, offset=(0.1, 0, 0)),
+                make_patch(0.01),
+                np.zeros((PATCH_SIZE**2, 4)),
+            ]
+            # Enough patches to be processed in several chunks.
+            * 2
+        )
+        center_ids = [self.center_id] * len(patches)
+        view_dirs = np.tile(self.view_dir, (len(patches), 1))
+        point_normals, valid_pns = get_point_normals_total_least_squares_batch(
+            patches, center_ids, view_dirs
+        )
+        k1, k2, dirs1, dirs2, valid_pcs = get_principal_curvatures_batch(
+            patches, center_ids, point_normals
+        )
+        np.testing.assert_array_equal(valid_pns, [True, True, True, False] * 2)
+        np.testing.assert_array_equal(valid_pcs, [True, True, True, False] * 2)
+        for i, patch in enumerate(patches):
+            point_normal, valid_pn = get_point_normal_total_least_squares(
+                patch, self.center_id, self.view_dir
+            )
+            self.assertEqual(valid_pn, valid_pns[i])
+            np.testing.assert_allclose(point_normals[i], point_normal)
+            single = get_principal_curvatures(patch, self.center_id, point_normal)
+            np.testing.assert_allclose(
+                [k1[i], k2[i]], single[:2], rtol=1e-10, atol=1e-10
+            )
+            np.testing.assert_allclose(dirs1[i], single[2], atol=1e-10)
+            np.testing.assert_allclose(dirs2[i], single[3], atol=1e-10)
+            self.assertEqual(valid_pcs[i], single[4])
+
+    def test_eig_2x2_matches_numpy(self):
+        rng = np.random.default_rng(0)
+        mats = rng.normal(size=(100, 2, 2))
+        # Symmetric matrices have real eigenvalues, plus some degenerate cases.
+        mats = mats + mats.transpose(0, 2, 1)
+        mats[:3] = [np.eye(2), np.zeros((2, 2)), [[1, 0], [0, 2]]]
+        eigval, eigvec = eig_2x2(mats)
+        np.testing.assert_allclose(
+            eigval, np.sort(np.linalg.eigvalsh(mats))[:, ::-1], atol=1e-12
+        )
+        np.testing.assert_allclose(
+            np.matmul(mats, eigvec), eigvec * eigval[:, np.newaxis], atol=1e-12
+        )
+        np.testing.assert_allclose(np.linalg.norm(eigvec, axis=1), 1)
+
+    def test_weight_matrix_is_cached_read_only(self):
+        weights = get_weight_matrix(PATCH_SIZE**2, self.center_id)
+        self.assertIs(weights, get_weight_matrix(PATCH_SIZE**2, self.center_id))
+        self.assertFalse(weights.flags.writeable)
+
+
+class HabitatDistantPatchSMPrepareStepTest(unittest.TestCase):
+    def make_observation(self, patch):
+        return {
+            "semantic_3d": patch,
+            "sensor_frame_data": patch,
+            "world_camera": np.diag([1.0, 1.0, -1.0, 1.0]),
+            "rgba": np.ones((PATCH_SIZE, PATCH_SIZE, 4)),
+            "depth": np.ones((PATCH_SIZE, PATCH_SIZE)),
+        }
+
+    def make_sensor_module(self, sensor_module_id):
+        sm = HabitatDistantPatchSM(
+            sensor_module_id,
+            features=["on_object", "pose_vectors", "principal_curvatures"],
+        )
+        sm.pre_episode()
+        sensor_state = {"position": np.zeros(3), "rotation": quaternion.one}
+        sm.update_state(
+            {
+                "position": np.zeros(3),
+                "rotation": quaternion.one,
+                "sensors": {f"{sensor_module_id}.rgba": sensor_state},
+            }
+        )
+        return sm
+
+    def test_prepared_step_matches_step(self):
+        observations = [
+            self.make_observation(make_patch(0.05)),
+            self.make_observation(make_patch(0.02, cylinder=True)),
+            self.make_observation(np.zeros((PATCH_SIZE**2, 4))),
+        ]
+        sms = [self.make_sensor_module(f"patch_{i}") for i in range(3)]
+        HabitatDistantPatchSM.prepare_step(sms, observations)
+        self.assertIsNotNone(sms[0]._surface_geometry)
+        self.assertIsNone(sms[2]._surface_geometry)
+        for i, observation in enumerate(observations):
+            prepared_state = sms[i].step(observation)
+            self.assertIsNone(sms[i]._surface_geometry)
+            state = self.make_sensor_module(f"patch_{i}").step(observation)
+            self.assertEqual(prepared_state.use_state, state.use_state)
+            for key, value in state.morphological_features.items():
+                np.testing.assert_allclose(
+                    prepared_state.morphological_features[key], value, atol=1e-10
+                )
+            for key, value in state.non_morphological_features.items():
+                np.testing.assert_allclose(
+                    prepared_state.non_morphological_features[key], value, atol=1e-10
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
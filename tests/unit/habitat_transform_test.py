@@ -321,6 +321,88 @@ class HabitatTransformTest(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(semantic_3d_obs, expected_semantic_3d)
 
+    def test_semantic_3d_all_points(self):
+        resolution = TEST_OBS[AGENT_ID][SENSOR_ID]["depth"].shape
+        md_obs = MissingToMaxDepth(agent_id=AGENT_ID, max_depth=100)(TEST_OBS)
+        agent_rotation = qt.from_rotation_vector([0.3, -0.2, 0.5])
+        mock_state = {
+            AGENT_ID: {
+                "position": np.array([0.1, 1.5, -0.2]),
+                "rotation": agent_rotation,
+                "sensors": {
+                    f"{SENSOR_ID}.depth": {
+                        "position": np.array([0.0, 0.02, 0.0]),
+                        "rotation": qt.quaternion(1.0, 0.0, 0.0, 0.0),
+                    }
+                },
+            }
+        }
+        module_obs = {}
+        for get_all_points in [False, True]:
+            transform = DepthTo3DLocations(
+                agent_id=AGENT_ID,
+                sensor_ids=[SENSOR_ID],
+                resolutions=[resolution],
+                get_all_points=get_all_points,
+                use_semantic_sensor=True,
+            )
+            obs = transform(copy.deepcopy(md_obs), state=mock_state)
+            module_obs[get_all_points] = obs[AGENT_ID][SENSOR_ID]
+
+        all_points = module_obs[True]["semantic_3d"]
+        sensor_frame_data = module_obs[True]["sensor_frame_data"]
+        self.assertTupleEqual(all_points.shape, (np.prod(resolution), 4))
+        self.assertTupleEqual(sensor_frame_data.shape, (np.prod(resolution), 4))
+        # Off-object points are only skipped if not all points are returned
+        on_object = TEST_OBS[AGENT_ID][SENSOR_ID]["semantic"].flatten() > 0
+        np.testing.assert_array_equal(
+            all_points[on_object], module_obs[False]["semantic_3d"]
+        )
+        np.testing.assert_array_equal(sensor_frame_data[:, 3], all_points[:, 3])
+        np.testing.assert_array_equal(
+            sensor_frame_data[:, 2], -md_obs[AGENT_ID][SENSOR_ID]["depth"].flatten()
+        )
+        # Sensor frame and world locations are related by the world_camera transform
+        world_camera = module_obs[True]["world_camera"]
+        np.testing.assert_array_almost_equal(
+            sensor_frame_data[:, :3] @ world_camera[:3, :3].T + world_camera[:3, 3],
+            all_points[:, :3],
+        )
+
+    def test_surfaces_from_depth_batch(self):
+        transform = DepthTo3DLocations(
+            agent_id=AGENT_ID, sensor_ids=[SENSOR_ID], resolutions=[(16, 16)]
+        )
+        rng = np.random.default_rng(0)
+        depth_patches = rng.uniform(0.2, 0.25, (4, 16, 16))
+        # Two surfaces, with the patch center on the near one
+        depth_patches[1, :, :4] = 0.5
+        # Two surfaces, with the patch center on the far one
+        depth_patches[2, 6:, :] = 0.6
+        # Only background
+        depth_patches[3] = 1.2
+        semantic_patches = np.ones((4, 16, 16), dtype=int)
+        surfaces = transform.get_surfaces_from_depth(
+            depth_patches, semantic_patches, default_on_surface_th=1000.0
+        )
+        np.testing.assert_array_equal(surfaces[0], np.ones((16, 16)))
+        np.testing.assert_array_equal(surfaces[1], depth_patches[1] < 0.5)
+        np.testing.assert_array_equal(surfaces[2], depth_patches[2] == 0.6)
+        np.testing.assert_array_equal(surfaces[3], np.zeros((16, 16)))
+        for depth_patch, semantic_patch, surface in zip(
+            depth_patches, semantic_patches, surfaces
+        ):
+            np.testing.assert_array_equal(
+                transform.get_surface_from_depth(depth_patch, semantic_patch, 1000.0),
+                surface,
+            )
+            # Thresholds are at the bin edges of np.histogram
+            th, _ = transform.get_on_surface_th(
+                np.minimum(depth_patch, 1.0), semantic_patch, 0.01, 1000.0
+            )
+            _, bins = np.histogram(np.minimum(depth_patch, 1.0), bins=8)
+            self.assertTrue(th == 1000.0 or th in bins)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,421 @@
+# Copyright 2025 Thousand Brains Project
+#
+# Copyright may exist in Contributors' modifications
+# and/or contributions to the work.
+#
+# Use of this source code is governed by the MIT
+# license that can be found in the LICENSE file or at
+# https://opensource.org/licenses/MIT.
+
+import io
+import json
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import quaternion as qt
+from PIL import Image
+
+from tbp.monty.frameworks.actions.actions import (
+    LookDown,
+    LookUp,
+    MoveForward,
+    OrientHorizontal,
+    SetAgentPose,
+    SetSensorPose,
+    SetYaw,
+    TurnLeft,
+)
+from tbp.monty.frameworks.environment_utils.transforms import DepthTo3DLocations
+from tbp.monty.simulators.mesh import (
+    BVH,
+    PRIMITIVE_OBJECT_TYPES,
+    MeshAgent,
+    MeshSim,
+    intersect_triangles,
+    load_glb,
+)
+from tbp.monty.simulators.mesh.environment import MeshEnvironment
+
+EXPECTED_1X_ZOOM = np.zeros((16, 16), dtype=int)
+EXPECTED_1X_ZOOM[6:10, 6:10] = 1
+EXPECTED_2X_ZOOM = np.zeros((16, 16), dtype=int)
+EXPECTED_2X_ZOOM[4:12, 4:12] = 1
+EXPECTED_2X_SCALE = np.zeros((16, 16), dtype=int)
+EXPECTED_2X_SCALE[3:13, 3:13] = 1
+
+
+def create_agent(resolution=(16, 16), zoom=1.0, action_space_type="distant_agent"):
+    return MeshAgent(
+        agent_id="camera",
+        sensor_ids=("sensor_id_0",),
+        resolutions=(resolution,),
+        zooms=(zoom,),
+        semantics=(True,),
+        action_space_type=action_space_type,
+    )
+
+
+def write_glb(path, texture):
+    """Write a binary glTF file with a textured unit square in the xy plane.
+
+    The square is translated by (0, 0, -1) by its node.
+    """
+    positions = np.array([[-1, -1, 0], [1, -1, 0], [1, 1, 0], [-1, 1, 0]], np.float32)
+    uvs = np.array([[0, 1], [1, 1], [1, 0], [0, 0]], np.float32)
+    indices = np.array([0, 1, 2, 0, 2, 3], np.uint16)
+    png = io.BytesIO()
+    Image.fromarray(texture).save(png, format="PNG")
+    chunks = [positions.tobytes(), uvs.tobytes(), indices.tobytes(), png.getvalue()]
+    offsets = np.cumsum([0] + [len(c) for c in chunks])
+    binary = b"".join(chunks)
+    binary += b"\0" * (-len(binary) % 4)
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": [0, 0, -1]}],
+        "meshes": [
+            {
+                "primitives": [
+                    {
+                        "attributes": {"POSITION": 0, "TEXCOORD_0": 1},
+                        "indices": 2,
+                        "material": 0,
+                    }
+                ]
+            }
+        ],
+        "materials": [{"pbrMetallicRoughness": {"baseColorTexture": {"index": 0}}}],
+        "textures": [{"source": 0}],
+        "images": [{"bufferView": 3, "mimeType": "image/png"}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": int(offsets[i]), "byteLength": len(chunk)}
+            for i, chunk in enumerate(chunks)
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": 4, "type": "VEC3"},
+            {"bufferView": 1, "componentType": 5126, "count": 4, "type": "VEC2"},
+            {"bufferView": 2, "componentType": 5123, "count": 6, "type": "SCALAR"},
+        ],
+    }
+    content = json.dumps(gltf).encode()
+    content += b" " * (-len(content) % 4)
+    length = 12 + 8 + len(content) + 8 + len(binary)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, length))
+        f.write(struct.pack("<II", len(content), 0x4E4F534A) + content)
+        f.write(struct.pack("<II", len(binary), 0x004E4942) + binary)
+
+
+class BVHTest(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        vertices = rng.uniform(-1, 1, (300, 3))
+        faces = rng.integers(len(vertices), size=(100, 3))
+        origins = rng.uniform(-2, 2, (500, 3))
+        directions = rng.normal(size=(500, 3))
+        # Axis aligned rays have zero components
+        directions[:50, 1:] = 0
+        t_max = np.where(np.arange(500) % 2 == 0, np.inf, 1.0)
+
+        triangles = vertices[faces]
+        ray_ids, face_ids = np.meshgrid(np.arange(500), np.arange(100), indexing="ij")
+        ray_ids, face_ids = ray_ids.ravel(), face_ids.ravel()
+        t, _, _ = intersect_triangles(
+            origins[ray_ids],
+            directions[ray_ids],
+            triangles[face_ids, 0],
+            triangles[face_ids, 1] - triangles[face_ids, 0],
+            triangles[face_ids, 2] - triangles[face_ids, 0],
+        )
+        t = t.reshape(500, 100)
+        t[t >= t_max[:, np.newaxis]] = np.inf
+        expected_t = t.min(axis=1)
+
+        for leaf_size in [1, 4]:
+            bvh = BVH(vertices, faces, leaf_size=leaf_size)
+            t_hit, hit_faces, u, v = bvh.intersect(origins, directions, t_max=t_max)
+            np.testing.assert_allclose(t_hit, expected_t)
+            hit = hit_faces >= 0
+            np.testing.assert_array_equal(hit, np.isfinite(expected_t))
+            np.testing.assert_allclose(
+                t[np.arange(500)[hit], hit_faces[hit]], expected_t[hit]
+            )
+            # Barycentric coordinates give the hit points
+            tri = triangles[hit_faces[hit]]
+            points = (
+                (1 - u[hit] - v[hit])[:, np.newaxis] * tri[:, 0]
+                + u[hit][:, np.newaxis] * tri[:, 1]
+                + v[hit][:, np.newaxis] * tri[:, 2]
+            )
+            np.testing.assert_allclose(
+                points,
+                origins[hit] + t_hit[hit][:, np.newaxis] * directions[hit],
+                atol=1e-9,
+            )
+
+    def test_empty_mesh(self):
+        bvh = BVH(np.zeros((0, 3)), np.zeros((0, 3), dtype=int))
+        t, faces, _, _ = bvh.intersect(np.zeros(3), np.ones((2, 3)))
+        np.testing.assert_array_equal(t, np.inf)
+        np.testing.assert_array_equal(faces, -1)
+
+
+class MeshSimTest(unittest.TestCase):
+    def test_primitive_objects(self):
+        agent = create_agent(resolution=(32, 32))
+        with MeshSim(agents=[agent]) as sim:
+            for obj_name, expected_id in PRIMITIVE_OBJECT_TYPES.items():
+                sim.remove_all_objects()
+                sim.add_object(name=obj_name, position=(0.0, 1.5, -0.5))
+                semantic = sim.get_observations()["camera"]["sensor_id_0"]["semantic"]
+                actual = np.unique(semantic[semantic.nonzero()])
+                np.testing.assert_array_equal(actual, [expected_id])
+
+    def test_zoom_and_scale_match_habitat(self):
+        # Same expected images as the habitat-sim zoom and object scale tests
+        for zoom, scale, expected in [
+            (1.0, 1.0, EXPECTED_1X_ZOOM),
+            (2.0, 1.0, EXPECTED_2X_ZOOM),
+            (1.0, 2.0, EXPECTED_2X_SCALE),
+        ]:
+            with MeshSim(agents=[create_agent(zoom=zoom)]) as sim:
+                sim.add_object(
+                    name="cube",
+                    position=(0.0, 1.5, -0.5),
+                    scale=(scale, scale, scale),
+                    semantic_id=1,
+                )
+                obs = sim.get_observations()["camera"]["sensor_id_0"]
+                np.testing.assert_array_equal(obs["semantic"], expected)
+                # Planar depth of the front face, 0 where nothing is hit
+                expected_depth = np.where(expected, 0.5 - 0.1 * scale, 0)
+                np.testing.assert_allclose(obs["depth"], expected_depth, rtol=1e-6)
+                self.assertEqual(obs["rgba"].shape, (16, 16, 4))
+
+    def test_depth_unprojects_to_surface(self):
+        agent = create_agent(resolution=(64, 64))
+        with MeshSim(agents=[agent]) as sim:
+            sim.add_object(name="uvSphereSolid", position=(0.0, 1.5, -0.5))
+            sim.apply_action(TurnLeft(agent_id="camera", rotation_degrees=5.0))
+            obs = sim.get_observations()
+            transform = DepthTo3DLocations(
+                agent_id="camera",
+                sensor_ids=["sensor_id_0"],
+                resolutions=[(64, 64)],
+                world_coord=True,
+                get_all_points=True,
+            )
+            obs = transform(obs, sim.get_states())
+            points = obs["camera"]["sensor_id_0"]["semantic_3d"]
+            on_object = points[points[:, 3] > 0, :3]
+            self.assertGreater(len(on_object), 100)
+            distances = np.linalg.norm(on_object - [0.0, 1.5, -0.5], axis=1)
+            np.testing.assert_allclose(distances, 0.1, atol=1e-3)
+
+    def test_move_and_get_agent_state(self):
+        with MeshSim(agents=[create_agent(resolution=(64, 64))]) as sim:
+            cylinder = sim.add_object(name="cylinderSolid", position=(-0.2, 1.5, -0.2))
+            cube = sim.add_object(name="cubeSolid", position=(0.6, 1.5, -0.6))
+
+            def visible_ids(obs):
+                semantic = obs["camera"]["sensor_id_0"]["semantic"]
+                return set(semantic[semantic.nonzero()])
+
+            expected = {cylinder.semantic_id, cube.semantic_id}
+            self.assertSetEqual(visible_ids(sim.get_observations()), expected)
+
+            # Turn the camera 10 degrees to the left, the cube is out of view
+            obs = sim.apply_action(TurnLeft(agent_id="camera", rotation_degrees=10.0))
+            self.assertSetEqual(visible_ids(obs), {cylinder.semantic_id})
+
+            # Reset restores the initial view
+            self.assertSetEqual(visible_ids(sim.reset()), expected)
+
+    def test_get_states(self):
+        agent_pos = np.array([2.125, 1.5, -5.278])
+        agent_rot = qt.from_rotation_vector([np.pi / 2, 0.0, 0.0])
+        agent = create_agent()
+        sensor_pos = np.zeros(3)
+        with MeshSim(agents=[agent]) as sim:
+            sim.apply_action(
+                SetAgentPose(
+                    agent_id="camera", location=agent_pos, rotation_quat=agent_rot
+                )
+            )
+            state = sim.get_states()["camera"]
+            self.assertSetEqual(
+                set(state["sensors"]),
+                {f"sensor_id_0.{t}" for t in ["rgba", "depth", "semantic"]},
+            )
+            np.testing.assert_allclose(state["position"], agent_pos)
+            self.assertTrue(qt.isclose(state["rotation"], agent_rot))
+
+            sim.apply_action(TurnLeft(agent_id="camera", rotation_degrees=10.0))
+            state = sim.get_states()["camera"]
+            turn_left_quat = qt.from_rotation_vector([0.0, np.deg2rad(10.0), 0.0])
+            self.assertTrue(qt.isclose(state["rotation"], agent_rot * turn_left_quat))
+            np.testing.assert_allclose(state["position"], agent_pos)
+
+            sim.apply_action(
+                SetAgentPose(
+                    agent_id="camera", location=agent_pos, rotation_quat=agent_rot
+                )
+            )
+            sim.apply_action(LookUp(agent_id="camera", rotation_degrees=10.0))
+            state = sim.get_states()["camera"]
+            sensor_state = state["sensors"]["sensor_id_0.rgba"]
+            look_up_quat = qt.from_rotation_vector([np.deg2rad(10.0), 0.0, 0.0])
+            self.assertTrue(qt.isclose(sensor_state["rotation"], look_up_quat))
+            np.testing.assert_allclose(sensor_state["position"], sensor_pos)
+            self.assertTrue(qt.isclose(state["rotation"], agent_rot))
+
+            # Looking up and down is constrained
+            sim.apply_action(
+                LookDown(
+                    agent_id="camera", rotation_degrees=50.0, constraint_degrees=30
+                )
+            )
+            sensor_state = sim.get_states()["camera"]["sensors"]["sensor_id_0.rgba"]
+            look_down_quat = qt.from_rotation_vector([np.deg2rad(-30.0), 0.0, 0.0])
+            self.assertTrue(qt.isclose(sensor_state["rotation"], look_down_quat))
+
+            sim.apply_action(MoveForward(agent_id="camera", distance=0.25))
+            state = sim.get_states()["camera"]
+            np.testing.assert_allclose(state["position"], agent_pos + [0, 0.25, 0])
+
+    def test_surface_agent_actions(self):
+        agent = create_agent(action_space_type="surface_agent")
+        with MeshSim(agents=[agent]) as sim:
+            sim.apply_action(
+                OrientHorizontal(
+                    agent_id="camera",
+                    rotation_degrees=90.0,
+                    left_distance=0.1,
+                    forward_distance=0.2,
+                )
+            )
+            state = sim.get_states()["camera"]
+            # Move 0.1 left, turn right and move 0.2 forward, which is now +x
+            np.testing.assert_allclose(state["position"], [0.1, 1.5, 0.0], atol=1e-12)
+            turn_right_quat = qt.from_rotation_vector([0.0, -np.pi / 2, 0.0])
+            self.assertTrue(qt.isclose(state["rotation"], turn_right_quat))
+
+            # Actions of other action spaces are invalid
+            with self.assertRaises(ValueError):
+                sim.apply_action(TurnLeft(agent_id="camera", rotation_degrees=10.0))
+
+    def test_absolute_actions(self):
+        agent = create_agent(action_space_type="absolute_only")
+        with MeshSim(agents=[agent]) as sim:
+            sim.apply_action(SetYaw(agent_id="camera", rotation_degrees=45.0))
+            state = sim.get_states()["camera"]
+            yaw_quat = qt.from_rotation_vector([0.0, 0.0, np.pi / 4])
+            self.assertTrue(qt.isclose(state["rotation"], yaw_quat))
+
+            sensor_rot = qt.from_rotation_vector([0.0, 0.3, 0.0])
+            sim.apply_action(
+                SetSensorPose(
+                    agent_id="camera",
+                    location=(0.0, 0.1, 0.0),
+                    rotation_quat=sensor_rot,
+                )
+            )
+            sensor_state = sim.get_states()["camera"]["sensors"]["sensor_id_0.depth"]
+            np.testing.assert_allclose(sensor_state["position"], [0.0, 0.1, 0.0])
+            self.assertTrue(qt.isclose(sensor_state["rotation"], sensor_rot))
+
+    def test_data_path(self):
+        texture = np.zeros((2, 2, 4), dtype=np.uint8)
+        texture[..., 3] = 255
+        texture[:, 0, 0] = 255  # Left half red
+        texture[:, 1, 2] = 255  # Right half blue
+        with tempfile.TemporaryDirectory() as data_path:
+            dataset_path = Path(data_path) / "objects" / "ycb"
+            (dataset_path / "meshes").mkdir(parents=True)
+            write_glb(dataset_path / "meshes" / "square.glb", texture)
+            with (dataset_path / "001_square.object_config.json").open("w") as f:
+                json.dump({"render_asset": "meshes/square.glb", "scale": [0.2] * 3}, f)
+            with (dataset_path / "test_obj.object_config.json").open("w") as f:
+                json.dump({"render_asset": "icosphereSolid_subdivs_1"}, f)
+
+            mesh = load_glb(dataset_path / "meshes" / "square.glb")
+            np.testing.assert_allclose(mesh.bounds, [[-1, -1, -1], [1, 1, -1]])
+
+            agent = create_agent(resolution=(4, 4))
+            with MeshSim(agents=[agent], data_path=data_path) as sim:
+                # Objects are centered and scaled, and found by substring
+                square = sim.add_object("square", position=(0.0, 1.5, -0.5))
+                self.assertEqual(square.handle, "001_square")
+                np.testing.assert_allclose(
+                    square.mesh.bounds, [[-0.2, -0.2, 0], [0.2, 0.2, 0]]
+                )
+                obs = sim.get_observations()["camera"]["sensor_id_0"]
+                rgba = obs["rgba"][1:3, 1:3]
+                np.testing.assert_array_equal(rgba[:, 0], [[255, 0, 0, 255]] * 2)
+                np.testing.assert_array_equal(rgba[:, 1], [[0, 0, 255, 255]] * 2)
+                np.testing.assert_array_equal(obs["rgba"][0, 0], [0, 0, 0, 255])
+                # Objects without semantic ID in their config have ID 0
+                self.assertEqual(square.semantic_id, 0)
+
+                sim.remove_all_objects()
+                sim.add_object("test_obj", position=(0.0, 1.5, -0.15), semantic_id=3)
+                semantic = sim.get_observations()["camera"]["sensor_id_0"]["semantic"]
+                self.assertEqual(semantic[1, 1], 3)
+
+        with tempfile.TemporaryDirectory() as data_path:
+            with self.assertRaises(ValueError):
+                MeshSim(agents=[create_agent()], data_path=data_path)
+
+    def test_environment(self):
+        env = MeshEnvironment(
+            agents=[
+                {
+                    "agent_type": MeshAgent,
+                    "agent_args": dict(agent_id="camera", sensor_ids=("patch",)),
+                }
+            ],
+            objects=[dict(name="coneSolid", position=(0.0, 1.5, -0.2))],
+        )
+        self.assertIn("camera.look_up", env.action_space)
+        obs = env.reset()
+        self.assertEqual(obs["camera"]["patch"]["depth"].shape, (16, 16))
+        self.assertGreater(obs["camera"]["patch"]["depth"][8, 8], 0)
+        obs = env.step(LookUp(agent_id="camera", rotation_degrees=90.0))
+        np.testing.assert_array_equal(obs["camera"]["patch"]["depth"], 0)
+        env.close()
+
+    def test_add_distractor_objects(self):
+        env = MeshEnvironment(
+            agents=[
+                {
+                    "agent_type": MeshAgent,
+                    "agent_args": dict(agent_id="camera", sensor_ids=("patch",)),
+                }
+            ],
+        )
+        target = env.add_object(name="cubeSolid", position=(0.0, 1.5, -0.5))
+        target_bb = target.get_bounding_corners()
+        for _ in range(3):
+            distractor = env.add_object(
+                name="sphereSolid",
+                position=(0.0, 1.5, -0.5),
+                object_to_avoid=True,
+                primary_target_object=target,
+            )
+            min_corner, max_corner = distractor.get_bounding_corners()
+            # Moved in the x-z plane until the boxes do not overlap
+            self.assertEqual(distractor.position[1], 1.5)
+            self.assertFalse(
+                np.all((min_corner < target_bb[1]) & (max_corner > target_bb[0]))
+            )
+        self.assertEqual(env._env.get_num_objects(), 4)
+        env.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,6 +19,7 @@ from tbp.monty.frameworks.models.object_model import (
     GridObjectModel,
     GridTooSmallError,
 )
+from tbp.monty.frameworks.utils.object_model_utils import circular_mean
 from tbp.monty.frameworks.utils.spatial_arithmetics import check_orthonormal
 
 
@@ -295,6 +296,167 @@ class ObjectModelTest(unittest.TestCase):
             )
         self.assertTrue(check_orthonormal(avg_pvs), "Average PVs are not orthonormal")
 
+    def test_grids_are_updated_per_voxel(self):
+        """Test averaging in voxels with different numbers of new observations."""
+        # With 1cm voxels, the locations fall into voxels with 3, 2 and 1 observations.
+        locations = np.array(
+            [
+                [0, 0, 0],
+                [0.002, 0, 0],
+                [0.05, 0, 0],
+                [0, 0.001, 0],
+                [0.052, 0, 0.001],
+                [0, 0.05, 0],
+            ]
+        )
+        features = {
+            "pose_vectors": np.tile(self.dummy_pv.flatten(), (6, 1)),
+            "pose_fully_defined": np.array([True, False, False, False, True, True]),
+            "hsv": np.array(
+                [
+                    [0.9, 1, 0],
+                    [0.1, 1, 1],
+                    [0.3, 0, 1],
+                    [0.9, 0, 1],
+                    [0.5, 1, 0],
+                    [0.4, 1, 1],
+                ]
+            ),
+            "curvature": np.array([1, 2, 3, 4, 5, 6]),
+        }
+        model = GridObjectModel(
+            "test_model", max_nodes=10, max_size=1, num_voxels_per_dim=100
+        )
+        model.build_model(locations, features)
+        self.assertEqual(model.num_nodes, 3)
+        # Nodes are sorted by observation count
+        expected_locations = [
+            np.mean(locations[[0, 1, 3]], axis=0),
+            np.mean(locations[[2, 4]], axis=0),
+            locations[5],
+        ]
+        for location, expected_location in zip(model.pos, expected_locations):
+            self.assertTrue(np.array_equal(location, expected_location))
+        self.assertEqual(
+            list(model.get_values_for_feature("curvature").flatten()), [7 / 3, 4, 6]
+        )
+        self.assertEqual(
+            list(model.get_values_for_feature("pose_fully_defined").flatten()),
+            [False, True, True],
+        )
+        hues = features["hsv"][:, 0]
+        self.assertTrue(
+            np.allclose(
+                model.get_values_for_feature("hsv")[:, 0],
+                [circular_mean(hues[[0, 1, 3]]), circular_mean(hues[[2, 4]]), hues[5]],
+            )
+        )
+
+        # New observations are averaged with the previous average of their voxel.
+        model.update_model(
+            locations=np.array([[0.05, 0, 0], [0.051, 0, 0], [0.1, 0, 0]]),
+            features={
+                "pose_vectors": np.tile(self.dummy_pv.flatten(), (3, 1)),
+                "pose_fully_defined": np.array([True, True, True]),
+                "hsv": np.array([[0.3, 0, 1], [0.3, 0, 1], [0.3, 0, 1]]),
+                "curvature": np.array([1, 3, 7]),
+            },
+            location_rel_model=np.zeros(3),
+            object_location_rel_body=np.zeros(3),
+            object_rotation=Rotation.identity(),
+        )
+        self.assertEqual(model.num_nodes, 4)
+        updated_node = np.argmin(np.linalg.norm(model.pos - [0.05, 0, 0], axis=1))
+        self.assertTrue(
+            np.allclose(
+                model.pos[updated_node],
+                (expected_locations[1] + np.array([0.0505, 0, 0])) / 2,
+            )
+        )
+        curvatures = model.get_values_for_feature("curvature").flatten()
+        self.assertEqual(curvatures[updated_node], 3)
+        self.assertEqual(sorted(curvatures), [7 / 3, 3, 6, 7])
+        self.assertTrue(
+            np.array_equal(
+                model.get_values_for_feature("pose_vectors"),
+                np.tile(self.dummy_pv.flatten(), (4, 1)),
+            )
+        )
+
+    def test_voxel_stores_give_same_model(self):
+        rng = np.random.default_rng(0)
+        locations = rng.normal(0, 0.02, (300, 3))
+        features = {
+            "pose_vectors": np.tile(self.dummy_pv.flatten(), (300, 1)),
+            "pose_fully_defined": np.ones(300, dtype=bool),
+            "curvature": rng.normal(size=300),
+        }
+        models = {}
+        for voxel_store in ["arrays", "sparse_tensor"]:
+            model = GridObjectModel(
+                "test_model",
+                max_nodes=50,
+                max_size=0.2,
+                num_voxels_per_dim=20,
+                voxel_store=voxel_store,
+            )
+            model.build_model(
+                locations[:200], {key: value[:200] for key, value in features.items()}
+            )
+            model.update_model(
+                locations[200:],
+                {key: value[200:] for key, value in features.items()},
+                location_rel_model=np.zeros(3),
+                object_location_rel_body=np.zeros(3),
+                object_rotation=Rotation.identity(),
+            )
+            models[voxel_store] = model
+        self.assertTrue(
+            np.array_equal(models["arrays"].pos, models["sparse_tensor"].pos)
+        )
+        self.assertTrue(np.array_equal(models["arrays"].x, models["sparse_tensor"].x))
+        with self.assertRaises(ValueError):
+            GridObjectModel(
+                "test_model",
+                max_nodes=10,
+                max_size=10,
+                num_voxels_per_dim=10,
+                voxel_store="dense",
+            )
+
+    def test_models_with_sparse_tensor_grids_can_be_loaded(self):
+        """Test that pickled models with sparse tensor grids are converted."""
+        model = GridObjectModel(
+            "test_model",
+            max_nodes=10,
+            max_size=10,
+            num_voxels_per_dim=5,
+            voxel_store="sparse_tensor",
+        )
+        model.build_model(self.dummy_locs, self.dummy_features)
+        # State of a model pickled before voxel stores were added
+        legacy_state = dict(model.__dict__)
+        voxel_store = legacy_state.pop("_voxel_store")
+        del legacy_state["_voxel_store_type"]
+        legacy_state["_observation_count"] = voxel_store.observation_count
+        legacy_state["_location_grid"] = voxel_store.location_grid
+        legacy_state["_feature_grid"] = voxel_store.feature_grid
+        loaded_model = GridObjectModel.__new__(GridObjectModel)
+        loaded_model.__setstate__(legacy_state)
+        self.assertEqual(loaded_model._voxel_store_type, "arrays")
+        self.assertEqual(len(loaded_model._voxel_store), 1)
+        self.assertIn("Feature grid shape: (5, 5, 5, 14)", repr(loaded_model))
+        for updated_model in [model, loaded_model]:
+            updated_model.update_model(
+                self.dummy_locs + 2,
+                self.dummy_features,
+                location_rel_model=np.zeros(3),
+                object_location_rel_body=np.zeros(3),
+                object_rotation=Rotation.identity(),
+            )
+        self.assertTrue(np.array_equal(loaded_model.pos, model.pos))
+        self.assertTrue(np.array_equal(loaded_model.x, model.x))
+
     def test_max_nodes_applied_correctly(self):
         model = GridObjectModel(
             "test_model", max_nodes=3, max_size=10, num_voxels_per_dim=10
@@ -37,6 +37,10 @@ from tbp.monty.frameworks.experiments import (
     MontySupervisedObjectPretrainingExperiment,
 )
 from tbp.monty.frameworks.models.displacement_matching import DisplacementGraphLM
+from tbp.monty.frameworks.run_parallel import (
+    evaluate_with_persistent_workers,
+    run_episodes_parallel,
+)
 from tbp.monty.frameworks.run_parallel import main as run_parallel
 from tbp.monty.simulators.habitat.configs import (
     EnvInitArgsPatchViewMount,
@@ -45,6 +49,20 @@ from tbp.monty.simulators.habitat.configs import (
 from tests.unit.graph_learning_test import MotorSystemConfigFixed
 
 
+class CrashingExperiment:
+    """Experiment whose process dies without reporting an error."""
+
+    def __init__(self, config):
+        os._exit(1)
+
+
+class FailingExperiment:
+    """Experiment that raises an error when it is created."""
+
+    def __init__(self, config):
+        raise RuntimeError("Experiment failed")
+
+
 class RunParallelTest(unittest.TestCase):
     def setUp(self):
         self.output_dir = tempfile.mkdtemp()
@@ -362,6 +380,129 @@ class RunParallelTest(unittest.TestCase):
 
         shutil.rmtree(self.output_dir)
 
+    def test_parallel_eval_with_shared_model(self):
+        pprint("...Training in serial...")
+        with MontySupervisedObjectPretrainingExperiment(
+            self.supervised_pre_training
+        ) as exp:
+            exp.model.set_experiment_mode("train")
+            exp.train()
+
+        pprint("...Evaluating in serial...")
+        with MontyObjectRecognitionExperiment(self.eval_config) as eval_exp:
+            eval_exp.evaluate()
+
+        pprint("...Evaluating in parallel with a shared model...")
+        run_parallel(
+            exp=self.eval_config,
+            experiment="unittest_eval_shared",
+            num_parallel=1,
+            quiet_habitat_logs=True,
+            print_cfg=False,
+            is_unittest=True,
+            share_model=True,
+        )
+
+        eval_dir = os.path.join(self.output_dir, "eval")
+        parallel_eval_dir = os.path.join(eval_dir, "unittest_eval_shared")
+        # The model store converted for the workers is removed after the run
+        self.assertFalse(
+            os.path.exists(os.path.join(parallel_eval_dir, "shared_model"))
+        )
+        scsv = pd.read_csv(os.path.join(eval_dir, "eval_stats.csv"))
+        pcsv = pd.read_csv(os.path.join(parallel_eval_dir, "eval_stats.csv"))
+        for col in ["time", "stepwise_performance", "stepwise_target_object"]:
+            scsv.drop(columns=col, inplace=True)
+            pcsv.drop(columns=col, inplace=True)
+
+        self.assertTrue(pcsv.equals(scsv))
+
+        shutil.rmtree(self.output_dir)
+
+    def test_parallel_eval_with_persistent_workers(self):
+        pprint("...Training in serial...")
+        with MontySupervisedObjectPretrainingExperiment(
+            self.supervised_pre_training
+        ) as exp:
+            exp.model.set_experiment_mode("train")
+            exp.train()
+
+        pprint("...Evaluating in serial...")
+        with MontyObjectRecognitionExperiment(self.eval_config) as eval_exp:
+            eval_exp.evaluate()
+
+        pprint("...Evaluating in parallel with a persistent worker...")
+        run_parallel(
+            exp=self.eval_config,
+            experiment="unittest_eval_persistent",
+            num_parallel=1,
+            quiet_habitat_logs=True,
+            print_cfg=False,
+            is_unittest=True,
+            persistent_workers=True,
+        )
+
+        eval_dir = os.path.join(self.output_dir, "eval")
+        parallel_eval_dir = os.path.join(eval_dir, "unittest_eval_persistent")
+        self.check_reproducibility_logs(
+            os.path.join(eval_dir, "reproduce_episode_data"),
+            os.path.join(parallel_eval_dir, "reproduce_episode_data"),
+        )
+        scsv = pd.read_csv(os.path.join(eval_dir, "eval_stats.csv"))
+        pcsv = pd.read_csv(os.path.join(parallel_eval_dir, "eval_stats.csv"))
+        for col in ["time", "stepwise_performance", "stepwise_target_object"]:
+            scsv.drop(columns=col, inplace=True)
+            pcsv.drop(columns=col, inplace=True)
+
+        self.assertTrue(pcsv.equals(scsv))
+
+        shutil.rmtree(self.output_dir)
+
+    def test_crashed_persistent_worker_raises_error(self):
+        configs = [
+            dict(
+                experiment_class=CrashingExperiment,
+                logging_config=dict(output_dir=self.output_dir),
+            )
+        ]
+        with self.assertRaises(RuntimeError):
+            list(evaluate_with_persistent_workers(configs, num_parallel=1))
+
+        shutil.rmtree(self.output_dir)
+
+    def test_shared_model_is_removed_if_evaluation_fails(self):
+        model_dir = os.path.join(self.output_dir, "pretrained")
+        os.makedirs(model_dir)
+        torch.save({"lm_dict": {}}, os.path.join(model_dir, "model.pt"))
+        eval_dir = os.path.join(self.output_dir, "eval")
+        configs = [
+            dict(
+                experiment_class=FailingExperiment,
+                experiment_args=dict(model_name_or_path=model_dir),
+                logging_config=dict(
+                    output_dir=os.path.join(eval_dir, "episode_0"),
+                    log_parallel_wandb=False,
+                ),
+            )
+        ]
+        with self.assertRaises(RuntimeError):
+            run_episodes_parallel(
+                configs,
+                num_parallel=1,
+                experiment_name="unittest_eval_failing",
+                train=False,
+                is_unittest=True,
+                share_model=True,
+            )
+        self.assertTrue(
+            configs[0]["experiment_args"]["model_name_or_path"].startswith(
+                os.path.join(eval_dir, "shared_model")
+            )
+        )
+        self.assertFalse(os.path.exists(os.path.join(eval_dir, "shared_model")))
+
+        shutil.rmtree(self.output_dir)
+
 
 if __name__ == "__main__":
     unittest.main()